@@ -3,12 +3,14 @@
 エントリポイント
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
 
-from routers import records, analysis, weekly, dialogue, summaries, morning_dialogue, journal, diary_dialogue, braindump, reminders, categories, flashcards, wishlist, gratitude, udemy_tips
+from services.ai_guard import AIUnavailableError
+from routers import records, analysis, weekly, dialogue, summaries, morning_dialogue, journal, diary_dialogue, braindump, reminders, categories, flashcards, wishlist, gratitude, udemy_tips, backfill, metrics, jobs, scheduler, stats, history, suggestions, search
 
 # 環境変数の読み込み
 load_dotenv()
@@ -47,6 +49,24 @@ app.include_router(flashcards.router,    prefix="/api/v1", tags=["flashcards"])
 app.include_router(wishlist.router,      prefix="/api/v1", tags=["wishlist"])
 app.include_router(gratitude.router,     prefix="/api/v1", tags=["gratitude"])
 app.include_router(udemy_tips.router,    prefix="/api/v1", tags=["udemy-tips"])
+app.include_router(backfill.router,      prefix="/api/v1", tags=["backfill"])
+app.include_router(metrics.router,       prefix="/api/v1", tags=["metrics"])
+app.include_router(jobs.router,          prefix="/api/v1", tags=["jobs"])
+app.include_router(scheduler.router,     prefix="/api/v1", tags=["scheduler"])
+app.include_router(stats.router,         prefix="/api/v1", tags=["stats"])
+app.include_router(history.router,       prefix="/api/v1", tags=["history"])
+app.include_router(suggestions.router,   prefix="/api/v1", tags=["suggestions"])
+app.include_router(search.router,        prefix="/api/v1", tags=["search"])
+
+
+@app.exception_handler(AIUnavailableError)
+async def _ai_unavailable_handler(request: Request, exc: AIUnavailableError):
+    """AI の回路が開いている間は 503 と再試行までの目安秒数を返す"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.on_event("startup")
@@ -63,6 +83,20 @@ async def _run_startup_migrations():
         logger.warning("起動時移行に失敗（処理は継続）: %s", e)
 
 
+@app.on_event("startup")
+async def _start_job_worker():
+    """AI 生成ジョブのワーカースレッドを起動する（前のインスタンスが残したジョブもここで拾う）"""
+    from services import job_queue
+    job_queue.start_worker()
+
+
+@app.on_event("startup")
+async def _start_pregeneration_scheduler():
+    """PREGENERATE_AT が設定されていれば事前生成のスケジューラーを起動する"""
+    from services import pregeneration
+    pregeneration.start_scheduler()
+
+
 @app.get("/")
 async def root():
     return {"message": "日次行動分析AI API", "version": "1.0.0"}
@@ -91,16 +91,20 @@ class MoodTrajectory(BaseModel):
     trend: str = "stable"             # improving|stable|declining
 
 
-class WeeklyJournalDigest(BaseModel):
-    """週次ジャーナルダイジェスト"""
-    id: str
-    week_id: str
-    week_start: str
-    week_end: str
+class WeeklyJournalDigestContent(BaseModel):
+    """週次ジャーナルダイジェストの AI 出力（tool schema としても使用）"""
     emotion_trends: list[EmotionTrend] = []
     top_blockers: list[TopBlocker] = []
     weekly_insights: list[str] = []
     hidden_patterns: list[str] = []
     mood_trajectory: MoodTrajectory = MoodTrajectory()
     action_recommendations: list[str] = []
+
+
+class WeeklyJournalDigest(WeeklyJournalDigestContent):
+    """週次ジャーナルダイジェスト"""
+    id: str
+    week_id: str
+    week_start: str
+    week_end: str
     created_at: Optional[str] = None
@@ -81,6 +81,7 @@ class DailyRecord(BaseModel):
     rest_day: bool = False
     rest_reason: str = ""
     available_hours: Optional[float] = None
+    time_accounting: Optional[dict] = None   # utils.time_accounting.compute の結果
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -116,10 +117,33 @@ class AnalysisSummary(BaseModel):
     productive_hours: float = 0.0
     wasted_hours: float = 0.0
     youtube_hours: float = 0.0
+    tasks_completed_count: Optional[int] = None
     task_completion_rate: float = 0.0
     overall_score: int = 0       # 0-100
 
 
+class DailyAnalysisContent(BaseModel):
+    """日次分析・共創分析の保存形式（AI 出力に計算済みの時間を加えたもの）"""
+    summary: AnalysisSummary = AnalysisSummary()
+    analysis: AnalysisDetail = AnalysisDetail()
+
+
+class AnalysisScores(BaseModel):
+    """AI が出力するサマリー（時間は time_accounting で計算する。記録の時刻が不整合な日だけ AI が推定する）"""
+    productive_hours: Optional[float] = None
+    wasted_hours: Optional[float] = None
+    youtube_hours: Optional[float] = None
+    tasks_completed_count: Optional[int] = None
+    task_completion_rate: float = 0.0
+    overall_score: int = 0       # 0-100
+
+
+class DailyAnalysisOutput(BaseModel):
+    """日次分析・共創分析の AI 出力（tool schema として使用）"""
+    summary: AnalysisScores = AnalysisScores()
+    analysis: AnalysisDetail = AnalysisDetail()
+
+
 class DailyAnalysis(BaseModel):
     """日次分析レスポンス"""
     id: str
@@ -129,6 +153,54 @@ class DailyAnalysis(BaseModel):
     created_at: Optional[str] = None
 
 
+# ---- 週次分析 ----
+
+class WeeklySummary(BaseModel):
+    """週次サマリー"""
+    avg_productive_hours: float = 0.0
+    avg_wasted_hours: float = 0.0
+    avg_task_completion_rate: float = 0.0
+    total_youtube_hours: float = 0.0
+    avg_overall_score: float = 0.0
+    score_trend: str = "stable"   # improving|declining|stable
+
+
+class TimeWaster(BaseModel):
+    """最大の時間泥棒"""
+    activity: str
+    total_hours: float = 0.0
+    trigger: str = ""
+
+
+class ImprovementPlan(BaseModel):
+    """来週の改善プラン"""
+    next_week_goals: list[str] = []
+    concrete_actions: list[str] = []
+    habit_building: list[str] = []
+
+
+class ProgressVsLastWeek(BaseModel):
+    """先週との比較"""
+    improved: list[str] = []
+    declined: list[str] = []
+    unchanged: list[str] = []
+
+
+class WeeklyDeepAnalysis(BaseModel):
+    """週次の深掘り分析"""
+    weekly_pattern: str = ""
+    biggest_time_wasters: list[TimeWaster] = []
+    cognitive_patterns: list[str] = []
+    improvement_plan: ImprovementPlan = ImprovementPlan()
+    progress_vs_last_week: ProgressVsLastWeek = ProgressVsLastWeek()
+
+
+class WeeklyAnalysisContent(BaseModel):
+    """週次分析の AI 出力（tool schema としても使用）"""
+    weekly_summary: WeeklySummary = WeeklySummary()
+    deep_analysis: WeeklyDeepAnalysis = WeeklyDeepAnalysis()
+
+
 # ---- ソクラテス式対話 ----
 
 class DialogueMessage(BaseModel):
@@ -173,6 +245,11 @@ class MorningPlan(BaseModel):
     focus_message: str = ""
 
 
+class DiarySynthesis(BaseModel):
+    """日記入力対話のまとめ（AI 出力）"""
+    raw_input: str
+
+
 class PatternSummary(BaseModel):
     """月次パターンサマリー"""
     pattern: str
@@ -37,9 +37,6 @@ DAILY_ANALYSIS_SYSTEM_PROMPT = """
 ```json
 {
   "summary": {
-    "productive_hours": <number>,
-    "wasted_hours": <number>,
-    "youtube_hours": <number>,
     "tasks_completed_count": <完了タスク数>,
     "task_completion_rate": <0.0-1.0 完了タスク数ベースで評価。未完了数で減点しない>,
     "overall_score": <0-100>
@@ -72,18 +69,24 @@ DAILY_ANALYSIS_SYSTEM_PROMPT = """
 - スクリーンタイムデータがある場合、アプリ別の使用時間を分析に含めること
 - 改善提案は優先度付きで3〜5個に絞ること
 - overall_score の基準: 70以上=良い日、40-69=普通、39以下=改善が必要
+- **時間集計が提供されている場合**: 生産的な時間・無駄時間・YouTube の時間は記録から計算済みの
+  値なので、推定し直さずにその数値を分析に引用すること（summary に productive_hours / wasted_hours /
+  youtube_hours は出力しない）。「計算できません」とある場合だけ、記録から推定して summary に入れること
 - **活動可能時間が申告されている場合**: その時間を前提に生産性を評価すること。
   例えば残業で帰宅が遅く可処分時間が2時間しかない日に1.5時間勉強できていれば、
   絶対時間は短くても高評価（75%活用）とすること。フルに時間がある日と同じ基準で
   減点してはならない。
+- **異常検知が提供されている場合**: 最近の基準と比べて本日の値がどれだけ離れているかに触れ、
+  直近の外れ値や水準の変化（変化点）は繰り返しパターンや悪化・改善の根拠として引用すること
 """.strip()
 
 
 def build_daily_analysis_prompt(
     record: dict,
     screen_time: dict | None,
-    past_records: list[dict],
-    past_analyses: list[dict],
+    past_days: list[dict],
+    time_facts: str = "",
+    anomaly_facts: str = "",
 ) -> str:
     """
     日次分析のユーザープロンプトを構築する
@@ -91,8 +94,9 @@ def build_daily_analysis_prompt(
     Args:
         record: 当日の行動記録
         screen_time: スクリーンタイムデータ（任意）
-        past_records: 過去の行動記録リスト
-        past_analyses: 過去の分析結果リスト
+        past_days: 過去の日ごとの要約リスト（firestore_service.get_past_days）
+        time_facts: 行動記録から計算した時間集計（time_accounting.format_facts）
+        anomaly_facts: 過去の日次スコアの異常検知の結果（anomaly.format_facts）
 
     Returns:
         ユーザープロンプト文字列
@@ -118,6 +122,12 @@ def build_daily_analysis_prompt(
 
 ### 完了タスク
 {', '.join(tasks_completed) if tasks_completed else 'なし'}
+"""
+
+    if time_facts:
+        prompt += f"""
+### 時間集計（記録から計算済み）
+{time_facts}
 """
 
     if screen_time and screen_time.get("apps"):
@@ -126,10 +136,16 @@ def build_daily_analysis_prompt(
 {format_screen_time(screen_time)}
 """
 
-    if past_records:
+    if past_days:
         prompt += f"""
 ## 過去データ（参考）
-{format_past_data(past_records, past_analyses)}
+{format_past_data(past_days)}
+"""
+
+    if anomaly_facts:
+        prompt += f"""
+## 異常検知（過去の日次スコア・無駄時間から自動検出）
+{anomaly_facts}
 """
 
     prompt += "\n上記のデータをもとに分析してください。"
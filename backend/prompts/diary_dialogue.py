@@ -3,6 +3,8 @@
 AIが質問を通じてユーザーの一日の行動を引き出し、行動ログテキストに変換する
 """
 
+from utils.helpers import build_dialogue_messages
+
 
 # ---- 1. 初期質問プロンプト ----
 
@@ -66,27 +68,20 @@ DIARY_FOLLOWUP_SYSTEM_PROMPT = """
 """.strip()
 
 
-def build_diary_followup_prompt(
+def build_diary_followup_messages(
     date: str,
     messages: list[dict],
     turn_count: int,
     max_turns: int,
-) -> str:
-    dialogue_text = ""
-    for msg in messages:
-        role_label = "AI" if msg.get("role") == "ai" else "ユーザー"
-        dialogue_text += f"\n{role_label}: {msg.get('content', '')}\n"
-
-    return f"""## 日付: {date}
-
-## 対話履歴
-{dialogue_text}
-
-## 状況
-ターン: {turn_count}/{max_turns}（残り{max_turns - turn_count}回）
+) -> list[dict]:
+    """対話履歴を user/assistant の交互メッセージで返す"""
+    context = f"""今日は {date} です。
+ユーザーの最近の出来事や過ごし方について、日記のための対話を行います。"""
 
+    turn_note = f"""（ターン: {turn_count}/{max_turns}、残り{max_turns - turn_count}回）
 上記の対話を踏まえて、最近の出来事や気持ちについてさらに深掘りしてください。
 残りターンが少ない場合は、話をまとめる質問をしてください。"""
+    return build_dialogue_messages(context, messages, turn_note, label="diary_followup")
 
 
 # ---- 3. 合成（行動ログ生成）プロンプト ----
@@ -4,6 +4,12 @@
 - 週次ダイジェスト: 1週間の傾向分析、隠れたパターン発見
 """
 
+from utils import prompt_budget
+
+# 週次ダイジェストのユーザープロンプトの上限（見積もりトークン）。
+# 超える週は行動分析スコア → 各日のジャーナル本文（全日で均等に）の順に切り詰める
+WEEKLY_JOURNAL_DIGEST_TOKEN_BUDGET = 5000
+
 # ===== エントリ分析 =====
 
 JOURNAL_ANALYSIS_SYSTEM_PROMPT = """あなたはジャーナル分析の専門家です。
@@ -142,31 +148,42 @@ def build_weekly_journal_digest_prompt(
     daily_analyses: list[dict] | None = None,
 ) -> str:
     """週次ジャーナルダイジェスト用のユーザープロンプトを構築"""
-    lines = [f"## 今週（{week_id}）のジャーナルデータ\n"]
+    header = f"## 今週（{week_id}）のジャーナルデータ\n"
 
+    # 1 日 1 要素。切り詰めは要素の末尾から行うため、分析結果を先に・本文を最後に置く
+    entries = []
     for entry in sorted(journal_entries, key=lambda e: e.get("date", "")):
         date = entry.get("date", "")
-        content = entry.get("content", "")[:500]
+        content = entry.get("content", "")
         analysis = entry.get("ai_analysis", {}) or {}
         emotions = analysis.get("emotions", [])
         blockers = analysis.get("blockers", [])
         mood = analysis.get("mood_score", "-")
 
-        lines.append(f"### {date}")
-        lines.append(f"ジャーナル: {content}")
+        entry_lines = [f"### {date}", f"気分スコア: {mood}"]
         if emotions:
             emo_str = ", ".join([f"{e['tag']}({e['intensity']})" for e in emotions])
-            lines.append(f"感情: {emo_str}")
+            entry_lines.append(f"感情: {emo_str}")
         if blockers:
             blk_str = ", ".join([f"{b['blocker']}({b['severity']})" for b in blockers])
-            lines.append(f"ブロッカー: {blk_str}")
-        lines.append(f"気分スコア: {mood}\n")
+            entry_lines.append(f"ブロッカー: {blk_str}")
+        entry_lines.append(f"ジャーナル: {content}\n")
+        entries.append("\n".join(entry_lines))
 
+    score_lines = []
     if daily_analyses:
-        lines.append("### 同期間の行動分析スコア")
+        score_lines.append("### 同期間の行動分析スコア")
         for a in sorted(daily_analyses, key=lambda x: x.get("date", "")):
             s = a.get("summary", {})
-            lines.append(f"- {a.get('date')}: スコア={s.get('overall_score', '-')}")
-
-    lines.append("\n上記をもとに週次ジャーナルダイジェストを生成してください。")
-    return "\n".join(lines)
+            score_lines.append(f"- {a.get('date')}: スコア={s.get('overall_score', '-')}")
+
+    return prompt_budget.assemble(
+        "weekly_journal_digest",
+        [
+            prompt_budget.section("header", header, fixed=True),
+            prompt_budget.item_section("entries", entries, priority=2),
+            prompt_budget.section("daily_scores", "\n".join(score_lines), priority=1),
+            prompt_budget.section("instruction", "\n上記をもとに週次ジャーナルダイジェストを生成してください。", fixed=True),
+        ],
+        WEEKLY_JOURNAL_DIGEST_TOKEN_BUDGET,
+    )
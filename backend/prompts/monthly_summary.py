@@ -1,13 +1,10 @@
 """
-月次サマリー生成プロンプト
-月初に前月のデータからコーチングサマリーを自動生成する
+月次・年次サマリー生成プロンプト
+月次は週次分析の要約から、年次は月次サマリーの要約からコーチングサマリーを生成する
+（services/summary_pipeline.py）
 """
 
-MONTHLY_SUMMARY_SYSTEM_PROMPT = """あなたはユーザーの月間行動データを分析し、コーチングサマリーを生成する専門家です。
-
-以下のデータから月次サマリーを生成してください。
-
-## 出力形式
+_OUTPUT_FORMAT = """## 出力形式
 以下のJSON形式のみを出力してください。説明文は不要です。
 ```json
 {
@@ -40,15 +37,45 @@ MONTHLY_SUMMARY_SYSTEM_PROMPT = """あなたはユーザーの月間行動デー
 }
 ```"""
 
+MONTHLY_SUMMARY_SYSTEM_PROMPT = f"""あなたはユーザーの月間行動データを分析し、コーチングサマリーを生成する専門家です。
+
+以下の週ごとの分析から月次サマリーを生成してください。
+
+{_OUTPUT_FORMAT}"""
+
+YEARLY_SUMMARY_SYSTEM_PROMPT = f"""あなたはユーザーの年間行動データを分析し、コーチングサマリーを生成する専門家です。
+
+以下の月ごとのサマリーから年次サマリーを生成してください。
+top_patterns の frequency はそのパターンが見られた月数、trend は年間を通した変化とすること。
+
+{_OUTPUT_FORMAT}"""
+
 
 def build_monthly_summary_prompt(
     period: str,
-    analyses_text: str,
+    weeks_text: str,
+    trend_text: str = "",
 ) -> str:
-    """月次サマリー生成用ユーザープロンプトを構築"""
+    """月次サマリー生成用ユーザープロンプトを構築（trend_text は metrics_engine.format_trend の出力）"""
+    trend = f"\n## 数値トレンド（月全体）\n{trend_text}\n" if trend_text else ""
     return f"""## 対象期間: {period}
 
-## 日次分析データ
-{analyses_text}
-
+## 週次分析データ
+{weeks_text}
+{trend}
 上記のデータから、{period}の月次コーチングサマリーをJSON形式で生成してください。"""
+
+
+def build_yearly_summary_prompt(
+    year: str,
+    months_text: str,
+    trend_text: str = "",
+) -> str:
+    """年次サマリー生成用ユーザープロンプトを構築"""
+    trend = f"\n## 数値トレンド（年全体）\n{trend_text}\n" if trend_text else ""
+    return f"""## 対象期間: {year}年
+
+## 月次サマリー
+{months_text}
+{trend}
+上記のデータから、{year}年の年次コーチングサマリーをJSON形式で生成してください。"""
@@ -3,6 +3,9 @@
 ソクラテス式問答で、昨日の記憶を引き出し、今日やるべきことを整理する
 """
 
+from utils import prompt_budget
+from utils.helpers import DIALOGUE_CONTEXT_TOKEN_BUDGET, build_dialogue_messages
+
 
 # ---- 1. 初期質問プロンプト ----
 
@@ -26,6 +29,7 @@ MORNING_QUESTION_SYSTEM_PROMPT = """
 - 「昨日何をやっていたか覚えていますか？」（記憶の確認）
 - 「やり残したことは何だと思いますか？」（未完了の自覚）
 - 「今日一番取り組みたいことは何ですか？」（意思の確認）
+- 異常検知で悪い方向の外れ値や水準の変化があれば、責めずに軽く触れて今日の工夫を問う
 
 ## 制約
 - 300文字以内に収める
@@ -40,6 +44,7 @@ def build_morning_question_prompt(
     incomplete_tasks: list[str],
     active_goals: list[dict],
     backlog_tasks: list[str] | None = None,
+    anomaly_facts: str = "",
 ) -> str:
     prompt = ""
 
@@ -75,6 +80,12 @@ def build_morning_question_prompt(
 - タスク完了率: {int(summary.get('task_completion_rate', 0) * 100)}%
 - 良かった点: {', '.join(analysis.get('good_points', [])[:2])}
 - 改善点: {', '.join(analysis.get('bad_points', [])[:2])}
+"""
+
+    if anomaly_facts:
+        prompt += f"""
+## 異常検知（日次スコア・無駄時間の推移から自動検出）
+{anomaly_facts}
 """
 
     if incomplete_tasks:
@@ -126,21 +137,16 @@ MORNING_FOLLOWUP_SYSTEM_PROMPT = """
 """.strip()
 
 
-def build_morning_followup_prompt(
+def build_morning_followup_messages(
     yesterday_record: dict | None,
     yesterday_analysis: dict | None,
     incomplete_tasks: list[str],
     messages: list[dict],
     turn_count: int,
     max_turns: int,
-) -> str:
-    # 対話履歴を構築
-    dialogue_text = ""
-    for msg in messages:
-        role_label = "AI" if msg.get("role") == "ai" else "ユーザー"
-        dialogue_text += f"\n{role_label}: {msg.get('content', '')}\n"
-
-    prompt = ""
+) -> list[dict]:
+    """昨日のデータをキャッシュ対象の先頭に置き、対話履歴を user/assistant の交互メッセージで返す"""
+    sections = []
 
     if yesterday_record:
         date = yesterday_record.get("date", "不明")
@@ -150,29 +156,30 @@ def build_morning_followup_prompt(
         tasks_completed = tasks.get("completed", [])
         incomplete = [t for t in tasks_planned if t not in tasks_completed]
 
-        prompt += f"""## 昨日の行動記録（{date}）
-{raw_input}
-
+        sections.append(prompt_budget.section("header", f"## 昨日の行動記録（{date}）", fixed=True))
+        sections.append(prompt_budget.section("raw_input", raw_input, priority=1))
+        sections.append(prompt_budget.section("tasks", f"""
 ### 昨日の予定タスク: {', '.join(tasks_planned) if tasks_planned else 'なし'}
 ### 昨日の完了タスク: {', '.join(tasks_completed) if tasks_completed else 'なし'}
-### 昨日の未完了タスク: {', '.join(incomplete) if incomplete else 'なし'}
-"""
+### 昨日の未完了タスク: {', '.join(incomplete) if incomplete else 'なし'}""", priority=2))
+    else:
+        sections.append(prompt_budget.section(
+            "header", "## 昨日の行動記録\nデータなし（昨日は記録がありません）", fixed=True,
+        ))
 
     if incomplete_tasks:
-        prompt += f"""
+        sections.append(prompt_budget.section("incomplete_tasks", f"""
 ## 直近の未完了タスク（過去7日）
-{chr(10).join('- ' + t for t in incomplete_tasks)}
-"""
-
-    prompt += f"""
-## 対話履歴
-{dialogue_text}
+{chr(10).join('- ' + t for t in incomplete_tasks)}""", priority=2))
 
-## 状況
-ターン: {turn_count}/{max_turns}（残り{max_turns - turn_count}回）
+    sections.append(prompt_budget.section(
+        "instruction", "\nこのデータをもとに、ユーザーと朝のプランニング対話を行います。", fixed=True,
+    ))
+    context = prompt_budget.assemble("morning_followup_context", sections, DIALOGUE_CONTEXT_TOKEN_BUDGET)
 
+    turn_note = f"""（ターン: {turn_count}/{max_turns}、残り{max_turns - turn_count}回）
 上記の対話を踏まえて、フォローアップの応答を生成してください。"""
-    return prompt
+    return build_dialogue_messages(context, messages, turn_note, label="morning_followup")
 
 
 # ---- 3. 合成（まとめ）プロンプト ----
@@ -3,7 +3,13 @@
 AIが質問を通じてユーザーの自己洞察を促し、対話を経て共創された分析を生成する
 """
 
-from utils.helpers import format_screen_time, format_past_data
+from utils import prompt_budget
+from utils.helpers import (
+    DIALOGUE_CONTEXT_TOKEN_BUDGET,
+    build_dialogue_messages,
+    format_past_data,
+    format_screen_time,
+)
 
 
 # ---- 1. 質問生成プロンプト ----
@@ -38,8 +44,7 @@ SOCRATIC_QUESTION_SYSTEM_PROMPT = """
 def build_socratic_question_prompt(
     record: dict,
     screen_time: dict | None,
-    past_records: list[dict],
-    past_analyses: list[dict],
+    past_days: list[dict],
 ) -> str:
     date = record.get("date", "不明")
     raw_input = record.get("raw_input", "")
@@ -65,10 +70,10 @@ def build_socratic_question_prompt(
 {format_screen_time(screen_time)}
 """
 
-    if past_records:
+    if past_days:
         prompt += f"""
 ## 過去データ（参考）
-{format_past_data(past_records, past_analyses)}
+{format_past_data(past_days)}
 """
 
     prompt += "\n上記のデータをもとに、ユーザーへの振り返り質問を生成してください。"
@@ -98,32 +103,29 @@ SOCRATIC_FOLLOWUP_SYSTEM_PROMPT = """
 """.strip()
 
 
-def build_socratic_followup_prompt(
+def build_socratic_followup_messages(
     record: dict,
     messages: list[dict],
     turn_count: int,
     max_turns: int,
-) -> str:
+) -> list[dict]:
+    """行動記録をキャッシュ対象の先頭に置き、対話履歴を user/assistant の交互メッセージで返す"""
     date = record.get("date", "不明")
     raw_input = record.get("raw_input", "")
 
-    # 対話履歴を構築
-    dialogue_text = ""
-    for msg in messages:
-        role_label = "AI" if msg.get("role") == "ai" else "ユーザー"
-        dialogue_text += f"\n{role_label}: {msg.get('content', '')}\n"
-
-    prompt = f"""## 行動記録データ（{date}）
-{raw_input}
-
-## 対話履歴
-{dialogue_text}
-
-## 状況
-ターン: {turn_count}/{max_turns}（残り{max_turns - turn_count}回）
-
+    context = prompt_budget.assemble(
+        "socratic_followup_context",
+        [
+            prompt_budget.section("header", f"## 行動記録データ（{date}）", fixed=True),
+            prompt_budget.section("raw_input", raw_input, priority=1),
+            prompt_budget.section("instruction", "\nこの記録をもとに、ユーザーと振り返りの対話を行います。", fixed=True),
+        ],
+        DIALOGUE_CONTEXT_TOKEN_BUDGET,
+    )
+
+    turn_note = f"""（ターン: {turn_count}/{max_turns}、残り{max_turns - turn_count}回）
 上記の対話を踏まえて、フォローアップの応答を生成してください。"""
-    return prompt
+    return build_dialogue_messages(context, messages, turn_note, label="socratic_followup")
 
 
 # ---- 3. 合成（まとめ）プロンプト ----
@@ -146,9 +148,6 @@ SOCRATIC_SYNTHESIS_SYSTEM_PROMPT = """
 ```json
 {
   "summary": {
-    "productive_hours": <number>,
-    "wasted_hours": <number>,
-    "youtube_hours": <number>,
     "task_completion_rate": <0.0-1.0>,
     "overall_score": <0-100>
   },
@@ -175,6 +174,8 @@ SOCRATIC_SYNTHESIS_SYSTEM_PROMPT = """
 
 ## ルール
 - overall_score の基準: 70以上=良い日、40-69=普通、39以下=改善が必要
+- 時間集計が提供されている場合、時間の数値は推定し直さずにその値を引用すること
+  （「計算できません」とある場合だけ、productive_hours / wasted_hours / youtube_hours を記録から推定して summary に入れる）
 - 改善提案は対話中にユーザーが自ら言及した解決策を優先すること
 - 過去データがある場合、繰り返しパターンを必ず指摘すること
 - 改善提案は優先度付きで3〜5個に絞ること
@@ -185,8 +186,8 @@ def build_socratic_synthesis_prompt(
     record: dict,
     messages: list[dict],
     screen_time: dict | None,
-    past_records: list[dict],
-    past_analyses: list[dict],
+    past_days: list[dict],
+    time_facts: str = "",
 ) -> str:
     date = record.get("date", "不明")
     raw_input = record.get("raw_input", "")
@@ -210,6 +211,12 @@ def build_socratic_synthesis_prompt(
 
 ### 完了タスク
 {', '.join(tasks_completed) if tasks_completed else 'なし'}
+"""
+
+    if time_facts:
+        prompt += f"""
+### 時間集計（記録から計算済み）
+{time_facts}
 """
 
     if screen_time and screen_time.get("apps"):
@@ -223,10 +230,10 @@ def build_socratic_synthesis_prompt(
 {dialogue_text}
 """
 
-    if past_records:
+    if past_days:
         prompt += f"""
 ## 過去データ（参考）
-{format_past_data(past_records, past_analyses)}
+{format_past_data(past_days)}
 """
 
     prompt += "\n上記の対話内容とデータを統合して、共創された日次分析を生成してください。"
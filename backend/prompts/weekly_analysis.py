@@ -3,6 +3,11 @@
 1週間分のデータをもとに深い分析と来週の改善プランを生成する
 """
 
+from utils import prompt_budget
+
+# ユーザープロンプトの上限（見積もりトークン）。超える週はスクリーンタイム → 先週 → 日別の問題点の順に切り詰める
+WEEKLY_ANALYSIS_TOKEN_BUDGET = 3000
+
 WEEKLY_ANALYSIS_SYSTEM_PROMPT = """
 あなたは行動改善コーチです。1週間分の行動データと日次分析をもとに、
 深い分析と来週の具体的な改善プランを提案してください。
@@ -79,10 +84,10 @@ def build_weekly_analysis_prompt(
     Returns:
         ユーザープロンプト文字列
     """
-    lines = [f"## 今週（{week_id}）のデータ\n"]
+    header = f"## 今週（{week_id}）のデータ\n"
 
-    # 日別サマリー
-    lines.append("### 日別スコアと概要")
+    # 日別サマリー（1 日 1 要素。切り詰めで消えないようスコアを先頭に置く）
+    days = []
     for record in sorted(daily_records, key=lambda r: r.get("date", "")):
         date = record.get("date", "")
         analysis = next(
@@ -95,17 +100,18 @@ def build_weekly_analysis_prompt(
             wasted = s.get("wasted_hours", 0)
             youtube = s.get("youtube_hours", 0)
             task_rate = int((s.get("task_completion_rate") or 0) * 100)
-            lines.append(
+            day = (
                 f"- {date}: スコア={score}, 生産的={productive}h, "
                 f"無駄={wasted}h, YouTube={youtube}h, タスク完了={task_rate}%"
             )
             # 悪かった点を追加
             bad = analysis.get("analysis", {}).get("bad_points", [])
             if bad:
-                lines.append(f"  → 問題点: {', '.join(bad[:2])}")
+                day += f"\n  → 問題点: {', '.join(bad[:2])}"
+            days.append(day)
         else:
             raw = record.get("raw_input", "")[:100]
-            lines.append(f"- {date}: 分析なし（行動記録: {raw}...）")
+            days.append(f"- {date}: 分析なし（行動記録: {raw}...）")
 
     # スクリーンタイムデータ
     all_apps: dict[str, int] = {}
@@ -116,25 +122,36 @@ def build_weekly_analysis_prompt(
             mins = app.get("duration_minutes", 0)
             all_apps[name] = all_apps.get(name, 0) + mins
 
+    screen_lines = []
     if all_apps:
-        lines.append("\n### 週間スクリーンタイム（アプリ別合計）")
+        screen_lines.append("\n### 週間スクリーンタイム（アプリ別合計）")
         for app_name, total_mins in sorted(all_apps.items(), key=lambda x: -x[1]):
             h = total_mins // 60
             m = total_mins % 60
-            lines.append(f"- {app_name}: {h}時間{m}分")
+            screen_lines.append(f"- {app_name}: {h}時間{m}分")
 
     # 先週の週次分析（比較用）
+    last_week_lines = []
     if last_week_analysis:
-        lines.append("\n### 先週（参考）")
+        last_week_lines.append("\n### 先週（参考）")
         s = last_week_analysis.get("weekly_summary", {})
-        lines.append(
+        last_week_lines.append(
             f"- 平均スコア: {s.get('avg_overall_score', '-')}, "
             f"スコアトレンド: {s.get('score_trend', '-')}"
         )
         plan = last_week_analysis.get("deep_analysis", {}).get("improvement_plan", {})
         goals = plan.get("next_week_goals", [])
         if goals:
-            lines.append(f"- 先週立てた目標: {', '.join(goals)}")
+            last_week_lines.append(f"- 先週立てた目標: {', '.join(goals)}")
 
-    lines.append("\n上記のデータをもとに深い週次分析を行ってください。")
-    return "\n".join(lines)
+    return prompt_budget.assemble(
+        "weekly_analysis",
+        [
+            prompt_budget.section("header", header, fixed=True),
+            prompt_budget.item_section("days", days, header="### 日別スコアと概要", priority=3),
+            prompt_budget.section("screen_time", "\n".join(screen_lines), priority=1),
+            prompt_budget.section("last_week", "\n".join(last_week_lines), priority=2),
+            prompt_budget.section("instruction", "\n上記のデータをもとに深い週次分析を行ってください。", fixed=True),
+        ],
+        WEEKLY_ANALYSIS_TOKEN_BUDGET,
+    )
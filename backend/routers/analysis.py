@@ -1,17 +1,24 @@
 """
 AI 分析エンドポイント
 POST /api/v1/analysis/{date}/generate  - 分析を生成
+POST /api/v1/analysis/{date}/generate/stream - 分析を生成（セクションごとに SSE で返す）
 GET  /api/v1/analysis/{date}           - 保存済み分析を取得
 GET  /api/v1/analysis                  - 分析一覧を取得
 """
 
+import logging
+
 import anthropic
 from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional
 
 from models.schemas import DailyAnalysis, AnalysisSummary, AnalysisDetail
-from services import firestore_service, claude_service
-from utils.helpers import now_jst
+from services import ai_guard, firestore_service, claude_service, job_queue, pregeneration, single_flight
+from utils import anomaly
+from utils.helpers import now_jst, sse_event
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -21,39 +28,30 @@ async def generate_analysis(date: str):
     """
     指定日の行動記録をもとに Claude API で日次分析を生成し保存する。
     過去7日間のデータも参照して比較分析を行う。
+    入力が変わっていない事前生成の分析があれば、生成せずにそれを返す。
     """
     try:
-        # 行動記録の存在確認
-        record = firestore_service.get_record(date)
-        if not record:
-            raise HTTPException(
-                status_code=404,
-                detail=f"{date} の行動記録が見つかりません。先に POST /records で記録を作成してください。",
-            )
+        record, past_days, anomaly_facts = _load_inputs(date)
+        digest = pregeneration.source_hash(record, past_days)
+        adopted = _adopt_pregenerated(date, digest)
+        if adopted:
+            return _build_response(adopted)
 
-        # おやすみモードの日は分析をスキップ
-        if record.get("rest_day"):
-            reason = record.get("rest_reason", "")
-            msg = f"{date} はおやすみモードのため分析対象外です"
-            if reason:
-                msg += f"（理由: {reason}）"
-            raise HTTPException(status_code=422, detail=msg)
-
-        # 過去データの取得（比較分析用）— おやすみ日と記録の少ない日を除外
-        past_records_raw = firestore_service.get_past_records(date, days=7)
-        past_records = [
-            r for r in past_records_raw
-            if not r.get("rest_day") and len(r.get("parsed_activities", [])) >= 1
-        ]
-        past_analyses = firestore_service.get_past_analyses(date, days=7)
-
-        # Claude API で分析を生成
-        try:
+        def generate() -> dict:
             analysis_data = claude_service.generate_daily_analysis(
                 record=record,
-                past_records=past_records,
-                past_analyses=past_analyses,
+                past_days=past_days,
+                anomaly_facts=anomaly_facts,
+            )
+            return _save_generated(date, analysis_data, digest)
+
+        # Claude API で分析を生成（同じ日付の同時リクエストは 1 回の生成を共有する）
+        try:
+            saved = await single_flight.run(
+                f"analysis:{date}", generate, load=lambda: firestore_service.get_analysis(date),
             )
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -63,25 +61,73 @@ async def generate_analysis(date: str):
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
 
-        # 分析結果を Firestore に保存
-        now = now_jst()
-        doc = {
-            "id": date,
-            "date": date,
-            "summary": analysis_data.get("summary", {}),
-            "analysis": analysis_data.get("analysis", {}),
-            "created_at": now,
-        }
-        saved = firestore_service.save_analysis(date, doc)
-
         return _build_response(saved)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
 
 
+@router.post("/analysis/{date}/generate/stream")
+async def generate_analysis_stream(date: str):
+    """
+    日次分析を Server-Sent Events で生成する。
+    生成完了を待たず、確定したセクションから順に送る。
+
+    event: section  {"path": ["analysis", "good_points"], "value": [...]}
+    event: done     保存済みの分析（GET /analysis/{date} と同じ形式）
+    event: error    {"detail": "..."}
+    """
+    record, past_days, anomaly_facts = _load_inputs(date)
+    digest = pregeneration.source_hash(record, past_days)
+
+    def generate():
+        for kind, path, value in claude_service.stream_daily_analysis(
+            record=record,
+            past_days=past_days,
+            anomaly_facts=anomaly_facts,
+        ):
+            if kind == "section":
+                yield (kind, path, value)
+            else:
+                yield ("done", (), _save_generated(date, value, digest))
+
+    def events():
+        try:
+            # 事前生成の分析が使えるなら done だけを返す
+            adopted = _adopt_pregenerated(date, digest)
+            if adopted:
+                yield sse_event("done", _build_response(adopted).model_dump())
+                return
+            # 同じ日付で生成中なら、その完了を待って done だけを返す
+            for kind, path, value in single_flight.stream(
+                f"analysis:{date}", generate, load=lambda: firestore_service.get_analysis(date),
+            ):
+                if kind == "section":
+                    yield sse_event("section", {"path": list(path), "value": value})
+                else:
+                    yield sse_event("done", _build_response(value).model_dump())
+        except ai_guard.AIUnavailableError as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except anthropic.APIStatusError as e:
+            if e.status_code == 529:
+                detail = "AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。"
+            elif e.status_code == 429:
+                detail = "APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。"
+            else:
+                detail = "AI応答の生成に失敗しました。しばらく待ってから再度お試しください。"
+            yield sse_event("error", {"detail": detail})
+        except Exception:
+            yield sse_event("error", {"detail": "AI応答の生成に失敗しました。しばらく待ってから再度お試しください。"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/analysis/{date}", response_model=DailyAnalysis)
 async def get_analysis(date: str):
     """保存済みの日次分析を取得する"""
@@ -101,6 +147,108 @@ async def list_analyses(
     return [_build_response(a) for a in analyses]
 
 
+def _load_inputs(date: str) -> tuple[dict, list[dict], str]:
+    """分析対象の記録と比較用の過去データ・異常検知の結果を取得する（対象外なら HTTPException）"""
+    # 行動記録の存在確認
+    record = firestore_service.get_record(date)
+    if not record:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{date} の行動記録が見つかりません。先に POST /records で記録を作成してください。",
+        )
+
+    # おやすみモードの日は分析をスキップ
+    if record.get("rest_day"):
+        reason = record.get("rest_reason", "")
+        msg = f"{date} はおやすみモードのため分析対象外です"
+        if reason:
+            msg += f"（理由: {reason}）"
+        raise HTTPException(status_code=422, detail=msg)
+
+    # 過去データの取得（比較分析用）— おやすみ日と記録の少ない日を除外
+    past_days = [
+        d for d in firestore_service.get_past_days(date)
+        if not d.get("rest_day") and d.get("activity_count", 0) >= 1
+    ]
+    anomaly_facts = anomaly.format_facts(firestore_service.get_anomaly_state(), date)
+    return record, past_days, anomaly_facts
+
+
+def _save_generated(date: str, analysis_data: dict, source_hash: str, pregenerated: bool = False) -> dict:
+    """
+    生成した分析結果を Firestore に保存する
+    source_hash は生成に使った記録・過去データのハッシュ。異常検知の引用（anomaly_facts）は
+    後の日の分析を取り込むと前の日の基準が引けなくなって変わるため含めない
+    """
+    now = now_jst()
+    doc = {
+        "id": date,
+        "date": date,
+        "summary": analysis_data.get("summary", {}),
+        "analysis": analysis_data.get("analysis", {}),
+        "source_hash": source_hash,
+        "pregenerated": pregenerated,
+        "created_at": now,
+    }
+    return firestore_service.save_analysis(date, doc)
+
+
+def _adopt_pregenerated(date: str, source_hash: str) -> Optional[dict]:
+    """
+    入力が変わっていない事前生成の分析があれば、利用者の分析として採用して返す
+    採用後は通常の分析と同じ扱いになり、次の「分析する」では生成し直す。
+    """
+    existing = firestore_service.get_analysis(date)
+    if not existing or not existing.get("pregenerated") or existing.get("source_hash") != source_hash:
+        return None
+    adopted_at = now_jst()
+    firestore_service.mark_analysis_adopted(date, adopted_at)
+    return {**existing, "pregenerated": False, "adopted_at": adopted_at}
+
+
+def _run_pregeneration_job(params: dict) -> dict:
+    """
+    日次分析を事前生成する（ジョブ pregen_daily_analysis）
+    利用者が生成した分析や、入力が変わっていない事前生成がある日は生成しない。
+    morning_date があれば完了後にその日の朝の問いかけの事前生成を登録する。
+    """
+    date = params["date"]
+    try:
+        record, past_days, anomaly_facts = _load_inputs(date)
+    except HTTPException as e:
+        result = {"date": date, "status": "skipped", "reason": e.detail}
+    else:
+        digest = pregeneration.source_hash(record, past_days)
+        existing = firestore_service.get_analysis(date)
+        if existing and not existing.get("pregenerated"):
+            result = {"date": date, "status": "skipped", "reason": "分析は生成済みです"}
+        elif existing and existing.get("source_hash") == digest:
+            result = {"date": date, "status": "skipped", "reason": "事前生成は最新です"}
+        else:
+            def generate() -> dict:
+                analysis_data = claude_service.generate_daily_analysis(
+                    record=record,
+                    past_days=past_days,
+                    anomaly_facts=anomaly_facts,
+                )
+                return _save_generated(date, analysis_data, digest, pregenerated=True)
+
+            single_flight.run_sync(
+                f"analysis:{date}", generate, load=lambda: firestore_service.get_analysis(date),
+            )
+            result = {"date": date, "status": "generated"}
+
+    if params.get("morning_date"):
+        try:
+            pregeneration.enqueue_morning_question(params["morning_date"])
+        except Exception as e:
+            logger.warning("朝の問いかけの事前生成を登録できませんでした: %s", e)
+    return result
+
+
+job_queue.register(pregeneration.DAILY_ANALYSIS_KIND, _run_pregeneration_job)
+
+
 def _build_response(data: dict) -> DailyAnalysis:
     """Firestore のデータから DailyAnalysis レスポンスモデルを構築"""
     summary_raw = data.get("summary", {})
@@ -110,6 +258,7 @@ def _build_response(data: dict) -> DailyAnalysis:
         productive_hours=summary_raw.get("productive_hours") or 0.0,
         wasted_hours=summary_raw.get("wasted_hours") or 0.0,
         youtube_hours=summary_raw.get("youtube_hours") or 0.0,
+        tasks_completed_count=summary_raw.get("tasks_completed_count"),
         task_completion_rate=summary_raw.get("task_completion_rate") or 0.0,
         overall_score=summary_raw.get("overall_score") or 0,
     )
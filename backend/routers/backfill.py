@@ -0,0 +1,59 @@
+"""
+バックフィル（一括再分析）エンドポイント
+POST /api/v1/backfill              - 期間内の分析を Message Batch で一括再生成（202）
+GET  /api/v1/backfill/{batch_id}   - バックフィルの進捗を取得（完了済みなら結果を適用）
+"""
+
+import anthropic
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from pydantic import BaseModel, Field
+
+from services import backfill_service
+
+router = APIRouter()
+
+
+class BackfillRequest(BaseModel):
+    kind: str = Field(..., description="daily|journal|weekly")
+    start_date: str = Field(..., description="開始日 (YYYY-MM-DD)")
+    end_date: str = Field(..., description="終了日 (YYYY-MM-DD)")
+
+
+def _public_job(job: dict) -> dict:
+    """custom_id の対応表はレスポンスから除外する"""
+    return {k: v for k, v in job.items() if k != "targets"}
+
+
+@router.post("/backfill", status_code=202)
+async def start_backfill(body: BackfillRequest, background_tasks: BackgroundTasks):
+    """
+    指定期間の日次分析・ジャーナル分析・週次分析を 1 つの Message Batch として送信する。
+    完了のポーリングと結果の書き込みはバックグラウンドで行う。
+    """
+    if body.start_date > body.end_date:
+        raise HTTPException(status_code=400, detail="start_date は end_date 以前の日付を指定してください")
+
+    try:
+        job = backfill_service.submit_backfill(body.kind, body.start_date, body.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except anthropic.APIStatusError as e:
+        raise HTTPException(status_code=502, detail=f"Batch の送信に失敗しました: HTTP {e.status_code}")
+
+    background_tasks.add_task(backfill_service.wait_and_apply, job["id"])
+    return _public_job(job)
+
+
+@router.get("/backfill/{batch_id}")
+async def get_backfill(batch_id: str):
+    """
+    バックフィルの進捗を返す。
+    インスタンス停止でポーリングが途切れていても、完了済みならここで結果を適用する。
+    """
+    try:
+        job = backfill_service.refresh_backfill(batch_id)
+    except anthropic.APIStatusError as e:
+        raise HTTPException(status_code=502, detail=f"Batch の状態取得に失敗しました: HTTP {e.status_code}")
+    if not job:
+        raise HTTPException(status_code=404, detail=f"{batch_id} のバックフィルが見つかりません")
+    return _public_job(job)
@@ -12,9 +12,11 @@ DELETE /api/v1/braindump/entry/{entry_id}         - メモ削除
 POST   /api/v1/braindump/entry/{entry_id}/generate-title - AIタイトル生成
 """
 
+import hashlib
+import logging
 import os
 
-from fastapi import APIRouter, HTTPException, Query, Response, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, HTTPException, Query, Response, UploadFile, File
 from typing import Optional
 
 from models.braindump_schemas import (
@@ -22,7 +24,7 @@ from models.braindump_schemas import (
     LabelRenameRequest, LabelListResponse, LabelCount,
     BraindumpReorderRequest,
 )
-from services import firestore_service, claude_service, storage_service
+from services import ai_guard, firestore_service, claude_service, job_queue, storage_service
 from utils.helpers import now_jst
 
 
@@ -44,11 +46,14 @@ def _normalize_labels(labels: Optional[list[str]]) -> list[str]:
 
 router = APIRouter()
 
+# 自動保存中は本文が変わるたびに PUT が来るため、最後の変更からこの秒数だけ待ってからタイトルを生成する
+TITLE_DEBOUNCE_SECONDS = float(os.getenv("BRAINDUMP_TITLE_DEBOUNCE_SECONDS", "20"))
+
 
 # ---- CRUD ----
 
 @router.post("/braindump", response_model=BraindumpEntry, status_code=201)
-async def create_braindump(body: BraindumpCreate, background_tasks: BackgroundTasks):
+async def create_braindump(body: BraindumpCreate):
     """ブレインダンプを作成する（1日に複数作成可能）"""
     date = body.date
 
@@ -93,9 +98,9 @@ async def create_braindump(body: BraindumpCreate, background_tasks: BackgroundTa
 
     saved = firestore_service.create_braindump(entry_id, data)
 
-    # バックグラウンドでAIタイトル生成（手動タイトル指定時はスキップ）
+    # ジョブキューでAIタイトル生成（手動タイトル指定時はスキップ）
     if not title_custom:
-        background_tasks.add_task(_generate_title_background, entry_id, body.content)
+        _enqueue_title(entry_id)
 
     return BraindumpEntry(**saved)
 
@@ -147,7 +152,7 @@ async def get_braindump_entry(entry_id: str):
 
 
 @router.put("/braindump/entry/{entry_id}", response_model=BraindumpEntry)
-async def update_braindump_entry(entry_id: str, body: BraindumpUpdate, background_tasks: BackgroundTasks):
+async def update_braindump_entry(entry_id: str, body: BraindumpUpdate):
     """ブレインダンプを更新する"""
     existing = firestore_service.get_braindump(entry_id)
     if not existing:
@@ -156,6 +161,7 @@ async def update_braindump_entry(entry_id: str, body: BraindumpUpdate, backgroun
     # updated_at は「本文が実際に変わったとき」だけ進める。
     # 閲覧時の自動タイトル固定・手動タイトル編集・ラベル変更では更新日時を動かさない。
     update_data: dict = {}
+    regenerate_title = False
 
     # 手動タイトル: 非空なら固定（title_custom=True）、空文字なら自動タイトルへ戻す
     title_custom = bool(existing.get("title_custom"))
@@ -173,9 +179,10 @@ async def update_braindump_entry(entry_id: str, body: BraindumpUpdate, backgroun
             temp_title = base[:30].replace("\n", " ")
             if len(base) > 30:
                 temp_title += "..."
-            update_data["title"] = temp_title
-            if base.strip():
-                background_tasks.add_task(_generate_title_background, entry_id, base)
+            # 同じ本文に生成済みの AI タイトルがあればそれに戻す
+            cached = _cached_title(existing, base)
+            update_data["title"] = cached or temp_title
+            regenerate_title = cached is None and bool(base.strip())
 
     if body.content is not None:
         update_data["content"] = body.content
@@ -188,8 +195,9 @@ async def update_braindump_entry(entry_id: str, body: BraindumpUpdate, backgroun
             temp_title = body.content[:30].replace("\n", " ")
             if len(body.content) > 30:
                 temp_title += "..."
-            update_data["title"] = temp_title
-            background_tasks.add_task(_generate_title_background, entry_id, body.content)
+            cached = _cached_title(existing, body.content)
+            update_data["title"] = cached or temp_title
+            regenerate_title = cached is None
 
     if body.labels is not None:
         update_data["labels"] = _normalize_labels(body.labels)
@@ -199,6 +207,9 @@ async def update_braindump_entry(entry_id: str, body: BraindumpUpdate, backgroun
         return BraindumpEntry(**existing)
 
     updated = firestore_service.update_braindump(entry_id, update_data)
+    # 保存後に登録する（ジョブは保存済みの本文からタイトルを作る）
+    if regenerate_title:
+        _enqueue_title(entry_id)
     return BraindumpEntry(**updated)
 
 
@@ -248,6 +259,8 @@ async def summarize_braindump(body: BraindumpCreate):
 
     try:
         summary = claude_service.summarize_braindump_as_markdown(content)
+    except ai_guard.AIUnavailableError:
+        raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
     except Exception as e:
         raise HTTPException(
             status_code=502,
@@ -266,6 +279,8 @@ async def generate_braindump_title(entry_id: str):
 
     try:
         title = claude_service.generate_braindump_title(entry["content"])
+    except ai_guard.AIUnavailableError:
+        raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
     except Exception as e:
         raise HTTPException(
             status_code=502,
@@ -273,7 +288,7 @@ async def generate_braindump_title(entry_id: str):
         )
 
     # AIタイトル生成は本文の変更ではないため更新日時は動かさない
-    update_data = {"title": title}
+    update_data = _ai_title_fields(title, entry["content"])
     updated = firestore_service.update_braindump(entry_id, update_data)
     return BraindumpEntry(**updated)
 
@@ -310,22 +325,65 @@ async def delete_braindump_label_endpoint(name: str):
     return {"affected": affected}
 
 
-# ---- バックグラウンドタスク ----
+# ---- AIタイトル生成ジョブ ----
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _ai_title_fields(title: str, content: str) -> dict:
+    """AI タイトルと、それを生成した本文のハッシュ（同じ本文なら再生成しない）"""
+    return {"title": title, "ai_title": title, "title_source_hash": _content_hash(content)}
+
+
+def _cached_title(entry: dict, content: str) -> Optional[str]:
+    """content に対して生成済みの AI タイトルがあれば返す"""
+    if entry.get("ai_title") and entry.get("title_source_hash") == _content_hash(content):
+        return entry["ai_title"]
+    return None
+
 
-def _generate_title_background(entry_id: str, content: str):
-    """バックグラウンドでAIタイトルを生成し保存する"""
+def _enqueue_title(entry_id: str) -> None:
+    """
+    AIタイトル生成をジョブキューに登録する（失敗しても保存自体は成功扱い）
+    TITLE_DEBOUNCE_SECONDS 秒後に実行し、その間に再登録されたら前のジョブは取り消す
+    """
     try:
-        # 生成中に手動タイトルが設定された場合は上書きしない
-        latest = firestore_service.get_braindump(entry_id)
-        if latest and latest.get("title_custom"):
-            return
-        title = claude_service.generate_braindump_title(content)
-        # AIタイトル生成は本文の変更ではないため更新日時は動かさない
-        firestore_service.update_braindump(entry_id, {
-            "title": title,
-        })
+        job_queue.enqueue(
+            "braindump_title", {"entry_id": entry_id},
+            dedupe_key=f"braindump_title:{entry_id}",
+            delay=TITLE_DEBOUNCE_SECONDS,
+            supersede=True,
+        )
     except Exception as e:
-        import logging
         logging.getLogger(__name__).warning(
-            "ブレインダンプ %s のタイトル生成に失敗: %s", entry_id, e,
+            "ブレインダンプ %s のタイトル生成ジョブ登録に失敗: %s", entry_id, e,
         )
+
+
+def _run_title_job(params: dict) -> dict:
+    """AIタイトルを生成し保存する（実行時点の本文を使う）"""
+    entry_id = params["entry_id"]
+    # 削除済み・生成待ちの間に手動タイトルが設定された場合は上書きしない
+    latest = firestore_service.get_braindump(entry_id)
+    if not latest or latest.get("title_custom") or not (latest.get("content") or "").strip():
+        return {"skipped": True}
+    # 同じ本文のタイトルは生成済み（編集して元に戻した場合など）
+    cached = _cached_title(latest, latest["content"])
+    if cached:
+        if latest.get("title") != cached:
+            firestore_service.update_braindump(entry_id, {"title": cached})
+        return {"title": cached, "cached": True}
+
+    title = claude_service.generate_braindump_title(latest["content"])
+
+    # 生成中に本文が変わった・手動タイトルになった場合は書き込まない（後続のジョブが生成する）
+    current = firestore_service.get_braindump(entry_id)
+    if not current or current.get("title_custom") or current.get("content") != latest["content"]:
+        return {"skipped": True}
+    # AIタイトル生成は本文の変更ではないため更新日時は動かさない
+    firestore_service.update_braindump(entry_id, _ai_title_fields(title, latest["content"]))
+    return {"title": title}
+
+
+job_queue.register("braindump_title", _run_title_job)
@@ -2,7 +2,7 @@
 ソクラテス式対話エンドポイント
 POST /api/v1/dialogue/{date}/start       - 対話を開始（または再開）
 POST /api/v1/dialogue/{date}/reply       - ユーザー返答を送信しAI応答を取得
-POST /api/v1/dialogue/{date}/synthesize  - 対話から分析を生成
+POST /api/v1/dialogue/{date}/synthesize  - 対話から分析を生成（202 + ジョブ）
 GET  /api/v1/dialogue/{date}             - 保存済み対話を取得
 DELETE /api/v1/dialogue/{date}           - 対話を削除
 """
@@ -11,7 +11,7 @@ import anthropic
 from fastapi import APIRouter, HTTPException, Response
 
 from models.schemas import AnalysisDialogue, DialogueReplyRequest, DialogueMessage
-from services import firestore_service, claude_service
+from services import ai_guard, firestore_service, claude_service, job_queue
 from utils.helpers import now_jst
 
 router = APIRouter()
@@ -56,16 +56,16 @@ async def start_dialogue(date: str):
             )
 
         # 過去データの取得
-        past_records = firestore_service.get_past_records(date, days=7)
-        past_analyses = firestore_service.get_past_analyses(date, days=7)
+        past_days = firestore_service.get_past_days(date)
 
         # ソクラテス式質問を生成
         try:
             ai_text = claude_service.generate_socratic_questions(
                 record=record,
-                past_records=past_records,
-                past_analyses=past_analyses,
+                past_days=past_days,
             )
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -93,7 +93,7 @@ async def start_dialogue(date: str):
 
         return _build_dialogue_response(doc)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
@@ -135,6 +135,8 @@ async def reply_dialogue(date: str, body: DialogueReplyRequest):
                 turn_count=turn_count,
                 max_turns=max_turns,
             )
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -155,78 +157,79 @@ async def reply_dialogue(date: str, body: DialogueReplyRequest):
 
         return _build_dialogue_response(dialogue)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
 
 
-@router.post("/dialogue/{date}/synthesize")
+@router.post("/dialogue/{date}/synthesize", status_code=202)
 async def synthesize_dialogue(date: str):
     """
-    対話からの共創分析を生成する。
-    DailyAnalysis を daily_analyses に保存し、対話を completed にする。
+    対話からの共創分析の生成ジョブを登録する。
+    ジョブは DailyAnalysis を daily_analyses に保存し、対話を completed にする。
+    結果（dialogue + analysis）は GET /jobs/{job_id} の result で受け取る。
     """
-    try:
-        dialogue = firestore_service.get_dialogue(date)
-        if not dialogue:
-            raise HTTPException(status_code=404, detail=f"{date} の対話が見つかりません。")
-        if dialogue.get("turn_count", 0) < 1:
-            raise HTTPException(status_code=400, detail="最低1回はやり取りしてから分析をまとめてください。")
+    _load_synthesis_inputs(date)  # 対話・記録が無い場合はここで 400 / 404
+    job = job_queue.enqueue("dialogue_synthesis", {"date": date}, dedupe_key=f"dialogue_synthesis:{date}")
+    return job_queue.public_view(job)
 
-        record = firestore_service.get_record(date)
-        if not record:
-            raise HTTPException(status_code=404, detail=f"{date} の行動記録が見つかりません。")
 
-        past_records = firestore_service.get_past_records(date, days=7)
-        past_analyses = firestore_service.get_past_analyses(date, days=7)
+def _load_synthesis_inputs(date: str) -> tuple[dict, dict]:
+    """まとめ対象の対話と行動記録を返す（対象外なら HTTPException）"""
+    dialogue = firestore_service.get_dialogue(date)
+    if not dialogue:
+        raise HTTPException(status_code=404, detail=f"{date} の対話が見つかりません。")
+    if dialogue.get("turn_count", 0) < 1:
+        raise HTTPException(status_code=400, detail="最低1回はやり取りしてから分析をまとめてください。")
 
-        messages = dialogue.get("messages", [])
+    record = firestore_service.get_record(date)
+    if not record:
+        raise HTTPException(status_code=404, detail=f"{date} の行動記録が見つかりません。")
+    return dialogue, record
 
-        # 共創分析を生成
-        try:
-            analysis_data = claude_service.generate_dialogue_synthesis(
-                record=record,
-                messages=messages,
-                past_records=past_records,
-                past_analyses=past_analyses,
-            )
-        except anthropic.APIStatusError as e:
-            if e.status_code == 529:
-                raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
-            if e.status_code == 429:
-                raise HTTPException(status_code=503, detail="APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。")
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
 
-        # daily_analyses に保存（既存の一括分析と同じスキーマ）
-        now = now_jst()
-        analysis_doc = {
-            "id": date,
-            "date": date,
-            "summary": analysis_data.get("summary", {}),
-            "analysis": analysis_data.get("analysis", {}),
-            "created_at": now,
-        }
-        firestore_service.save_analysis(date, analysis_doc)
+def _run_synthesis_job(params: dict) -> dict:
+    """共創分析ジョブ: 分析を生成して保存し、対話を completed にする"""
+    date = params["date"]
+    dialogue, record = _load_synthesis_inputs(date)
 
-        # 対話を completed に更新
-        dialogue["status"] = "completed"
-        dialogue["updated_at"] = now
-        firestore_service.save_dialogue(date, dialogue)
+    past_days = firestore_service.get_past_days(date)
 
-        # 分析 + 対話をまとめて返却
-        from routers.analysis import _build_response
-        return {
-            "dialogue": _build_dialogue_response(dialogue).model_dump(),
-            "analysis": _build_response(analysis_doc).model_dump(),
-        }
+    messages = dialogue.get("messages", [])
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
+    # 共創分析を生成
+    analysis_data = claude_service.generate_dialogue_synthesis(
+        record=record,
+        messages=messages,
+        past_days=past_days,
+    )
+
+    # daily_analyses に保存（既存の一括分析と同じスキーマ）
+    now = now_jst()
+    analysis_doc = {
+        "id": date,
+        "date": date,
+        "summary": analysis_data.get("summary", {}),
+        "analysis": analysis_data.get("analysis", {}),
+        "created_at": now,
+    }
+    firestore_service.save_analysis(date, analysis_doc)
+
+    # 対話を completed に更新
+    dialogue["status"] = "completed"
+    dialogue["updated_at"] = now
+    firestore_service.save_dialogue(date, dialogue)
+
+    # 分析 + 対話をまとめて返却
+    from routers.analysis import _build_response
+    return {
+        "dialogue": _build_dialogue_response(dialogue).model_dump(),
+        "analysis": _build_response(analysis_doc).model_dump(),
+    }
+
+
+job_queue.register("dialogue_synthesis", _run_synthesis_job)
 
 
 @router.get("/dialogue/{date}", response_model=AnalysisDialogue)
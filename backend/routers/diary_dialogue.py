@@ -4,7 +4,7 @@ AIの質問に答える形で一日の行動を記録する
 
 POST   /api/v1/diary-dialogue/{date}/start       - 対話を開始（または再開）
 POST   /api/v1/diary-dialogue/{date}/reply        - ユーザー返答を送信しAI応答を取得
-POST   /api/v1/diary-dialogue/{date}/synthesize   - 対話から行動ログを生成しレコード保存
+POST   /api/v1/diary-dialogue/{date}/synthesize   - 対話から行動ログを生成しレコード保存（202 + ジョブ）
 GET    /api/v1/diary-dialogue/{date}              - 保存済み対話を取得
 DELETE /api/v1/diary-dialogue/{date}              - 対話を削除
 """
@@ -13,7 +13,7 @@ import anthropic
 from fastapi import APIRouter, HTTPException, Response
 
 from models.schemas import AnalysisDialogue, DialogueReplyRequest, DialogueMessage
-from services import firestore_service, claude_service
+from services import ai_guard, firestore_service, claude_service, job_queue
 from utils.helpers import now_jst
 
 router = APIRouter()
@@ -48,6 +48,8 @@ async def start_diary_dialogue(date: str):
         # 初期質問を生成
         try:
             ai_text = claude_service.generate_diary_questions(date=date)
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -74,7 +76,7 @@ async def start_diary_dialogue(date: str):
 
         return _build_response(doc)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
@@ -107,6 +109,8 @@ async def reply_diary_dialogue(date: str, body: DialogueReplyRequest):
                 turn_count=turn_count,
                 max_turns=max_turns,
             )
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -126,62 +130,64 @@ async def reply_diary_dialogue(date: str, body: DialogueReplyRequest):
 
         return _build_response(dialogue)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
 
 
-@router.post("/diary-dialogue/{date}/synthesize")
+@router.post("/diary-dialogue/{date}/synthesize", status_code=202)
 async def synthesize_diary_dialogue(date: str):
     """
-    対話から日記テキストを生成する。
-    テキストはレスポンスで返し、フロントエンドが日記テキストエリアに反映する。
+    対話から日記テキストを生成するジョブを登録する。
+    結果（dialogue + raw_input）は GET /jobs/{job_id} の result で受け取り、
+    フロントエンドが日記テキストエリアに反映する。
     """
-    try:
-        dialogue = firestore_service.get_diary_dialogue(date)
-        if not dialogue:
-            raise HTTPException(status_code=404, detail=f"{date} の日記対話が見つかりません。")
-        if dialogue.get("turn_count", 0) < 1:
-            raise HTTPException(status_code=400, detail="最低1回はやり取りしてから記録をまとめてください。")
+    _load_synthesis_dialogue(date)  # 対話が無い・やり取り不足はここで 400 / 404
+    job = job_queue.enqueue("diary_synthesis", {"date": date}, dedupe_key=f"diary_synthesis:{date}")
+    return job_queue.public_view(job)
 
-        messages = dialogue.get("messages", [])
 
-        # 日記テキストを生成
-        try:
-            result = claude_service.generate_diary_synthesis(
-                date=date,
-                messages=messages,
-            )
-        except anthropic.APIStatusError as e:
-            if e.status_code == 529:
-                raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
-            if e.status_code == 429:
-                raise HTTPException(status_code=503, detail="APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。")
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
+def _load_synthesis_dialogue(date: str) -> dict:
+    """まとめ対象の日記対話を返す（対象外なら HTTPException）"""
+    dialogue = firestore_service.get_diary_dialogue(date)
+    if not dialogue:
+        raise HTTPException(status_code=404, detail=f"{date} の日記対話が見つかりません。")
+    if dialogue.get("turn_count", 0) < 1:
+        raise HTTPException(status_code=400, detail="最低1回はやり取りしてから記録をまとめてください。")
+    return dialogue
 
-        raw_input = result.get("raw_input", "")
-        if not raw_input:
-            raise HTTPException(status_code=500, detail="日記テキストの生成に失敗しました。")
 
-        # 対話を completed に更新
-        now = now_jst()
-        dialogue["status"] = "completed"
-        dialogue["updated_at"] = now
-        dialogue["raw_input"] = raw_input
-        firestore_service.save_diary_dialogue(date, dialogue)
+def _run_synthesis_job(params: dict) -> dict:
+    """日記テキストジョブ: テキストを生成し、対話を completed にする"""
+    date = params["date"]
+    dialogue = _load_synthesis_dialogue(date)
+    messages = dialogue.get("messages", [])
 
-        return {
-            "dialogue": _build_response(dialogue).model_dump(),
-            "raw_input": raw_input,
-        }
+    # 日記テキストを生成
+    result = claude_service.generate_diary_synthesis(
+        date=date,
+        messages=messages,
+    )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
+    raw_input = result.get("raw_input", "")
+    if not raw_input:
+        raise HTTPException(status_code=500, detail="日記テキストの生成に失敗しました。")
+
+    # 対話を completed に更新
+    now = now_jst()
+    dialogue["status"] = "completed"
+    dialogue["updated_at"] = now
+    dialogue["raw_input"] = raw_input
+    firestore_service.save_diary_dialogue(date, dialogue)
+
+    return {
+        "dialogue": _build_response(dialogue).model_dump(),
+        "raw_input": raw_input,
+    }
+
+
+job_queue.register("diary_synthesis", _run_synthesis_job)
 
 
 @router.get("/diary-dialogue/{date}", response_model=AnalysisDialogue)
@@ -0,0 +1,64 @@
+"""
+履歴一覧エンドポイント
+GET /api/v1/history  - 日ごとの記録と分析スコアを結合した一覧（新しい順、カーソルでページング）
+
+行動記録と日次分析をサーバー側で日付で結合し、一覧の 1 行に必要な値だけを返す。
+記録・分析の全文をクライアントに送らずに済む。
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from services import firestore_service
+
+router = APIRouter()
+
+DEFAULT_LIMIT = 31   # 1 ページ目で今月のカレンダーが埋まる件数
+MAX_LIMIT = 100
+SNIPPET_CHARS = 60
+
+
+def _snippet(raw_input: str) -> str:
+    """生テキストの最初の空でない行（SNIPPET_CHARS 文字まで）"""
+    line = next((l.strip() for l in (raw_input or "").splitlines() if l.strip()), "")
+    return line[:SNIPPET_CHARS] + "…" if len(line) > SNIPPET_CHARS else line
+
+
+def _item(record: dict, analysis: Optional[dict]) -> dict:
+    summary = (analysis or {}).get("summary") or {}
+    return {
+        "date": record.get("date"),
+        "score": summary.get("overall_score"),
+        "productive_hours": summary.get("productive_hours"),
+        "wasted_hours": summary.get("wasted_hours"),
+        "task_completion_rate": (record.get("tasks") or {}).get("completion_rate", 0.0),
+        "rest_day": bool(record.get("rest_day")),
+        "rest_reason": record.get("rest_reason", ""),
+        "snippet": _snippet(record.get("raw_input", "")),
+        "has_analysis": analysis is not None,
+    }
+
+
+@router.get("/history")
+async def list_history(
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="1 ページの日数"),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor（この日付より前を返す）"),
+):
+    """
+    記録のある日を新しい順に返す。
+    next_cursor が null でなければ、cursor に渡して続きを取得できる。
+    """
+    # 1 件多く読んで次のページの有無を判定する
+    records = firestore_service.list_record_heads(limit + 1, before=cursor)
+    has_more = len(records) > limit
+    records = records[:limit]
+    if not records:
+        return {"items": [], "next_cursor": None}
+
+    analyses = firestore_service.list_analysis_summaries(records[-1]["date"], records[0]["date"])
+    analyses_by_date = {a.get("date"): a for a in analyses}
+    return {
+        "items": [_item(r, analyses_by_date.get(r.get("date"))) for r in records],
+        "next_cursor": records[-1]["date"] if has_more else None,
+    }
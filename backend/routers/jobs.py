@@ -0,0 +1,79 @@
+"""
+AI ジョブエンドポイント
+GET /api/v1/jobs/{job_id}         - ジョブの状態と結果を取得（ポーリング用）
+GET /api/v1/jobs/{job_id}/events  - ジョブの状態変化を SSE で受け取る
+"""
+
+import asyncio
+import time
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from services import firestore_service, job_queue
+from utils.helpers import sse_event
+
+router = APIRouter()
+
+EVENTS_INTERVAL = 1.0  # seconds
+EVENTS_MAX_SECONDS = 240  # リクエストタイムアウトより前に切り、クライアントに再接続させる
+
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = firestore_service.get_ai_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"ジョブ {job_id} が見つかりません")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """ジョブの状態を返す。succeeded なら result に生成結果が入る（cancelled は新しいジョブに置き換えられたもの）"""
+    job = _get_job_or_404(job_id)
+    if job.get("status") == "queued":
+        # スケールダウン後に起動したインスタンスでもすぐ拾えるようにワーカーを起こす
+        job_queue.start_worker()
+        job_queue.kick()
+    return job_queue.public_view(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    ジョブの状態変化を Server-Sent Events で送る
+
+    event: status   {"status": "queued|running", "attempts": n}
+    event: done     ジョブの結果（result）
+    event: error    {"status": 500, "detail": "..."}（新しいジョブに置き換えられた場合は status: 409）
+    event: timeout  接続を切る前に送る（GET /jobs/{job_id} またはこのエンドポイントで待ち直す）
+    """
+    _get_job_or_404(job_id)
+    job_queue.start_worker()
+    job_queue.kick()
+
+    async def events():
+        last_status = None
+        deadline = time.monotonic() + EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            job = firestore_service.get_ai_job(job_id) or {}
+            status = job.get("status")
+            if status == "succeeded":
+                yield sse_event("done", job.get("result"))
+                return
+            if status == "failed":
+                yield sse_event("error", job.get("error") or {"detail": "ジョブが失敗しました"})
+                return
+            if status == "cancelled":
+                yield sse_event("error", {"status": 409, "detail": "ジョブは新しいジョブに置き換えられました"})
+                return
+            if status != last_status:
+                last_status = status
+                yield sse_event("status", {"status": status, "attempts": job.get("attempts", 0)})
+            await asyncio.sleep(EVENTS_INTERVAL)
+        yield sse_event("timeout", {"job_id": job_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
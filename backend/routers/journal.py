@@ -10,8 +10,9 @@ PUT    /api/v1/journal/entry/{entry_id}              - エントリ更新
 DELETE /api/v1/journal/entry/{entry_id}              - エントリ削除
 POST   /api/v1/journal/entry/{entry_id}/analyze      - AI分析を実行
 POST   /api/v1/journal/entry/{entry_id}/summarize    - MD要約を生成
+GET    /api/v1/journal/metrics                       - 気分・エネルギーの日次推移と感情タグの頻度
 GET    /api/v1/journal/digest/{week_id}              - 週次ダイジェスト取得
-POST   /api/v1/journal/digest/{week_id}/generate     - 週次ダイジェスト生成
+POST   /api/v1/journal/digest/{week_id}/generate     - 週次ダイジェスト生成（202 + ジョブ）
 
 後方互換:
 GET    /api/v1/journal/{date}                        - 旧API互換（by-date と同等）
@@ -25,8 +26,8 @@ from models.journal_schemas import (
     JournalCreate, JournalUpdate, JournalEntry,
     WeeklyJournalDigest,
 )
-from services import firestore_service, claude_service
-from utils.helpers import now_jst
+from services import ai_guard, firestore_service, claude_service, job_queue, journal_metrics, metrics_engine
+from utils.helpers import now_jst, today_jst
 
 router = APIRouter()
 
@@ -80,6 +81,33 @@ async def list_journals(
     return [JournalEntry(**j) for j in journals]
 
 
+# ---- 気分の推移（/journal/metrics は /journal/{date} より先に定義） ----
+
+@router.get("/journal/metrics")
+async def get_journal_metrics(
+    start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD)。省略時は終了日の29日前"),
+    end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD)。省略時は今日"),
+    window: int = Query(metrics_engine.DEFAULT_WINDOW, ge=1, le=90, description="移動平均の日数"),
+):
+    """
+    AI 分析済みエントリの mood_score・energy_level の日ごとの平均と移動平均、感情タグの出現頻度を返す。
+    journal_metrics を年ごとに 1 件読むだけで集計する（Claude 呼び出し・ジャーナルの全件取得なし）。
+    """
+    end = end_date or today_jst()
+    try:
+        start = start_date or (
+            datetime.strptime(end, "%Y-%m-%d") - timedelta(days=29)
+        ).strftime("%Y-%m-%d")
+        span = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date / end_date は YYYY-MM-DD 形式で指定してください")
+    if span < 0:
+        raise HTTPException(status_code=400, detail="start_date は end_date 以前の日付を指定してください")
+    if span >= metrics_engine.MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"期間は {metrics_engine.MAX_RANGE_DAYS} 日以内で指定してください")
+    return journal_metrics.analyze(start, end, window)
+
+
 # ---- 週次ダイジェスト（/journal/digest/* は /journal/{date} より先に定義） ----
 
 @router.get("/journal/digest/{week_id}", response_model=WeeklyJournalDigest)
@@ -94,9 +122,19 @@ async def get_journal_digest(week_id: str):
     return WeeklyJournalDigest(**digest)
 
 
-@router.post("/journal/digest/{week_id}/generate", response_model=WeeklyJournalDigest)
+@router.post("/journal/digest/{week_id}/generate", status_code=202)
 async def generate_journal_digest(week_id: str):
-    """週次ジャーナルダイジェストを生成する"""
+    """
+    週次ジャーナルダイジェストの生成ジョブを登録する。
+    結果（WeeklyJournalDigest）は GET /jobs/{job_id} の result で受け取る。
+    """
+    _load_digest_entries(week_id)  # 形式不正・エントリなしはここで 400 / 404
+    job = job_queue.enqueue("journal_digest", {"week_id": week_id}, dedupe_key=f"journal_digest:{week_id}")
+    return job_queue.public_view(job)
+
+
+def _load_digest_entries(week_id: str) -> tuple[str, str, list[dict]]:
+    """週の開始日・終了日とジャーナルエントリを返す（形式不正・エントリなしは HTTPException）"""
     try:
         year = int(week_id[:4])
         week_num = int(week_id[6:])
@@ -116,6 +154,13 @@ async def generate_journal_digest(week_id: str):
             status_code=404,
             detail=f"{week_id} にジャーナルエントリがありません",
         )
+    return week_start, week_end, journal_entries
+
+
+def _run_digest_job(params: dict) -> dict:
+    """ジャーナルダイジェストジョブ: Claude で生成し保存する"""
+    week_id = params["week_id"]
+    week_start, week_end, journal_entries = _load_digest_entries(week_id)
 
     daily_analyses = firestore_service.list_analyses(
         start_date=week_start, end_date=week_end,
@@ -143,7 +188,10 @@ async def generate_journal_digest(week_id: str):
     }
 
     saved = firestore_service.save_journal_digest(week_id, result)
-    return WeeklyJournalDigest(**saved)
+    return WeeklyJournalDigest(**saved).model_dump()
+
+
+job_queue.register("journal_digest", _run_digest_job)
 
 
 # ---- 日付指定で全エントリ取得 ----
@@ -212,6 +260,8 @@ async def analyze_journal_entry(entry_id: str):
             daily_record=daily_record,
             daily_analysis=daily_analysis,
         )
+    except ai_guard.AIUnavailableError:
+        raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
     except Exception as e:
         raise HTTPException(
             status_code=502,
@@ -0,0 +1,44 @@
+"""
+AI テレメトリ集計エンドポイント
+GET /api/v1/metrics/ai   - 機能（プロンプト種別）ごとの呼び出し数・トークン・p50/p95 レイテンシ・推定コスト
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import ai_metrics
+from utils.helpers import today_jst
+
+router = APIRouter()
+
+
+@router.get("/metrics/ai")
+async def get_ai_metrics(
+    start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD)。省略時は終了日の6日前"),
+    end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD)。省略時は今日"),
+):
+    """
+    日次ロールアップ（全インスタンス合算）と、このインスタンスの直近の呼び出し統計を返す。
+    ロールアップの p50/p95 はヒストグラムのバケット上限（ms）で近似する。
+    """
+    end = end_date or today_jst()
+    try:
+        start = start_date or (
+            datetime.strptime(end, "%Y-%m-%d") - timedelta(days=6)
+        ).strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="end_date は YYYY-MM-DD 形式で指定してください")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date は end_date 以前の日付を指定してください")
+
+    features = ai_metrics.summarize_rollups(start, end)
+    return {
+        "start_date": start,
+        "end_date": end,
+        "total_cost_usd": round(sum(f["cost_usd"] for f in features), 4),
+        "total_calls": sum(f["calls"] for f in features),
+        "features": features,
+        "live": ai_metrics.summarize_live(),
+    }
@@ -2,7 +2,7 @@
 朝のタスク整理エンドポイント
 POST /api/v1/morning/{date}/start       - 朝問答を開始（または再開）
 POST /api/v1/morning/{date}/reply       - ユーザー返答を送信しAI応答を取得
-POST /api/v1/morning/{date}/synthesize  - 対話から今日のプランを生成
+POST /api/v1/morning/{date}/synthesize  - 対話から今日のプランを生成（202 + ジョブ）
 GET  /api/v1/morning/{date}             - 保存済み朝問答を取得
 DELETE /api/v1/morning/{date}           - 朝問答を削除
 """
@@ -13,7 +13,8 @@ import anthropic
 from fastapi import APIRouter, HTTPException, Response
 
 from models.schemas import AnalysisDialogue, DialogueReplyRequest, DialogueMessage
-from services import firestore_service, claude_service
+from services import ai_guard, firestore_service, claude_service, job_queue, pregeneration, task_ledger
+from utils import anomaly
 from utils.helpers import now_jst
 
 router = APIRouter()
@@ -25,36 +26,6 @@ def _yesterday(date: str) -> str:
     return (dt - timedelta(days=1)).strftime("%Y-%m-%d")
 
 
-def _collect_incomplete_tasks(date: str, days: int = 7) -> list[str]:
-    """直近N日間の未完了タスクを収集する"""
-    past_records = firestore_service.get_past_records(date, days=days)
-    incomplete = []
-    seen = set()
-    for record in past_records:
-        tasks = record.get("tasks", {})
-        planned = tasks.get("planned", [])
-        completed = tasks.get("completed", [])
-        for task in planned:
-            if task not in completed and task not in seen:
-                incomplete.append(task)
-                seen.add(task)
-    return incomplete
-
-
-def _collect_backlog_tasks(date: str, days: int = 7) -> list[str]:
-    """直近N日間の近日中タスクを収集する（最新のレコードのbacklogを優先）"""
-    past_records = firestore_service.get_past_records(date, days=days)
-    backlog = []
-    seen = set()
-    for record in past_records:
-        tasks = record.get("tasks", {})
-        for task in tasks.get("backlog", []):
-            if task not in seen:
-                backlog.append(task)
-                seen.add(task)
-    return backlog
-
-
 def _build_dialogue_response(data: dict) -> AnalysisDialogue:
     """Firestore のデータから AnalysisDialogue レスポンスを構築"""
     messages = [
@@ -79,6 +50,7 @@ async def start_morning_dialogue(date: str):
     """
     朝のタスク整理対話を開始する。
     既に in_progress の対話がある場合はそのまま返す（再開）。
+    入力が変わっていない事前生成の問いかけがあれば、生成せずにそれを使う。
     """
     try:
         # 既存の対話を確認
@@ -86,27 +58,20 @@ async def start_morning_dialogue(date: str):
         if existing and existing.get("status") == "in_progress":
             return _build_dialogue_response(existing)
 
-        # 昨日のデータを取得
-        yesterday = _yesterday(date)
-        yesterday_record = firestore_service.get_record(yesterday)
-        yesterday_analysis = firestore_service.get_analysis(yesterday)
-
-        # 直近の未完了タスクと近日中タスクを収集
-        incomplete_tasks = _collect_incomplete_tasks(date)
-        backlog_tasks = _collect_backlog_tasks(date)
-
-        # アクティブな目標は KG 廃止により空にする（過去互換用に引数は残す）
-        active_goals: list = []
+        inputs = _load_question_inputs(date)
+        yesterday_record = inputs["yesterday_record"]
+        incomplete_tasks = inputs["incomplete_tasks"]
+        backlog_tasks = inputs["backlog_tasks"]
 
-        # 朝の問いかけを生成
+        # 朝の問いかけを生成（事前生成があればそれを使う）
         try:
-            ai_text = claude_service.generate_morning_questions(
-                yesterday_record=yesterday_record,
-                yesterday_analysis=yesterday_analysis,
-                incomplete_tasks=incomplete_tasks,
-                active_goals=active_goals,
-                backlog_tasks=backlog_tasks,
-            )
+            cached = firestore_service.get_morning_pregeneration(date)
+            if cached and cached.get("source_hash") == pregeneration.source_hash(inputs):
+                ai_text = cached["question"]
+            else:
+                ai_text = claude_service.generate_morning_questions(**inputs)
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -128,7 +93,7 @@ async def start_morning_dialogue(date: str):
             "turn_count": 0,
             "max_turns": 5,
             "context": {
-                "yesterday_date": yesterday,
+                "yesterday_date": _yesterday(date),
                 "has_yesterday_record": yesterday_record is not None,
                 "incomplete_tasks": incomplete_tasks,
                 "backlog_tasks": backlog_tasks,
@@ -140,7 +105,7 @@ async def start_morning_dialogue(date: str):
 
         return _build_dialogue_response(doc)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
@@ -173,7 +138,7 @@ async def reply_morning_dialogue(date: str, body: DialogueReplyRequest):
         yesterday = _yesterday(date)
         yesterday_record = firestore_service.get_record(yesterday)
         yesterday_analysis = firestore_service.get_analysis(yesterday)
-        incomplete_tasks = _collect_incomplete_tasks(date)
+        incomplete_tasks = task_ledger.carry_over(date)["incomplete"]
 
         # AIフォローアップ応答を生成
         try:
@@ -185,6 +150,8 @@ async def reply_morning_dialogue(date: str, body: DialogueReplyRequest):
                 turn_count=turn_count,
                 max_turns=max_turns,
             )
+        except ai_guard.AIUnavailableError:
+            raise  # 503 + Retry-After は main.py の例外ハンドラーが返す
         except anthropic.APIStatusError as e:
             if e.status_code == 529:
                 raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
@@ -205,65 +172,113 @@ async def reply_morning_dialogue(date: str, body: DialogueReplyRequest):
 
         return _build_dialogue_response(dialogue)
 
-    except HTTPException:
+    except (HTTPException, ai_guard.AIUnavailableError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
 
 
-@router.post("/morning/{date}/synthesize")
+@router.post("/morning/{date}/synthesize", status_code=202)
 async def synthesize_morning_dialogue(date: str):
     """
-    朝問答から今日のプランを生成する。
-    MorningPlan JSON を返し、対話を completed にする。
+    朝問答から今日のプランを生成するジョブを登録する。
+    ジョブは MorningPlan を保存し、対話を completed にする。
+    結果（dialogue + plan）は GET /jobs/{job_id} の result で受け取る。
     """
-    try:
-        dialogue = firestore_service.get_morning_dialogue(date)
-        if not dialogue:
-            raise HTTPException(status_code=404, detail=f"{date} の朝問答が見つかりません。")
-        if dialogue.get("turn_count", 0) < 1:
-            raise HTTPException(status_code=400, detail="最低1回はやり取りしてからプランをまとめてください。")
+    _load_synthesis_dialogue(date)  # 対話が無い・やり取り不足はここで 400 / 404
+    job = job_queue.enqueue("morning_synthesis", {"date": date}, dedupe_key=f"morning_synthesis:{date}")
+    return job_queue.public_view(job)
 
-        # 昨日のデータを取得
-        yesterday = _yesterday(date)
-        yesterday_record = firestore_service.get_record(yesterday)
-        yesterday_analysis = firestore_service.get_analysis(yesterday)
-        incomplete_tasks = _collect_incomplete_tasks(date)
-        messages = dialogue.get("messages", [])
 
-        # 今日のプランを生成
-        try:
-            plan_data = claude_service.generate_morning_synthesis(
-                yesterday_record=yesterday_record,
-                yesterday_analysis=yesterday_analysis,
-                incomplete_tasks=incomplete_tasks,
-                messages=messages,
-            )
-        except anthropic.APIStatusError as e:
-            if e.status_code == 529:
-                raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
-            if e.status_code == 429:
-                raise HTTPException(status_code=503, detail="APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。")
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
+def _load_synthesis_dialogue(date: str) -> dict:
+    """まとめ対象の朝問答を返す（対象外なら HTTPException）"""
+    dialogue = firestore_service.get_morning_dialogue(date)
+    if not dialogue:
+        raise HTTPException(status_code=404, detail=f"{date} の朝問答が見つかりません。")
+    if dialogue.get("turn_count", 0) < 1:
+        raise HTTPException(status_code=400, detail="最低1回はやり取りしてからプランをまとめてください。")
+    return dialogue
+
+
+def _run_synthesis_job(params: dict) -> dict:
+    """今日のプランジョブ: プランを生成して保存し、対話を completed にする"""
+    date = params["date"]
+    dialogue = _load_synthesis_dialogue(date)
+
+    # 昨日のデータを取得
+    yesterday = _yesterday(date)
+    yesterday_record = firestore_service.get_record(yesterday)
+    yesterday_analysis = firestore_service.get_analysis(yesterday)
+    incomplete_tasks = task_ledger.carry_over(date)["incomplete"]
+    messages = dialogue.get("messages", [])
+
+    # 今日のプランを生成
+    plan_data = claude_service.generate_morning_synthesis(
+        yesterday_record=yesterday_record,
+        yesterday_analysis=yesterday_analysis,
+        incomplete_tasks=incomplete_tasks,
+        messages=messages,
+    )
 
-        # 対話を completed に更新、プランも保存
-        now = now_jst()
-        dialogue["status"] = "completed"
-        dialogue["plan"] = plan_data
-        dialogue["updated_at"] = now
-        firestore_service.save_morning_dialogue(date, dialogue)
+    # 対話を completed に更新、プランも保存
+    now = now_jst()
+    dialogue["status"] = "completed"
+    dialogue["plan"] = plan_data
+    dialogue["updated_at"] = now
+    firestore_service.save_morning_dialogue(date, dialogue)
 
-        return {
-            "dialogue": _build_dialogue_response(dialogue).model_dump(),
-            "plan": plan_data,
-        }
+    return {
+        "dialogue": _build_dialogue_response(dialogue).model_dump(),
+        "plan": plan_data,
+    }
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"サーバーエラー: {type(e).__name__}: {str(e)}")
+
+job_queue.register("morning_synthesis", _run_synthesis_job)
+
+
+def _load_question_inputs(date: str) -> dict:
+    """朝の問いかけの生成に使う入力（generate_morning_questions の引数）を集める"""
+    yesterday = _yesterday(date)
+    # 直近 7 日の未完了タスクと近日中タスク（タスク台帳を 1 回読む）
+    tasks = task_ledger.carry_over(date)
+    return {
+        "yesterday_record": firestore_service.get_record(yesterday),
+        "yesterday_analysis": firestore_service.get_analysis(yesterday),
+        "incomplete_tasks": tasks["incomplete"],
+        "backlog_tasks": tasks["backlog"],
+        # アクティブな目標は KG 廃止により空にする（過去互換用に引数は残す）
+        "active_goals": [],
+        # 昨日までの日次スコア・無駄時間の外れ値と水準の変化
+        "anomaly_facts": anomaly.format_facts(firestore_service.get_anomaly_state(), date),
+    }
+
+
+def _run_question_pregeneration_job(params: dict) -> dict:
+    """
+    朝の問いかけを事前生成する（ジョブ pregen_morning_question）
+    既に対話を始めている日や、入力が変わっていない事前生成がある日は生成しない。
+    """
+    date = params["date"]
+    if firestore_service.get_morning_dialogue(date):
+        return {"date": date, "status": "skipped", "reason": "朝問答は開始済みです"}
+
+    inputs = _load_question_inputs(date)
+    digest = pregeneration.source_hash(inputs)
+    cached = firestore_service.get_morning_pregeneration(date)
+    if cached and cached.get("source_hash") == digest:
+        return {"date": date, "status": "skipped", "reason": "事前生成は最新です"}
+
+    question = claude_service.generate_morning_questions(**inputs)
+    firestore_service.save_morning_pregeneration(date, {
+        "date": date,
+        "question": question,
+        "source_hash": digest,
+        "created_at": now_jst(),
+    })
+    return {"date": date, "status": "generated"}
+
+
+job_queue.register(pregeneration.MORNING_QUESTION_KIND, _run_question_pregeneration_job)
 
 
 @router.get("/morning/{date}", response_model=AnalysisDialogue)
@@ -11,7 +11,8 @@ from fastapi import APIRouter, HTTPException, Query, Response
 from typing import Optional
 
 from models.schemas import RecordCreate, RecordUpdate, DailyRecord, Tasks, RestDayRequest
-from services import firestore_service, claude_service
+from services import firestore_service, claude_service, pregeneration
+from utils import time_accounting
 from utils.helpers import now_jst
 
 router = APIRouter()
@@ -21,7 +22,8 @@ router = APIRouter()
 async def create_record(body: RecordCreate):
     """
     行動記録を作成する。
-    Claude API で生テキストを構造化（行動リスト化）してから保存する。
+    生テキストを構造化（行動リスト化）してから保存する。
+    時刻付きのタイムラインはローカルで構造化し、読めない部分だけ Claude API を使う。
     """
     date = body.date
 
@@ -30,7 +32,7 @@ async def create_record(body: RecordCreate):
     if existing:
         raise HTTPException(status_code=409, detail=f"{date} の記録はすでに存在します。PUT で更新してください。")
 
-    # Claude API で行動を構造化
+    # 行動を構造化
     try:
         parsed_activities = claude_service.parse_activities(body.raw_input, date)
     except Exception as e:
@@ -45,11 +47,13 @@ async def create_record(body: RecordCreate):
         completion_rate=len(body.tasks_completed) / len(body.tasks_planned) if body.tasks_planned else 0.0,
     )
 
+    activities = [a if isinstance(a, dict) else a.dict() for a in parsed_activities]
     record_data = {
         "id": date,
         "date": date,
         "raw_input": body.raw_input,
-        "parsed_activities": [a if isinstance(a, dict) else a.dict() for a in parsed_activities],
+        "parsed_activities": activities,
+        "time_accounting": time_accounting.compute(activities),
         "screen_time": None,
         "tasks": tasks.dict(),
         "created_at": now,
@@ -57,6 +61,7 @@ async def create_record(body: RecordCreate):
     }
 
     saved = firestore_service.create_record(date, record_data)
+    pregeneration.invalidate_for_record(date)
     return DailyRecord(**saved)
 
 
@@ -102,6 +107,7 @@ async def update_record(date: str, body: RecordUpdate):
             try:
                 parsed = claude_service.parse_activities(body.raw_input, date)
                 update_data["parsed_activities"] = parsed
+                update_data["time_accounting"] = time_accounting.compute(parsed)
             except Exception:
                 pass
 
@@ -125,6 +131,7 @@ async def update_record(date: str, body: RecordUpdate):
         }
 
     updated = firestore_service.update_record(date, update_data)
+    pregeneration.invalidate_for_record(date)
     return DailyRecord(**updated)
 
 
@@ -141,6 +148,7 @@ async def toggle_rest_day(date: str, body: RestDayRequest):
             "updated_at": now,
         }
         updated = firestore_service.update_record(date, update_data)
+        pregeneration.invalidate_for_record(date)
         return DailyRecord(**updated)
     else:
         # レコードが無い場合は最小限のレコードを作成
@@ -157,6 +165,7 @@ async def toggle_rest_day(date: str, body: RestDayRequest):
             "updated_at": now,
         }
         saved = firestore_service.create_record(date, record_data)
+        pregeneration.invalidate_for_record(date)
         return DailyRecord(**saved)
 
 
@@ -166,3 +175,4 @@ async def delete_record(date: str):
     deleted = firestore_service.delete_record(date)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"{date} の記録が見つかりません")
+    pregeneration.invalidate_for_record(date)
@@ -0,0 +1,32 @@
+"""
+スケジューラー用エンドポイント
+POST /api/v1/scheduler/pregenerate  - 前日の日次分析と当日の朝の問いかけの事前生成を登録（202 + ジョブ）
+
+Cloud Scheduler から利用の少ない時間帯（例: 毎日 04:30 JST）に呼び出す。
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import job_queue, pregeneration
+
+router = APIRouter()
+
+
+@router.post("/scheduler/pregenerate", status_code=202)
+async def pregenerate(
+    date: Optional[str] = Query(None, description="朝の問いかけを用意する日 (YYYY-MM-DD)。省略時は今日。分析はその前日が対象"),
+):
+    """
+    事前生成ジョブを登録する。
+    同じ日の事前生成が queued / running なら、新しく作らずにそのジョブを返す。
+    """
+    if date:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="date は YYYY-MM-DD 形式で指定してください")
+    job = pregeneration.schedule(date)
+    return job_queue.public_view(job)
@@ -0,0 +1,44 @@
+"""
+全文検索エンドポイント
+GET /api/v1/search  - 日記・ブレインダンプ・Udemy Tips・ありがたいノートを横断して検索する
+
+文字 1/2/3-gram の転置インデックス（search_segments）を BM25 で順位付けする（services/search_service.py）。
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import search_service
+
+router = APIRouter()
+
+MAX_LIMIT = 50
+
+
+def _split(value: Optional[str]) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="検索語"),
+    kinds: Optional[str] = Query(None, description="対象の種類（journal,braindump,udemy_tip,gratitude をカンマ区切り）"),
+    labels: Optional[str] = Query(None, description="すべてを持つエントリに絞るラベル（カンマ区切り）"),
+    start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD)"),
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+):
+    """一致したエントリを関連度の高い順に返す（total は limit で切る前の件数）"""
+    kind_list = _split(kinds)
+    unknown = [k for k in kind_list if k not in search_service.KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不明な種類です: {', '.join(unknown)}")
+    return search_service.search(
+        q,
+        kinds=kind_list,
+        labels=_split(labels),
+        start_date=start_date,
+        end_date=end_date,
+        limit=limit,
+    )
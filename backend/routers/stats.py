@@ -0,0 +1,78 @@
+"""
+集計エンドポイント
+GET /api/v1/stats/tasks          - タスク実績（日別・月別のタスク数と完了率、連続日数）
+GET /api/v1/stats/daily-metrics  - 日次分析の数値トレンド（移動平均・週ごとの前週差・パーセンタイル）
+GET /api/v1/stats/anomalies      - 日次スコア・無駄時間の異常検知（最近の基準と直近の外れ値・変化点）
+
+いずれもロールアップ（task_stats_monthly / daily_metrics / anomaly_state）を読むだけで返すため、
+期間内の記録・分析を全件取得しない。
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import firestore_service, metrics_engine, task_stats
+from utils import anomaly
+from utils.helpers import today_jst
+
+router = APIRouter()
+
+
+@router.get("/stats/tasks")
+async def get_task_stats(
+    today: Optional[str] = Query(None, description="基準日 (YYYY-MM-DD)。省略時は今日"),
+    months: int = Query(6, ge=1, le=task_stats.MAX_MONTHS, description="月別集計の月数（基準日の月を含む）"),
+    days: int = Query(35, ge=1, le=task_stats.MAX_DAYS, description="日別集計の日数（基準日を含む）"),
+    streak_task: Optional[str] = Query(None, description="連続日数を数えるタスク名"),
+):
+    """
+    日別（days 日分）・月別（months か月分）のタスク数と完了率、連続日数を返す。
+    completion.current は今日まだ完了タスクが無ければ昨日から数える。completion.longest は months の範囲で数える。
+    """
+    today = today or today_jst()
+    try:
+        datetime.strptime(today, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="today は YYYY-MM-DD 形式で指定してください")
+    return task_stats.summarize(today, months, days, streak_task)
+
+
+@router.get("/stats/daily-metrics")
+async def get_daily_metrics(
+    start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD)。省略時は終了日の27日前"),
+    end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD)。省略時は今日"),
+    window: int = Query(metrics_engine.DEFAULT_WINDOW, ge=1, le=90, description="移動平均の日数"),
+):
+    """
+    overall_score / productive_hours / wasted_hours / youtube_hours / task_completion_rate の
+    件数・平均・最小・最大・パーセンタイル・移動平均・週ごとの平均と前週差を返す。
+    """
+    end = end_date or today_jst()
+    try:
+        start = start_date or (
+            datetime.strptime(end, "%Y-%m-%d") - timedelta(days=27)
+        ).strftime("%Y-%m-%d")
+        span = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date / end_date は YYYY-MM-DD 形式で指定してください")
+    if span < 0:
+        raise HTTPException(status_code=400, detail="start_date は end_date 以前の日付を指定してください")
+    if span >= metrics_engine.MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"期間は {metrics_engine.MAX_RANGE_DAYS} 日以内で指定してください")
+    return metrics_engine.analyze(start, end, window)
+
+
+@router.get("/stats/anomalies")
+async def get_anomalies():
+    """
+    overall_score / wasted_hours の最近の基準（EWMA の平均・標準偏差）と、
+    直近の外れ値（anomaly）・水準の変化（shift）を新しい順に返す。
+    """
+    state = firestore_service.get_anomaly_state()
+    return {
+        "last_date": state.get("last_date"),
+        "baselines": anomaly.baselines(state),
+        "events": list(reversed(state.get("events") or [])),
+    }
@@ -0,0 +1,45 @@
+"""
+改善提案の索引エンドポイント
+GET /api/v1/suggestions  - 全期間の改善提案を似た提案ごとにまとめた一覧（出現回数の多い順）
+
+日次分析の保存時に更新している suggestion_index を 1 件読むだけで返す。
+"""
+
+from fastapi import APIRouter, Query
+
+from services import firestore_service
+
+router = APIRouter()
+
+RECENT_DATES = 5  # クラスタごとに返す最近の出現日の数
+
+
+def _cluster(cluster: dict) -> dict:
+    dates = sorted({o.split(":", 1)[0] for o in cluster.get("occurrences", [])}, reverse=True)
+    return {
+        "id": cluster["id"],
+        "suggestion": cluster.get("suggestion", ""),
+        "category": cluster.get("category", "その他"),
+        "priority": cluster.get("priority", "low"),
+        "priority_counts": cluster.get("priority_counts", {}),
+        "count": cluster.get("count", 0),
+        "first_seen": cluster.get("first_seen"),
+        "last_seen": cluster.get("last_seen"),
+        "recent_dates": dates[:RECENT_DATES],
+    }
+
+
+@router.get("/suggestions")
+async def list_suggestions(
+    min_count: int = Query(1, ge=1, description="この回数以上挙がった提案だけを返す"),
+):
+    """
+    似た提案をまとめたクラスタを、出現回数の多い順（同数なら最近挙がった順）に返す。
+    """
+    index = firestore_service.get_suggestion_index()
+    clusters = [c for c in (index.get("clusters") or {}).values() if c.get("count", 0) >= min_count]
+    clusters.sort(key=lambda c: (c.get("count", 0), c.get("last_seen") or ""), reverse=True)
+    return {
+        "clusters": [_cluster(c) for c in clusters],
+        "total_occurrences": sum(c.get("count", 0) for c in clusters),
+    }
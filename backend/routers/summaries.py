@@ -1,105 +1,87 @@
 """
-月次サマリーエンドポイント
-POST /api/v1/summaries/generate/{yearMonth}  - 月次サマリー生成
-GET  /api/v1/summaries/{yearMonth}           - 月次サマリー取得
-GET  /api/v1/summaries                       - サマリー一覧
+月次・年次サマリーエンドポイント
+POST /api/v1/summaries/generate/{period}  - サマリー生成（202 + ジョブ、period は YYYY-MM または YYYY）
+GET  /api/v1/summaries/{period}           - サマリー取得
+GET  /api/v1/summaries                    - サマリー一覧
+
+月次は週次分析から、年次は月次サマリーから階層的にまとめる（services/summary_pipeline.py）。
 """
 
 import logging
-from datetime import datetime, timedelta
+import re
 from fastapi import APIRouter, HTTPException
 
-from services import firestore_service
-from services.claude_service import get_client, _call_claude_with_retry, _extract_json
-from prompts.monthly_summary import MONTHLY_SUMMARY_SYSTEM_PROMPT, build_monthly_summary_prompt
-from utils.helpers import now_jst
+from services import firestore_service, job_queue, summary_pipeline
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 月次サマリーは Sonnet を使用
-SUMMARY_MODEL = "claude-sonnet-4-6"
-
 
-@router.post("/summaries/generate/{year_month}")
-async def generate_monthly_summary(year_month: str):
+@router.post("/summaries/generate/{period}", status_code=202)
+async def generate_summary(period: str):
     """
-    指定月の月次コーチングサマリーを生成する。
-    形式: YYYY-MM（例: 2026-02）
+    指定月（YYYY-MM）または指定年（YYYY）のコーチングサマリーの生成ジョブを登録する。
+    要約済みの週・月は再利用し、日次分析が更新された週とそれを含む月・年だけを作り直す。
+    結果は GET /jobs/{job_id} の result で受け取る（同じ期間の生成中なら同じジョブを返す）。
     """
+    if re.fullmatch(r"\d{4}", period):
+        if not summary_pipeline.months_with_data(period):
+            raise HTTPException(status_code=404, detail=f"{period}年の分析データがありません。")
+        job = job_queue.enqueue("yearly_summary", {"year": period}, dedupe_key=f"yearly:{period}")
+    else:
+        _load_month_analyses(period)  # 分析データが無い月はここで 404
+        job = job_queue.enqueue("monthly_summary", {"year_month": period}, dedupe_key=f"monthly:{period}")
+    return job_queue.public_view(job)
+
+
+def _month_range(year_month: str) -> tuple[str, str]:
+    """指定月の初日と末日（形式不正は HTTPException）"""
     try:
-        # 月の開始日・終了日を計算
-        year, month = year_month.split("-")
-        start_date = f"{year}-{month}-01"
-        if int(month) == 12:
-            end_date = f"{int(year)+1}-01-01"
-        else:
-            end_date = f"{year}-{int(month)+1:02d}-01"
-        # 月末日を計算
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=1)
-        end_date = end_dt.strftime("%Y-%m-%d")
-
-        # 該当月の日次分析を取得
-        analyses = firestore_service.list_analyses(start_date=start_date, end_date=end_date)
-        if not analyses:
-            raise HTTPException(status_code=404, detail=f"{year_month}の分析データがありません。")
-
-        # テキスト化
-        analyses_lines = []
-        for a in sorted(analyses, key=lambda x: x.get("date", "")):
-            s = a.get("summary", {})
-            score = s.get("overall_score", 0)
-            detail = a.get("analysis", {})
-            good = detail.get("good_points", [])
-            bad = detail.get("bad_points", [])
-            analyses_lines.append(
-                f"{a.get('date')}: スコア={score}, "
-                f"生産的={s.get('productive_hours', '-')}h, "
-                f"無駄={s.get('wasted_hours', '-')}h "
-                f"良: {', '.join(good[:2])} / 悪: {', '.join(bad[:2])}"
-            )
-
-        # Claude API で月次サマリー生成
-        user_prompt = build_monthly_summary_prompt(
-            period=year_month,
-            analyses_text="\n".join(analyses_lines),
-        )
-
-        client = get_client()
-        response = _call_claude_with_retry(
-            client,
-            model=SUMMARY_MODEL,
-            max_tokens=4096,
-            system=MONTHLY_SUMMARY_SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_prompt}],
-        )
-
-        summary_data = _extract_json(response.content[0].text)
-
-        # Firestore に保存
-        now = now_jst()
-        doc = {
-            "period": year_month,
-            **summary_data,
-            "created_at": now,
-        }
-        firestore_service.save_coaching_summary(year_month, doc)
-
-        return doc
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"サマリー生成エラー: {type(e).__name__}: {str(e)}")
-
-
-@router.get("/summaries/{year_month}")
-async def get_monthly_summary(year_month: str):
-    """月次コーチングサマリーを取得"""
-    summary = firestore_service.get_coaching_summary(year_month)
+        return summary_pipeline.month_range(year_month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="期間は YYYY-MM または YYYY 形式で指定してください")
+
+
+def _load_month_analyses(year_month: str) -> list[dict]:
+    """指定月の日次分析を取得する（形式不正・データなしは HTTPException）"""
+    start_date, end_date = _month_range(year_month)
+
+    # 該当月の日次分析を取得
+    analyses = firestore_service.list_analyses(start_date=start_date, end_date=end_date)
+    if not analyses:
+        raise HTTPException(status_code=404, detail=f"{year_month}の分析データがありません。")
+    return analyses
+
+
+def _run_monthly_summary_job(params: dict) -> dict:
+    """月次サマリージョブ: 古くなった週次分析を作り直し、週次分析から月次サマリーをまとめる"""
+    year_month = params["year_month"]
+    summary = summary_pipeline.ensure_month(year_month)
+    if not summary:
+        raise HTTPException(status_code=404, detail=f"{year_month}の行動記録がありません。")
+    return summary
+
+
+def _run_yearly_summary_job(params: dict) -> dict:
+    """年次サマリージョブ: 古くなった月次サマリーを作り直し、月次サマリーから年次サマリーをまとめる"""
+    year = params["year"]
+    summary = summary_pipeline.ensure_year(year)
+    if not summary:
+        raise HTTPException(status_code=404, detail=f"{year}年の行動記録がありません。")
+    return summary
+
+
+job_queue.register("monthly_summary", _run_monthly_summary_job)
+job_queue.register("yearly_summary", _run_yearly_summary_job)
+
+
+@router.get("/summaries/{period}")
+async def get_summary(period: str):
+    """月次・年次コーチングサマリーを取得"""
+    summary = firestore_service.get_coaching_summary(period)
     if not summary:
-        raise HTTPException(status_code=404, detail=f"{year_month}のサマリーが見つかりません。")
+        raise HTTPException(status_code=404, detail=f"{period}のサマリーが見つかりません。")
     return summary
 
 
@@ -1,6 +1,7 @@
 """
 週次分析エンドポイント
-POST /api/v1/weekly/{week_id}/generate  - 週次分析を生成
+POST /api/v1/weekly/{week_id}/generate  - 週次分析を生成（202 + ジョブ）
+POST /api/v1/weekly/{week_id}/generate/stream - 週次分析を生成（セクションごとに SSE で返す）
 GET  /api/v1/weekly/{week_id}           - 保存済み週次分析を取得
 GET  /api/v1/weekly                     - 週次分析一覧を取得
 """
@@ -10,39 +11,113 @@ import json
 from datetime import datetime, timedelta
 import anthropic
 from fastapi import APIRouter, HTTPException, Query
-from services import firestore_service, claude_service
-from utils.helpers import now_jst
+from fastapi.responses import StreamingResponse
+from services import ai_guard, firestore_service, claude_service, job_queue, single_flight
+from utils.helpers import now_jst, week_id_to_dates, sse_event
 
 router = APIRouter()
 
 
-def _week_id_to_dates(week_id: str) -> tuple[str, str]:
-    """
-    'YYYY-Www' 形式の週 ID を (week_start, week_end) の日付ペアに変換する
-    例: '2026-W08' → ('2026-02-16', '2026-02-22')
-    """
-    # ISO 8601 week: %G-W%V
-    dt = datetime.strptime(f"{week_id}-1", "%G-W%V-%u")
-    week_start = dt.strftime("%Y-%m-%d")
-    week_end = (dt + timedelta(days=6)).strftime("%Y-%m-%d")
-    return week_start, week_end
-
-
 def _get_last_week_id(week_id: str) -> str:
     """指定週の前週の週 ID を返す"""
-    week_start, _ = _week_id_to_dates(week_id)
+    week_start, _ = week_id_to_dates(week_id)
     dt = datetime.strptime(week_start, "%Y-%m-%d")
     last_week_dt = dt - timedelta(days=7)
     return last_week_dt.strftime("%G-W%V")
 
 
-@router.post("/weekly/{week_id}/generate")
+@router.post("/weekly/{week_id}/generate", status_code=202)
 async def generate_weekly_analysis(week_id: str):
     """
-    指定週の全行動記録と日次分析を使って週次分析を生成し保存する。
-    先週の週次分析も参照して進捗比較を行う。
+    指定週の週次分析の生成ジョブを登録する。
+    全行動記録と日次分析を使い、先週の週次分析も参照して進捗比較を行う。
+    結果は GET /jobs/{job_id} の result で受け取る（同じ週の生成中なら同じジョブを返す）。
+    """
+    _load_inputs(week_id)  # 記録が無い週はここで 404
+    job = job_queue.enqueue("weekly_analysis", {"week_id": week_id}, dedupe_key=f"weekly:{week_id}")
+    return job_queue.public_view(job)
+
+
+def _run_weekly_job(params: dict) -> dict:
+    """週次分析ジョブ: 入力を読み直して Claude で生成し保存する"""
+    week_id = params["week_id"]
+    daily_records, daily_analyses, last_week_analysis = _load_inputs(week_id)
+
+    def generate() -> dict:
+        analysis_data = claude_service.generate_weekly_analysis(
+            week_id=week_id,
+            daily_records=daily_records,
+            daily_analyses=daily_analyses,
+            last_week_analysis=last_week_analysis,
+        )
+        return _save_generated(week_id, analysis_data)
+
+    # ストリーミング版と同時に走った場合も 1 回の生成を共有する
+    return single_flight.run_sync(
+        f"weekly:{week_id}", generate, load=lambda: _get_weekly_from_db(week_id),
+    )
+
+
+job_queue.register("weekly_analysis", _run_weekly_job)
+
+
+@router.post("/weekly/{week_id}/generate/stream")
+async def generate_weekly_analysis_stream(week_id: str):
+    """
+    週次分析を Server-Sent Events で生成する。
+    生成完了を待たず、確定したセクションから順に送る。
+
+    event: section  {"path": ["deep_analysis", "weekly_pattern"], "value": ...}
+    event: done     保存済みの週次分析（GET /weekly/{week_id} と同じ形式）
+    event: error    {"detail": "..."}
     """
-    week_start, week_end = _week_id_to_dates(week_id)
+    daily_records, daily_analyses, last_week_analysis = _load_inputs(week_id)
+
+    def generate():
+        for kind, path, value in claude_service.stream_weekly_analysis(
+            week_id=week_id,
+            daily_records=daily_records,
+            daily_analyses=daily_analyses,
+            last_week_analysis=last_week_analysis,
+        ):
+            if kind == "section":
+                yield (kind, path, value)
+            else:
+                yield ("done", (), _save_generated(week_id, value))
+
+    def events():
+        try:
+            # 同じ週で生成中なら、その完了を待って done だけを返す
+            for kind, path, value in single_flight.stream(
+                f"weekly:{week_id}", generate, load=lambda: _get_weekly_from_db(week_id),
+            ):
+                if kind == "section":
+                    yield sse_event("section", {"path": list(path), "value": value})
+                else:
+                    yield sse_event("done", value)
+        except ai_guard.AIUnavailableError as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except anthropic.APIStatusError as e:
+            if e.status_code == 529:
+                detail = "AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。"
+            elif e.status_code == 429:
+                detail = "APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。"
+            else:
+                detail = "AI応答の生成に失敗しました。しばらく待ってから再度お試しください。"
+            yield sse_event("error", {"detail": detail})
+        except Exception:
+            yield sse_event("error", {"detail": "AI応答の生成に失敗しました。しばらく待ってから再度お試しください。"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _load_inputs(week_id: str) -> tuple[list[dict], list[dict], dict | None]:
+    """週次分析の入力データを取得する（記録が無ければ HTTPException）"""
+    week_start, week_end = week_id_to_dates(week_id)
 
     # 今週のデータを取得
     daily_records_raw = firestore_service.list_records(start_date=week_start, end_date=week_end)
@@ -62,25 +137,12 @@ async def generate_weekly_analysis(week_id: str):
     # 先週の週次分析（比較用）
     last_week_id = _get_last_week_id(week_id)
     last_week_analysis = _get_weekly_from_db(last_week_id)
+    return daily_records, daily_analyses, last_week_analysis
 
-    # Claude API で週次分析を生成
-    try:
-        analysis_data = claude_service.generate_weekly_analysis(
-            week_id=week_id,
-            daily_records=daily_records,
-            daily_analyses=daily_analyses,
-            last_week_analysis=last_week_analysis,
-        )
-    except anthropic.APIStatusError as e:
-        if e.status_code == 529:
-            raise HTTPException(status_code=503, detail="AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。")
-        if e.status_code == 429:
-            raise HTTPException(status_code=503, detail="APIリクエストの上限に達しました。しばらく待ってからもう一度お試しください。")
-        raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI応答の生成に失敗しました。しばらく待ってから再度お試しください。")
-
-    # Firestore に保存
+
+def _save_generated(week_id: str, analysis_data: dict) -> dict:
+    """生成した週次分析を Firestore に保存する"""
+    week_start, week_end = week_id_to_dates(week_id)
     doc = {
         "id": week_id,
         "week_id": week_id,
@@ -91,7 +153,6 @@ async def generate_weekly_analysis(week_id: str):
         "created_at": now_jst(),
     }
     _save_weekly_to_db(week_id, doc)
-
     return doc
 
 
@@ -124,14 +185,8 @@ async def list_weekly_analyses(limit: int = Query(default=10, ge=1, le=52)):
 # ---- Firestore ヘルパー（weekly_analyses コレクション） ----
 
 def _get_weekly_from_db(week_id: str) -> dict | None:
-    from services.firestore_service import get_db
-    db = get_db()
-    doc = db.collection("weekly_analyses").document(week_id).get()
-    return doc.to_dict() if doc.exists else None
+    return firestore_service.get_weekly_analysis(week_id)
 
 
 def _save_weekly_to_db(week_id: str, data: dict) -> dict:
-    from services.firestore_service import get_db
-    db = get_db()
-    db.collection("weekly_analyses").document(week_id).set(data)
-    return data
+    return firestore_service.save_weekly_analysis(week_id, data)
@@ -0,0 +1,228 @@
+"""
+AI 呼び出しガード
+Anthropic API の過負荷（529）やレート制限（429）のときに、各リクエストが個別にリトライして
+負荷を増幅させないよう、呼び出しの入口をまとめて制御する。
+
+- 同時実行数: モデルごと・インスタンスごとのセマフォで制限する
+- トークンバケット: ai_guard/{model} をトランザクションで更新し、全インスタンス合計の
+  呼び出しレートを制限する
+- サーキットブレーカー: 429/529 を受けたら retry-after（無ければ段階的に伸ばす待ち時間）の間
+  回路を開き、同じドキュメントで全インスタンスに共有する。待ち時間が長い間は
+  AIUnavailableError で即座に失敗させ、main.py の例外ハンドラーが 503 + Retry-After を返す
+
+ai_guard/{model} は 1 モデル 1 ドキュメントのため、呼び出しのたびにトランザクションを張ると
+同時呼び出しがこのドキュメントで競合し（Firestore の 1 ドキュメントの持続的な書き込みは毎秒 1 回程度が目安）、
+Claude 呼び出しの前に往復 1 回分以上の遅延が乗る。そこでトークンは待たずに使える分を最大 RESERVE_BATCH 個
+まとめて予約してインスタンス内に持ち、RESERVE_TTL 秒以内の呼び出しは Firestore を読まずに使う。
+代わりに、使われずに期限切れになった予約分だけ全体のレートを低く見積もり、他のインスタンスが開いた回路には
+最大 RESERVE_TTL 秒遅れて従う（自インスタンスで 429/529 を受けたときは予約をすぐ捨てる）。
+
+Firestore に到達できない場合はローカルの制御だけで続行する（AI 呼び出し自体は止めない）。
+"""
+
+import email.utils
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from services import firestore_service
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))  # モデルごと・インスタンスごと
+RATE_PER_MINUTE = float(os.getenv("AI_RATE_PER_MINUTE", "60"))  # モデルごと・全インスタンス合計
+BURST = max(1.0, RATE_PER_MINUTE / 6)  # バケットの容量（10秒分）
+MAX_WAIT = float(os.getenv("AI_MAX_WAIT_SECONDS", "20"))  # これ以上待つ必要があれば 503 で返す
+BASE_COOLDOWN = 5  # retry-after が無い過負荷で回路を開く秒数（連続するたびに倍）
+MAX_COOLDOWN = 300
+RESERVE_BATCH = max(1, int(os.getenv("AI_RESERVE_BATCH", "4")))  # 1 回のトランザクションで予約するトークン数の上限
+RESERVE_TTL = 5.0  # 予約したトークンをインスタンス内で使える秒数
+
+# 回路を開くステータス（上流全体の混雑を示すもの）
+OVERLOAD_STATUS_CODES = {429, 529}
+
+
+class AIUnavailableError(Exception):
+    """AI を一時的に呼び出せない（retry_after 秒後に再試行できる見込み）"""
+
+    def __init__(self, retry_after: float, reason: str):
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+        super().__init__(
+            f"AIサーバーが混み合っています。約{self.retry_after}秒後にもう一度お試しください。"
+        )
+
+
+_lock = threading.Lock()
+_semaphores: dict[str, threading.BoundedSemaphore] = {}
+# model -> {"open_until": epoch 秒, "overloads": 連続した過負荷の回数,
+#           "reserved": 予約済みで未使用のトークン数, "reserved_until": 予約の期限（epoch 秒）}
+_local: dict[str, dict] = {}
+
+
+def _model_key(model: str) -> str:
+    return (model or "default").replace("/", "_")
+
+
+def _local_state(key: str) -> dict:
+    return _local.setdefault(key, {"open_until": 0.0, "overloads": 0, "reserved": 0, "reserved_until": 0.0})
+
+
+def _semaphore(key: str) -> threading.BoundedSemaphore:
+    with _lock:
+        if key not in _semaphores:
+            _semaphores[key] = threading.BoundedSemaphore(MAX_CONCURRENCY)
+        return _semaphores[key]
+
+
+def _reserve(state: dict, now: float, count: int = 1) -> tuple[dict | None, tuple[float, str, float, int]]:
+    """
+    トークンを予約する（update_ai_guard_state 用）
+    待たずに使えるトークンがあれば最大 count 個まとめて、無ければ 1 つだけ予約する
+    トークンは負の値まで借りられ、不足分が補充されるまでの秒数を待ち時間とする
+    待ち時間が MAX_WAIT を超える場合は予約しない
+
+    Returns:
+        (書き込むフィールド, (待ち時間, 理由, 回路が開いている期限, 予約したトークン数))
+    """
+    rate = RATE_PER_MINUTE / 60
+    open_until = state.get("open_until", 0.0)
+    open_wait = max(0.0, open_until - now)
+    refilled_at = state.get("refilled_at", now)
+    tokens = min(BURST, state.get("tokens", BURST) + max(0.0, now - refilled_at) * rate)
+    token_wait = max(0.0, (1 - tokens) / rate)
+
+    wait = max(open_wait, token_wait)
+    reason = "circuit_open" if open_wait >= token_wait else "rate_limit"
+    if wait > MAX_WAIT:
+        return None, (wait, reason, open_until, 0)
+    granted = max(1, min(count, int(tokens))) if wait == 0 else 1
+    return {"tokens": tokens - granted, "refilled_at": now}, (wait, reason, open_until, granted)
+
+
+def _wait_for_capacity(key: str) -> None:
+    """回路とトークンバケットを確認し、必要なら待つ（待ち切れなければ AIUnavailableError）"""
+    now = time.time()
+    with _lock:
+        st = _local_state(key)
+        local_open = st["open_until"]
+        # 予約済みのトークンが残っていれば Firestore を読まずに使う
+        if local_open <= now and st["reserved"] > 0 and st["reserved_until"] > now:
+            st["reserved"] -= 1
+            return
+    if local_open - now > MAX_WAIT:
+        raise AIUnavailableError(local_open - now, "circuit_open")
+
+    try:
+        wait, reason, open_until, granted = firestore_service.update_ai_guard_state(
+            key, lambda state: _reserve(state, time.time(), RESERVE_BATCH),
+        )
+        with _lock:
+            st = _local_state(key)
+            st["open_until"] = max(st["open_until"], open_until)
+            # 1 つはこの呼び出しで使い、残りを次の呼び出しのために持っておく
+            st["reserved"] = max(0, granted - 1)
+            st["reserved_until"] = time.time() + wait + RESERVE_TTL
+    except Exception as e:
+        logger.warning("AI ガードの共有状態を取得できませんでした（ローカル制御のみで続行）: %s", e)
+        wait, reason = 0.0, "circuit_open"
+    wait = max(wait, local_open - now)
+
+    if wait > MAX_WAIT:
+        raise AIUnavailableError(wait, reason)
+    if wait > 0:
+        # 回路が閉じた瞬間に全員が同時に再開しないよう揺らぎを加える
+        time.sleep(wait + random.uniform(0, 1))
+
+
+@contextmanager
+def slot(model: str):
+    """
+    Claude 呼び出し 1 回分の枠を確保するコンテキストマネージャ
+
+    Raises:
+        AIUnavailableError: 回路が開いている・レート上限・同時実行枠が空かないとき
+    """
+    key = _model_key(model)
+    _wait_for_capacity(key)
+    sem = _semaphore(key)
+    if not sem.acquire(timeout=MAX_WAIT):
+        raise AIUnavailableError(MAX_WAIT, "concurrency")
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """API エラーのレスポンスヘッダーから retry-after（秒）を取り出す"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return float(ms) / 1000
+    except ValueError:
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def report_overload(model: str, error: Exception) -> float:
+    """
+    429/529 を受けたことを記録して回路を開き、開いている秒数を返す
+    retry-after があればそれに従い、無ければ連続回数に応じて BASE_COOLDOWN から倍々に伸ばす
+    """
+    key = _model_key(model)
+    retry_after = retry_after_seconds(error)
+    with _lock:
+        st = _local_state(key)
+        st["overloads"] += 1
+        if retry_after is not None:
+            cooldown = min(MAX_COOLDOWN, retry_after)
+        else:
+            cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (st["overloads"] - 1))
+        until = time.time() + cooldown
+        st["open_until"] = max(st["open_until"], until)
+        st["reserved"] = 0
+
+    status = getattr(error, "status_code", None)
+    logger.warning(
+        "AI 回路を開きます: model=%s status=%s cooldown=%.1fs (retry-after=%s)",
+        model, status, cooldown, retry_after,
+    )
+    try:
+        firestore_service.update_ai_guard_state(
+            key,
+            lambda state: (
+                {"open_until": max(state.get("open_until", 0.0), until), "last_status": status},
+                None,
+            ),
+        )
+    except Exception as e:
+        logger.warning("AI ガードの共有状態を更新できませんでした: %s", e)
+    return cooldown
+
+
+def report_success(model: str) -> None:
+    """呼び出しの成功を記録し、連続過負荷の回数をリセットする"""
+    with _lock:
+        st = _local.get(_model_key(model))
+        if st:
+            st["overloads"] = 0
@@ -0,0 +1,233 @@
+"""
+AI 呼び出しテレメトリ
+Claude 呼び出しごとにプロンプト種別・モデル・トークン数・TTFT・レイテンシ・リトライ回数を記録する。
+
+- プロセス内レジストリ: 直近の呼び出しを保持し、正確な p50/p95 を計算する
+- 日次ロールアップ: ai_usage_daily/{YYYY-MM-DD} に種別ごとの累計とレイテンシヒストグラムを
+  Increment で加算し、インスタンスをまたいだ集計に使う
+"""
+
+import logging
+import threading
+from collections import deque
+
+from services import firestore_service
+from utils.helpers import today_jst
+
+logger = logging.getLogger(__name__)
+
+# 1M トークンあたりの USD 単価（input, output, cache_write, cache_read）
+# モデル名の前方一致で引き、複数一致したら最も長い（具体的な）ものを使う。未知のモデルは Sonnet 相当で見積もる
+# Opus は 4.0 / 4.1 と 4.5 以降で単価が違うため、4.0 / 4.1 は個別に載せる
+PRICING = {
+    "claude-opus-4-20250514": (15.0, 75.0, 18.75, 1.50),
+    "claude-opus-4-0": (15.0, 75.0, 18.75, 1.50),
+    "claude-opus-4-1": (15.0, 75.0, 18.75, 1.50),
+    "claude-opus-4": (5.0, 25.0, 6.25, 0.50),
+    "claude-sonnet-4": (3.0, 15.0, 3.75, 0.30),
+    "claude-haiku-4": (1.0, 5.0, 1.25, 0.10),
+    "claude-3-5-haiku": (0.80, 4.0, 1.0, 0.08),
+}
+DEFAULT_PRICING = PRICING["claude-sonnet-4"]
+BATCH_DISCOUNT = 0.5
+
+# レイテンシヒストグラムのバケット上限（ms）。最後は上限なし
+LATENCY_BUCKETS_MS = [250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000, 120000]
+
+REGISTRY_SIZE = 500  # 種別ごとに保持する直近の呼び出し数
+
+_lock = threading.Lock()
+_registry: dict[str, deque] = {}
+
+
+def _pricing(model: str) -> tuple[float, float, float, float]:
+    matches = [prefix for prefix in PRICING if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_PRICING
+    return PRICING[max(matches, key=len)]
+
+
+def estimate_cost(model: str, usage: dict, batch: bool = False) -> float:
+    """トークン使用量から推定コスト（USD）を計算する"""
+    p_in, p_out, p_cw, p_cr = _pricing(model or "")
+    cost = (
+        usage.get("input_tokens", 0) * p_in
+        + usage.get("output_tokens", 0) * p_out
+        + usage.get("cache_creation_input_tokens", 0) * p_cw
+        + usage.get("cache_read_input_tokens", 0) * p_cr
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+def usage_to_dict(usage) -> dict:
+    """SDK の Usage オブジェクトを記録用の辞書に変換する"""
+    if usage is None:
+        return {}
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def _bucket_key(latency_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+def record_call(
+    prompt_type: str,
+    model: str,
+    usage: dict,
+    latency_ms: float | None = None,
+    ttft_ms: float | None = None,
+    retries: int = 0,
+    error: str | None = None,
+    batch: bool = False,
+    calls: int = 1,
+) -> None:
+    """
+    Claude 呼び出しを記録する（失敗しても呼び出し元には影響させない）
+    Batch の結果は calls に件数、usage に合計を渡してまとめて記録する
+    """
+    cost = estimate_cost(model, usage, batch=batch)
+    sample = {
+        "model": model,
+        "latency_ms": latency_ms,
+        "ttft_ms": ttft_ms,
+        "retries": retries,
+        "error": error,
+        "cost_usd": cost,
+        **usage,
+    }
+    if calls == 1:
+        with _lock:
+            _registry.setdefault(prompt_type, deque(maxlen=REGISTRY_SIZE)).append(sample)
+
+    if latency_ms is not None:
+        logger.info(
+            "claude call type=%s model=%s in=%d out=%d cache_r=%d cache_w=%d ttft=%s latency=%.0fms retries=%d%s",
+            prompt_type, model,
+            usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+            usage.get("cache_read_input_tokens", 0), usage.get("cache_creation_input_tokens", 0),
+            f"{ttft_ms:.0f}ms" if ttft_ms is not None else "-", latency_ms, retries,
+            f" error={error}" if error else "",
+        )
+
+    fields = {
+        "calls": calls,
+        "errors": 1 if error else 0,
+        "retries": retries,
+        "cost_usd": cost,
+        **usage,
+    }
+    if latency_ms is not None:
+        fields["latency_ms_sum"] = latency_ms
+        fields[f"latency_hist.{_bucket_key(latency_ms)}"] = 1
+    if ttft_ms is not None:
+        fields["ttft_ms_sum"] = ttft_ms
+        fields["ttft_count"] = 1
+        fields[f"ttft_hist.{_bucket_key(ttft_ms)}"] = 1
+    try:
+        firestore_service.increment_ai_usage(today_jst(), prompt_type, model, fields)
+    except Exception as e:
+        logger.warning("AI 使用量ロールアップの書き込みに失敗: %s", e)
+
+
+# ---- 集計 ----
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return round(ordered[index], 1)
+
+
+def _hist_percentile(hist: dict, q: float) -> int | None:
+    """ヒストグラムから q 分位点が含まれるバケットの上限（ms）を返す"""
+    total = sum(hist.values())
+    if not total:
+        return None
+    cumulative = 0
+    for bound in LATENCY_BUCKETS_MS:
+        cumulative += hist.get(f"le_{bound}", 0)
+        if cumulative >= q * total:
+            return bound
+    return None  # 最大バケット超
+
+
+def summarize_live() -> list[dict]:
+    """このインスタンスの直近の呼び出しから種別ごとの統計を返す"""
+    with _lock:
+        snapshot = {k: list(v) for k, v in _registry.items()}
+
+    results = []
+    for prompt_type, samples in sorted(snapshot.items()):
+        latencies = [s["latency_ms"] for s in samples if s["latency_ms"] is not None]
+        ttfts = [s["ttft_ms"] for s in samples if s["ttft_ms"] is not None]
+        results.append({
+            "prompt_type": prompt_type,
+            "calls": len(samples),
+            "errors": sum(1 for s in samples if s["error"]),
+            "latency_p50_ms": _percentile(latencies, 0.5),
+            "latency_p95_ms": _percentile(latencies, 0.95),
+            "ttft_p50_ms": _percentile(ttfts, 0.5),
+            "ttft_p95_ms": _percentile(ttfts, 0.95),
+            "avg_input_tokens": round(sum(s.get("input_tokens", 0) for s in samples) / len(samples)),
+            "avg_output_tokens": round(sum(s.get("output_tokens", 0) for s in samples) / len(samples)),
+            "cost_usd": round(sum(s["cost_usd"] for s in samples), 4),
+        })
+    return results
+
+
+def summarize_rollups(start_date: str, end_date: str) -> list[dict]:
+    """日次ロールアップを期間で合算し、種別ごとの統計を返す"""
+    totals: dict[str, dict] = {}
+    for doc in firestore_service.list_ai_usage(start_date, end_date):
+        for prompt_type, f in (doc.get("features") or {}).items():
+            t = totals.setdefault(prompt_type, {
+                "calls": 0, "errors": 0, "retries": 0, "cost_usd": 0.0,
+                "input_tokens": 0, "output_tokens": 0,
+                "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+                "latency_ms_sum": 0.0, "ttft_ms_sum": 0.0, "ttft_count": 0,
+                "latency_hist": {}, "ttft_hist": {}, "models": {},
+            })
+            for key in (
+                "calls", "errors", "retries", "cost_usd", "input_tokens", "output_tokens",
+                "cache_creation_input_tokens", "cache_read_input_tokens",
+                "latency_ms_sum", "ttft_ms_sum", "ttft_count",
+            ):
+                t[key] += f.get(key, 0) or 0
+            for hist_key in ("latency_hist", "ttft_hist"):
+                for bucket, n in (f.get(hist_key) or {}).items():
+                    t[hist_key][bucket] = t[hist_key].get(bucket, 0) + n
+            for model, n in (f.get("models") or {}).items():
+                t["models"][model] = t["models"].get(model, 0) + n
+
+    results = []
+    for prompt_type, t in sorted(totals.items(), key=lambda x: -x[1]["cost_usd"]):
+        timed_calls = sum(t["latency_hist"].values())
+        results.append({
+            "prompt_type": prompt_type,
+            "calls": t["calls"],
+            "errors": t["errors"],
+            "retries": t["retries"],
+            "models": t["models"],
+            "input_tokens": t["input_tokens"],
+            "output_tokens": t["output_tokens"],
+            "cache_creation_input_tokens": t["cache_creation_input_tokens"],
+            "cache_read_input_tokens": t["cache_read_input_tokens"],
+            "latency_avg_ms": round(t["latency_ms_sum"] / timed_calls) if timed_calls else None,
+            "latency_p50_ms": _hist_percentile(t["latency_hist"], 0.5),
+            "latency_p95_ms": _hist_percentile(t["latency_hist"], 0.95),
+            "ttft_avg_ms": round(t["ttft_ms_sum"] / t["ttft_count"]) if t["ttft_count"] else None,
+            "ttft_p50_ms": _hist_percentile(t["ttft_hist"], 0.5),
+            "ttft_p95_ms": _hist_percentile(t["ttft_hist"], 0.95),
+            "cost_usd": round(t["cost_usd"], 4),
+            "cost_per_call_usd": round(t["cost_usd"] / t["calls"], 5) if t["calls"] else None,
+        })
+    return results
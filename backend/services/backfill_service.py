@@ -0,0 +1,327 @@
+"""
+バックフィルサービス
+プロンプトやモデルを変更した後に、過去の日次分析・ジャーナル分析・週次分析を
+Anthropic Message Batches API でまとめて再生成する。
+
+1. 期間内の対象データを一括取得し、Batch リクエストを組み立てて送信
+2. backfill_jobs/{batch_id} に custom_id → 保存先の対応表を記録
+3. 処理完了をポーリングし、結果を WriteBatch でまとめて書き込む
+
+Batch API は通常呼び出しの約半額で、リクエストハンドラを占有しない。
+ローカル検証時は ANTHROPIC_BASE_URL を tools/mock_anthropic_server.py に向ける。
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from models.schemas import DailyAnalysisOutput, WeeklyAnalysisContent
+from models.journal_schemas import JournalAnalysis
+from services import firestore_service, claude_service, ai_metrics
+from utils import anomaly
+from utils.helpers import now_jst, week_id_to_dates
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_KINDS = ("daily", "journal", "weekly")
+# テレメトリ上のプロンプト種別（通常呼び出しと同じ名前に "_batch" を付ける）
+_PROMPT_TYPES = {
+    "daily": "daily_analysis_batch",
+    "journal": "journal_analysis_batch",
+    "weekly": "weekly_analysis_batch",
+}
+# 結果の検証に使う出力スキーマ（リクエスト側の tool schema と同じモデル）
+_OUTPUT_MODELS = {
+    "daily": DailyAnalysisOutput,
+    "journal": JournalAnalysis,
+    "weekly": WeeklyAnalysisContent,
+}
+PAST_DAYS = 7
+POLL_INTERVAL = 30  # seconds
+MAX_WAIT = 24 * 60 * 60  # Batch の処理期限（24時間）
+
+
+def _shift(date: str, days: int) -> str:
+    dt = datetime.strptime(date, "%Y-%m-%d")
+    return (dt + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def _is_analyzable(record: dict) -> bool:
+    """おやすみ日と記録の少ない日を除外する（analysis / weekly ルーターと同じ基準）"""
+    return not record.get("rest_day") and len(record.get("parsed_activities", [])) >= 1
+
+
+# ---- リクエスト組み立て ----
+
+def _collect_daily(start_date: str, end_date: str) -> tuple[list[dict], dict[str, dict]]:
+    """日次分析の Batch リクエストを組み立てる（過去7日分も含めて一括取得）"""
+    fetch_start = _shift(start_date, -PAST_DAYS)
+    records = firestore_service.list_records(start_date=fetch_start, end_date=end_date)
+    analyses = firestore_service.list_analyses(start_date=fetch_start, end_date=end_date)
+
+    analyzable = [r for r in records if _is_analyzable(r)]
+    anomaly_state = firestore_service.get_anomaly_state()
+
+    requests: list[dict] = []
+    targets: dict[str, dict] = {}
+    for record in records:
+        date = record.get("date", "")
+        if date < start_date or record.get("rest_day"):
+            continue
+        past_days = firestore_service.build_past_days(date, analyzable, analyses)
+        custom_id = f"daily-{date}"
+        requests.append({
+            "custom_id": custom_id,
+            "params": claude_service.build_daily_analysis_request(
+                record, past_days, anomaly.format_facts(anomaly_state, date),
+            ),
+        })
+        # summary の時間は AI に出力させないため、計算済みの値を書き込み時まで持っておく
+        targets[custom_id] = {"date": date, "hours": claude_service.daily_summary_hours(record)}
+    return requests, targets
+
+
+def _collect_journal(start_date: str, end_date: str) -> tuple[list[dict], dict[str, dict]]:
+    """ジャーナル分析の Batch リクエストを組み立てる"""
+    entries = firestore_service.list_journals(start_date=start_date, end_date=end_date)
+    records = {r["date"]: r for r in firestore_service.list_records(start_date=start_date, end_date=end_date)}
+    analyses = {a["date"]: a for a in firestore_service.list_analyses(start_date=start_date, end_date=end_date)}
+
+    requests: list[dict] = []
+    targets: dict[str, dict] = {}
+    for entry in entries:
+        content = entry.get("content", "")
+        if not content.strip():
+            continue
+        date = entry.get("date", "")
+        # custom_id は英数字・_・- のみ許可されるため、エントリID（{date}#{n}）ではなく日付とエントリ番号で作る
+        custom_id = f"journal-{date}-{entry.get('entry_number', 1)}"
+        requests.append({
+            "custom_id": custom_id,
+            "params": claude_service.build_journal_analysis_request(
+                content, date, records.get(date), analyses.get(date),
+            ),
+        })
+        targets[custom_id] = {"entry_id": entry["id"]}
+    return requests, targets
+
+
+def _week_ids_in_range(start_date: str, end_date: str) -> list[str]:
+    """期間に含まれる ISO 週 ID を昇順で返す"""
+    dt = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    week_ids: list[str] = []
+    while dt <= end:
+        week_id = dt.strftime("%G-W%V")
+        if week_id not in week_ids:
+            week_ids.append(week_id)
+        dt += timedelta(days=1)
+    return week_ids
+
+
+def _collect_weekly(start_date: str, end_date: str) -> tuple[list[dict], dict[str, dict]]:
+    """週次分析の Batch リクエストを組み立てる"""
+    week_ids = _week_ids_in_range(start_date, end_date)
+    first_start, _ = week_id_to_dates(week_ids[0])
+    _, last_end = week_id_to_dates(week_ids[-1])
+    records = firestore_service.list_records(start_date=first_start, end_date=last_end)
+    analyses = firestore_service.list_analyses(start_date=first_start, end_date=last_end)
+
+    requests: list[dict] = []
+    targets: dict[str, dict] = {}
+    for week_id in week_ids:
+        week_start, week_end = week_id_to_dates(week_id)
+        daily_records = [
+            r for r in records
+            if week_start <= r.get("date", "") <= week_end and _is_analyzable(r)
+        ]
+        if not daily_records:
+            continue
+        daily_analyses = [a for a in analyses if week_start <= a.get("date", "") <= week_end]
+        last_week_id = (datetime.strptime(week_start, "%Y-%m-%d") - timedelta(days=7)).strftime("%G-W%V")
+        custom_id = f"weekly-{week_id}"
+        requests.append({
+            "custom_id": custom_id,
+            "params": claude_service.build_weekly_analysis_request(
+                week_id, daily_records, daily_analyses,
+                firestore_service.get_weekly_analysis(last_week_id),
+            ),
+        })
+        targets[custom_id] = {"week_id": week_id, "week_start": week_start, "week_end": week_end}
+    return requests, targets
+
+
+_COLLECTORS = {
+    "daily": _collect_daily,
+    "journal": _collect_journal,
+    "weekly": _collect_weekly,
+}
+
+
+# ---- 送信・ポーリング ----
+
+def submit_backfill(kind: str, start_date: str, end_date: str) -> dict:
+    """
+    期間内の対象を 1 つの Message Batch として送信し、ジョブドキュメントを返す
+
+    Raises:
+        ValueError: kind が不正、または対象データが無い場合
+    """
+    if kind not in _COLLECTORS:
+        raise ValueError(f"kind は {', '.join(BACKFILL_KINDS)} のいずれかを指定してください")
+
+    requests, targets = _COLLECTORS[kind](start_date, end_date)
+    if not requests:
+        raise ValueError(f"{start_date}〜{end_date} にバックフィル対象のデータがありません")
+
+    client = claude_service.get_client()
+    batch = client.messages.batches.create(requests=requests)
+    logger.info("バックフィル送信: kind=%s batch=%s 件数=%d", kind, batch.id, len(requests))
+
+    now = now_jst()
+    job = {
+        "id": batch.id,
+        "kind": kind,
+        "start_date": start_date,
+        "end_date": end_date,
+        "status": "submitted",
+        "request_count": len(requests),
+        "targets": targets,
+        "succeeded": 0,
+        "errored": 0,
+        "written": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    firestore_service.save_backfill_job(batch.id, job)
+    return job
+
+
+def refresh_backfill(batch_id: str) -> dict | None:
+    """
+    Batch の処理状況を確認し、完了していれば結果を書き込んでジョブを返す
+    既に適用済みのジョブはそのまま返す
+    """
+    job = firestore_service.get_backfill_job(batch_id)
+    if not job or job.get("status") != "submitted":
+        return job
+
+    client = claude_service.get_client()
+    batch = client.messages.batches.retrieve(batch_id)
+    if batch.processing_status != "ended":
+        job["processing_status"] = batch.processing_status
+        return job
+
+    return _apply_results(client, job)
+
+
+def wait_and_apply(batch_id: str, poll_interval: int = POLL_INTERVAL) -> dict | None:
+    """Batch の完了をポーリングで待ち、結果を書き込む（BackgroundTasks / CLI 用）"""
+    deadline = time.monotonic() + MAX_WAIT
+    while time.monotonic() < deadline:
+        try:
+            job = refresh_backfill(batch_id)
+        except Exception as e:
+            logger.warning("バックフィル %s の状態確認に失敗: %s", batch_id, e)
+            job = firestore_service.get_backfill_job(batch_id)
+        if not job or job.get("status") != "submitted":
+            return job
+        time.sleep(poll_interval)
+    logger.warning("バックフィル %s が期限内に完了しませんでした", batch_id)
+    return firestore_service.get_backfill_job(batch_id)
+
+
+# ---- 結果の書き込み ----
+
+def _build_write(kind: str, target: dict, data: dict, now: str) -> tuple[str, str, dict, bool]:
+    """結果 1 件を (collection, doc_id, data, merge) に変換する（各ルーターの保存形式と同じ）"""
+    if kind == "daily":
+        date = target["date"]
+        data = claude_service.complete_daily_analysis(data, target.get("hours") or {})
+        return ("daily_analyses", date, {
+            "id": date,
+            "date": date,
+            "summary": data.get("summary", {}),
+            "analysis": data.get("analysis", {}),
+            "created_at": now,
+        }, False)
+    if kind == "journal":
+        return ("journal_entries", target["entry_id"], {
+            "ai_analysis": data,
+            "is_analyzed": True,
+            "updated_at": now,
+        }, True)
+    week_id = target["week_id"]
+    return ("weekly_analyses", week_id, {
+        "id": week_id,
+        "week_id": week_id,
+        "week_start": target["week_start"],
+        "week_end": target["week_end"],
+        "weekly_summary": data.get("weekly_summary", {}),
+        "deep_analysis": data.get("deep_analysis", {}),
+        "created_at": now,
+    }, False)
+
+
+def _apply_results(client, job: dict) -> dict:
+    """完了した Batch の結果をまとめて Firestore に書き込む"""
+    kind = job["kind"]
+    targets = job.get("targets", {})
+    now = now_jst()
+
+    writes: list[tuple[str, str, dict, bool]] = []
+    errors: list[str] = []
+    usage_total: dict[str, int] = {}
+    model = ""
+    for item in client.messages.batches.results(job["id"]):
+        target = targets.get(item.custom_id)
+        if target is None:
+            continue
+        if item.result.type != "succeeded":
+            errors.append(f"{item.custom_id}: {item.result.type}")
+            continue
+        model = item.result.message.model
+        for key, value in ai_metrics.usage_to_dict(item.result.message.usage).items():
+            usage_total[key] = usage_total.get(key, 0) + value
+        try:
+            data = claude_service.parse_structured(item.result.message, _OUTPUT_MODELS[kind])
+        except ValueError as e:
+            errors.append(f"{item.custom_id}: {e}")
+            continue
+        writes.append(_build_write(kind, target, data, now))
+
+    written = firestore_service.bulk_write(writes)
+    if usage_total:
+        ai_metrics.record_call(
+            _PROMPT_TYPES[kind], model, usage_total, batch=True, calls=len(writes) + len(errors),
+        )
+    logger.info(
+        "バックフィル適用: batch=%s 書き込み=%d エラー=%d", job["id"], written, len(errors),
+    )
+
+    job.update({
+        "status": "completed",
+        "processing_status": "ended",
+        "succeeded": len(writes),
+        "errored": len(errors),
+        "errors": errors[:50],
+        "written": written,
+        "updated_at": now_jst(),
+    })
+    firestore_service.save_backfill_job(job["id"], job)
+    return job
+
+
+if __name__ == "__main__":
+    # 使い方: python -m services.backfill_service daily 2026-01-01 2026-02-28
+    import sys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 4:
+        print("usage: python -m services.backfill_service <daily|journal|weekly> <start_date> <end_date>")
+        sys.exit(2)
+    submitted = submit_backfill(sys.argv[1], sys.argv[2], sys.argv[3])
+    result = wait_and_apply(submitted["id"])
+    print(result and {k: v for k, v in result.items() if k != "targets"})
@@ -7,22 +7,34 @@ import os
 import json
 import time
 import logging
+from functools import lru_cache
+
 import anthropic
+from pydantic import BaseModel
+
+from models.schemas import (
+    DailyAnalysisContent, DailyAnalysisOutput, AnalysisDetail, WeeklyAnalysisContent, WeeklyDeepAnalysis,
+    MorningPlan, DiarySynthesis,
+)
+from models.journal_schemas import JournalAnalysis, WeeklyJournalDigestContent
+from services import ai_guard, ai_metrics, model_router
+from utils import activity_parser, time_accounting
+from utils.partial_json import PartialJSONSections
 from prompts.daily_analysis import DAILY_ANALYSIS_SYSTEM_PROMPT, build_daily_analysis_prompt
 from prompts.weekly_analysis import WEEKLY_ANALYSIS_SYSTEM_PROMPT, build_weekly_analysis_prompt
 from prompts.socratic_dialogue import (
     SOCRATIC_QUESTION_SYSTEM_PROMPT, build_socratic_question_prompt,
-    SOCRATIC_FOLLOWUP_SYSTEM_PROMPT, build_socratic_followup_prompt,
+    SOCRATIC_FOLLOWUP_SYSTEM_PROMPT, build_socratic_followup_messages,
     SOCRATIC_SYNTHESIS_SYSTEM_PROMPT, build_socratic_synthesis_prompt,
 )
 from prompts.morning_planning import (
     MORNING_QUESTION_SYSTEM_PROMPT, build_morning_question_prompt,
-    MORNING_FOLLOWUP_SYSTEM_PROMPT, build_morning_followup_prompt,
+    MORNING_FOLLOWUP_SYSTEM_PROMPT, build_morning_followup_messages,
     MORNING_SYNTHESIS_SYSTEM_PROMPT, build_morning_synthesis_prompt,
 )
 from prompts.diary_dialogue import (
     DIARY_QUESTION_SYSTEM_PROMPT, build_diary_question_prompt,
-    DIARY_FOLLOWUP_SYSTEM_PROMPT, build_diary_followup_prompt,
+    DIARY_FOLLOWUP_SYSTEM_PROMPT, build_diary_followup_messages,
     DIARY_SYNTHESIS_SYSTEM_PROMPT, build_diary_synthesis_prompt,
 )
 from prompts.journal_analysis import (
@@ -37,24 +49,57 @@ INITIAL_BACKOFF = 2  # seconds
 
 
 def get_client() -> anthropic.Anthropic:
-    """Anthropic クライアントを返す"""
-    return anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    """
+    Anthropic クライアントを返す（リトライは SDK ではなく _call_claude_with_retry と ai_guard で行う）
+    ANTHROPIC_BASE_URL を設定すると呼び出し先を tools/mock_anthropic_server.py などに差し替えられる。
+    """
+    return anthropic.Anthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        base_url=os.getenv("ANTHROPIC_BASE_URL") or None,
+        max_retries=0,
+    )
 
 
 RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 529}
 
 
-def _call_claude_with_retry(client, **kwargs):
+def _call_claude_with_retry(client, prompt_type: str = "unknown", **kwargs):
     """
     Claude API をリトライ付きで呼び出す。
-    overloaded(529) / rate_limit(429) / 5xx エラー時に指数バックオフでリトライ。
+    各試行は ai_guard の枠（同時実行数・共有レート・サーキットブレーカー）を通す。
+    overloaded(529) / rate_limit(429) は回路を開き、retry-after まで回路側で待ってリトライ。
+    その他の 5xx・接続エラーは指数バックオフでリトライ。
+    呼び出しごとにトークン数・TTFT・レイテンシ・リトライ回数を ai_metrics に記録する。
+
+    Raises:
+        ai_guard.AIUnavailableError: 回路が開いていて待ち時間が長いとき
     """
+    model = kwargs.get("model", "")
+    started = time.monotonic()
     for attempt in range(MAX_RETRIES):
         try:
-            with client.messages.stream(**kwargs) as stream:
-                return stream.get_final_message()
+            with ai_guard.slot(model):
+                attempt_started = time.monotonic()
+                ttft_ms = None
+                with client.messages.stream(**kwargs) as stream:
+                    for event in stream:
+                        if ttft_ms is None and event.type == "content_block_delta":
+                            ttft_ms = (time.monotonic() - attempt_started) * 1000
+                    message = stream.get_final_message()
+            ai_guard.report_success(model)
+            ai_metrics.record_call(
+                prompt_type, model, ai_metrics.usage_to_dict(message.usage),
+                latency_ms=(time.monotonic() - started) * 1000,
+                ttft_ms=ttft_ms,
+                retries=attempt,
+            )
+            return message
+        except ai_guard.AIUnavailableError as e:
+            _record_failure(prompt_type, model, started, attempt, e)
+            raise
         except anthropic.APIConnectionError as e:
             if attempt == MAX_RETRIES - 1:
+                _record_failure(prompt_type, model, started, attempt, e)
                 raise
             wait = INITIAL_BACKOFF * (2 ** attempt)
             logger.warning(
@@ -64,9 +109,21 @@ def _call_claude_with_retry(client, **kwargs):
             time.sleep(wait)
         except anthropic.APIStatusError as e:
             if e.status_code not in RETRYABLE_STATUS_CODES:
+                _record_failure(prompt_type, model, started, attempt, e)
                 raise
+            overloaded = e.status_code in ai_guard.OVERLOAD_STATUS_CODES
+            if overloaded:
+                ai_guard.report_overload(model, e)
             if attempt == MAX_RETRIES - 1:
+                _record_failure(prompt_type, model, started, attempt, e)
                 raise
+            if overloaded:
+                # 待ちは次の ai_guard.slot に任せる（回路が閉じるまで待つか、長ければ 503）
+                logger.warning(
+                    "Claude API HTTP %d エラー (attempt %d/%d): %s. 回路が閉じてからリトライ...",
+                    e.status_code, attempt + 1, MAX_RETRIES, e,
+                )
+                continue
             wait = INITIAL_BACKOFF * (2 ** attempt)
             logger.warning(
                 "Claude API HTTP %d エラー (attempt %d/%d): %s. %d秒後にリトライ...",
@@ -75,10 +132,211 @@ def _call_claude_with_retry(client, **kwargs):
             time.sleep(wait)
 
 
+# ストリーミング時に逐次返すセクション（画面のカード単位）
+DAILY_STREAM_SECTIONS = {("summary",)} | {("analysis", k) for k in AnalysisDetail.model_fields}
+WEEKLY_STREAM_SECTIONS = {("weekly_summary",)} | {("deep_analysis", k) for k in WeeklyDeepAnalysis.model_fields}
+
+
+def _stream_structured(
+    client, prompt_type: str, output_model: type[BaseModel], sections: set[tuple[str, ...]], **kwargs,
+):
+    """
+    構造化出力をストリーミングで生成するジェネレーター
+    tool_use の入力 JSON を逐次解析し、sections に含まれるパスの値が確定した順に返す
+
+    Yields:
+        ("section", path, value)  セクション（path はキーのタプル）が確定するたび
+        ("result", (), data)      最後に、スキーマ検証済みの全体
+    リトライは最初のセクションを返す前の失敗に限る（途中まで送った内容と矛盾させないため）
+    """
+    model = kwargs.get("model", "")
+    started = time.monotonic()
+    for attempt in range(MAX_RETRIES):
+        parser = PartialJSONSections()
+        emitted = False
+        try:
+            attempt_started = time.monotonic()
+            ttft_ms = None
+            with ai_guard.slot(model), client.messages.stream(**kwargs) as stream:
+                for event in stream:
+                    if event.type != "content_block_delta":
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.monotonic() - attempt_started) * 1000
+                    if event.delta.type == "input_json_delta":
+                        for path, value in parser.feed(event.delta.partial_json):
+                            if path in sections:
+                                emitted = True
+                                yield ("section", path, value)
+                message = stream.get_final_message()
+            ai_guard.report_success(model)
+            ai_metrics.record_call(
+                prompt_type, model, ai_metrics.usage_to_dict(message.usage),
+                latency_ms=(time.monotonic() - started) * 1000,
+                ttft_ms=ttft_ms,
+                retries=attempt,
+            )
+            yield ("result", (), parse_structured(message, output_model))
+            return
+        except ai_guard.AIUnavailableError as e:
+            _record_failure(prompt_type, model, started, attempt, e)
+            raise
+        except (anthropic.APIConnectionError, anthropic.APIStatusError) as e:
+            status = getattr(e, "status_code", None)
+            retryable = status is None or status in RETRYABLE_STATUS_CODES
+            overloaded = status in ai_guard.OVERLOAD_STATUS_CODES
+            if overloaded:
+                ai_guard.report_overload(model, e)
+            if emitted or not retryable or attempt == MAX_RETRIES - 1:
+                _record_failure(prompt_type, model, started, attempt, e)
+                raise
+            # 過負荷の待ちは次の ai_guard.slot に任せる
+            wait = 0 if overloaded else INITIAL_BACKOFF * (2 ** attempt)
+            logger.warning(
+                "Claude API ストリーミングエラー (attempt %d/%d): %s. %d秒後にリトライ...",
+                attempt + 1, MAX_RETRIES, e, wait,
+            )
+            time.sleep(wait)
+
+
+def _record_failure(prompt_type: str, model: str, started: float, attempt: int, error: Exception):
+    """失敗した呼び出しをテレメトリに記録する"""
+    status = getattr(error, "status_code", None)
+    ai_metrics.record_call(
+        prompt_type, model, {},
+        latency_ms=(time.monotonic() - started) * 1000,
+        retries=attempt,
+        error=f"HTTP {status}" if status else type(error).__name__,
+    )
+
+
+def _call_routed(client, prompt_type: str, standard_model: str, parse, **kwargs):
+    """
+    ルーティング表に従ってモデルを選んで呼び出し、parse で検証・変換した結果を返す
+    軽量モデルの出力で parse が ValueError を出した場合は standard_model で 1 回だけやり直す
+    """
+    model = model_router.select_model(prompt_type, standard_model)
+    response = _call_claude_with_retry(client, prompt_type=prompt_type, model=model, **kwargs)
+    try:
+        result = parse(response)
+    except ValueError as e:
+        if model == standard_model:
+            model_router.log_decision(prompt_type, model, "failed", str(e)[:200])
+            raise
+        model_router.log_decision(prompt_type, model, "escalated", str(e)[:200])
+        response = _call_claude_with_retry(client, prompt_type=prompt_type, model=standard_model, **kwargs)
+        try:
+            result = parse(response)
+        except ValueError as e2:
+            model_router.log_decision(prompt_type, standard_model, "failed", str(e2)[:200])
+            raise
+        model_router.log_decision(prompt_type, standard_model, "ok")
+        return result
+    model_router.log_decision(prompt_type, model, "ok")
+    return result
+
+
+# ---- 構造化出力（tool use） ----
+
+def _inline_refs(node, defs: dict):
+    """Pydantic が出力する $ref / $defs を展開し、required を全必須フィールドに広げる"""
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _inline_refs(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+    result = {k: _inline_refs(v, defs) for k, v in node.items() if k not in ("$defs", "title")}
+    if result.get("type") == "object" and "properties" in result:
+        # Optional（default=None）以外はすべて出力させる
+        result["required"] = [
+            name for name, prop in result["properties"].items()
+            if not ("default" in prop and prop["default"] is None)
+        ]
+    return result
+
+
+@lru_cache(maxsize=None)
+def _output_tool(output_model: type[BaseModel]) -> dict:
+    """出力スキーマ（Pydantic モデル）から tool 定義を生成する"""
+    schema = output_model.model_json_schema()
+    schema.pop("description", None)
+    return {
+        "name": output_model.__name__,
+        "description": "生成した結果をこのスキーマに沿って返す",
+        "input_schema": _inline_refs(schema, schema.get("$defs", {})),
+    }
+
+
+def _structured_params(output_model: type[BaseModel]) -> dict:
+    """tools / tool_choice パラメータを返す（指定ツールの呼び出しを強制する）"""
+    tool = _output_tool(output_model)
+    return {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}}
+
+
+def parse_structured(message, output_model: type[BaseModel]) -> dict:
+    """
+    tool_use ブロックの入力を出力スキーマで検証して辞書で返す
+    tool_use が無い応答（旧形式）はテキストから JSON を抽出して検証する
+
+    Raises:
+        ValueError: スキーマに合わない場合（pydantic.ValidationError は ValueError のサブクラス）
+    """
+    data = next(
+        (b.input for b in message.content if getattr(b, "type", None) == "tool_use"),
+        None,
+    )
+    if data is None:
+        text = "".join(getattr(b, "text", "") for b in message.content)
+        data = _extract_json(text)
+    return output_model.model_validate(data).model_dump()
+
+
+def build_daily_analysis_request(
+    record: dict,
+    past_days: list[dict] = None,
+    anomaly_facts: str = "",
+) -> dict:
+    """
+    日次分析の Messages API リクエストパラメータを構築する
+    通常呼び出しと Message Batches（バックフィル）で同じパラメータを使う
+    """
+    model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
+
+    screen_time = record.get("screen_time")
+    user_prompt = build_daily_analysis_prompt(
+        record=record,
+        screen_time=screen_time,
+        past_days=past_days or [],
+        time_facts=time_accounting.format_facts(time_accounting.for_record(record), screen_time),
+        anomaly_facts=anomaly_facts,
+    )
+
+    return {
+        "model": model,
+        "max_tokens": 4096,
+        "system": DAILY_ANALYSIS_SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": user_prompt}],
+        **_structured_params(DailyAnalysisOutput),
+    }
+
+
+def daily_summary_hours(record: dict) -> dict:
+    """日次分析 summary の時間（行動記録から計算した値。時刻が不整合で計算できなければ空で、AI の推定を使う）"""
+    return time_accounting.summary_hours(time_accounting.for_record(record), record.get("screen_time"))
+
+
+def complete_daily_analysis(data: dict, hours: dict) -> dict:
+    """AI 出力（DailyAnalysisOutput）に計算済みの時間を加えて保存形式（DailyAnalysisContent）にする"""
+    summary = {k: v for k, v in (data.get("summary") or {}).items() if v is not None}
+    merged = {**data, "summary": {**summary, **hours}}
+    return DailyAnalysisContent.model_validate(merged).model_dump()
+
+
 def generate_daily_analysis(
     record: dict,
-    past_records: list[dict] = None,
-    past_analyses: list[dict] = None,
+    past_days: list[dict] = None,
+    anomaly_facts: str = "",
 ) -> dict:
     """
     日次分析を生成する
@@ -86,42 +344,51 @@ def generate_daily_analysis(
 
     Args:
         record: 当日の行動記録
-        past_records: 過去の行動記録リスト
-        past_analyses: 過去の分析結果リスト
+        past_days: 過去の日ごとの要約リスト（firestore_service.get_past_days）
+        anomaly_facts: 過去の日次スコアの異常検知の結果（anomaly.format_facts）
 
     Returns:
         分析結果の辞書
     """
     client = get_client()
-    model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
-
-    screen_time = record.get("screen_time")
-    user_prompt = build_daily_analysis_prompt(
-        record=record,
-        screen_time=screen_time,
-        past_records=past_records or [],
-        past_analyses=past_analyses or [],
-    )
+    params = build_daily_analysis_request(record, past_days, anomaly_facts)
 
     # リトライ付きで呼び出し（overloaded / rate_limit 対策）
-    response = _call_claude_with_retry(
-        client,
-        model=model,
-        max_tokens=4096,
-        system=DAILY_ANALYSIS_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
-    )
+    response = _call_claude_with_retry(client, prompt_type="daily_analysis", **params)
 
-    raw_text = response.content[0].text
+    return complete_daily_analysis(parse_structured(response, DailyAnalysisOutput), daily_summary_hours(record))
 
-    # JSON ブロックを抽出してパース
-    analysis_data = _extract_json(raw_text)
-    return analysis_data
+
+def stream_daily_analysis(
+    record: dict,
+    past_days: list[dict] = None,
+    anomaly_facts: str = "",
+):
+    """
+    日次分析をストリーミングで生成する
+    summary / good_points / improvement_suggestions などのセクションが確定するたびに返す
+    （イベント形式は _stream_structured を参照）
+    """
+    client = get_client()
+    params = build_daily_analysis_request(record, past_days, anomaly_facts)
+    hours = daily_summary_hours(record)
+    for kind, path, value in _stream_structured(
+        client, prompt_type="daily_analysis", output_model=DailyAnalysisOutput,
+        sections=DAILY_STREAM_SECTIONS, **params,
+    ):
+        # summary と最終結果には計算済みの時間を入れて返す（保存形式と同じにする）
+        if kind == "result":
+            value = complete_daily_analysis(value, hours)
+        elif path == ("summary",):
+            value = {**{k: v for k, v in value.items() if v is not None}, **hours}
+        yield (kind, path, value)
 
 
 def parse_activities(raw_input: str, date: str) -> list[dict]:
     """
     ユーザーの自由記述テキストから行動リストを構造化する
+    「HH:MM-HH:MM 行動」形式のタイムラインはローカルで構造化し、
+    カテゴリが決まらない行だけを Claude に送る（タイムラインとして読めない入力は全体を送る）
 
     Args:
         raw_input: ユーザーが入力した生テキスト
@@ -130,6 +397,22 @@ def parse_activities(raw_input: str, date: str) -> list[dict]:
     Returns:
         構造化された行動リスト
     """
+    local = activity_parser.parse_timeline(raw_input)
+    if local is not None:
+        activities, ambiguous = local
+        if not ambiguous:
+            logger.info("parse_activities: ローカルで %d 件を構造化（Claude 呼び出しなし）", len(activities))
+            return activities
+        logger.info(
+            "parse_activities: ローカルで %d 件を構造化、曖昧な %d 行を Claude で構造化",
+            len(activities), len(ambiguous),
+        )
+        return activity_parser.merge(activities, _parse_activities_with_claude("\n".join(ambiguous), date))
+    return _parse_activities_with_claude(raw_input, date)
+
+
+def _parse_activities_with_claude(raw_input: str, date: str) -> list[dict]:
+    """行動記録テキストを Claude で構造化する"""
     client = get_client()
     model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
 
@@ -159,9 +442,11 @@ is_productive:
 - 娯楽（1時間以内）→ true
 - 娯楽（1時間超）・無駄時間 → false"""
 
-    response = _call_claude_with_retry(
+    return _call_routed(
         client,
-        model=model,
+        prompt_type="parse_activities",
+        standard_model=model,
+        parse=_parse_activities_response,
         max_tokens=2048,
         system=system_prompt,
         messages=[
@@ -172,15 +457,43 @@ is_productive:
         ],
     )
 
-    raw_text = response.content[0].text
-    activities = _extract_json(raw_text)
 
-    # リストが返ってこない場合は空リストを返す
+def _parse_activities_response(response) -> list[dict]:
+    """行動リストの応答を検証する（リストでない・必須キーが無い場合は ValueError）"""
+    activities = _extract_json(response.content[0].text)
     if not isinstance(activities, list):
-        return []
+        raise ValueError("行動リストが JSON 配列ではありません")
+    for item in activities:
+        if not isinstance(item, dict) or not item.get("start_time") or not item.get("activity"):
+            raise ValueError(f"start_time / activity が欠けた要素があります: {str(item)[:100]}")
     return activities
 
 
+def build_weekly_analysis_request(
+    week_id: str,
+    daily_records: list[dict],
+    daily_analyses: list[dict],
+    last_week_analysis: dict | None = None,
+) -> dict:
+    """週次分析の Messages API リクエストパラメータを構築する"""
+    model = os.getenv("WEEKLY_ANALYSIS_MODEL", "claude-sonnet-4-6")
+
+    user_prompt = build_weekly_analysis_prompt(
+        week_id=week_id,
+        daily_records=daily_records,
+        daily_analyses=daily_analyses,
+        last_week_analysis=last_week_analysis,
+    )
+
+    return {
+        "model": model,
+        "max_tokens": 6144,
+        "system": WEEKLY_ANALYSIS_SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": user_prompt}],
+        **_structured_params(WeeklyAnalysisContent),
+    }
+
+
 def generate_weekly_analysis(
     week_id: str,
     daily_records: list[dict],
@@ -200,31 +513,35 @@ def generate_weekly_analysis(
         週次分析結果の辞書
     """
     client = get_client()
-    model = os.getenv("WEEKLY_ANALYSIS_MODEL", "claude-sonnet-4-6")
-
-    user_prompt = build_weekly_analysis_prompt(
-        week_id=week_id,
-        daily_records=daily_records,
-        daily_analyses=daily_analyses,
-        last_week_analysis=last_week_analysis,
+    params = build_weekly_analysis_request(
+        week_id, daily_records, daily_analyses, last_week_analysis,
     )
 
-    response = _call_claude_with_retry(
-        client,
-        model=model,
-        max_tokens=6144,
-        system=WEEKLY_ANALYSIS_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
-    )
+    response = _call_claude_with_retry(client, prompt_type="weekly_analysis", **params)
 
-    raw_text = response.content[0].text
-    return _extract_json(raw_text)
+    return parse_structured(response, WeeklyAnalysisContent)
+
+
+def stream_weekly_analysis(
+    week_id: str,
+    daily_records: list[dict],
+    daily_analyses: list[dict],
+    last_week_analysis: dict | None = None,
+):
+    """週次分析をストリーミングで生成する（イベント形式は _stream_structured を参照）"""
+    client = get_client()
+    params = build_weekly_analysis_request(
+        week_id, daily_records, daily_analyses, last_week_analysis,
+    )
+    yield from _stream_structured(
+        client, prompt_type="weekly_analysis", output_model=WeeklyAnalysisContent,
+        sections=WEEKLY_STREAM_SECTIONS, **params,
+    )
 
 
 def generate_socratic_questions(
     record: dict,
-    past_records: list[dict] = None,
-    past_analyses: list[dict] = None,
+    past_days: list[dict] = None,
 ) -> str:
     """ソクラテス式の振り返り質問を生成する（テキスト返却）"""
     client = get_client()
@@ -234,12 +551,12 @@ def generate_socratic_questions(
     user_prompt = build_socratic_question_prompt(
         record=record,
         screen_time=screen_time,
-        past_records=past_records or [],
-        past_analyses=past_analyses or [],
+        past_days=past_days or [],
     )
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="socratic_question",
         model=model,
         max_tokens=1024,
         system=SOCRATIC_QUESTION_SYSTEM_PROMPT,
@@ -259,7 +576,7 @@ def generate_socratic_followup(
     client = get_client()
     model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
 
-    user_prompt = build_socratic_followup_prompt(
+    dialogue_messages = build_socratic_followup_messages(
         record=record,
         messages=messages,
         turn_count=turn_count,
@@ -268,10 +585,11 @@ def generate_socratic_followup(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="socratic_followup",
         model=model,
         max_tokens=1024,
         system=SOCRATIC_FOLLOWUP_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
+        messages=dialogue_messages,
     )
 
     return response.content[0].text
@@ -280,8 +598,7 @@ def generate_socratic_followup(
 def generate_dialogue_synthesis(
     record: dict,
     messages: list[dict],
-    past_records: list[dict] = None,
-    past_analyses: list[dict] = None,
+    past_days: list[dict] = None,
 ) -> dict:
     """対話＋データから共創された分析を生成する（JSON返却）"""
     client = get_client()
@@ -292,20 +609,21 @@ def generate_dialogue_synthesis(
         record=record,
         messages=messages,
         screen_time=screen_time,
-        past_records=past_records or [],
-        past_analyses=past_analyses or [],
+        past_days=past_days or [],
+        time_facts=time_accounting.format_facts(time_accounting.for_record(record), screen_time),
     )
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="socratic_synthesis",
         model=model,
         max_tokens=4096,
         system=SOCRATIC_SYNTHESIS_SYSTEM_PROMPT,
         messages=[{"role": "user", "content": user_prompt}],
+        **_structured_params(DailyAnalysisOutput),
     )
 
-    raw_text = response.content[0].text
-    return _extract_json(raw_text)
+    return complete_daily_analysis(parse_structured(response, DailyAnalysisOutput), daily_summary_hours(record))
 
 
 def generate_morning_questions(
@@ -314,6 +632,7 @@ def generate_morning_questions(
     incomplete_tasks: list[str] = None,
     active_goals: list[dict] = None,
     backlog_tasks: list[str] = None,
+    anomaly_facts: str = "",
 ) -> str:
     """朝のプランニング問答の初期質問を生成する（テキスト返却）"""
     client = get_client()
@@ -325,10 +644,12 @@ def generate_morning_questions(
         incomplete_tasks=incomplete_tasks or [],
         active_goals=active_goals or [],
         backlog_tasks=backlog_tasks or [],
+        anomaly_facts=anomaly_facts,
     )
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="morning_question",
         model=model,
         max_tokens=1024,
         system=MORNING_QUESTION_SYSTEM_PROMPT,
@@ -350,7 +671,7 @@ def generate_morning_followup(
     client = get_client()
     model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
 
-    user_prompt = build_morning_followup_prompt(
+    dialogue_messages = build_morning_followup_messages(
         yesterday_record=yesterday_record,
         yesterday_analysis=yesterday_analysis,
         incomplete_tasks=incomplete_tasks,
@@ -361,10 +682,11 @@ def generate_morning_followup(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="morning_followup",
         model=model,
         max_tokens=1024,
         system=MORNING_FOLLOWUP_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
+        messages=dialogue_messages,
     )
 
     return response.content[0].text
@@ -389,14 +711,15 @@ def generate_morning_synthesis(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="morning_synthesis",
         model=model,
         max_tokens=4096,
         system=MORNING_SYNTHESIS_SYSTEM_PROMPT,
         messages=[{"role": "user", "content": user_prompt}],
+        **_structured_params(MorningPlan),
     )
 
-    raw_text = response.content[0].text
-    return _extract_json(raw_text)
+    return parse_structured(response, MorningPlan)
 
 
 def generate_diary_questions(date: str) -> str:
@@ -408,6 +731,7 @@ def generate_diary_questions(date: str) -> str:
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="diary_question",
         model=model,
         max_tokens=1024,
         system=DIARY_QUESTION_SYSTEM_PROMPT,
@@ -427,7 +751,7 @@ def generate_diary_followup(
     client = get_client()
     model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
 
-    user_prompt = build_diary_followup_prompt(
+    dialogue_messages = build_diary_followup_messages(
         date=date,
         messages=messages,
         turn_count=turn_count,
@@ -436,10 +760,11 @@ def generate_diary_followup(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="diary_followup",
         model=model,
         max_tokens=1024,
         system=DIARY_FOLLOWUP_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
+        messages=dialogue_messages,
     )
 
     return response.content[0].text
@@ -460,26 +785,24 @@ def generate_diary_synthesis(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="diary_synthesis",
         model=model,
         max_tokens=4096,
         system=DIARY_SYNTHESIS_SYSTEM_PROMPT,
         messages=[{"role": "user", "content": user_prompt}],
+        **_structured_params(DiarySynthesis),
     )
 
-    raw_text = response.content[0].text
-    return _extract_json(raw_text)
+    return parse_structured(response, DiarySynthesis)
 
 
-def analyze_journal_entry(
+def build_journal_analysis_request(
     content: str,
     date: str,
     daily_record: dict | None = None,
     daily_analysis: dict | None = None,
 ) -> dict:
-    """
-    ジャーナルエントリを分析し、感情タグ・ブロッカー等を返す
-    """
-    client = get_client()
+    """ジャーナル分析の Messages API リクエストパラメータを構築する"""
     model = os.getenv("DAILY_ANALYSIS_MODEL", "claude-sonnet-4-6")
 
     user_prompt = build_journal_analysis_prompt(
@@ -489,15 +812,30 @@ def analyze_journal_entry(
         daily_analysis=daily_analysis,
     )
 
-    response = _call_claude_with_retry(
-        client,
-        model=model,
-        max_tokens=4096,
-        system=JOURNAL_ANALYSIS_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_prompt}],
-    )
+    return {
+        "model": model,
+        "max_tokens": 4096,
+        "system": JOURNAL_ANALYSIS_SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": user_prompt}],
+        **_structured_params(JournalAnalysis),
+    }
 
-    return _extract_json(response.content[0].text)
+
+def analyze_journal_entry(
+    content: str,
+    date: str,
+    daily_record: dict | None = None,
+    daily_analysis: dict | None = None,
+) -> dict:
+    """
+    ジャーナルエントリを分析し、感情タグ・ブロッカー等を返す
+    """
+    client = get_client()
+    params = build_journal_analysis_request(content, date, daily_record, daily_analysis)
+
+    response = _call_claude_with_retry(client, prompt_type="journal_analysis", **params)
+
+    return parse_structured(response, JournalAnalysis)
 
 
 def summarize_journal_as_markdown(content: str) -> str:
@@ -517,6 +855,7 @@ def summarize_journal_as_markdown(content: str) -> str:
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="journal_markdown",
         model=model,
         max_tokens=2048,
         system=system_prompt,
@@ -545,13 +884,15 @@ def generate_weekly_journal_digest(
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="weekly_journal_digest",
         model=model,
         max_tokens=4096,
         system=WEEKLY_JOURNAL_DIGEST_SYSTEM_PROMPT,
         messages=[{"role": "user", "content": user_prompt}],
+        **_structured_params(WeeklyJournalDigestContent),
     )
 
-    return _extract_json(response.content[0].text)
+    return parse_structured(response, WeeklyJournalDigestContent)
 
 
 def summarize_braindump_as_markdown(content: str) -> str:
@@ -576,6 +917,7 @@ def summarize_braindump_as_markdown(content: str) -> str:
 
     response = _call_claude_with_retry(
         client,
+        prompt_type="braindump_markdown",
         model=model,
         max_tokens=4096,
         system=system_prompt,
@@ -599,15 +941,23 @@ def generate_braindump_title(content: str) -> str:
         "日本語で出力してください。"
     )
 
-    response = _call_claude_with_retry(
+    return _call_routed(
         client,
-        model=model,
+        prompt_type="braindump_title",
+        standard_model=model,
+        parse=_parse_title_response,
         max_tokens=64,
         system=system_prompt,
         messages=[{"role": "user", "content": content[:500]}],
     )
 
-    return response.content[0].text.strip()
+
+def _parse_title_response(response) -> str:
+    """タイトルの応答を検証する（空・複数行・長すぎる場合は ValueError）"""
+    title = response.content[0].text.strip().strip("「」\"'")
+    if not title or "\n" in title or len(title) > 30:
+        raise ValueError(f"タイトルとして不適切な応答です: {title[:50]}")
+    return title
 
 
 def _extract_json(text: str) -> dict | list:
@@ -639,16 +989,9 @@ def _extract_json(text: str) -> dict | list:
             text = text[i:]
             break
 
-    # 末尾の不完全なテキストを除去（閉じ括弧で終わるようにする）
-    # JSON が途中で切れている場合に対応
+    # 先頭の JSON 値だけをデコードし、末尾の余計なテキストは無視する
     try:
-        return json.loads(text)
+        data, _ = json.JSONDecoder().raw_decode(text)
     except json.JSONDecodeError:
-        # 末尾にゴミがある場合: 最後の } または ] を探す
-        for j in range(len(text) - 1, -1, -1):
-            if text[j] in ("}", "]"):
-                try:
-                    return json.loads(text[: j + 1])
-                except json.JSONDecodeError:
-                    continue
         raise ValueError(f"有効な JSON が見つかりません: {text[:200]}")
+    return data
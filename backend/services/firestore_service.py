@@ -3,12 +3,17 @@ Firestore サービス
 daily_records / daily_analyses コレクションの CRUD 操作を担当する
 """
 
+import hashlib
 import os
+import time
+import uuid
+from collections import Counter
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
 from typing import Optional
 
+from utils import anomaly, minhash, ngram_index
 from utils.helpers import now_jst
 
 # Firebase Admin SDK の初期化（初回のみ）
@@ -60,10 +65,30 @@ def list_records(start_date: Optional[str] = None, end_date: Optional[str] = Non
     return [doc.to_dict() for doc in query.stream()]
 
 
+# 履歴一覧で読むフィールド（parsed_activities など一覧に不要な大きいフィールドは読まない）
+HISTORY_RECORD_FIELDS = ["date", "raw_input", "rest_day", "rest_reason", "tasks.completion_rate"]
+
+
+def list_record_heads(limit: int, before: Optional[str] = None) -> list[dict]:
+    """行動記録を新しい順に limit 件、一覧用のフィールドだけ取得（before より前の日付のみ）"""
+    db = get_db()
+    query = (
+        db.collection("daily_records")
+        .select(HISTORY_RECORD_FIELDS)
+        .order_by("date", direction=firestore.Query.DESCENDING)
+    )
+    if before:
+        query = query.where(filter=FieldFilter("date", "<", before))
+    return [doc.to_dict() for doc in query.limit(limit).stream()]
+
+
 def create_record(date: str, data: dict) -> dict:
     """行動記録を作成"""
     db = get_db()
     db.collection("daily_records").document(date).set(data)
+    _update_context_digests(date, _digest_record_fields(data))
+    _update_task_stats(date, _task_stats_day_fields(data))
+    _update_task_ledger(date, None, data)
     return data
 
 
@@ -71,19 +96,29 @@ def update_record(date: str, data: dict) -> Optional[dict]:
     """行動記録を更新"""
     db = get_db()
     ref = db.collection("daily_records").document(date)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return None
     ref.update(data)
-    return ref.get().to_dict()
+    updated = ref.get().to_dict()
+    _update_context_digests(date, _digest_record_fields(updated))
+    if "tasks" in data:
+        _update_task_stats(date, _task_stats_day_fields(updated))
+        _update_task_ledger(date, before.to_dict(), updated)
+    return updated
 
 
 def delete_record(date: str) -> bool:
     """行動記録を削除"""
     db = get_db()
     ref = db.collection("daily_records").document(date)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return False
     ref.delete()
+    _update_context_digests(date, _digest_record_fields(None))
+    _update_task_stats(date, _task_stats_day_fields(None))
+    _update_task_ledger(date, before.to_dict(), None)
     return True
 
 
@@ -111,13 +146,52 @@ def list_analyses(start_date: Optional[str] = None, end_date: Optional[str] = No
     return [doc.to_dict() for doc in query.stream()]
 
 
+def list_analysis_summaries(start_date: str, end_date: str) -> list[dict]:
+    """期間の分析結果の date と summary だけを取得（本文の analysis は読まない）"""
+    db = get_db()
+    query = (
+        db.collection("daily_analyses")
+        .select(["date", "summary"])
+        .where(filter=FieldFilter("date", ">=", start_date))
+        .where(filter=FieldFilter("date", "<=", end_date))
+    )
+    return [doc.to_dict() for doc in query.stream()]
+
+
 def save_analysis(date: str, data: dict) -> dict:
     """分析結果を保存（上書き）"""
     db = get_db()
     db.collection("daily_analyses").document(date).set(data)
+    _update_context_digests(date, _digest_analysis_fields(data))
+    _update_daily_metrics({date: _daily_metric_values(data)})
+    _update_suggestion_index({date: _suggestion_items(data)})
+    _update_anomaly_state({date: _daily_metric_values(data)})
     return data
 
 
+def mark_analysis_adopted(date: str, adopted_at: str) -> None:
+    """
+    事前生成の分析を利用者の分析として採用済みにする（pregenerated と adopted_at だけを更新）
+    分析の内容は変わらないため、save_analysis と違い要約ビュー・索引は更新しない。
+    """
+    db = get_db()
+    db.collection("daily_analyses").document(date).update({"pregenerated": False, "adopted_at": adopted_at})
+
+
+def delete_analysis(date: str) -> bool:
+    """分析結果を削除"""
+    db = get_db()
+    ref = db.collection("daily_analyses").document(date)
+    if not ref.get().exists:
+        return False
+    ref.delete()
+    _update_context_digests(date, _digest_analysis_fields(None))
+    _update_daily_metrics({date: _daily_metric_values(None)})
+    _update_suggestion_index({date: []})
+    _update_anomaly_state({date: None})
+    return True
+
+
 def get_past_records(date: str, days: int = 7) -> list[dict]:
     """指定日より前の過去 N 日間の行動記録を取得"""
     from datetime import datetime, timedelta
@@ -136,6 +210,1043 @@ def get_past_analyses(date: str, days: int = 7) -> list[dict]:
     return list_analyses(start_date=start, end_date=end)
 
 
+# ---- context_digests（過去 N 日分の要約ビュー） ----
+# context_digests/{date} は date までの直近 CONTEXT_DIGEST_DAYS 日分の日ごとの要約
+# （スコア・時間・主な課題）を days.{YYYY-MM-DD} に持つ。
+# 記録・分析の保存時に、その日を窓に含む CONTEXT_DIGEST_DAYS 個のドキュメントへ差分だけを書き込み、
+# プロンプトの「過去データ」は前日のドキュメント 1 件を読むだけで組み立てる。
+# 未作成のドキュメントは前日のドキュメントが完全ならそこから作るため、作り直しは初回と
+# 一括書き込み（bulk_write は差分だけを書く）の後に限られる。
+
+CONTEXT_DIGEST_DAYS = 7
+CONTEXT_DIGEST_TOP_ISSUES = 3
+
+
+def _shift_date(date: str, days: int) -> str:
+    from datetime import datetime, timedelta
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def _digest_record_fields(record: Optional[dict]) -> dict:
+    """要約のうち行動記録から決まる部分"""
+    if not record:
+        return {"has_record": False, "rest_day": False, "activity_count": 0}
+    return {
+        "has_record": True,
+        "rest_day": bool(record.get("rest_day")),
+        "activity_count": len(record.get("parsed_activities") or []),
+    }
+
+
+def _digest_analysis_fields(analysis: Optional[dict]) -> dict:
+    """要約のうち分析結果から決まる部分"""
+    if not analysis:
+        return {
+            "has_analysis": False,
+            "overall_score": None, "productive_hours": None, "wasted_hours": None, "top_issues": [],
+        }
+    summary = analysis.get("summary") or {}
+    detail = analysis.get("analysis") or {}
+    return {
+        "has_analysis": True,
+        "overall_score": summary.get("overall_score"),
+        "productive_hours": summary.get("productive_hours"),
+        "wasted_hours": summary.get("wasted_hours"),
+        "top_issues": [str(p)[:80] for p in (detail.get("bad_points") or [])[:CONTEXT_DIGEST_TOP_ISSUES]],
+    }
+
+
+def _context_digest_writes(date: str, fields: dict) -> list[tuple[str, str, dict, bool]]:
+    """date の要約を、date を窓に含む各ドキュメントへマージする書き込み（bulk_write 用。complete は付けない）"""
+    writes = []
+    for offset in range(CONTEXT_DIGEST_DAYS):
+        anchor = _shift_date(date, offset)
+        writes.append(("context_digests", anchor, {
+            "date": anchor,
+            "days": {date: {"date": date, **fields}},
+        }, True))
+    return writes
+
+
+def _seed_context_digest(anchor: str, previous: dict, current: Optional[dict]) -> dict:
+    """
+    完全な前日のドキュメントから anchor の days を作る
+    anchor 当日は記録・分析なしを既定とし、anchor のドキュメントに書き込み済みの差分を重ねる。
+    """
+    window_start = _shift_date(anchor, -(CONTEXT_DIGEST_DAYS - 1))
+    days = {d: dict(v) for d, v in (previous.get("days") or {}).items() if window_start <= d < anchor}
+    days[anchor] = {
+        "date": anchor, **_digest_record_fields(None), **_digest_analysis_fields(None),
+        **((current or {}).get("days") or {}).get(anchor, {}),
+    }
+    return days
+
+
+def _update_context_digests(date: str, fields: dict) -> None:
+    """
+    date の要約を、date を窓に含む各ドキュメントへトランザクションでマージする
+    未作成・不完全なドキュメントは、前日のドキュメントが完全ならそこから作って complete にする
+    （当日の記録を保存した時点で翌日の分析が読むドキュメントが完全になり、作り直しが要らない）
+    """
+    db = get_db()
+    anchors = [_shift_date(date, offset) for offset in range(-1, CONTEXT_DIGEST_DAYS)]
+    refs = {anchor: db.collection("context_digests").document(anchor) for anchor in anchors}
+    entry = {"date": date, **fields}
+
+    @firestore.transactional
+    def _run(transaction):
+        snaps = {anchor: ref.get(transaction=transaction) for anchor, ref in refs.items()}
+        previous = snaps[anchors[0]].to_dict() if snaps[anchors[0]].exists else None
+        for anchor in anchors[1:]:
+            current = snaps[anchor].to_dict() if snaps[anchor].exists else None
+            if current and current.get("complete"):
+                days = dict(current.get("days") or {})
+                days[date] = {**days.get(date, {}), **entry}
+                transaction.set(refs[anchor], {"date": anchor, "days": {date: entry}}, merge=True)
+            elif previous and previous.get("complete"):
+                days = _seed_context_digest(anchor, previous, current)
+                days[date] = {**days.get(date, {}), **entry}
+                # 窓の外の古い差分が残らないよう丸ごと置き換える
+                transaction.set(refs[anchor], {"date": anchor, "complete": True, "days": days})
+            else:
+                transaction.set(refs[anchor], {"date": anchor, "days": {date: entry}}, merge=True)
+                previous = None
+                continue
+            # 翌日のドキュメントはこの書き込み後の内容から作る
+            previous = {"complete": True, "days": days}
+
+    _run(db.transaction())
+
+
+def build_past_days(date: str, records: list[dict], analyses: list[dict]) -> list[dict]:
+    """取得済みの記録・分析から date より前の CONTEXT_DIGEST_DAYS 日分の要約を作る（日付昇順、記録のある日のみ）"""
+    window_start = _shift_date(date, -CONTEXT_DIGEST_DAYS)
+    analyses_by_date = {a.get("date"): a for a in analyses}
+    days = []
+    for record in sorted(records, key=lambda r: r.get("date", "")):
+        day = record.get("date", "")
+        if not (window_start <= day < date):
+            continue
+        days.append({
+            "date": day,
+            **_digest_record_fields(record),
+            **_digest_analysis_fields(analyses_by_date.get(day)),
+        })
+    return days
+
+
+def get_past_days(date: str) -> list[dict]:
+    """
+    date より前の CONTEXT_DIGEST_DAYS 日分の要約を返す（日付昇順、記録のある日のみ）
+    前日のドキュメントが未作成・不完全（機能追加前のデータ）なら記録と分析から作り直して保存する
+    """
+    anchor = _shift_date(date, -1)
+    window_start = _shift_date(date, -CONTEXT_DIGEST_DAYS)
+    db = get_db()
+    ref = db.collection("context_digests").document(anchor)
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return sorted(
+            (d for d in (data.get("days") or {}).values()
+             if d.get("has_record") and window_start <= d.get("date", "") < date),
+            key=lambda d: d["date"],
+        )
+
+    days = build_past_days(
+        date,
+        get_past_records(date, days=CONTEXT_DIGEST_DAYS),
+        get_past_analyses(date, days=CONTEXT_DIGEST_DAYS),
+    )
+    # 記録の無い日も has_record=False として書き、差分だけで作られた不完全な内容を上書きする
+    stored = {}
+    for i in range(1, CONTEXT_DIGEST_DAYS + 1):
+        day = _shift_date(date, -i)
+        stored[day] = {"date": day, **_digest_record_fields(None), **_digest_analysis_fields(None)}
+    stored.update({d["date"]: d for d in days})
+    ref.set({"date": anchor, "complete": True, "days": stored}, merge=True)
+    return days
+
+
+# ---- daily_metrics（日次分析の数値の列指向ストア） ----
+# daily_metrics/{YYYY} は AnalysisSummary の数値フィールドごとに、1 月 1 日を 0 とする通し日で引く
+# 長さ DAILY_METRICS_DAYS の配列を持つ（分析の無い日は null）。
+# 日次分析の保存・削除時にその日の要素だけを書き換え、期間のトレンドは年ごとのドキュメントを
+# 読むだけで計算する（services/metrics_engine.py）。
+
+DAILY_METRIC_FIELDS = (
+    "overall_score", "productive_hours", "wasted_hours", "youtube_hours", "task_completion_rate",
+)
+DAILY_METRICS_DAYS = 366
+
+
+def day_of_year_index(date: str) -> int:
+    """YYYY-MM-DD の年内の通し日（1 月 1 日 = 0）"""
+    from datetime import datetime
+    return datetime.strptime(date, "%Y-%m-%d").timetuple().tm_yday - 1
+
+
+def _daily_metric_values(analysis: Optional[dict]) -> dict:
+    """分析結果の数値フィールド（分析が無い・値が無いものは None）"""
+    summary = (analysis or {}).get("summary") or {}
+    values = {}
+    for field in DAILY_METRIC_FIELDS:
+        value = summary.get(field)
+        values[field] = float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    return values
+
+
+def _empty_daily_metrics(year: str) -> dict:
+    return {"year": year, **{field: [None] * DAILY_METRICS_DAYS for field in DAILY_METRIC_FIELDS}}
+
+
+def _update_daily_metrics(values_by_date: dict[str, dict]) -> None:
+    """日付 → 数値フィールドの値 を年ごとのドキュメントへトランザクションで書き込む"""
+    by_year: dict[str, dict[str, dict]] = {}
+    for date, values in values_by_date.items():
+        by_year.setdefault(date[:4], {})[date] = values
+
+    db = get_db()
+    for year, updates in by_year.items():
+        ref = db.collection("daily_metrics").document(year)
+
+        @firestore.transactional
+        def _run(transaction):
+            snap = ref.get(transaction=transaction)
+            # 未作成なら空の配列から始める（complete でないため初回の読み込み時に作り直される）
+            doc = snap.to_dict() if snap.exists else _empty_daily_metrics(year)
+            columns = {field: list(doc.get(field) or [None] * DAILY_METRICS_DAYS) for field in DAILY_METRIC_FIELDS}
+            for date, values in updates.items():
+                index = day_of_year_index(date)
+                for field in DAILY_METRIC_FIELDS:
+                    columns[field][index] = values[field]
+            transaction.set(ref, {"year": year, **columns}, merge=True)
+
+        _run(db.transaction())
+
+
+def get_daily_metrics(year: str) -> dict:
+    """
+    年の列指向ストア（YYYY）を返す
+    未作成・不完全（機能追加前のデータ）なら、その年の日次分析から作り直して保存する
+    """
+    db = get_db()
+    ref = db.collection("daily_metrics").document(year)
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return data
+
+    data = _empty_daily_metrics(year)
+    for analysis in list_analyses(f"{year}-01-01", f"{year}-12-31"):
+        if not analysis.get("date"):
+            continue
+        index = day_of_year_index(analysis["date"])
+        for field, value in _daily_metric_values(analysis).items():
+            data[field][index] = value
+    data["complete"] = True
+    ref.set(data)
+    return data
+
+
+# ---- task_stats_monthly（タスク実績の月次ロールアップ） ----
+# task_stats_monthly/{YYYY-MM} は月内の日ごとのタスク数を days.{YYYY-MM-DD} に持つ。
+# 記録の作成・タスク更新・削除時にその日の値だけをマージし、
+# GET /stats/tasks は月数ぶんのドキュメントを読むだけで集計する（services/task_stats.py）。
+
+def _task_stats_day_fields(record: Optional[dict]) -> dict:
+    """1 日分のタスク数（記録が無い日は 0）"""
+    if not record:
+        return {"has_record": False, "planned": 0, "completed": 0, "backlog": 0, "completed_tasks": []}
+    tasks = record.get("tasks") or {}
+    completed = list(tasks.get("completed") or [])
+    return {
+        "has_record": True,
+        "planned": len(tasks.get("planned") or []),
+        "completed": len(completed),
+        "backlog": len(tasks.get("backlog") or []),
+        "completed_tasks": completed,  # 特定タスクの連続日数（瞑想など）の集計用
+    }
+
+
+def _update_task_stats(date: str, fields: dict) -> None:
+    month = date[:7]
+    db = get_db()
+    db.collection("task_stats_monthly").document(month).set(
+        {"month": month, "days": {date: {"date": date, **fields}}}, merge=True,
+    )
+
+
+def get_task_stats_month(month: str) -> dict:
+    """
+    月次ロールアップ（YYYY-MM）を返す
+    未作成・不完全（機能追加前のデータ）なら、その月の記録から作り直して保存する
+    """
+    db = get_db()
+    ref = db.collection("task_stats_monthly").document(month)
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return data
+
+    days = {
+        r["date"]: {"date": r["date"], **_task_stats_day_fields(r)}
+        for r in list_records(f"{month}-01", f"{month}-31")
+        if r.get("date")
+    }
+    ref.set({"month": month, "complete": True, "days": days}, merge=True)
+    # 差分だけで書かれていた日（記録の削除など）も残るようにマージ後の内容を返す
+    return {"month": month, "complete": True, "days": {**((data or {}).get("days") or {}), **days}}
+
+
+# ---- task_ledger（タスク台帳） ----
+# task_ledger/{タスク名の SHA-1} はタスクごとに、記録の日付 → その日の状態（予定・完了・近日中と並び順）を dates に持ち、
+# そこから計算した first_planned_date（最後の完了より後に初めて予定に入れた日）・carried_days（その後完了せずに
+# 予定に残した日数）・completed_date（最後に完了した日）・last_date（最後に現れた日）を持つ。
+# 記録の作成・タスク更新・削除時にその日の前後で状態の変わったタスクだけを書き換え、
+# 朝の対話の持ち越し・近日中タスクは last_date の範囲クエリ 1 回で集める（services/task_ledger.py）。
+# task_ledger_meta/state が complete でなければ、初回の読み込み時に全期間の記録から作り直す。
+
+def _task_ledger_id(task: str) -> str:
+    # タスク名には "/" などドキュメントIDに使えない文字が入りうるためハッシュにする
+    return hashlib.sha1(task.encode("utf-8")).hexdigest()
+
+
+def _task_ledger_day(record: Optional[dict]) -> dict[str, dict]:
+    """記録のタスク名 → その日の状態（planned / completed / backlog と記録内の並び順 order）"""
+    tasks = (record or {}).get("tasks") or {}
+    day: dict[str, dict] = {}
+    for key in ("planned", "completed", "backlog"):
+        for task in tasks.get(key) or []:
+            if not task:
+                continue
+            entry = day.setdefault(task, {"planned": False, "completed": False, "backlog": False, "order": len(day)})
+            entry[key] = True
+    return day
+
+
+def _task_ledger_fields(task: str, dates: dict[str, dict]) -> dict:
+    """日付ごとの状態からタスク台帳のドキュメントを作る"""
+    completed = [d for d, e in dates.items() if e.get("completed")]
+    completed_date = max(completed) if completed else None
+    open_dates = sorted(
+        d for d, e in dates.items()
+        if e.get("planned") and not e.get("completed") and (not completed_date or d > completed_date)
+    )
+    return {
+        "task": task,
+        "dates": dates,
+        "first_planned_date": open_dates[0] if open_dates else None,
+        "carried_days": len(open_dates),
+        "completed_date": completed_date,
+        "last_date": max(dates),
+    }
+
+
+def _task_ledger_complete() -> bool:
+    doc = get_db().collection("task_ledger_meta").document("state").get()
+    return doc.exists and bool(doc.to_dict().get("complete"))
+
+
+def _update_task_ledger(date: str, before: Optional[dict], after: Optional[dict]) -> None:
+    """その日の記録の前後で状態の変わったタスクの台帳をトランザクションで書き換える"""
+    before_day, after_day = _task_ledger_day(before), _task_ledger_day(after)
+    changed = [t for t in {**before_day, **after_day} if before_day.get(t) != after_day.get(t)]
+    # 未作成・不完全なら何もしない（初回の読み込み時に全期間から作り直す）
+    if not changed or not _task_ledger_complete():
+        return
+
+    db = get_db()
+    refs = {task: db.collection("task_ledger").document(_task_ledger_id(task)) for task in changed}
+
+    @firestore.transactional
+    def _run(transaction):
+        snaps = {task: ref.get(transaction=transaction) for task, ref in refs.items()}
+        for task, ref in refs.items():
+            snap = snaps[task]
+            dates = dict((snap.to_dict() or {}).get("dates") or {}) if snap.exists else {}
+            if task in after_day:
+                dates[date] = after_day[task]
+            else:
+                dates.pop(date, None)
+            # dates はマージすると外した日付が残るため丸ごと置き換える
+            if dates:
+                transaction.set(ref, _task_ledger_fields(task, dates))
+            else:
+                transaction.delete(ref)
+
+    _run(db.transaction())
+
+
+def _rebuild_task_ledger() -> None:
+    """全期間の記録から台帳を作り直す"""
+    db = get_db()
+    by_task: dict[str, dict[str, dict]] = {}
+    for snap in db.collection("daily_records").select(["date", "tasks"]).stream():
+        record = snap.to_dict()
+        if not record.get("date"):
+            continue
+        for task, entry in _task_ledger_day(record).items():
+            by_task.setdefault(task, {})[record["date"]] = entry
+
+    ids = {_task_ledger_id(task): task for task in by_task}
+    stale = [doc.id for doc in db.collection("task_ledger").select([]).stream() if doc.id not in ids]
+    items = list(ids.items())
+    for i in range(0, max(len(items), len(stale)), BULK_WRITE_CHUNK):
+        batch = db.batch()
+        for doc_id, task in items[i:i + BULK_WRITE_CHUNK]:
+            batch.set(db.collection("task_ledger").document(doc_id), _task_ledger_fields(task, by_task[task]))
+        for doc_id in stale[i:i + BULK_WRITE_CHUNK]:
+            batch.delete(db.collection("task_ledger").document(doc_id))
+        batch.commit()
+    db.collection("task_ledger_meta").document("state").set({"complete": True, "updated_at": now_jst()})
+
+
+def list_task_ledger(since: str) -> list[dict]:
+    """
+    last_date が since 以降のタスク台帳を返す
+    台帳が未作成・不完全（機能追加前のデータ）なら、全期間の記録から作り直してから読む
+    """
+    if not _task_ledger_complete():
+        _rebuild_task_ledger()
+    query = get_db().collection("task_ledger").where(filter=FieldFilter("last_date", ">=", since))
+    return [doc.to_dict() for doc in query.stream()]
+
+
+# ---- anomaly_state（日次スコアの異常検知の状態） ----
+# anomaly_state/daily は overall_score / wasted_hours の EWMA 平均・分散と CUSUM、直近の異常・変化点 events、
+# 最後に取り込んだ日 last_date と、その日を取り込む前の状態 previous を持つ（大きさは一定。utils/anomaly.py）。
+# 日次分析の保存時に、last_date より後の日なら状態を進め、last_date と同じ日なら previous に戻して取り込み直す。
+# それより前の日の保存・削除は complete を外し、次の読み込み時に全期間の分析から作り直す。
+
+def _update_anomaly_state(values_by_date: dict[str, Optional[dict]]) -> None:
+    """日付 → その日の数値（削除は None）を日付順にトランザクションで状態へ取り込む"""
+    db = get_db()
+    ref = db.collection("anomaly_state").document("daily")
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        doc = snap.to_dict() if snap.exists else None
+        # 未作成・不完全なら何もしない（初回の読み込み時に全期間から作り直す）
+        if not doc or not doc.get("complete"):
+            return
+        state = {key: doc.get(key) for key in ("last_date", "fields", "events", "previous")}
+        for date in sorted(values_by_date):
+            values = values_by_date[date]
+            last = state.get("last_date")
+            if last and date == last:
+                state = anomaly.rewind(state)
+            elif last and date < last:
+                state = None
+            if state is None:
+                # 取り込み済みの日より前の変更は順に取り込み直せないため、次の読み込み時に作り直す
+                transaction.set(ref, {"complete": False}, merge=True)
+                return
+            if values is not None:
+                state = anomaly.ingest(state, date, values)
+        transaction.set(ref, {**state, "complete": True, "updated_at": now_jst()})
+
+    _run(db.transaction())
+
+
+def get_anomaly_state() -> dict:
+    """
+    異常検知の状態を返す
+    未作成・不完全（機能追加前のデータ・過去の日の変更）なら、全期間の日次分析を日付順に取り込み直して保存する
+    """
+    db = get_db()
+    ref = db.collection("anomaly_state").document("daily")
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return data
+
+    query = db.collection("daily_analyses").select(["date", *(f"summary.{f}" for f in anomaly.FIELDS)])
+    analyses = sorted(
+        (snap.to_dict() for snap in query.stream()),
+        key=lambda a: a.get("date", ""),
+    )
+    state = anomaly.empty_state()
+    for analysis in analyses:
+        if analysis.get("date"):
+            state = anomaly.ingest(state, analysis["date"], _daily_metric_values(analysis))
+    data = {**state, "complete": True, "updated_at": now_jst()}
+    ref.set(data)
+    return data
+
+
+# ---- suggestion_index（改善提案のクラスタ索引） ----
+# suggestion_index/all は全期間の日次分析の improvement_suggestions を、文字 bigram の MinHash で
+# 言い回し違いの同じ提案ごとにまとめたクラスタを clusters.{id} に持つ。
+# 日次分析の保存・削除時にその日の提案だけを付け替え、改善提案の画面はこのドキュメント 1 件を読むだけで表示する。
+# occurrences は "日付:優先度" の配列（同じ日の分析を作り直したときにその日の分だけ外せるようにする）。
+# texts は新しい SUGGESTION_TEXT_DATES 日分の 日付 → 文・カテゴリ（表示する文はこのうち最も新しい日のもの。
+# その日の分析が削除・作り直しで外れたら、残った日の文に戻す）。
+
+SUGGESTION_SIMILARITY = 0.4     # MinHash の推定 Jaccard 係数がこれ以上なら同じ提案とみなす
+SUGGESTION_MAX_CLUSTERS = 300   # ドキュメントの上限（1 MiB）に収めるため、超えたら出現の少ない古いものから外す
+SUGGESTION_PRIORITIES = ("high", "medium", "low")
+SUGGESTION_TEXT_DATES = 5       # クラスタごとに文を残す日数（全日分はドキュメントの上限に収まらないため）
+
+
+def _suggestion_items(analysis: Optional[dict]) -> list[dict]:
+    """分析結果の改善提案（文の空なものは除く）"""
+    items = []
+    for s in ((analysis or {}).get("analysis") or {}).get("improvement_suggestions") or []:
+        if not isinstance(s, dict) or not str(s.get("suggestion", "")).strip():
+            continue
+        priority = s.get("priority") if s.get("priority") in SUGGESTION_PRIORITIES else "low"
+        items.append({
+            "suggestion": str(s["suggestion"]).strip(),
+            "priority": priority,
+            "category": s.get("category") or "その他",
+        })
+    return items
+
+
+def _refresh_cluster(cluster: dict) -> None:
+    """occurrences・texts から件数・初出/最終日・優先度・表示する文を計算し直す"""
+    pairs = [o.split(":", 1) for o in cluster["occurrences"]]
+    dates = [date for date, _ in pairs]
+    counts = {p: sum(1 for _, priority in pairs if priority == p) for p in SUGGESTION_PRIORITIES}
+    cluster["count"] = len(dates)
+    cluster["first_seen"] = min(dates)
+    cluster["last_seen"] = max(dates)
+    cluster["priority_counts"] = counts
+    # 一度でも高い優先度で挙がった提案はその優先度で扱う
+    cluster["priority"] = next(p for p in SUGGESTION_PRIORITIES if counts.get(p))
+    # 表示する文は最終日の文（texts に最終日の文が無い古いクラスタは今の文のまま）
+    newest = (cluster.get("texts") or {}).get(cluster["last_seen"])
+    if newest:
+        cluster["suggestion"] = newest["suggestion"]
+        cluster["category"] = newest["category"]
+
+
+def _apply_suggestion_updates(clusters: dict, items_by_date: dict[str, list[dict]]) -> dict:
+    """日付ごとに、その日の提案をクラスタから外してから付け直す"""
+    signatures = {cid: minhash.decode(c["signature"]) for cid, c in clusters.items()}
+    for date in sorted(items_by_date):
+        prefix = f"{date}:"
+        for cid in list(clusters):
+            cluster = clusters[cid]
+            kept = [o for o in cluster["occurrences"] if not o.startswith(prefix)]
+            if len(kept) == len(cluster["occurrences"]):
+                continue
+            if not kept:
+                del clusters[cid]
+                del signatures[cid]
+                continue
+            cluster["occurrences"] = kept
+            cluster["texts"] = {d: t for d, t in (cluster.get("texts") or {}).items() if d != date}
+            _refresh_cluster(cluster)
+
+        for item in items_by_date[date]:
+            sig = minhash.signature(item["suggestion"])
+            best_id, best = None, SUGGESTION_SIMILARITY
+            for cid, other in signatures.items():
+                score = minhash.similarity(sig, other)
+                if score >= best:
+                    best_id, best = cid, score
+            if best_id is None:
+                best_id = uuid.uuid4().hex[:12]
+                clusters[best_id] = {"id": best_id, "signature": minhash.encode(sig), "occurrences": []}
+                signatures[best_id] = sig
+            cluster = clusters[best_id]
+            texts = {**(cluster.get("texts") or {}), date: {"suggestion": item["suggestion"], "category": item["category"]}}
+            cluster["texts"] = {d: texts[d] for d in sorted(texts, reverse=True)[:SUGGESTION_TEXT_DATES]}
+            cluster["occurrences"].append(f"{date}:{item['priority']}")
+            _refresh_cluster(cluster)
+
+    if len(clusters) > SUGGESTION_MAX_CLUSTERS:
+        keep = sorted(clusters.values(), key=lambda c: (c["count"], c["last_seen"]), reverse=True)
+        clusters = {c["id"]: c for c in keep[:SUGGESTION_MAX_CLUSTERS]}
+    return clusters
+
+
+def _update_suggestion_index(items_by_date: dict[str, list[dict]]) -> None:
+    """日付 → その日の改善提案 をトランザクションで索引に反映する"""
+    db = get_db()
+    ref = db.collection("suggestion_index").document("all")
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        doc = snap.to_dict() if snap.exists else None
+        # 未作成・不完全なら何もしない（初回の読み込み時に全期間から作り直す）
+        if not doc or not doc.get("complete"):
+            return
+        clusters = _apply_suggestion_updates(doc.get("clusters") or {}, items_by_date)
+        # clusters はマージすると消したクラスタが残るため丸ごと置き換える
+        transaction.set(ref, {"complete": True, "clusters": clusters, "updated_at": now_jst()})
+
+    _run(db.transaction())
+
+
+def get_suggestion_index() -> dict:
+    """
+    改善提案の索引を返す
+    未作成・不完全（機能追加前のデータ）なら、全期間の日次分析から作り直して保存する
+    """
+    db = get_db()
+    ref = db.collection("suggestion_index").document("all")
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return data
+
+    query = db.collection("daily_analyses").select(["date", "analysis.improvement_suggestions"])
+    items_by_date = {}
+    for snap in query.stream():
+        analysis = snap.to_dict()
+        if analysis.get("date"):
+            items_by_date[analysis["date"]] = _suggestion_items(analysis)
+    data = {"complete": True, "clusters": _apply_suggestion_updates({}, items_by_date), "updated_at": now_jst()}
+    ref.set(data)
+    return data
+
+
+# ---- search_segments（全文検索の転置インデックス） ----
+# 日記・ブレインダンプ・Udemy Tips・ありがたいノートの全文検索用（services/search_service.py）。
+# search_segments/{種類}-{YYYY-MM} はその月のエントリの一覧（docs）と、文字 1/2/3-gram の
+# ポスティングリストを圧縮したもの（postings、形式は utils/ngram_index.py）を持つ。
+# postings の文書番号は docs の添字。
+# search_index/meta の segments.{セグメントID} はセグメントの版で、書き直すたびに 1 増やす
+# （検索側は版の変わったセグメントだけを読み直す）。
+# エントリの作成・更新・削除時は、そのエントリのセグメントだけを書き直す。
+
+SEARCH_COLLECTIONS = {
+    "journal": "journal_entries",
+    "braindump": "braindump_entries",
+    "udemy_tip": "udemy_tips_entries",
+    "gratitude": "gratitude_entries",
+}
+SEARCH_MAX_CHARS = 20000  # 1 エントリで索引にする文字数（セグメントをドキュメントの上限 1 MiB に収めるため）
+SEARCH_TITLE_CHARS = 40
+
+
+def _search_entry(kind: str, data: Optional[dict]) -> Optional[dict]:
+    """索引に載せるエントリの情報と本文（削除済み・日付の無いものは None）"""
+    if not data or not data.get("id"):
+        return None
+    # ありがたいノートは日付を持たないため作成日を使う
+    date = data.get("date") or str(data.get("created_at") or "")[:10]
+    if not date:
+        return None
+    content = data.get("content") or ""
+    title = data.get("title") or ""
+    first_line = next((l.strip() for l in content.splitlines() if l.strip()), "")
+    return {
+        "id": data["id"],
+        "date": date,
+        "title": (title or first_line)[:SEARCH_TITLE_CHARS],
+        "labels": [l for l in data.get("labels") or [] if isinstance(l, str)],
+        "text": f"{title}\n{content}"[:SEARCH_MAX_CHARS],
+    }
+
+
+def _search_segment_id(kind: str, entry: dict) -> str:
+    return f"{kind}-{entry['date'][:7]}"
+
+
+def _build_search_segment(segment: dict, entries: dict[str, Optional[dict]]) -> dict:
+    """セグメントのエントリを差し替えて作り直す（entries は ID → 新しい内容、None なら外す）"""
+    docs = segment.get("docs") or []
+    doc_terms = [Counter() for _ in docs]
+    for term, numbers in ngram_index.decode_postings(segment.get("postings")).items():
+        for number, count in numbers.items():
+            doc_terms[number][term] = count
+
+    kept = [(doc, t) for doc, t in zip(docs, doc_terms) if doc["id"] not in entries]
+    for entry in entries.values():
+        if entry:
+            t = ngram_index.terms(entry["text"])
+            doc = {k: entry[k] for k in ("id", "date", "title", "labels")}
+            kept.append(({**doc, "length": sum(t.values())}, t))
+    kept.sort(key=lambda pair: (pair[0]["date"], pair[0]["id"]))
+
+    postings: dict[str, dict[int, int]] = {}
+    for number, (_, t) in enumerate(kept):
+        for term, count in t.items():
+            postings.setdefault(term, {})[number] = count
+    return {"docs": [doc for doc, _ in kept], "postings": ngram_index.encode_postings(postings)}
+
+
+def _update_search_index(kind: str, changes: list[tuple[Optional[dict], Optional[dict]]]) -> None:
+    """エントリの変更（変更前, 変更後）をトランザクションで索引に反映する"""
+    by_segment: dict[str, dict[str, Optional[dict]]] = {}
+    for before, after in changes:
+        old, new = _search_entry(kind, before), _search_entry(kind, after)
+        if old == new:
+            continue  # 本文・タイトル・ラベル・日付が同じなら索引はそのまま
+        if old:
+            by_segment.setdefault(_search_segment_id(kind, old), {})[old["id"]] = None
+        if new:
+            by_segment.setdefault(_search_segment_id(kind, new), {})[new["id"]] = new
+    if not by_segment:
+        return
+
+    db = get_db()
+    meta_ref = db.collection("search_index").document("meta")
+    refs = {sid: db.collection("search_segments").document(sid) for sid in by_segment}
+
+    @firestore.transactional
+    def _run(transaction):
+        meta_snap = meta_ref.get(transaction=transaction)
+        meta = meta_snap.to_dict() if meta_snap.exists else None
+        # 未作成・不完全・索引語の形式が古いなら何もしない（初回の検索時に全件から作り直す）
+        if not meta or not meta.get("complete") or meta.get("format") != ngram_index.INDEX_FORMAT:
+            return
+        snaps = {sid: ref.get(transaction=transaction) for sid, ref in refs.items()}
+        versions = {}
+        for sid, ref in refs.items():
+            segment = snaps[sid].to_dict() if snaps[sid].exists else {}
+            versions[sid] = (meta.get("segments") or {}).get(sid, 0) + 1
+            transaction.set(ref, {
+                "kind": kind,
+                "month": sid[-7:],
+                **_build_search_segment(segment, by_segment[sid]),
+                "version": versions[sid],
+            })
+        transaction.set(meta_ref, {"segments": versions, "updated_at": now_jst()}, merge=True)
+
+    _run(db.transaction())
+
+
+def _rebuild_search_index(previous: Optional[dict]) -> dict:
+    """全エントリから索引を作り直す（版は前の版より大きくして、検索側のキャッシュを捨てさせる）"""
+    db = get_db()
+    by_segment: dict[str, dict[str, Optional[dict]]] = {}
+    for kind, collection in SEARCH_COLLECTIONS.items():
+        for doc in db.collection(collection).stream():
+            entry = _search_entry(kind, doc.to_dict())
+            if entry:
+                by_segment.setdefault(_search_segment_id(kind, entry), {})[entry["id"]] = entry
+
+    previous_versions = (previous or {}).get("segments") or {}
+    versions = {sid: previous_versions.get(sid, 0) + 1 for sid in by_segment}
+    sids = sorted(by_segment)
+    for i in range(0, len(sids), 100):
+        batch = db.batch()
+        for sid in sids[i:i + 100]:
+            kind = sid[:-8]
+            batch.set(db.collection("search_segments").document(sid), {
+                "kind": kind,
+                "month": sid[-7:],
+                **_build_search_segment({}, by_segment[sid]),
+                "version": versions[sid],
+            })
+        batch.commit()
+
+    meta = {"complete": True, "format": ngram_index.INDEX_FORMAT, "segments": versions, "updated_at": now_jst()}
+    db.collection("search_index").document("meta").set(meta)
+    return meta
+
+
+def get_search_meta() -> dict:
+    """
+    索引のセグメントと版の一覧を返す
+    未作成・不完全（機能追加前のデータ）・索引語の形式が古いなら、全エントリから作り直して保存する
+    """
+    doc = get_db().collection("search_index").document("meta").get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete") and data.get("format") == ngram_index.INDEX_FORMAT:
+        return data
+    return _rebuild_search_index(data)
+
+
+def get_search_segments(segment_ids: list[str]) -> dict[str, dict]:
+    """セグメントをまとめて 1 回で読む"""
+    if not segment_ids:
+        return {}
+    db = get_db()
+    refs = [db.collection("search_segments").document(sid) for sid in segment_ids]
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+
+def get_search_entries(kind: str, entry_ids: list[str]) -> dict[str, dict]:
+    """検索結果のエントリ本文をまとめて 1 回で読む（抜粋の作成用）"""
+    if not entry_ids:
+        return {}
+    db = get_db()
+    refs = [db.collection(SEARCH_COLLECTIONS[kind]).document(entry_id) for entry_id in entry_ids]
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+
+# ---- weekly_analyses ----
+
+def get_weekly_analysis(week_id: str) -> Optional[dict]:
+    """指定週の週次分析を取得"""
+    db = get_db()
+    doc = db.collection("weekly_analyses").document(week_id).get()
+    if doc.exists:
+        return doc.to_dict()
+    return None
+
+
+def save_weekly_analysis(week_id: str, data: dict) -> dict:
+    """週次分析を保存（上書き）"""
+    db = get_db()
+    db.collection("weekly_analyses").document(week_id).set(data)
+    return data
+
+
+# ---- 一括書き込み ----
+
+BULK_WRITE_CHUNK = 400  # Firestore のバッチ上限（500 件）に余裕を持たせる
+
+
+def bulk_write(writes: list[tuple[str, str, dict, bool]]) -> int:
+    """(collection, doc_id, data, merge) のリストを WriteBatch でまとめて書き込む。
+
+    BULK_WRITE_CHUNK 件ごとにコミットする。書き込んだ件数（writes の件数）を返す。
+    日次分析（daily_analyses の上書き）は context_digests の更新も同じ書き込みに含め、
+    daily_metrics・suggestion_index・anomaly_state（日付順に取り込む）は書き込み後にまとめて、
+    ジャーナルの分析（journal_entries の ai_analysis）は書き込み後にエントリごとに journal_metrics へ反映する。
+    """
+    db = get_db()
+    digest_writes = []
+    metric_values = {}
+    suggestion_items = {}
+    journal_ids = []
+    for collection, doc_id, data, merge in writes:
+        if collection == "daily_analyses" and not merge:
+            digest_writes.extend(_context_digest_writes(doc_id, _digest_analysis_fields(data)))
+            metric_values[doc_id] = _daily_metric_values(data)
+            suggestion_items[doc_id] = _suggestion_items(data)
+        if collection == "journal_entries" and "ai_analysis" in data:
+            journal_ids.append(doc_id)
+    all_writes = writes + digest_writes
+    for i in range(0, len(all_writes), BULK_WRITE_CHUNK):
+        batch = db.batch()
+        for collection, doc_id, data, merge in all_writes[i:i + BULK_WRITE_CHUNK]:
+            batch.set(db.collection(collection).document(doc_id), data, merge=merge)
+        batch.commit()
+    if metric_values:
+        _update_daily_metrics(metric_values)
+        _update_anomaly_state(metric_values)
+    if suggestion_items:
+        _update_suggestion_index(suggestion_items)
+    # ジャーナルの分析はマージで書くため、書き込み後のエントリから読み直す
+    for entry_id in journal_ids:
+        _update_journal_metrics(entry_id, None, get_journal(entry_id))
+    return len(writes)
+
+
+# ---- backfill_jobs ----
+
+def get_backfill_job(batch_id: str) -> Optional[dict]:
+    """バックフィルジョブを取得"""
+    db = get_db()
+    doc = db.collection("backfill_jobs").document(batch_id).get()
+    if doc.exists:
+        return doc.to_dict()
+    return None
+
+
+def save_backfill_job(batch_id: str, data: dict) -> dict:
+    """バックフィルジョブを保存（上書き）"""
+    db = get_db()
+    db.collection("backfill_jobs").document(batch_id).set(data)
+    return data
+
+
+# ---- ai_usage_daily（AI 呼び出しテレメトリの日次ロールアップ） ----
+
+def increment_ai_usage(date: str, prompt_type: str, model: str, fields: dict) -> None:
+    """日次ロールアップの features.{prompt_type} に数値を加算する。
+
+    fields のキーは 'latency_hist.le_500' のようなドット区切りでネストを表す。
+    """
+    feature: dict = {"models": {model: firestore.Increment(fields.get("calls", 1))}}
+    for key, value in fields.items():
+        target = feature
+        parts = key.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = firestore.Increment(value)
+
+    db = get_db()
+    db.collection("ai_usage_daily").document(date).set(
+        {"date": date, "features": {prompt_type: feature}}, merge=True,
+    )
+
+
+def list_ai_usage(start_date: str, end_date: str) -> list[dict]:
+    """期間内の日次ロールアップを取得"""
+    db = get_db()
+    query = (
+        db.collection("ai_usage_daily")
+        .where(filter=FieldFilter("date", ">=", start_date))
+        .where(filter=FieldFilter("date", "<=", end_date))
+    )
+    return [doc.to_dict() for doc in query.stream()]
+
+
+# ---- ai_guard（AI 呼び出しの共有レート制限・サーキットブレーカー） ----
+
+def update_ai_guard_state(model_key: str, update_fn):
+    """ai_guard/{model_key} をトランザクション内で読み書きする。
+
+    update_fn(state) は (書き込むフィールド or None, 戻り値) を返す。
+    競合時は Firestore がトランザクションごと再実行する。
+    """
+    db = get_db()
+    ref = db.collection("ai_guard").document(model_key)
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        updates, result = update_fn(snap.to_dict() if snap.exists else {})
+        if updates:
+            transaction.set(ref, updates, merge=True)
+        return result
+
+    return _run(db.transaction())
+
+
+# ---- generation_leases（AI 生成の重複実行防止） ----
+
+def acquire_generation_lease(key: str, owner: str, ttl: float, waiting_since: float) -> str:
+    """生成リースの取得を試みる。
+
+    Returns:
+        "acquired":  取得できた（owner が生成する）
+        "held":      他のインスタンスが生成中
+        "completed": waiting_since 以降に他のインスタンスの生成が完了した
+    """
+    db = get_db()
+    ref = db.collection("generation_leases").document(key)
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        state = snap.to_dict() if snap.exists else {}
+        now = time.time()
+        if state.get("owner") and state.get("expires_at", 0) > now:
+            return "held"
+        if state.get("completed_at") and state["completed_at"] >= waiting_since:
+            return "completed"
+        transaction.set(ref, {"owner": owner, "expires_at": now + ttl, "acquired_at": now})
+        return "acquired"
+
+    return _run(db.transaction())
+
+
+def release_generation_lease(key: str, owner: str, completed: bool) -> None:
+    """生成リースを解放する（completed なら完了時刻を残し、待機中の他インスタンスに知らせる）"""
+    db = get_db()
+    ref = db.collection("generation_leases").document(key)
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        if not snap.exists or snap.to_dict().get("owner") != owner:
+            return
+        data = {"owner": None, "expires_at": 0}
+        if completed:
+            data["completed_at"] = time.time()
+        transaction.set(ref, data, merge=True)
+
+    _run(db.transaction())
+
+
+# ---- ai_jobs（AI 生成ジョブキュー） ----
+
+def get_ai_job(job_id: str) -> Optional[dict]:
+    """ジョブを取得"""
+    db = get_db()
+    doc = db.collection("ai_jobs").document(job_id).get()
+    if doc.exists:
+        return doc.to_dict()
+    return None
+
+
+def create_ai_job(
+    job: dict,
+    dedupe_key: Optional[str] = None,
+    active_statuses: tuple = (),
+    supersede_statuses: tuple = (),
+) -> dict:
+    """ジョブを作成する。
+
+    dedupe_key を指定した場合、同じキーのジョブが active_statuses のいずれかなら
+    新しく作らずにそのジョブを返す（ai_job_keys/{dedupe_key} で最新のジョブを引く）。
+    supersede_statuses のいずれかなら、そのジョブを cancelled にして新しいジョブを作る。
+    """
+    db = get_db()
+    job_ref = db.collection("ai_jobs").document(job["id"])
+    if not dedupe_key:
+        job_ref.set(job)
+        return job
+    key_ref = db.collection("ai_job_keys").document(dedupe_key)
+
+    @firestore.transactional
+    def _run(transaction):
+        key_snap = key_ref.get(transaction=transaction)
+        if key_snap.exists:
+            current_ref = db.collection("ai_jobs").document(key_snap.to_dict().get("job_id", ""))
+            current = current_ref.get(transaction=transaction)
+            status = current.to_dict().get("status") if current.exists else None
+            if status in supersede_statuses:
+                transaction.update(current_ref, {
+                    "status": "cancelled", "owner": None, "updated_at": job["created_at"],
+                })
+            elif status in active_statuses:
+                return current.to_dict()
+        transaction.set(job_ref, job)
+        transaction.set(key_ref, {"job_id": job["id"]})
+        return job
+
+    return _run(db.transaction())
+
+
+def list_claimable_ai_jobs(now: float, limit: int = 20) -> list[dict]:
+    """
+    取り出せるジョブを取得する
+    run_after を過ぎた queued（run_after の古い順）と、lease_expires_at を過ぎた running
+    （lease_expires_at の古い順）をそれぞれ最大 limit 件。待機中・実行中のジョブが多くても
+    取り出せるジョブが上限の外に隠れないよう、ステータスごとに時刻で絞り込む。
+    複合インデックス（status + run_after、status + lease_expires_at）を使う（firestore.indexes.json）
+    """
+    db = get_db()
+    col = db.collection("ai_jobs")
+    queued = (
+        col.where(filter=FieldFilter("status", "==", "queued"))
+        .where(filter=FieldFilter("run_after", "<=", now))
+        .order_by("run_after")
+        .limit(limit)
+    )
+    expired = (
+        col.where(filter=FieldFilter("status", "==", "running"))
+        .where(filter=FieldFilter("lease_expires_at", "<=", now))
+        .order_by("lease_expires_at")
+        .limit(limit)
+    )
+    return [doc.to_dict() for doc in queued.stream()] + [doc.to_dict() for doc in expired.stream()]
+
+
+def update_ai_job(job_id: str, update_fn):
+    """ai_jobs/{job_id} をトランザクション内で読み書きする。
+
+    update_fn(job) は (書き込むフィールド or None, 戻り値) を返す。ジョブが無ければ None を返す。
+    """
+    db = get_db()
+    ref = db.collection("ai_jobs").document(job_id)
+
+    @firestore.transactional
+    def _run(transaction):
+        snap = ref.get(transaction=transaction)
+        if not snap.exists:
+            return None
+        updates, result = update_fn(snap.to_dict())
+        if updates:
+            transaction.update(ref, updates)
+        return result
+
+    return _run(db.transaction())
+
+
 # ---- analysis_dialogues ----
 
 def get_dialogue(date: str) -> Optional[dict]:
@@ -192,6 +1303,34 @@ def delete_morning_dialogue(date: str) -> bool:
     return True
 
 
+# ---- morning_pregenerations（朝の問いかけの事前生成） ----
+
+def get_morning_pregeneration(date: str) -> Optional[dict]:
+    """指定日の事前生成した朝の問いかけを取得"""
+    db = get_db()
+    doc = db.collection("morning_pregenerations").document(date).get()
+    if doc.exists:
+        return doc.to_dict()
+    return None
+
+
+def save_morning_pregeneration(date: str, data: dict) -> dict:
+    """事前生成した朝の問いかけを保存（上書き）"""
+    db = get_db()
+    db.collection("morning_pregenerations").document(date).set(data)
+    return data
+
+
+def delete_morning_pregeneration(date: str) -> bool:
+    """事前生成した朝の問いかけを削除"""
+    db = get_db()
+    ref = db.collection("morning_pregenerations").document(date)
+    if not ref.get().exists:
+        return False
+    ref.delete()
+    return True
+
+
 # ---- diary_dialogues ----
 
 def get_diary_dialogue(date: str) -> Optional[dict]:
@@ -319,6 +1458,8 @@ def create_journal(entry_id: str, data: dict) -> dict:
     """ジャーナルを作成"""
     db = get_db()
     db.collection("journal_entries").document(entry_id).set(data)
+    _update_search_index("journal", [(None, data)])
+    _update_journal_metrics(entry_id, None, data)
     return data
 
 
@@ -326,19 +1467,26 @@ def update_journal(entry_id: str, data: dict) -> Optional[dict]:
     """ジャーナルを更新"""
     db = get_db()
     ref = db.collection("journal_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return None
     ref.update(data)
-    return _ensure_entry_number(ref.get().to_dict())
+    after = _ensure_entry_number(ref.get().to_dict())
+    _update_search_index("journal", [(before.to_dict(), after)])
+    _update_journal_metrics(entry_id, before.to_dict(), after)
+    return after
 
 
 def delete_journal(entry_id: str) -> bool:
     """ジャーナルを削除"""
     db = get_db()
     ref = db.collection("journal_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return False
     ref.delete()
+    _update_search_index("journal", [(before.to_dict(), None)])
+    _update_journal_metrics(entry_id, before.to_dict(), None)
     return True
 
 
@@ -360,6 +1508,72 @@ def save_journal_digest(week_id: str, data: dict) -> dict:
     return data
 
 
+# ---- journal_metrics（日記分析の気分・エネルギーの系列） ----
+# journal_metrics/{YYYY} は AI 分析済みのジャーナルエントリごとの mood_score・energy_level・
+# 感情タグの強さを entries.{entry_id} に持つ。エントリの分析・更新・削除時にその 1 件だけを書き換え、
+# 気分の推移（GET /journal/metrics）は年ごとのドキュメントを読むだけで集計する（services/journal_metrics.py）。
+
+def _journal_metric_values(entry: Optional[dict]) -> Optional[dict]:
+    """エントリの分析結果の数値（未分析・削除済みなら None）"""
+    analysis = (entry or {}).get("ai_analysis")
+    if not entry or not entry.get("date") or not isinstance(analysis, dict):
+        return None
+    intensities: dict[str, float] = {}
+    for emotion in analysis.get("emotions") or []:
+        tag = str((emotion or {}).get("tag", "")).strip()
+        intensity = (emotion or {}).get("intensity")
+        if tag and isinstance(intensity, (int, float)):
+            # 同じタグが複数あれば強い方
+            intensities[tag] = max(float(intensity), intensities.get(tag, 0.0))
+    mood = analysis.get("mood_score")
+    return {
+        "date": entry["date"],
+        "mood_score": float(mood) if isinstance(mood, (int, float)) and not isinstance(mood, bool) else None,
+        "energy_level": analysis.get("energy_level") if analysis.get("energy_level") in ("high", "medium", "low") else None,
+        # マップにするとマージ書き込みで消えたタグが残るため配列で持つ
+        "emotions": [{"tag": tag, "intensity": value} for tag, value in intensities.items()],
+    }
+
+
+def _update_journal_metrics(entry_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    """エントリの分析結果が変わっていれば、その年のドキュメントの 1 件だけを書き換える"""
+    old, new = _journal_metric_values(before), _journal_metric_values(after)
+    if old == new:
+        return
+    db = get_db()
+    if old and (not new or old["date"][:4] != new["date"][:4]):
+        db.collection("journal_metrics").document(old["date"][:4]).set(
+            {"entries": {entry_id: firestore.DELETE_FIELD}}, merge=True,
+        )
+    if new:
+        year = new["date"][:4]
+        db.collection("journal_metrics").document(year).set(
+            {"year": year, "entries": {entry_id: new}}, merge=True,
+        )
+
+
+def get_journal_metrics(year: str) -> dict:
+    """
+    年のジャーナル分析の数値（YYYY）を返す
+    未作成・不完全（機能追加前のデータ）なら、その年のジャーナルから作り直して保存する
+    """
+    db = get_db()
+    ref = db.collection("journal_metrics").document(year)
+    doc = ref.get()
+    data = doc.to_dict() if doc.exists else None
+    if data and data.get("complete"):
+        return data
+
+    entries = {}
+    for entry in list_journals(f"{year}-01-01", f"{year}-12-31"):
+        values = _journal_metric_values(entry)
+        if values and entry.get("id"):
+            entries[entry["id"]] = values
+    data = {"year": year, "complete": True, "entries": entries}
+    ref.set(data)
+    return data
+
+
 # ---- braindump_entries ----
 
 def get_braindump(entry_id: str) -> Optional[dict]:
@@ -457,6 +1671,7 @@ def create_braindump(entry_id: str, data: dict) -> dict:
     """ブレインダンプを作成"""
     db = get_db()
     db.collection("braindump_entries").document(entry_id).set(data)
+    _update_search_index("braindump", [(None, data)])
     return data
 
 
@@ -464,10 +1679,13 @@ def update_braindump(entry_id: str, data: dict) -> Optional[dict]:
     """ブレインダンプを更新"""
     db = get_db()
     ref = db.collection("braindump_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return None
     ref.update(data)
-    return ref.get().to_dict()
+    after = ref.get().to_dict()
+    _update_search_index("braindump", [(before.to_dict(), after)])
+    return after
 
 
 def reset_braindump_updated_at_to_created() -> int:
@@ -501,9 +1719,11 @@ def delete_braindump(entry_id: str) -> bool:
     """ブレインダンプを削除"""
     db = get_db()
     ref = db.collection("braindump_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return False
     ref.delete()
+    _update_search_index("braindump", [(before.to_dict(), None)])
     return True
 
 
@@ -532,6 +1752,7 @@ def rename_braindump_label(old_name: str, new_name: str) -> int:
         return 0
 
     affected = 0
+    changes = []
     for doc in db.collection("braindump_entries").stream():
         data = doc.to_dict() or {}
         labels = data.get("labels") or []
@@ -547,7 +1768,9 @@ def rename_braindump_label(old_name: str, new_name: str) -> int:
             seen.add(replaced)
             new_labels.append(replaced)
         doc.reference.update({"labels": new_labels, "updated_at": now_jst()})
+        changes.append((data, {**data, "labels": new_labels}))
         affected += 1
+    _update_search_index("braindump", changes)
     return affected
 
 
@@ -559,6 +1782,7 @@ def delete_braindump_label(name: str) -> int:
         return 0
 
     affected = 0
+    changes = []
     for doc in db.collection("braindump_entries").stream():
         data = doc.to_dict() or {}
         labels = data.get("labels") or []
@@ -566,7 +1790,9 @@ def delete_braindump_label(name: str) -> int:
             continue
         new_labels = [lbl for lbl in labels if lbl != target]
         doc.reference.update({"labels": new_labels, "updated_at": now_jst()})
+        changes.append((data, {**data, "labels": new_labels}))
         affected += 1
+    _update_search_index("braindump", changes)
     return affected
 
 
@@ -648,24 +1874,30 @@ def get_next_udemy_tip_entry_number(date: str) -> int:
 def create_udemy_tip(entry_id: str, data: dict) -> dict:
     db = get_db()
     db.collection("udemy_tips_entries").document(entry_id).set(data)
+    _update_search_index("udemy_tip", [(None, data)])
     return data
 
 
 def update_udemy_tip(entry_id: str, data: dict) -> Optional[dict]:
     db = get_db()
     ref = db.collection("udemy_tips_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return None
     ref.update(data)
-    return ref.get().to_dict()
+    after = ref.get().to_dict()
+    _update_search_index("udemy_tip", [(before.to_dict(), after)])
+    return after
 
 
 def delete_udemy_tip(entry_id: str) -> bool:
     db = get_db()
     ref = db.collection("udemy_tips_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return False
     ref.delete()
+    _update_search_index("udemy_tip", [(before.to_dict(), None)])
     return True
 
 
@@ -692,6 +1924,7 @@ def rename_udemy_tip_label(old_name: str, new_name: str) -> int:
         return 0
 
     affected = 0
+    changes = []
     for doc in db.collection("udemy_tips_entries").stream():
         data = doc.to_dict() or {}
         labels = data.get("labels") or []
@@ -706,7 +1939,9 @@ def rename_udemy_tip_label(old_name: str, new_name: str) -> int:
             seen.add(replaced)
             new_labels.append(replaced)
         doc.reference.update({"labels": new_labels, "updated_at": now_jst()})
+        changes.append((data, {**data, "labels": new_labels}))
         affected += 1
+    _update_search_index("udemy_tip", changes)
     return affected
 
 
@@ -717,6 +1952,7 @@ def delete_udemy_tip_label(name: str) -> int:
         return 0
 
     affected = 0
+    changes = []
     for doc in db.collection("udemy_tips_entries").stream():
         data = doc.to_dict() or {}
         labels = data.get("labels") or []
@@ -724,7 +1960,9 @@ def delete_udemy_tip_label(name: str) -> int:
             continue
         new_labels = [lbl for lbl in labels if lbl != target]
         doc.reference.update({"labels": new_labels, "updated_at": now_jst()})
+        changes.append((data, {**data, "labels": new_labels}))
         affected += 1
+    _update_search_index("udemy_tip", changes)
     return affected
 
 
@@ -891,6 +2129,7 @@ def create_gratitude(entry_id: str, data: dict) -> dict:
     """ありがたいノートを作成"""
     db = get_db()
     db.collection("gratitude_entries").document(entry_id).set(data)
+    _update_search_index("gratitude", [(None, data)])
     return data
 
 
@@ -898,17 +2137,22 @@ def update_gratitude(entry_id: str, data: dict) -> Optional[dict]:
     """ありがたいノートを更新"""
     db = get_db()
     ref = db.collection("gratitude_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return None
     ref.update(data)
-    return ref.get().to_dict()
+    after = ref.get().to_dict()
+    _update_search_index("gratitude", [(before.to_dict(), after)])
+    return after
 
 
 def delete_gratitude(entry_id: str) -> bool:
     """ありがたいノートを削除"""
     db = get_db()
     ref = db.collection("gratitude_entries").document(entry_id)
-    if not ref.get().exists:
+    before = ref.get()
+    if not before.exists:
         return False
     ref.delete()
+    _update_search_index("gratitude", [(before.to_dict(), None)])
     return True
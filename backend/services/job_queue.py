@@ -0,0 +1,266 @@
+"""
+AI 生成ジョブキュー
+週次分析・月次サマリー・ジャーナルダイジェスト・対話のまとめなど時間のかかる AI 生成を
+HTTP リクエストの外で実行する。リクエストは 202 Accepted と job_id を返すだけにし、
+Cloud Run のリクエストタイムアウトやスケールダウンで生成が失われないようにする。
+
+- ai_jobs/{job_id} にジョブを保存する（queued → running → succeeded / failed）
+- 各インスタンスのワーカースレッドが queued のジョブを取り出して実行する。
+  取り出す際に lease_expires_at（可視性タイムアウト）を設定し、インスタンスが
+  途中で停止した場合は期限切れ後に別のワーカーが拾い直す
+- ワーカースレッドはリクエストの外で動くため、Cloud Run は CPU を常に割り当て（--no-cpu-throttling）、
+  最小インスタンス数 1 でデプロイする（deploy.yml）。CPU を絞る設定や 0 台までのスケールダウンでは、
+  202 を返した後の生成やデバウンス中のジョブが次のリクエストまで止まる
+- 失敗時は max_attempts まで間隔を空けて再実行する
+  （AIUnavailableError は retry_after 後に再実行し、試行回数に数えない）
+- supersede=True で登録すると、同じ dedupe_key の未実行（queued）ジョブを cancelled にして
+  置き換える。delay と組み合わせると「最後の登録から delay 秒後に 1 回だけ実行」になる（デバウンス）
+
+クライアントは GET /jobs/{job_id}（ポーリング）または GET /jobs/{job_id}/events（SSE）で
+完了を待つ。ジョブの種類ごとの処理は各ルーターが register() で登録する。
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from services import ai_guard, firestore_service
+from utils.helpers import now_jst
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = 600  # seconds（実行中のジョブをこの時間が過ぎたら再取得できる）
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 10  # seconds（1 回目の失敗後。以降は倍）
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+CLAIM_BATCH = 20
+
+ACTIVE_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+_INSTANCE_ID = os.getenv("K_REVISION", "local") + "-" + uuid.uuid4().hex[:8]
+
+_handlers: dict[str, Callable[[dict], object]] = {}
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_started = False
+
+
+def register(kind: str, handler: Callable[[dict], object]) -> None:
+    """ジョブの種類と処理関数を登録する（handler(params) の戻り値がジョブの結果になる）"""
+    _handlers[kind] = handler
+
+
+def enqueue(
+    kind: str,
+    params: dict,
+    dedupe_key: Optional[str] = None,
+    delay: float = 0,
+    supersede: bool = False,
+) -> dict:
+    """
+    ジョブを登録して返す
+    dedupe_key が同じジョブが queued / running なら、新しく作らずにそのジョブを返す。
+    supersede=True なら queued のジョブは取り消して新しいジョブに置き換える
+    （running のジョブは止めずに、新しいジョブをその後に実行する）
+
+    Raises:
+        ValueError: 未登録の kind
+    """
+    if kind not in _handlers:
+        raise ValueError(f"未登録のジョブ種別です: {kind}")
+    now = now_jst()
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "params": params,
+        "dedupe_key": dedupe_key,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": MAX_ATTEMPTS,
+        "run_after": time.time() + delay,
+        "lease_expires_at": 0,
+        "owner": None,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    if supersede:
+        job = firestore_service.create_ai_job(job, dedupe_key, supersede_statuses=("queued",))
+    else:
+        job = firestore_service.create_ai_job(job, dedupe_key, ACTIVE_STATUSES)
+    logger.info("ジョブ登録: kind=%s id=%s", kind, job["id"])
+    if delay <= 0:
+        kick()
+    return job
+
+
+def public_view(job: dict) -> dict:
+    """API レスポンス用のジョブ表現"""
+    job_id = job["id"]
+    return {
+        "job_id": job_id,
+        "kind": job.get("kind"),
+        "status": job.get("status"),
+        "attempts": job.get("attempts", 0),
+        "result": job.get("result") if job.get("status") == "succeeded" else None,
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "status_url": f"/api/v1/jobs/{job_id}",
+        "events_url": f"/api/v1/jobs/{job_id}/events",
+    }
+
+
+# ---- ワーカー ----
+
+def start_worker() -> None:
+    """このインスタンスのワーカースレッドを起動する（2 回目以降は何もしない）"""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    for i in range(WORKER_CONCURRENCY):
+        threading.Thread(target=_worker_loop, name=f"ai-job-worker-{i}", daemon=True).start()
+    logger.info("ジョブワーカー起動: %d スレッド", WORKER_CONCURRENCY)
+
+
+def kick() -> None:
+    """待機中のワーカーを起こす"""
+    _wakeup.set()
+
+
+def _worker_loop() -> None:
+    owner = f"{_INSTANCE_ID}-{threading.current_thread().name}"
+    while True:
+        try:
+            job = _claim(owner)
+        except Exception as e:
+            logger.warning("ジョブの取得に失敗: %s", e)
+            job = None
+        if job is None:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+        _execute(job, owner)
+
+
+def _claimable(job: dict, now: float) -> bool:
+    if job.get("status") == "queued":
+        return job.get("run_after", 0) <= now
+    # running のまま可視性タイムアウトを過ぎたものは実行中のインスタンスが停止したとみなす
+    return job.get("status") == "running" and job.get("lease_expires_at", 0) <= now
+
+
+def _claim(owner: str) -> Optional[dict]:
+    """実行可能なジョブを 1 件取り出し、running にして返す"""
+    now = time.time()
+    candidates = firestore_service.list_claimable_ai_jobs(now, CLAIM_BATCH)
+    for candidate in sorted(candidates, key=lambda j: j.get("run_after", 0)):
+
+        def take(job: dict):
+            now = time.time()
+            if not _claimable(job, now):
+                return None, None
+            if job.get("attempts", 0) >= job.get("max_attempts", MAX_ATTEMPTS):
+                # 実行中に停止したまま試行回数を使い切った
+                updates = {
+                    "status": "failed",
+                    "owner": None,
+                    "error": {"status": 500, "detail": "ジョブの実行が中断されました。もう一度お試しください。"},
+                    "updated_at": now_jst(),
+                }
+                return updates, None
+            updates = {
+                "status": "running",
+                "owner": owner,
+                "attempts": job.get("attempts", 0) + 1,
+                "lease_expires_at": now + VISIBILITY_TIMEOUT,
+                "updated_at": now_jst(),
+            }
+            return updates, {**job, **updates}
+
+        claimed = firestore_service.update_ai_job(candidate["id"], take)
+        if claimed is not None:
+            return claimed
+    return None
+
+
+def _describe_error(error: Exception) -> tuple[int, str]:
+    """例外を (HTTP ステータス相当, 利用者向けメッセージ) に変換する"""
+    status = getattr(error, "status_code", None)
+    detail = getattr(error, "detail", None)  # HTTPException
+    if status and isinstance(detail, str):
+        return status, detail
+    if status in (429, 529):
+        return 503, "AIサーバーが混み合っています。しばらく待ってからもう一度お試しください。"
+    return 500, "AI応答の生成に失敗しました。しばらく待ってから再度お試しください。"
+
+
+def _finish(job: dict, owner: str, updates: dict) -> None:
+    """自分が保持しているジョブだけを更新する（可視性タイムアウト後に別ワーカーが取った場合は触らない）"""
+    def apply(current: dict):
+        if current.get("owner") != owner or current.get("status") != "running":
+            return None, None
+        return {**updates, "lease_expires_at": 0, "updated_at": now_jst()}, None
+
+    try:
+        firestore_service.update_ai_job(job["id"], apply)
+    except Exception as e:
+        logger.warning("ジョブ %s の状態更新に失敗: %s", job["id"], e)
+
+
+def _execute(job: dict, owner: str) -> None:
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        _finish(job, owner, {
+            "status": "failed", "owner": None,
+            "error": {"status": 500, "detail": f"未登録のジョブ種別です: {job['kind']}"},
+        })
+        return
+
+    started = time.monotonic()
+    try:
+        result = handler(job.get("params") or {})
+    except ai_guard.AIUnavailableError as e:
+        # 上流の混雑は試行回数に数えず、回路が閉じる頃に再実行する
+        logger.info("ジョブ %s を %d 秒後に再実行（%s）", job["id"], e.retry_after, e.reason)
+        _finish(job, owner, {
+            "status": "queued", "owner": None,
+            "attempts": max(0, job["attempts"] - 1),
+            "run_after": time.time() + e.retry_after,
+        })
+        return
+    except Exception as e:
+        status, detail = _describe_error(e)
+        if status >= 500 and job["attempts"] < job.get("max_attempts", MAX_ATTEMPTS):
+            delay = RETRY_BACKOFF * (2 ** (job["attempts"] - 1))
+            logger.warning(
+                "ジョブ %s (%s) 失敗 attempt %d: %s. %d秒後に再実行",
+                job["id"], job["kind"], job["attempts"], e, delay,
+            )
+            _finish(job, owner, {"status": "queued", "owner": None, "run_after": time.time() + delay})
+        else:
+            logger.warning("ジョブ %s (%s) 失敗: %s", job["id"], job["kind"], e)
+            _finish(job, owner, {
+                "status": "failed", "owner": None,
+                "error": {"status": status, "detail": detail},
+            })
+        return
+
+    logger.info(
+        "ジョブ %s (%s) 完了: %.1fs", job["id"], job["kind"], time.monotonic() - started,
+    )
+    _finish(job, owner, {
+        "status": "succeeded", "owner": None,
+        "result": jsonable_encoder(result),
+        "error": None,
+    })
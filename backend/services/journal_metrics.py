@@ -0,0 +1,107 @@
+"""
+ジャーナル分析の気分・エネルギーの推移
+journal_metrics（年ごとのエントリ別の数値）から、日ごとの平均・移動平均と感情タグの出現頻度を計算する。
+Claude を呼ばず、ジャーナル本文も読まない。
+
+1 日に複数のエントリがあれば平均する。energy_level は low=1 / medium=2 / high=3 の数値にする。
+エントリの無い日は null（移動平均は直近 window 日のうち値のある日だけで平均する）。
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from services import firestore_service, metrics_engine
+
+ENERGY_VALUES = {"low": 1.0, "medium": 2.0, "high": 3.0}
+TOP_EMOTIONS = 15
+
+
+def _parse(date: str) -> datetime:
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def _round(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _mean(values: list[float]) -> float:
+    return sum(values) / len(values) if values else np.nan
+
+
+def analyze(start_date: str, end_date: str, window: int = metrics_engine.DEFAULT_WINDOW) -> dict:
+    """
+    期間（両端を含む）の気分・エネルギーの日次系列と感情タグの頻度を返す
+
+    Returns:
+        {"start_date", "end_date", "window",
+         "days": [{"date", "entries", "mood_score", "energy", "mood_rolling", "energy_rolling"}],
+         "emotions": [{"tag", "count", "avg_intensity", "days"}],
+         "summary": {"entries", "days_with_entries", "mood_mean", "energy_mean"}}
+        emotions は出現回数の多い順に TOP_EMOTIONS 件
+    """
+    start, end = _parse(start_date), _parse(end_date)
+    entries = []
+    for year in range(start.year, end.year + 1):
+        doc = firestore_service.get_journal_metrics(str(year))
+        entries.extend(
+            e for e in (doc.get("entries") or {}).values()
+            if start_date <= e.get("date", "") <= end_date
+        )
+
+    dates = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+    moods: dict[str, list[float]] = {}
+    energies: dict[str, list[float]] = {}
+    counts: dict[str, int] = {}
+    emotions: dict[str, dict] = {}
+    for entry in entries:
+        date = entry["date"]
+        counts[date] = counts.get(date, 0) + 1
+        if entry.get("mood_score") is not None:
+            moods.setdefault(date, []).append(entry["mood_score"])
+        if entry.get("energy_level") in ENERGY_VALUES:
+            energies.setdefault(date, []).append(ENERGY_VALUES[entry["energy_level"]])
+        for emotion in entry.get("emotions") or []:
+            stats = emotions.setdefault(emotion["tag"], {"count": 0, "total": 0.0, "days": set()})
+            stats["count"] += 1
+            stats["total"] += emotion["intensity"]
+            stats["days"].add(date)
+
+    mood = np.array([_mean(moods.get(d, [])) for d in dates], dtype=float)
+    energy = np.array([_mean(energies.get(d, [])) for d in dates], dtype=float)
+    mood_rolling = metrics_engine.rolling_mean(mood, window)
+    energy_rolling = metrics_engine.rolling_mean(energy, window)
+
+    ranked = sorted(emotions.items(), key=lambda kv: (-kv[1]["count"], kv[0]))[:TOP_EMOTIONS]
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "window": window,
+        "days": [
+            {
+                "date": date,
+                "entries": counts.get(date, 0),
+                "mood_score": _round(mood[i]),
+                "energy": _round(energy[i]),
+                "mood_rolling": _round(mood_rolling[i]),
+                "energy_rolling": _round(energy_rolling[i]),
+            }
+            for i, date in enumerate(dates)
+        ],
+        "emotions": [
+            {
+                "tag": tag,
+                "count": stats["count"],
+                "avg_intensity": round(stats["total"] / stats["count"], 2),
+                "days": len(stats["days"]),
+            }
+            for tag, stats in ranked
+        ],
+        "summary": {
+            "entries": len(entries),
+            "days_with_entries": len(counts),
+            "mood_mean": _round(_mean([v for values in moods.values() for v in values])),
+            "energy_mean": _round(_mean([v for values in energies.values() for v in values])),
+        },
+    }
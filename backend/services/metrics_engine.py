@@ -0,0 +1,157 @@
+"""
+日次分析の数値トレンド（NumPy）
+daily_metrics（年ごとの列指向ストア）から期間の配列を切り出し、
+移動平均・週ごとの平均と前週差・パーセンタイルをまとめて計算する。
+期間がいくつの年にまたがっても、読み込みは年ごとのドキュメント 1 件ずつで済む。
+
+分析の無い日は NaN として扱い、平均・パーセンタイルから除外する。
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from services import firestore_service
+
+DEFAULT_WINDOW = 7
+PERCENTILES = (10, 25, 50, 75, 90)
+MAX_RANGE_DAYS = 731  # 1 回の集計で扱う上限（2 年分）
+
+FIELDS = firestore_service.DAILY_METRIC_FIELDS
+
+
+def _parse(date: str) -> datetime:
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def _round(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def _to_list(values: np.ndarray) -> list[Optional[float]]:
+    return [_round(v) for v in values]
+
+
+def load(start_date: str, end_date: str) -> dict[str, np.ndarray]:
+    """期間（両端を含む）の各フィールドを日付順の float 配列で返す（分析の無い日は NaN）"""
+    start, end = _parse(start_date), _parse(end_date)
+    columns: dict[str, list[np.ndarray]] = {field: [] for field in FIELDS}
+    for year in range(start.year, end.year + 1):
+        doc = firestore_service.get_daily_metrics(str(year))
+        first = start_date if year == start.year else f"{year}-01-01"
+        last = end_date if year == end.year else f"{year}-12-31"
+        lo = firestore_service.day_of_year_index(first)
+        hi = firestore_service.day_of_year_index(last) + 1
+        for field in FIELDS:
+            # None は float 配列にすると NaN になる
+            column = np.array(doc.get(field) or [], dtype=float)
+            column = np.pad(column, (0, max(0, hi - len(column))), constant_values=np.nan)
+            columns[field].append(column[lo:hi])
+    return {field: np.concatenate(parts) for field, parts in columns.items()}
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """直近 window 日（当日を含む）の平均。期間の先頭は取れる日数だけで平均し、値が 1 つも無ければ NaN"""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    idx = np.arange(len(values))
+    lo = np.maximum(idx - window + 1, 0)
+    total = sums[idx + 1] - sums[lo]
+    count = counts[idx + 1] - counts[lo]
+    return np.divide(total, count, out=np.full(len(values), np.nan), where=count > 0)
+
+
+def weekly_means(values: np.ndarray, start_date: str) -> tuple[list[str], np.ndarray]:
+    """月曜始まりの週ごとの平均（期間の端の週は期間内の日だけで平均する）"""
+    start = _parse(start_date)
+    head = start.weekday()
+    tail = (-(head + len(values))) % 7
+    weeks = np.concatenate((np.full(head, np.nan), values, np.full(tail, np.nan))).reshape(-1, 7)
+    valid = ~np.isnan(weeks)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, weeks, 0.0).sum(axis=1)
+    means = np.divide(sums, counts, out=np.full(len(weeks), np.nan), where=counts > 0)
+    monday = start - timedelta(days=head)
+    labels = [(monday + timedelta(weeks=i)).strftime("%Y-%m-%d") for i in range(len(weeks))]
+    return labels, means
+
+
+def percentiles(values: np.ndarray) -> Optional[dict[str, float]]:
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        return None
+    return {f"p{q}": _round(v) for q, v in zip(PERCENTILES, np.percentile(valid, PERCENTILES))}
+
+
+def _field_stats(values: np.ndarray, start_date: str, window: int) -> dict:
+    valid = values[~np.isnan(values)]
+    labels, means = weekly_means(values, start_date)
+    deltas = np.concatenate(([np.nan], np.diff(means)))
+    return {
+        "count": int(valid.size),
+        "mean": _round(valid.mean()) if valid.size else None,
+        "min": _round(valid.min()) if valid.size else None,
+        "max": _round(valid.max()) if valid.size else None,
+        "percentiles": percentiles(values),
+        "rolling_mean": _to_list(rolling_mean(values, window)),
+        "weekly": [
+            {"week_start": label, "mean": _round(mean), "delta": _round(delta)}
+            for label, mean, delta in zip(labels, means, deltas)
+        ],
+    }
+
+
+def analyze(start_date: str, end_date: str, window: int = DEFAULT_WINDOW) -> dict:
+    """
+    期間の各フィールドの統計をまとめて返す
+
+    Returns:
+        {"start_date", "end_date", "window", "dates",
+         "fields": {field: {count, mean, min, max, percentiles, rolling_mean, weekly}}}
+        rolling_mean は dates と同じ長さ、weekly は月曜始まりの週ごとの平均と前週差
+    """
+    columns = load(start_date, end_date)
+    start = _parse(start_date)
+    days = len(next(iter(columns.values())))
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "window": window,
+        "dates": [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)],
+        "fields": {field: _field_stats(values, start_date, window) for field, values in columns.items()},
+    }
+
+
+_FIELD_LABELS = {
+    "overall_score": ("スコア", ""),
+    "productive_hours": ("生産的時間", "h"),
+    "wasted_hours": ("無駄時間", "h"),
+    "youtube_hours": ("YouTube", "h"),
+    "task_completion_rate": ("タスク完了率", ""),
+}
+
+
+def format_trend(result: dict, weekly: bool = True) -> str:
+    """
+    analyze() の結果をプロンプト用の短いテキストにする（平均・中央値・幅と週ごとの推移）
+    年単位など週の数が多い期間は weekly=False で週ごとの推移を省く
+    """
+    lines = []
+    for field, stats in result["fields"].items():
+        if not stats["count"]:
+            continue
+        label, unit = _FIELD_LABELS.get(field, (field, ""))
+        p = stats["percentiles"]
+        line = (
+            f"- {label}: 平均 {stats['mean']}{unit}, 中央値 {p['p50']}{unit}, "
+            f"p10-p90 {p['p10']}-{p['p90']}{unit}（{stats['count']}日）"
+        )
+        if weekly:
+            line += "／週平均: " + " → ".join(
+                f"{w['mean']}{unit}" + (f"({w['delta']:+})" if w["delta"] is not None else "")
+                for w in stats["weekly"] if w["mean"] is not None
+            )
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,63 @@
+"""
+モデルルーティング
+プロンプト種別ごとにモデルの階層（tier）を決め、軽量モデルの出力が検証に通らなかった場合は
+標準モデルで自動的にやり直す。
+
+- fast:     短いタイトル生成や単純な抽出など。FAST_MODEL（デフォルト claude-haiku-4-5）
+- standard: 深い分析・対話。各関数が従来どおり参照する DAILY/WEEKLY_ANALYSIS_MODEL
+
+ROUTING_OVERRIDES="parse_activities=standard,braindump_title=fast" の形式で環境変数から上書きできる。
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+TIER_FAST = "fast"
+TIER_STANDARD = "standard"
+
+# プロンプト種別 → tier（未登録の種別は standard）
+ROUTING_TABLE = {
+    "braindump_title": TIER_FAST,
+    "parse_activities": TIER_FAST,
+}
+
+
+def _overrides() -> dict[str, str]:
+    raw = os.getenv("ROUTING_OVERRIDES", "")
+    overrides = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        prompt_type, tier = (s.strip() for s in item.split("=", 1))
+        if tier in (TIER_FAST, TIER_STANDARD):
+            overrides[prompt_type] = tier
+    return overrides
+
+
+def tier_for(prompt_type: str) -> str:
+    """プロンプト種別の tier を返す"""
+    return _overrides().get(prompt_type) or ROUTING_TABLE.get(prompt_type, TIER_STANDARD)
+
+
+def select_model(prompt_type: str, standard_model: str) -> str:
+    """
+    プロンプト種別に対応するモデル名を返す
+
+    Args:
+        standard_model: 呼び出し元が従来使っていたモデル（standard tier の実体）
+    """
+    if tier_for(prompt_type) == TIER_FAST:
+        return os.getenv("FAST_MODEL", "claude-haiku-4-5")
+    return standard_model
+
+
+def log_decision(prompt_type: str, model: str, outcome: str, detail: str = "") -> None:
+    """ルーティング結果をログに残す（outcome: ok / escalated / failed）"""
+    log = logger.warning if outcome != "ok" else logger.info
+    log(
+        "model routing type=%s tier=%s model=%s outcome=%s%s",
+        prompt_type, tier_for(prompt_type), model, outcome,
+        f" detail={detail}" if detail else "",
+    )
@@ -0,0 +1,142 @@
+"""
+AI 生成の事前計算（プリジェネレーション）
+夜の「分析する」と朝の問答開始は Claude の応答待ちがそのまま利用者の待ち時間になる。
+利用の少ない時間帯に前日の日次分析と当日の朝の問いかけを生成しておき、
+GET /analysis/{date} と POST /morning/{date}/start がすぐに返せるようにする。
+
+- 前日の日次分析は daily_analyses/{date} に pregenerated=True で保存する
+  （POST /analysis/{date}/generate で入力が変わっていなければそのまま採用される）
+- 当日の朝の問いかけは morning_pregenerations/{date} に保存する
+- どちらも生成に使った入力のハッシュ（source_hash）を持ち、入力が変わったものは使わない。
+  記録の作成・更新・削除時には invalidate_for_record() で該当日の事前生成を破棄する
+
+スケジュールは Cloud Scheduler から POST /scheduler/pregenerate を呼ぶか、
+PREGENERATE_AT（JST の HH:MM）を設定してインスタンス内のスケジューラーで起動する。
+生成自体は job_queue のジョブ（pregen_daily_analysis → pregen_morning_question）で行う。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from services import firestore_service, job_queue
+from utils.helpers import JST, today_jst
+
+logger = logging.getLogger(__name__)
+
+DAILY_ANALYSIS_KIND = "pregen_daily_analysis"
+MORNING_QUESTION_KIND = "pregen_morning_question"
+
+PREGENERATE_AT = os.getenv("PREGENERATE_AT", "")  # 例: "04:30"（空ならインスタンス内スケジューラーは使わない）
+
+# 生成結果の管理用フィールド。入力のハッシュには含めない
+_BOOKKEEPING_KEYS = {"pregenerated", "source_hash", "adopted_at"}
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if k not in _BOOKKEEPING_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def source_hash(*inputs) -> str:
+    """生成に使う入力のハッシュ。入力が同じなら事前生成の結果をそのまま使える"""
+    payload = json.dumps(_canonical(list(inputs)), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _previous_day(date: str) -> str:
+    dt = datetime.strptime(date, "%Y-%m-%d")
+    return (dt - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _next_day(date: str) -> str:
+    dt = datetime.strptime(date, "%Y-%m-%d")
+    return (dt + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def schedule(today: Optional[str] = None) -> dict:
+    """
+    today の朝に向けた事前生成を登録する
+    前日の日次分析を生成し、完了後に当日の朝の問いかけを生成する（問いかけは前日の分析を参照するため）
+    """
+    today = today or today_jst()
+    return job_queue.enqueue(
+        DAILY_ANALYSIS_KIND,
+        {"date": _previous_day(today), "morning_date": today},
+        dedupe_key=f"pregen:{today}",
+    )
+
+
+def enqueue_morning_question(date: str) -> dict:
+    """date の朝の問いかけの事前生成を登録する"""
+    return job_queue.enqueue(MORNING_QUESTION_KIND, {"date": date}, dedupe_key=f"pregen:morning:{date}")
+
+
+def invalidate_for_record(date: str) -> None:
+    """
+    date の記録が変わったときに、その記録を入力とする事前生成を破棄する
+    - date の事前生成分析（利用者が生成・採用した分析は残す）
+    - date + 1 の朝の問いかけ
+    それ以外の日（過去 7 日分として参照しているもの）は使用時のハッシュ照合で弾く。
+    """
+    try:
+        analysis = firestore_service.get_analysis(date)
+        if analysis and analysis.get("pregenerated"):
+            firestore_service.delete_analysis(date)
+            logger.info("事前生成した %s の分析を破棄（記録が変更されたため）", date)
+        if firestore_service.delete_morning_pregeneration(_next_day(date)):
+            logger.info("事前生成した %s の朝の問いかけを破棄（記録が変更されたため）", _next_day(date))
+    except Exception as e:
+        logger.warning("事前生成の破棄に失敗（使用時のハッシュ照合で弾かれる）: %s", e)
+
+
+# ---- インスタンス内スケジューラー ----
+
+def _seconds_until(hhmm: str) -> float:
+    """JST で次に hh:mm になるまでの秒数"""
+    hour, minute = (int(x) for x in hhmm.split(":"))
+    now = datetime.now(JST)
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def _scheduler_loop(hhmm: str) -> None:
+    while True:
+        time.sleep(_seconds_until(hhmm))
+        try:
+            job = schedule()
+            logger.info("事前生成を登録: job=%s", job["id"])
+        except Exception as e:
+            logger.warning("事前生成の登録に失敗: %s", e)
+        time.sleep(60)  # 同じ分に二重登録しない
+
+
+def start_scheduler() -> None:
+    """PREGENERATE_AT が設定されていれば毎日その時刻に schedule() を呼ぶスレッドを起動する"""
+    global _scheduler_started
+    if not PREGENERATE_AT:
+        return
+    try:
+        _seconds_until(PREGENERATE_AT)
+    except ValueError:
+        logger.warning("PREGENERATE_AT の形式が不正です（HH:MM）: %s", PREGENERATE_AT)
+        return
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, args=(PREGENERATE_AT,), name="pregen-scheduler", daemon=True).start()
+    logger.info("事前生成スケジューラー起動: 毎日 %s (JST)", PREGENERATE_AT)
@@ -0,0 +1,140 @@
+"""
+全文検索（日記・ブレインダンプ・Udemy Tips・ありがたいノート）
+search_segments（種類・月ごとの文字 n-gram 転置インデックス）を BM25 で順位付けする。
+
+展開したセグメントはプロセス内にキャッシュし、検索のたびに search_index/meta を 1 件読んで
+版の変わったセグメントだけを読み直す。書き込みの無い間の検索は meta 1 件と
+抜粋用のエントリ本文（上位の件数ぶん）を読むだけで済む。
+"""
+
+import math
+import threading
+from typing import Optional
+
+from services import firestore_service
+from utils import ngram_index
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 80
+KINDS = tuple(firestore_service.SEARCH_COLLECTIONS)
+
+# セグメントID → (版, docs, postings)
+_segments: dict[str, tuple[int, list[dict], dict[str, dict[int, int]]]] = {}
+_lock = threading.Lock()
+
+
+def _load_segments() -> dict[str, tuple[int, list[dict], dict[str, dict[int, int]]]]:
+    """最新の版のセグメントを返す（版が変わったものだけ Firestore から読み直す）"""
+    versions = firestore_service.get_search_meta().get("segments") or {}
+    with _lock:
+        stale = [sid for sid, version in versions.items() if _segments.get(sid, (None,))[0] != version]
+        for sid, doc in firestore_service.get_search_segments(stale).items():
+            _segments[sid] = (
+                doc.get("version", versions[sid]),
+                doc.get("docs") or [],
+                ngram_index.decode_postings(doc.get("postings")),
+            )
+        for sid in list(_segments):
+            if sid not in versions:
+                del _segments[sid]
+        return dict(_segments)
+
+
+def _matches(doc: dict, start_date: Optional[str], end_date: Optional[str], labels: list[str]) -> bool:
+    if start_date and doc["date"] < start_date:
+        return False
+    if end_date and doc["date"] > end_date:
+        return False
+    return all(label in doc.get("labels", []) for label in labels)
+
+
+def _snippet(text: str, query: str) -> str:
+    """検索語の最初の出現の前後を SNIPPET_CHARS 文字ほど切り出す（見つからなければ先頭）"""
+    text = " ".join((text or "").split())
+    lowered = text.lower()
+    position = -1
+    for word in query.lower().split():
+        position = lowered.find(word)
+        if position >= 0:
+            break
+    start = max(0, position - SNIPPET_CHARS // 4) if position >= 0 else 0
+    snippet = text[start:start + SNIPPET_CHARS]
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+def search(
+    query: str,
+    kinds: Optional[list[str]] = None,
+    labels: Optional[list[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 20,
+) -> dict:
+    """
+    検索語を文字 n-gram に分け、すべての n-gram を含むエントリを BM25 の合計で順位付けして返す
+
+    Returns:
+        {"total": 一致件数, "results": [{"kind", "id", "date", "title", "labels", "score", "snippet"}]}
+        IDF・平均文書長は絞り込み前の全エントリで計算する
+    """
+    terms = ngram_index.query_terms(query)
+    if not terms:
+        return {"total": 0, "results": []}
+    kinds = kinds or list(KINDS)
+    labels = labels or []
+    segments = _load_segments()
+
+    total_docs = sum(len(docs) for _, docs, _ in segments.values())
+    if not total_docs:
+        return {"total": 0, "results": []}
+    avg_length = sum(d.get("length", 0) for _, docs, _ in segments.values() for d in docs) / total_docs
+    df = {term: sum(len(postings.get(term, {})) for _, _, postings in segments.values()) for term in terms}
+    if not all(df.values()):
+        return {"total": 0, "results": []}
+    idf = {term: math.log(1 + (total_docs - n + 0.5) / (n + 0.5)) for term, n in df.items()}
+
+    scores: dict[tuple[str, int], float] = {}
+    matched: dict[tuple[str, int], int] = {}
+    for sid, (_, docs, postings) in segments.items():
+        kind, month = sid[:-8], sid[-7:]
+        if kind not in kinds:
+            continue
+        # 月の範囲外のセグメントは中を見ない
+        if (start_date and month < start_date[:7]) or (end_date and month > end_date[:7]):
+            continue
+        for term, weight in idf.items():
+            for number, tf in postings.get(term, {}).items():
+                length_norm = 1 - BM25_B + BM25_B * docs[number].get("length", 0) / (avg_length or 1)
+                score = weight * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                scores[(sid, number)] = scores.get((sid, number), 0.0) + score
+                matched[(sid, number)] = matched.get((sid, number), 0) + 1
+
+    hits = [
+        (score, sid[:-8], segments[sid][1][number])
+        for (sid, number), score in scores.items()
+        if matched[(sid, number)] == len(terms)
+        and _matches(segments[sid][1][number], start_date, end_date, labels)
+    ]
+    hits.sort(key=lambda h: (h[0], h[2]["date"]), reverse=True)
+    top = hits[:limit]
+
+    # 抜粋用の本文は種類ごとにまとめて読む
+    bodies: dict[str, dict[str, dict]] = {}
+    for kind in {kind for _, kind, _ in top}:
+        ids = [doc["id"] for _, k, doc in top if k == kind]
+        bodies[kind] = firestore_service.get_search_entries(kind, ids)
+
+    results = []
+    for score, kind, doc in top:
+        body = bodies.get(kind, {}).get(doc["id"]) or {}
+        results.append({
+            "kind": kind,
+            "id": doc["id"],
+            "date": doc["date"],
+            "title": doc.get("title", ""),
+            "labels": doc.get("labels", []),
+            "score": round(score, 3),
+            "snippet": _snippet(body.get("content", ""), query),
+        })
+    return {"total": len(hits), "results": results}
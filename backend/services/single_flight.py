@@ -0,0 +1,181 @@
+"""
+AI 生成の重複実行防止（single-flight）
+「分析する」の二度押しやモバイルの再送で、同じ日付・週・月の生成が同時に走ると
+Claude を 2 回呼んだうえ結果が上書きし合う。同じキーの生成は 1 回にまとめ、
+後から来た呼び出しは実行中の生成の結果を受け取る。
+
+- 同一インスタンス: キーごとの Future を共有し、後続は完了を待つ
+- インスタンス間: generation_leases/{key} のリースを取った 1 インスタンスだけが生成し、
+  他は解放を待って保存済みの結果を load で読み直す
+
+キーは "analysis:2026-02-19" のように「エンドポイント:日付/週/月」とする。
+Firestore に到達できない場合はインスタンス内の重複防止だけで続行する。
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Iterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from services import firestore_service
+
+logger = logging.getLogger(__name__)
+
+LEASE_TTL = 300  # seconds（Cloud Run のリクエストタイムアウトに合わせる）
+POLL_INTERVAL = 1.0  # 他インスタンスの生成完了を確認する間隔
+
+_INSTANCE_ID = os.getenv("K_REVISION", "local") + "-" + uuid.uuid4().hex[:8]
+
+_lock = threading.Lock()
+_inflight: dict[str, Future] = {}
+
+
+def _join(key: str) -> tuple[bool, Future]:
+    """キーの実行中フライトに参加する。先頭なら (True, 新しい Future)"""
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return False, future
+        future = Future()
+        _inflight[key] = future
+        return True, future
+
+
+def _leave(key: str, future: Future) -> None:
+    with _lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+class _Lease:
+    """
+    インスタンス間のリース
+    with の中で loaded が None 以外なら他インスタンスの生成が完了済み（生成は不要）
+    生成に成功したら completed = True にしてから抜ける
+    """
+
+    def __init__(self, key: str, load: Optional[Callable[[], object]]):
+        self.key = key
+        self.load = load
+        self.owner = f"{_INSTANCE_ID}-{uuid.uuid4().hex[:8]}"
+        self.held = False
+        self.loaded = None
+        self.completed = False
+
+    def __enter__(self) -> "_Lease":
+        waiting_since = time.time()
+        deadline = time.monotonic() + LEASE_TTL
+        while True:
+            try:
+                state = firestore_service.acquire_generation_lease(
+                    self.key, self.owner, LEASE_TTL, waiting_since,
+                )
+            except Exception as e:
+                logger.warning("生成リース %s を取得できませんでした（インスタンス内のみで重複防止）: %s", self.key, e)
+                return self
+            if state == "acquired":
+                self.held = True
+                return self
+            if state == "completed":
+                self.loaded = self.load() if self.load is not None else None
+                if self.loaded is not None:
+                    logger.info("生成 %s は他のインスタンスで完了済みのため結果を再利用", self.key)
+                    return self
+                # 完了済みでも結果を読めない（保存後に削除された等）なら、その完了は無視して
+                # すぐにリースを取り直す（completed_at は変わらないため待っても "completed" のまま）
+                waiting_since = time.time()
+                continue
+            if time.monotonic() >= deadline:
+                # リースの期限切れは acquire 側で拾えるため、ここに来るのは異常時のみ
+                return self
+            time.sleep(POLL_INTERVAL)
+
+    def __exit__(self, *exc) -> None:
+        if not self.held:
+            return
+        try:
+            firestore_service.release_generation_lease(self.key, self.owner, self.completed)
+        except Exception as e:
+            logger.warning("生成リース %s の解放に失敗: %s", self.key, e)
+
+
+def run_sync(key: str, fn: Callable[[], object], load: Optional[Callable[[], object]] = None):
+    """
+    key の生成を 1 回だけ実行し、同時に呼ばれたすべての呼び出し元に同じ結果を返す
+
+    fn:   生成して保存し、保存した内容を返す関数
+    load: 他インスタンスが保存した結果を読み出す関数（無ければ自分で生成し直す）
+    例外も同時に待っていた全員に伝わる。
+    """
+    leader, future = _join(key)
+    if not leader:
+        logger.info("生成 %s は実行中のため完了を待ちます", key)
+        return future.result()
+    try:
+        with _Lease(key, load) as lease:
+            if lease.loaded is not None:
+                result = lease.loaded
+            else:
+                result = fn()
+                lease.completed = True
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _leave(key, future)
+
+
+async def run(key: str, fn: Callable[[], object], load: Optional[Callable[[], object]] = None):
+    """run_sync をスレッドプールで実行する（待っている間もイベントループを塞がない）"""
+    return await run_in_threadpool(run_sync, key, fn, load)
+
+
+def stream(
+    key: str,
+    gen_fn: Callable[[], Iterator[tuple]],
+    load: Optional[Callable[[], object]] = None,
+) -> Iterator[tuple]:
+    """
+    ストリーミング生成版の run_sync
+
+    gen_fn() は (kind, path, value) を返すジェネレーターで、最後に ("done", (), 保存した内容) を返す。
+    先頭の呼び出し元には gen_fn の出力をそのまま流し、後続（同じキーで実行中の
+    run_sync / stream、または他インスタンスの生成）には完了後に "done" だけを返す。
+    """
+    leader, future = _join(key)
+    if not leader:
+        logger.info("生成 %s は実行中のため完了を待ちます", key)
+        yield ("done", (), future.result())
+        return
+    result = None
+    try:
+        with _Lease(key, load) as lease:
+            if lease.loaded is not None:
+                result = lease.loaded
+                yield ("done", (), result)
+            else:
+                for item in gen_fn():
+                    if item[0] == "done":
+                        result = item[2]
+                        lease.completed = True
+                    yield item
+        future.set_result(result)
+    except GeneratorExit:
+        # クライアントが切断した（生成は gen_fn ごと中断される）
+        if result is None:
+            future.set_exception(RuntimeError(f"生成 {key} が中断されました"))
+        else:
+            future.set_result(result)
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _leave(key, future)
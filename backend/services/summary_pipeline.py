@@ -0,0 +1,262 @@
+"""
+階層的なコーチングサマリー
+日次分析 → 週次分析（weekly_analyses）→ 月次 → 年次の順に下の階層の要約だけを読んでまとめる。
+月次は週次分析の数件、年次は月次サマリーの数件を読むだけなので、期間が長くなっても
+1 回のプロンプトは小さいまま。
+
+要約済みの階層は再利用し、下の階層より古くなったものだけを作り直す:
+- 週: その週の日次分析のどれかが週次分析より新しい（created_at）、または週次分析が無い
+- 月・年: 使った下の階層の ID（source_ids）が変わった、またはどれかが要約より新しい
+
+週は木曜日を含む月に属する（ISO 週の年の決め方と同じ）ため、月をまたぐ週も 1 つの月にだけ入る。
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from services import firestore_service, metrics_engine, single_flight
+from services.claude_service import (
+    get_client, _call_claude_with_retry, _extract_json, generate_weekly_analysis,
+)
+from prompts.monthly_summary import (
+    MONTHLY_SUMMARY_SYSTEM_PROMPT, YEARLY_SUMMARY_SYSTEM_PROMPT,
+    build_monthly_summary_prompt, build_yearly_summary_prompt,
+)
+from utils.helpers import now_jst, week_id_to_dates
+
+logger = logging.getLogger(__name__)
+
+# 月次・年次サマリーは Sonnet を使用
+SUMMARY_MODEL = "claude-sonnet-4-6"
+
+
+def _parse(date: str) -> datetime:
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def month_range(year_month: str) -> tuple[str, str]:
+    """月の初日と末日（形式不正は ValueError）"""
+    start = datetime.strptime(f"{year_month}-01", "%Y-%m-%d")
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime("%Y-%m-%d"), (next_month - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def weeks_of_month(year_month: str) -> list[str]:
+    """月に属する週 ID（木曜日がその月にある ISO 週）を古い順に返す"""
+    start, end = (_parse(d) for d in month_range(year_month))
+    # 月の最初の木曜日から 7 日ずつ
+    thursday = start + timedelta(days=(3 - start.weekday()) % 7)
+    weeks = []
+    while thursday <= end:
+        weeks.append(thursday.strftime("%G-W%V"))
+        thursday += timedelta(days=7)
+    return weeks
+
+
+def _newest(docs: list[dict]) -> str:
+    return max((d.get("created_at") or "" for d in docs), default="")
+
+
+def _is_stale(summary: Optional[dict], source_ids: list[str], sources: list[dict]) -> bool:
+    """要約が無い・使った下の階層が変わった・下の階層の方が新しいなら作り直す"""
+    if not summary:
+        return True
+    if summary.get("source_ids") != source_ids:
+        return True
+    return _newest(sources) > (summary.get("created_at") or "")
+
+
+# ---- 週 ----
+
+def _is_analyzable(record: dict) -> bool:
+    """おやすみ日と記録の少ない日を除外する（weekly ルーターと同じ基準）"""
+    return not record.get("rest_day") and len(record.get("parsed_activities", [])) >= 1
+
+
+def ensure_week(week_id: str, records: list[dict], analyses: list[dict]) -> Optional[dict]:
+    """
+    週次分析を返す（古ければ作り直す）
+
+    Args:
+        records / analyses: その週の行動記録と日次分析（呼び出し側で月単位にまとめて取得したもの）
+
+    Returns:
+        週次分析。分析できる記録の無い週は None
+    """
+    daily_records = [r for r in records if _is_analyzable(r)]
+    if not daily_records:
+        return None
+    current = firestore_service.get_weekly_analysis(week_id)
+    if current and _newest(analyses) <= (current.get("created_at") or ""):
+        return current
+
+    def generate() -> dict:
+        week_start, week_end = week_id_to_dates(week_id)
+        last_week_id = (_parse(week_start) - timedelta(days=7)).strftime("%G-W%V")
+        data = generate_weekly_analysis(
+            week_id=week_id,
+            daily_records=daily_records,
+            daily_analyses=analyses,
+            last_week_analysis=firestore_service.get_weekly_analysis(last_week_id),
+        )
+        doc = {
+            "id": week_id,
+            "week_id": week_id,
+            "week_start": week_start,
+            "week_end": week_end,
+            "weekly_summary": data.get("weekly_summary", {}),
+            "deep_analysis": data.get("deep_analysis", {}),
+            "created_at": now_jst(),
+        }
+        return firestore_service.save_weekly_analysis(week_id, doc)
+
+    logger.info("サマリー: 週次分析 %s を作り直します", week_id)
+    # weekly ルーターの生成と同じキーで、同時に走った生成を共有する
+    return single_flight.run_sync(
+        f"weekly:{week_id}", generate, load=lambda: firestore_service.get_weekly_analysis(week_id),
+    )
+
+
+# ---- 月 ----
+
+def _format_week(doc: dict) -> str:
+    s = doc.get("weekly_summary", {})
+    deep = doc.get("deep_analysis", {})
+    wasters = ", ".join(w.get("activity", "") for w in deep.get("biggest_time_wasters", [])[:2])
+    patterns = ", ".join(deep.get("cognitive_patterns", [])[:2])
+    return (
+        f"{doc.get('week_id')}（{doc.get('week_start')}〜{doc.get('week_end')}）: "
+        f"平均スコア={s.get('avg_overall_score', '-')}（{s.get('score_trend', '-')}）, "
+        f"生産的={s.get('avg_productive_hours', '-')}h/日, 無駄={s.get('avg_wasted_hours', '-')}h/日, "
+        f"完了率={s.get('avg_task_completion_rate', '-')}\n"
+        f"  パターン: {deep.get('weekly_pattern', '')}\n"
+        f"  時間泥棒: {wasters or 'なし'} / 思考パターン: {patterns or 'なし'}"
+    )
+
+
+def ensure_month(year_month: str) -> Optional[dict]:
+    """
+    月次サマリーを返す（古ければ、古くなった週だけ作り直してからまとめ直す）
+
+    Returns:
+        月次サマリー。週次分析を作れる週が無い月は None
+    """
+    weeks = weeks_of_month(year_month)
+    first_start, _ = week_id_to_dates(weeks[0])
+    _, last_end = week_id_to_dates(weeks[-1])
+    # 月に属する週の記録と日次分析はまとめて 1 回ずつ読む
+    records = firestore_service.list_records(start_date=first_start, end_date=last_end)
+    analyses = firestore_service.list_analyses(start_date=first_start, end_date=last_end)
+
+    week_docs = []
+    for week_id in weeks:
+        week_start, week_end = week_id_to_dates(week_id)
+        doc = ensure_week(
+            week_id,
+            [r for r in records if week_start <= r.get("date", "") <= week_end],
+            [a for a in analyses if week_start <= a.get("date", "") <= week_end],
+        )
+        if doc:
+            week_docs.append(doc)
+    if not week_docs:
+        return None
+
+    source_ids = [d["week_id"] for d in week_docs]
+    current = firestore_service.get_coaching_summary(year_month)
+    if not _is_stale(current, source_ids, week_docs):
+        return current
+
+    def generate() -> dict:
+        # 数値の傾向（平均・分布・週ごとの推移）は列指向ストアから計算する
+        trend_text = metrics_engine.format_trend(metrics_engine.analyze(*month_range(year_month)))
+        user_prompt = build_monthly_summary_prompt(
+            period=year_month,
+            weeks_text="\n".join(_format_week(d) for d in week_docs),
+            trend_text=trend_text,
+        )
+        return _generate_summary(
+            "monthly_summary", MONTHLY_SUMMARY_SYSTEM_PROMPT, user_prompt,
+            {"period": year_month, "level": "month", "source_ids": source_ids},
+        )
+
+    return single_flight.run_sync(
+        f"monthly:{year_month}", generate, load=lambda: firestore_service.get_coaching_summary(year_month),
+    )
+
+
+# ---- 年 ----
+
+def _format_month(doc: dict) -> str:
+    emo = doc.get("emotional_summary", {})
+    patterns = ", ".join(
+        f"{p.get('pattern', '')}（{p.get('trend', '-')}）" for p in doc.get("top_patterns", [])[:3]
+    )
+    insights = " / ".join(doc.get("key_insights", [])[:3])
+    return (
+        f"{doc.get('period')}: 平均スコア={emo.get('average_score', '-')}\n"
+        f"  パターン: {patterns or 'なし'}\n"
+        f"  気づき: {insights or 'なし'}"
+    )
+
+
+def months_with_data(year: str) -> list[str]:
+    """日次分析のある月（daily_metrics の overall_score 列から判定するため記録を全件読まない）"""
+    scores = firestore_service.get_daily_metrics(year).get("overall_score") or []
+    jan1 = datetime(int(year), 1, 1)
+    months = {
+        (jan1 + timedelta(days=i)).strftime("%Y-%m")
+        for i, score in enumerate(scores) if score is not None
+    }
+    return sorted(m for m in months if m.startswith(year))
+
+
+def ensure_year(year: str) -> Optional[dict]:
+    """
+    年次サマリーを返す（古ければ、古くなった月・週だけ作り直してからまとめ直す）
+
+    Returns:
+        年次サマリー。日次分析の無い年は None
+    """
+    month_docs = [doc for doc in (ensure_month(m) for m in months_with_data(year)) if doc]
+    if not month_docs:
+        return None
+
+    source_ids = [d["period"] for d in month_docs]
+    current = firestore_service.get_coaching_summary(year)
+    if not _is_stale(current, source_ids, month_docs):
+        return current
+
+    def generate() -> dict:
+        trend_text = metrics_engine.format_trend(
+            metrics_engine.analyze(f"{year}-01-01", f"{year}-12-31"), weekly=False,
+        )
+        user_prompt = build_yearly_summary_prompt(
+            year=year,
+            months_text="\n".join(_format_month(d) for d in month_docs),
+            trend_text=trend_text,
+        )
+        return _generate_summary(
+            "yearly_summary", YEARLY_SUMMARY_SYSTEM_PROMPT, user_prompt,
+            {"period": year, "level": "year", "source_ids": source_ids},
+        )
+
+    return single_flight.run_sync(
+        f"yearly:{year}", generate, load=lambda: firestore_service.get_coaching_summary(year),
+    )
+
+
+def _generate_summary(prompt_type: str, system: str, user_prompt: str, meta: dict) -> dict:
+    """Claude でサマリーを生成して coaching_summaries に保存する"""
+    client = get_client()
+    response = _call_claude_with_retry(
+        client,
+        prompt_type=prompt_type,
+        model=SUMMARY_MODEL,
+        max_tokens=4096,
+        system=system,
+        messages=[{"role": "user", "content": user_prompt}],
+    )
+    summary_data = _extract_json(response.content[0].text)
+    doc = {**summary_data, **meta, "created_at": now_jst()}
+    return firestore_service.save_coaching_summary(meta["period"], doc)
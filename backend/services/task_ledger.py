@@ -0,0 +1,50 @@
+"""
+タスクの持ち越し・近日中タスク
+task_ledger（タスクごとの日付別の状態）から、指定日より前の直近 N 日に残っているタスクを集める。
+直近 N 日分の行動記録を読み直さず、last_date の範囲クエリ 1 回で済む。
+
+- 未完了（持ち越し）: 期間内で最後に予定・完了に現れた日に、予定に入っていて完了していないタスク
+  （期間内に後から完了したタスクは含めない）
+- 近日中: 期間内のいずれかの日に近日中（backlog）に入っているタスク
+どちらも最後に現れた日の新しい順、同じ日の中は記録内の並び順。
+"""
+
+from datetime import datetime, timedelta
+
+from services import firestore_service
+
+DEFAULT_DAYS = 7
+
+
+def _newest_first(items: list[tuple[str, int, str]]) -> list[str]:
+    """(日付, 並び順, タスク名) を日付の新しい順・並び順に並べたタスク名"""
+    items = sorted(items, key=lambda item: (item[1], item[2]))
+    return [task for _, _, task in sorted(items, key=lambda item: item[0], reverse=True)]
+
+
+def carry_over(date: str, days: int = DEFAULT_DAYS) -> dict:
+    """
+    date より前の直近 days 日の未完了タスクと近日中タスクを返す
+
+    Returns:
+        {"incomplete": [タスク名], "backlog": [タスク名]}
+    """
+    start = (datetime.strptime(date, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+    incomplete: list[tuple[str, int, str]] = []
+    backlog: list[tuple[str, int, str]] = []
+    for doc in firestore_service.list_task_ledger(start):
+        task = doc.get("task", "")
+        window = {d: e for d, e in (doc.get("dates") or {}).items() if start <= d < date}
+
+        scheduled = [d for d, e in window.items() if e.get("planned") or e.get("completed")]
+        if scheduled:
+            latest = max(scheduled)
+            if not window[latest].get("completed"):
+                incomplete.append((latest, window[latest].get("order", 0), task))
+
+        listed = [d for d, e in window.items() if e.get("backlog")]
+        if listed:
+            latest = max(listed)
+            backlog.append((latest, window[latest].get("order", 0), task))
+
+    return {"incomplete": _newest_first(incomplete), "backlog": _newest_first(backlog)}
@@ -0,0 +1,159 @@
+"""
+タスク実績の集計
+task_stats_monthly（月次ロールアップ）から日別・月別のタスク数、完了率、連続日数を組み立てる。
+記録を期間ごと全件取得せずに、月数ぶんの小さなドキュメントを読むだけで済む。
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from services import firestore_service
+
+MAX_MONTHS = 12       # 月別集計・連続日数で遡る上限
+MAX_DAYS = 120        # 日別で返す上限
+
+
+def _parse(date: str) -> datetime:
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def _format(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+def _previous_month(month: str) -> str:
+    year, mon = (int(x) for x in month.split("-"))
+    return f"{year - 1}-12" if mon == 1 else f"{year}-{mon - 1:02d}"
+
+
+def _rate(completed: int, planned: int) -> float:
+    return round(completed / planned, 3) if planned else 0.0
+
+
+def _month(cache: dict, month: str) -> dict:
+    """月次ロールアップを読む（集計中に同じ月を二度読まないよう cache に置く）"""
+    if month not in cache:
+        cache[month] = firestore_service.get_task_stats_month(month)
+    return cache[month]
+
+
+def _day(cache: dict, date: str) -> dict:
+    return (_month(cache, date[:7]).get("days") or {}).get(date) or {}
+
+
+def _completed_any(day: dict) -> bool:
+    return day.get("completed", 0) > 0
+
+
+def _day_view(date: str, day: dict) -> dict:
+    planned = day.get("planned", 0)
+    completed = day.get("completed", 0)
+    return {
+        "date": date,
+        "planned": planned,
+        "completed": completed,
+        "backlog": day.get("backlog", 0),
+        "completion_rate": _rate(completed, planned),
+    }
+
+
+def _month_view(month: str, doc: dict) -> dict:
+    days = [d for d in (doc.get("days") or {}).values() if d.get("has_record")]
+    planned = sum(d.get("planned", 0) for d in days)
+    completed = sum(d.get("completed", 0) for d in days)
+    return {
+        "month": month,
+        "planned": planned,
+        "completed": completed,
+        "backlog": sum(d.get("backlog", 0) for d in days),
+        "completion_rate": _rate(completed, planned),
+        "active_days": sum(1 for d in days if d.get("completed", 0) > 0),
+    }
+
+
+def _current_streak(cache: dict, today: str, done) -> int:
+    """
+    today から遡って done(day) が続いている日数
+    今日がまだ未達成なら昨日から数える（1 日の途中で連続が途切れて見えないように）
+    """
+    dt = _parse(today)
+    if not done(_day(cache, today)):
+        dt -= timedelta(days=1)
+    oldest = _parse(today) - timedelta(days=MAX_MONTHS * 31)
+    streak = 0
+    while dt > oldest and done(_day(cache, _format(dt))):
+        streak += 1
+        dt -= timedelta(days=1)
+    return streak
+
+
+def _longest_streak(days: list[dict], done) -> int:
+    longest = run = 0
+    for day in days:
+        run = run + 1 if done(day) else 0
+        longest = max(longest, run)
+    return longest
+
+
+def _fill_gaps(days: list[dict]) -> list[dict]:
+    """ロールアップに無い日（記録の無い日）を空の日として補い、連続判定で飛ばされないようにする"""
+    if not days:
+        return []
+    by_date = {d["date"]: d for d in days}
+    dt, end = _parse(days[0]["date"]), _parse(days[-1]["date"])
+    filled = []
+    while dt <= end:
+        filled.append(by_date.get(_format(dt), {}))
+        dt += timedelta(days=1)
+    return filled
+
+
+def summarize(today: str, months: int, days: int, streak_task: Optional[str] = None) -> dict:
+    """
+    タスク実績をまとめて返す
+
+    Args:
+        today: 基準日 (YYYY-MM-DD)
+        months: 月別集計の月数（today の月を含む）
+        days: 日別集計の日数（today を含む）
+        streak_task: 連続日数を数えるタスク名（例: 瞑想）
+    """
+    cache: dict[str, dict] = {}
+
+    month_ids = [today[:7]]
+    while len(month_ids) < months:
+        month_ids.append(_previous_month(month_ids[-1]))
+    month_ids.reverse()
+
+    start = _parse(today) - timedelta(days=days - 1)
+    day_ids = [_format(start + timedelta(days=i)) for i in range(days)]
+
+    # 最長連続は読み込んだ月の範囲で数える
+    loaded_days = []
+    for month in month_ids:
+        doc_days = _month(cache, month).get("days") or {}
+        loaded_days.extend(doc_days[d] for d in sorted(doc_days) if d <= today)
+
+    result = {
+        "today": today,
+        "days": [_day_view(d, _day(cache, d)) for d in day_ids],
+        "months": [_month_view(m, _month(cache, m)) for m in month_ids],
+        "streaks": {
+            "completion": {
+                "current": _current_streak(cache, today, _completed_any),
+                "longest": _longest_streak(_fill_gaps(loaded_days), _completed_any),
+            },
+            "task": None,
+        },
+    }
+    if streak_task:
+        def has_task(day: dict) -> bool:
+            return streak_task in (day.get("completed_tasks") or [])
+
+        result["streaks"]["task"] = {
+            "name": streak_task,
+            "current": _current_streak(cache, today, has_task),
+            "done_today": has_task(_day(cache, today)),
+        }
+    return result
+
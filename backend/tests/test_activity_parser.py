@@ -0,0 +1,63 @@
+"""行動記録のローカル構造化（utils/activity_parser.py）のテスト"""
+
+import pytest
+
+from utils import activity_parser
+
+
+def test_parse_timeline_ranges_and_kanji_times():
+    activities, ambiguous = activity_parser.parse_timeline(
+        "7時半 朝食\n08:00-12:00 仕事\n12時30分〜13時 ランチ\n・21:00　YouTube"
+    )
+    assert ambiguous == []
+    assert [(a["start_time"], a["end_time"], a["category"]) for a in activities] == [
+        ("07:30", None, "生活"),
+        ("08:00", "12:00", "仕事"),
+        ("12:30", "13:00", "生活"),
+        ("21:00", None, "無駄時間"),
+    ]
+
+
+def test_parse_timeline_fullwidth_and_headers():
+    activities, _ = activity_parser.parse_timeline("## 午前\n０７：００ 起床\n- 07:30 朝食")
+    assert [a["start_time"] for a in activities] == ["07:00", "07:30"]
+
+
+@pytest.mark.parametrize("raw", [
+    "9:00-12:00 仕事\n2時間勉強\n21:00 YouTube",   # 所要時間の行
+    "9:00 仕事\n30分 読書",
+    "7時30 朝食",                                    # 分の無い「時」の後に数字
+    "9:000 仕事",
+    "朝起きて仕事をした",                            # 時刻の無い行
+])
+def test_parse_timeline_falls_back_for_non_clock_lines(raw):
+    assert activity_parser.parse_timeline(raw) is None
+
+
+def test_parse_timeline_marks_unknown_lines_ambiguous():
+    activities, ambiguous = activity_parser.parse_timeline("09:00 プランニング\n10:00 会議")
+    assert [a["activity"] for a in activities] == ["会議"]
+    assert ambiguous == ["09:00 プランニング"]
+
+
+@pytest.mark.parametrize("activity, category", [
+    ("ジムで筋トレ", "運動"),
+    ("ランニング30分", "運動"),
+    ("ライブ配信を見る", "娯楽"),
+    ("youtubeを見る", "無駄時間"),
+    ("YouTube", "無駄時間"),
+    ("朝ご飯", "生活"),
+    # 別の語の一部になっているキーワードは数えない
+    ("プランニング", None),
+    ("ライブラリの調査", None),
+    ("ジムニー洗車", None),
+    # 複数カテゴリに当たる行は曖昧
+    ("会議の後にゲーム", None),
+])
+def test_categorize(activity, category):
+    assert activity_parser.categorize(activity) == category
+
+
+def test_entertainment_over_an_hour_is_not_productive():
+    activities, _ = activity_parser.parse_timeline("20:00 映画\n22:30 就寝")
+    assert activities[0]["is_productive"] is False
@@ -0,0 +1,25 @@
+"""AI 呼び出しのコスト見積もり（services/ai_metrics.py）のテスト"""
+
+import pytest
+
+from services import ai_metrics
+
+
+@pytest.mark.parametrize("model, price", [
+    ("claude-opus-4-20250514", (15.0, 75.0, 18.75, 1.50)),
+    ("claude-opus-4-0", (15.0, 75.0, 18.75, 1.50)),
+    ("claude-opus-4-1-20250805", (15.0, 75.0, 18.75, 1.50)),
+    ("claude-opus-4-5-20251101", (5.0, 25.0, 6.25, 0.50)),
+    ("claude-opus-4-6", (5.0, 25.0, 6.25, 0.50)),
+    ("claude-sonnet-4-6", (3.0, 15.0, 3.75, 0.30)),
+    ("claude-3-5-haiku-20241022", (0.80, 4.0, 1.0, 0.08)),
+    ("unknown-model", ai_metrics.DEFAULT_PRICING),
+])
+def test_pricing_uses_most_specific_prefix(model, price):
+    assert ai_metrics._pricing(model) == price
+
+
+def test_estimate_cost_batch_discount():
+    usage = {"input_tokens": 1_000_000, "output_tokens": 1_000_000}
+    assert ai_metrics.estimate_cost("claude-opus-4-1", usage) == pytest.approx(90.0)
+    assert ai_metrics.estimate_cost("claude-opus-4-1", usage, batch=True) == pytest.approx(45.0)
@@ -0,0 +1,82 @@
+"""日次スコアのオンライン異常検知（utils/anomaly.py）のテスト"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import anomaly
+
+
+def _dates(n: int, start: str = "2026-02-01") -> list[str]:
+    first = datetime.strptime(start, "%Y-%m-%d")
+    return [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(n)]
+
+
+def _ingest_all(scores: list[float], start: str = "2026-02-01") -> dict:
+    state = anomaly.empty_state()
+    for date, score in zip(_dates(len(scores), start), scores):
+        state = anomaly.ingest(state, date, {"overall_score": score, "wasted_hours": None})
+    return state
+
+
+def test_mean_matches_simple_average_during_warmup():
+    state = _ingest_all([60, 70, 80])
+    stats = state["fields"]["overall_score"]
+    assert stats["n"] == 3
+    assert stats["mean"] == pytest.approx(70.0)
+    assert state["fields"]["wasted_hours"]["n"] == 0
+    assert state["events"] == []
+
+
+def test_no_events_before_warmup():
+    state = _ingest_all([60] * (anomaly.WARMUP - 1) + [5])
+    assert state["events"] == []
+
+
+def test_outlier_is_an_anomaly():
+    state = _ingest_all([60, 62, 58, 61, 59, 60, 61, 60, 20])
+    (event,) = state["events"]
+    assert event["kind"] == "anomaly"
+    assert event["date"] == "2026-02-09"
+    assert event["direction"] == "down"
+    assert event["bad"] is True
+    assert event["z"] <= -anomaly.ANOMALY_Z
+
+
+def test_sustained_level_change_is_a_shift():
+    state = _ingest_all([60, 62, 58, 61, 59, 60, 61] + [50] * 6)
+    shifts = [e for e in state["events"] if e["kind"] == "shift"]
+    assert shifts
+    assert shifts[0]["direction"] == "down"
+    assert shifts[0]["since"] == "2026-02-08"
+
+
+def test_ingest_does_not_mutate_and_rewind_restores():
+    state = _ingest_all([60, 62, 58, 61, 59, 60, 61, 60])
+    before = anomaly.rewind(state)
+    again = anomaly.ingest(before, state["last_date"], {"overall_score": 60})
+    assert again["fields"] == state["fields"]
+    assert again["events"] == state["events"]
+    # 別の値で取り込み直すと前の値の影響は残らない
+    replaced = anomaly.ingest(before, state["last_date"], {"overall_score": 20})
+    assert replaced["events"] and not state["events"]
+    assert anomaly.rewind(anomaly.rewind(state)) is None
+
+
+def test_baselines_exclude_the_day_itself():
+    state = _ingest_all([60] * 7 + [90])
+    last = state["last_date"]
+    assert anomaly.baselines(state, last)["overall_score"]["mean"] == 60.0
+    assert anomaly.baselines(state)["overall_score"]["mean"] > 60.0
+    assert anomaly.baselines(state, "2026-03-31") == anomaly.baselines(state)
+    # 最終日より前の日の基準は引けない
+    assert anomaly.baselines(state, "2026-02-03") == {}
+
+
+def test_format_facts_cites_recent_events():
+    state = _ingest_all([60, 62, 58, 61, 59, 60, 61, 60, 20])
+    facts = anomaly.format_facts(state, "2026-02-10")
+    assert "最近の基準" in facts
+    assert "2/9 スコアが外れ値: 20" in facts
+    assert anomaly.format_facts(state, "2026-03-31").count("外れ値") == 0
+    assert anomaly.format_facts(anomaly.empty_state(), "2026-02-10") == ""
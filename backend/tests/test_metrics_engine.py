@@ -0,0 +1,54 @@
+"""日次分析の数値トレンド（services/metrics_engine.py）のテスト"""
+
+import numpy as np
+import pytest
+
+from services import metrics_engine
+
+nan = np.nan
+
+
+def _list(values: np.ndarray) -> list:
+    return [None if np.isnan(v) else round(float(v), 3) for v in values]
+
+
+def test_rolling_mean_skips_missing_days():
+    values = np.array([1.0, nan, 3.0, 5.0, nan, nan, nan])
+    assert _list(metrics_engine.rolling_mean(values, 3)) == [1.0, 1.0, 2.0, 4.0, 4.0, 5.0, None]
+
+
+def test_rolling_mean_window_one_is_identity():
+    values = np.array([2.0, nan, 4.0])
+    assert _list(metrics_engine.rolling_mean(values, 1)) == [2.0, None, 4.0]
+
+
+def test_weekly_means_align_to_monday():
+    # 2026-02-19 は木曜。木〜日の 4 日 + 翌週の月〜水の 3 日
+    values = np.array([1.0, 2.0, 3.0, nan, 10.0, nan, 20.0])
+    labels, means = metrics_engine.weekly_means(values, "2026-02-19")
+    assert labels == ["2026-02-16", "2026-02-23"]
+    assert _list(means) == [2.0, 15.0]
+
+
+def test_weekly_means_empty_week_is_nan():
+    values = np.array([nan] * 7 + [4.0])
+    labels, means = metrics_engine.weekly_means(values, "2026-02-16")
+    assert labels == ["2026-02-16", "2026-02-23"]
+    assert _list(means) == [None, 4.0]
+
+
+def test_percentiles():
+    values = np.array([nan, 1.0, 2.0, 3.0, 4.0, 5.0])
+    result = metrics_engine.percentiles(values)
+    assert result["p50"] == 3.0
+    assert result["p10"] == pytest.approx(1.4)
+    assert metrics_engine.percentiles(np.array([nan, nan])) is None
+
+
+def test_field_stats_weekly_delta():
+    values = np.array([1.0] * 7 + [3.0] * 7)
+    stats = metrics_engine._field_stats(values, "2026-02-16", 7)
+    assert stats["count"] == 14
+    assert stats["mean"] == 2.0
+    assert [(w["mean"], w["delta"]) for w in stats["weekly"]] == [(1.0, None), (3.0, 2.0)]
+    assert stats["rolling_mean"][-1] == 3.0
@@ -0,0 +1,72 @@
+"""全文検索の索引語（utils/ngram_index.py）とセグメントの組み立て（_build_search_segment）のテスト"""
+
+from services.firestore_service import _build_search_segment
+from utils import ngram_index
+
+
+def _entry(entry_id: str, text: str) -> dict:
+    return {"id": entry_id, "date": "2026-02-19", "title": "", "labels": [], "text": text}
+
+
+def _segment(*texts: str) -> dict:
+    entries = {f"e{i}": _entry(f"e{i}", text) for i, text in enumerate(texts)}
+    return _build_search_segment({}, entries)
+
+
+def _hits(segment: dict, query: str) -> list[str]:
+    """query のすべての索引語を含むエントリの ID（search_service.search と同じ一致条件）"""
+    postings = ngram_index.decode_postings(segment["postings"])
+    terms = ngram_index.query_terms(query)
+    if not terms:
+        return []
+    numbers = set.intersection(*(set(postings.get(term, {})) for term in terms))
+    return sorted(segment["docs"][n]["id"] for n in numbers)
+
+
+SEGMENT_TEXTS = (
+    "昨日は怖い夢を見た。瞑想してから寝た",
+    "猫と遊んだ。瞑想は休み",
+    "朝から瞑想、夢の内容をメモ",
+)
+
+
+def test_single_character_query():
+    segment = _segment(*SEGMENT_TEXTS)
+    assert _hits(segment, "夢") == ["e0", "e2"]
+    assert _hits(segment, "猫") == ["e1"]
+
+
+def test_two_and_three_character_queries():
+    segment = _segment(*SEGMENT_TEXTS)
+    assert _hits(segment, "瞑想") == ["e0", "e1", "e2"]
+    assert _hits(segment, "遊んだ") == ["e1"]
+    assert _hits(segment, "犬") == []
+
+
+def test_space_separated_query():
+    segment = _segment(*SEGMENT_TEXTS)
+    assert _hits(segment, "瞑想 夢") == ["e0", "e2"]
+    assert _hits(segment, "瞑想　猫") == ["e1"]
+
+
+def test_query_terms_do_not_use_unigrams_for_longer_words():
+    assert ngram_index.query_terms("夢") == ["夢"]
+    assert ngram_index.query_terms("瞑想する") == ["瞑想", "想す", "する", "瞑想す", "想する"]
+
+
+def test_replacing_an_entry_keeps_other_postings():
+    segment = _segment(*SEGMENT_TEXTS)
+    segment = _build_search_segment(segment, {"e0": None, "e3": _entry("e3", "夢日記")})
+    assert _hits(segment, "夢") == ["e2", "e3"]
+    assert _hits(segment, "瞑想") == ["e1", "e2"]
+
+
+def test_postings_round_trip():
+    postings = {
+        "夢": {0: 1, 2: 3},
+        "瞑想": {0: 1, 1: 1, 7: 2},
+        "ab": {5: 10},
+    }
+    assert ngram_index.decode_postings(ngram_index.encode_postings(postings)) == postings
+    assert ngram_index.decode_postings(ngram_index.encode_postings({})) == {}
+    assert ngram_index.decode_postings(b"") == {}
@@ -0,0 +1,59 @@
+"""ストリーミング中の JSON の逐次解析（utils/partial_json.py）のテスト"""
+
+import json
+
+from utils.partial_json import PartialJSONSections
+
+DOCUMENT = {
+    "summary": {"overall_score": 72, "productive_hours": 4.5, "note": "a \"quoted\" , } ] text"},
+    "analysis": {
+        "good_points": ["朝に勉強した", "運動した"],
+        "bad_points": [],
+        "comparison_with_past": {"trend": "improving", "score": None, "flag": True},
+    },
+}
+
+
+def _feed_in_chunks(text: str, size: int, max_depth: int = 2) -> list:
+    parser = PartialJSONSections(max_depth=max_depth)
+    sections = []
+    for i in range(0, len(text), size):
+        sections.extend(parser.feed(text[i:i + size]))
+    return sections
+
+
+def test_sections_are_emitted_in_order_for_any_chunking():
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=2)
+    expected = [
+        (("summary", "overall_score"), 72),
+        (("summary", "productive_hours"), 4.5),
+        (("summary", "note"), DOCUMENT["summary"]["note"]),
+        (("summary",), DOCUMENT["summary"]),
+        (("analysis", "good_points"), ["朝に勉強した", "運動した"]),
+        (("analysis", "bad_points"), []),
+        (("analysis", "comparison_with_past"), DOCUMENT["analysis"]["comparison_with_past"]),
+        (("analysis",), DOCUMENT["analysis"]),
+    ]
+    for size in (1, 3, 7, len(text)):
+        assert _feed_in_chunks(text, size) == expected
+
+
+def test_max_depth_one_returns_only_top_level():
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    sections = _feed_in_chunks(text, 5, max_depth=1)
+    assert sections == [(("summary",), DOCUMENT["summary"]), (("analysis",), DOCUMENT["analysis"])]
+
+
+def test_incomplete_section_is_not_emitted():
+    parser = PartialJSONSections()
+    assert parser.feed('{"summary": {"overall_score": 7') == []
+    # 数値は区切り文字が来るまで確定しない
+    assert parser.feed("0") == []
+    assert parser.feed(",") == [(("summary", "overall_score"), 70)]
+
+
+def test_array_elements_are_not_sections():
+    parser = PartialJSONSections()
+    sections = parser.feed('{"analysis": {"good_points": [{"a": 1}, "b"')
+    assert sections == []
+    assert parser.feed("]") == [(("analysis", "good_points"), [{"a": 1}, "b"])]
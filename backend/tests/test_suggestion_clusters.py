@@ -0,0 +1,83 @@
+"""MinHash（utils/minhash.py）と改善提案のクラスタリング（_apply_suggestion_updates）のテスト"""
+
+from services.firestore_service import SUGGESTION_TEXT_DATES, _apply_suggestion_updates
+from utils import minhash
+
+
+def _item(text: str, priority: str = "medium", category: str = "時間管理") -> dict:
+    return {"suggestion": text, "priority": priority, "category": category}
+
+
+def test_signature_is_stable_and_normalized():
+    a = minhash.signature("ＹｏｕＴｕｂｅを見る時間を決める！")
+    b = minhash.signature("youtube を見る時間を決める")
+    assert a == b
+    assert len(a) == minhash.NUM_PERM
+    assert minhash.decode(minhash.encode(a)) == a
+
+
+def test_similarity_tracks_jaccard():
+    base = minhash.signature("YouTubeを見る時間を決めてタイマーをかける")
+    close = minhash.signature("YouTubeを見る時間を決めてタイマーをかけよう")
+    other = minhash.signature("寝る前にストレッチをする")
+    assert minhash.similarity(base, base) == 1.0
+    assert minhash.similarity(base, close) >= 0.6
+    assert minhash.similarity(base, other) <= 0.2
+    assert minhash.similarity(base, []) == 0.0
+
+
+def test_shingles_of_short_text():
+    assert minhash.shingles("a") == {"a"}
+    assert minhash.shingles("！？") == set()
+
+
+def test_similar_suggestions_share_a_cluster():
+    clusters = _apply_suggestion_updates({}, {
+        "2026-02-01": [_item("YouTubeを見る時間を決めてタイマーをかける", "low"), _item("寝る前にストレッチをする")],
+        "2026-02-03": [_item("YouTubeを見る時間を決めてタイマーをかけよう", "high")],
+    })
+    assert len(clusters) == 2
+    youtube = next(c for c in clusters.values() if c["count"] == 2)
+    assert youtube["first_seen"] == "2026-02-01"
+    assert youtube["last_seen"] == "2026-02-03"
+    assert youtube["priority"] == "high"
+    assert youtube["priority_counts"] == {"high": 1, "medium": 0, "low": 1}
+    assert youtube["suggestion"] == "YouTubeを見る時間を決めてタイマーをかけよう"
+
+
+def test_replacing_a_date_removes_its_occurrences():
+    clusters = _apply_suggestion_updates({}, {
+        "2026-02-01": [_item("寝る前にストレッチをする")],
+        "2026-02-02": [_item("寝る前にストレッチをする")],
+    })
+    clusters = _apply_suggestion_updates(clusters, {"2026-02-02": []})
+    (cluster,) = clusters.values()
+    assert cluster["occurrences"] == ["2026-02-01:medium"]
+    clusters = _apply_suggestion_updates(clusters, {"2026-02-01": []})
+    assert clusters == {}
+
+
+def test_removing_newest_date_restores_previous_text():
+    clusters = _apply_suggestion_updates({}, {
+        "2026-02-01": [_item("YouTubeを見る時間を決めてタイマーをかける")],
+        "2026-02-05": [_item("YouTubeを見る時間を決めてタイマーをかけよう", category="習慣")],
+    })
+    clusters = _apply_suggestion_updates(clusters, {"2026-02-05": []})
+    (cluster,) = clusters.values()
+    assert cluster["suggestion"] == "YouTubeを見る時間を決めてタイマーをかける"
+    assert cluster["category"] == "時間管理"
+
+
+def test_older_date_does_not_replace_newer_text():
+    clusters = _apply_suggestion_updates({}, {"2026-02-05": [_item("YouTubeを見る時間を決めてタイマーをかけよう")]})
+    clusters = _apply_suggestion_updates(clusters, {"2026-01-20": [_item("YouTubeを見る時間を決めてタイマーをかける")]})
+    (cluster,) = clusters.values()
+    assert cluster["suggestion"] == "YouTubeを見る時間を決めてタイマーをかけよう"
+
+
+def test_texts_are_bounded():
+    text = "YouTubeを見る時間を決めてタイマーをかける"
+    clusters = _apply_suggestion_updates({}, {f"2026-02-{d:02d}": [_item(text)] for d in range(1, 11)})
+    (cluster,) = clusters.values()
+    assert cluster["count"] == 10
+    assert sorted(cluster["texts"]) == [f"2026-02-{d:02d}" for d in range(11 - SUGGESTION_TEXT_DATES, 11)]
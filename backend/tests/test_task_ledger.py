@@ -0,0 +1,82 @@
+"""タスク台帳（_task_ledger_day / _task_ledger_fields）と持ち越しの集計（services/task_ledger.py）のテスト"""
+
+import pytest
+
+from services import firestore_service, task_ledger
+
+
+def _record(planned=(), completed=(), backlog=()) -> dict:
+    return {"tasks": {"planned": list(planned), "completed": list(completed), "backlog": list(backlog)}}
+
+
+def _ledger(records: dict[str, dict]) -> list[dict]:
+    """日付 → 記録 から台帳のドキュメントを作る（_rebuild_task_ledger と同じ組み立て）"""
+    by_task: dict[str, dict[str, dict]] = {}
+    for date, record in records.items():
+        for task, entry in firestore_service._task_ledger_day(record).items():
+            by_task.setdefault(task, {})[date] = entry
+    return [firestore_service._task_ledger_fields(task, dates) for task, dates in by_task.items()]
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    docs: list[dict] = []
+
+    def list_task_ledger(since: str) -> list[dict]:
+        return [doc for doc in docs if doc["last_date"] >= since]
+
+    monkeypatch.setattr(firestore_service, "list_task_ledger", list_task_ledger)
+    return docs
+
+
+def test_task_ledger_day_keeps_order_and_flags():
+    day = firestore_service._task_ledger_day(_record(planned=["A", "B"], completed=["B", "C"], backlog=["D", ""]))
+    assert day == {
+        "A": {"planned": True, "completed": False, "backlog": False, "order": 0},
+        "B": {"planned": True, "completed": True, "backlog": False, "order": 1},
+        "C": {"planned": False, "completed": True, "backlog": False, "order": 2},
+        "D": {"planned": False, "completed": False, "backlog": True, "order": 3},
+    }
+
+
+def test_task_ledger_fields_count_days_since_last_completion():
+    (doc,) = _ledger({
+        "2026-02-01": _record(planned=["A"]),
+        "2026-02-02": _record(planned=["A"], completed=["A"]),
+        "2026-02-04": _record(planned=["A"]),
+        "2026-02-05": _record(planned=["A"]),
+    })
+    assert doc["completed_date"] == "2026-02-02"
+    assert doc["first_planned_date"] == "2026-02-04"
+    assert doc["carried_days"] == 2
+    assert doc["last_date"] == "2026-02-05"
+
+
+def test_carry_over_incomplete_and_backlog(ledger):
+    ledger.extend(_ledger({
+        "2026-02-10": _record(planned=["レポート", "買い物", "読書"], backlog=["確定申告"]),
+        "2026-02-11": _record(planned=["レポート", "a/b テスト"], completed=["買い物"], backlog=["確定申告", "歯医者"]),
+        "2026-02-12": _record(planned=["英語"]),
+    }))
+    result = task_ledger.carry_over("2026-02-12")
+    # 当日（02-12）は含めない。後から完了した 買い物 は含めない
+    assert result["incomplete"] == ["レポート", "a/b テスト", "読書"]
+    assert result["backlog"] == ["確定申告", "歯医者"]
+
+
+def test_carry_over_window(ledger):
+    ledger.extend(_ledger({
+        "2026-02-01": _record(planned=["古いタスク"], backlog=["古い近日中"]),
+        "2026-02-09": _record(planned=["新しいタスク"]),
+    }))
+    assert task_ledger.carry_over("2026-02-10", days=7) == {"incomplete": ["新しいタスク"], "backlog": []}
+    assert task_ledger.carry_over("2026-02-10", days=10)["incomplete"] == ["新しいタスク", "古いタスク"]
+
+
+def test_carry_over_ignores_completion_after_date(ledger):
+    ledger.extend(_ledger({
+        "2026-02-09": _record(planned=["A"]),
+        "2026-02-11": _record(completed=["A"]),
+    }))
+    assert task_ledger.carry_over("2026-02-10")["incomplete"] == ["A"]
+    assert task_ledger.carry_over("2026-02-12")["incomplete"] == []
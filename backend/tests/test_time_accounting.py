@@ -0,0 +1,90 @@
+"""行動記録の時間集計（utils/time_accounting.py）のテスト"""
+
+from utils import time_accounting
+
+
+def _activity(start, end, activity, category, is_productive=True):
+    return {"start_time": start, "end_time": end, "activity": activity, "category": category,
+            "is_productive": is_productive}
+
+
+def test_open_end_without_next_activity_runs_until_bedtime():
+    result = time_accounting.compute([
+        _activity("19:00", "21:00", "仕事", "仕事"),
+        _activity("22:00", None, "YouTube", "無駄時間", False),
+    ])
+    assert result["open_end_count"] == 1
+    assert result["open_end_minutes"] == 120
+    assert result["youtube_minutes"] == 120
+    assert result["wasted_minutes"] == 120
+    assert result["gaps"] == [{"start": "21:00", "end": "22:00", "minutes": 60}]
+    assert result["issues"] == []
+
+
+def test_open_end_is_capped():
+    result = time_accounting.compute([_activity("01:00", None, "YouTube", "無駄時間", False)])
+    assert result["open_end_minutes"] == time_accounting.OPEN_END_MAX_MINUTES
+
+
+def test_open_end_closes_at_next_activity():
+    result = time_accounting.compute([
+        _activity("09:00", None, "仕事", "仕事"),
+        _activity("12:00", "13:00", "昼食", "生活"),
+    ])
+    assert result["category_minutes"] == {"仕事": 180, "生活": 60}
+    assert result["open_end_count"] == 0
+    assert result["productive_ratio"] == 1.0
+
+
+def test_timeline_crossing_midnight():
+    result = time_accounting.compute([
+        _activity("22:00", "23:30", "勉強", "勉強"),
+        _activity("23:30", "01:00", "YouTube", "無駄時間", False),
+        _activity("01:00", "07:00", "睡眠", "生活"),
+    ])
+    assert result["issues"] == []
+    assert result["category_minutes"] == {"勉強": 90, "無駄時間": 90, "生活": 360}
+    assert result["total_minutes"] == 540
+    assert result["gaps"] == []
+
+
+def test_out_of_order_times_are_rejected():
+    # 「2時間勉強」を 02:00 開始と読み違えたような記録
+    result = time_accounting.compute([
+        _activity("09:00", "12:00", "仕事", "仕事"),
+        _activity("02:00", None, "間勉強", "勉強"),
+        _activity("21:00", None, "YouTube", "無駄時間", False),
+    ])
+    assert result["issues"]
+    assert time_accounting.summary_hours(result) == {}
+    assert "計算できません" in time_accounting.format_facts(result)
+
+
+def test_backwards_range_is_rejected():
+    result = time_accounting.compute([_activity("12:00", "09:00", "仕事", "仕事")])
+    assert result["issues"]
+
+
+def test_total_over_a_day_is_rejected():
+    result = time_accounting.compute([
+        _activity("08:00", "22:00", "仕事", "仕事"),
+        _activity("09:00", "23:00", "勉強", "勉強"),
+    ])
+    assert result["issues"] == ["記録の合計（28時間）が 1 日を超える"]
+
+
+def test_summary_hours_prefers_longer_screen_time():
+    result = time_accounting.compute([
+        _activity("20:00", "21:00", "YouTube", "無駄時間", False),
+        _activity("21:00", "22:00", "勉強", "勉強"),
+    ])
+    screen_time = {"apps": [{"name": "YouTube", "duration_minutes": 90}]}
+    assert time_accounting.summary_hours(result, screen_time) == {
+        "productive_hours": 1.0, "wasted_hours": 1.0, "youtube_hours": 1.5,
+    }
+
+
+def test_for_record_recomputes_old_accounting():
+    activities = [_activity("22:00", None, "YouTube", "無駄時間", False)]
+    record = {"parsed_activities": activities, "time_accounting": {"youtube_minutes": 0, "open_end_count": 1}}
+    assert time_accounting.for_record(record)["youtube_minutes"] == 120
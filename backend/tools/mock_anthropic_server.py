@@ -0,0 +1,507 @@
+"""
+ローカル用 Anthropic API スタンドイン
+実トークンを消費せず、実際のレート制限にも当たらずに、AI を呼ぶエンドポイントの
+負荷試験・レイテンシ計測・リトライ処理の検証を行うための簡易サーバー
+
+- POST /v1/messages          Messages API（stream=true なら SSE でトークンを逐次返す）
+- POST /v1/messages/batches  Message Batches（バックフィルの検証用）
+- GET/PUT /mock/config       遅延・トークン速度・エラー注入・同時実行上限を起動中に変更
+- GET /mock/stats            リクエスト数・同時実行数のピーク・注入したエラー数
+
+応答は system プロンプトからプロンプト種別を判定した定型 JSON / テキスト。
+構造化出力（tool_use 強制）で定型が無い種別は input_schema からダミー値を組み立てる。
+
+起動:
+    uvicorn tools.mock_anthropic_server:app --port 8787
+
+バックエンド側は ANTHROPIC_BASE_URL=http://localhost:8787 を設定すると
+claude_service の呼び出し先がこのサーバーになる。
+
+環境変数（/mock/config の初期値）:
+    MOCK_BATCH_SECONDS      Batch が ended になるまでの秒数（デフォルト 5）
+    MOCK_LATENCY_MS         最初のトークンまでの遅延（デフォルト 300）
+    MOCK_TOKENS_PER_SECOND  出力トークンの生成速度。0 なら待たない（デフォルト 80）
+    MOCK_RATE_LIMIT_RATE    429 rate_limit_error を返す確率 0.0-1.0（デフォルト 0）
+    MOCK_OVERLOAD_RATE      529 overloaded_error を返す確率 0.0-1.0（デフォルト 0）
+    MOCK_RETRY_AFTER        429 / 529 に付ける retry-after 秒（デフォルト 5）
+    MOCK_MAX_CONCURRENCY    同時実行の上限。超えたリクエストは 429。0 なら無制限（デフォルト 0）
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from prompts.daily_analysis import DAILY_ANALYSIS_SYSTEM_PROMPT
+from prompts.weekly_analysis import WEEKLY_ANALYSIS_SYSTEM_PROMPT
+from prompts.journal_analysis import JOURNAL_ANALYSIS_SYSTEM_PROMPT, WEEKLY_JOURNAL_DIGEST_SYSTEM_PROMPT
+from prompts.monthly_summary import MONTHLY_SUMMARY_SYSTEM_PROMPT, YEARLY_SUMMARY_SYSTEM_PROMPT
+from prompts.socratic_dialogue import (
+    SOCRATIC_QUESTION_SYSTEM_PROMPT, SOCRATIC_FOLLOWUP_SYSTEM_PROMPT, SOCRATIC_SYNTHESIS_SYSTEM_PROMPT,
+)
+from prompts.morning_planning import (
+    MORNING_QUESTION_SYSTEM_PROMPT, MORNING_FOLLOWUP_SYSTEM_PROMPT, MORNING_SYNTHESIS_SYSTEM_PROMPT,
+)
+from prompts.diary_dialogue import (
+    DIARY_QUESTION_SYSTEM_PROMPT, DIARY_FOLLOWUP_SYSTEM_PROMPT, DIARY_SYNTHESIS_SYSTEM_PROMPT,
+)
+
+app = FastAPI(title="Mock Anthropic API")
+
+BATCH_SECONDS = float(os.getenv("MOCK_BATCH_SECONDS", "5"))
+
+# /mock/config で起動中に変更できる
+_config = {
+    "latency_ms": float(os.getenv("MOCK_LATENCY_MS", "300")),
+    "tokens_per_second": float(os.getenv("MOCK_TOKENS_PER_SECOND", "80")),
+    "rate_limit_rate": float(os.getenv("MOCK_RATE_LIMIT_RATE", "0")),
+    "overload_rate": float(os.getenv("MOCK_OVERLOAD_RATE", "0")),
+    "retry_after": int(os.getenv("MOCK_RETRY_AFTER", "5")),
+    "max_concurrency": int(os.getenv("MOCK_MAX_CONCURRENCY", "0")),
+}
+
+_stats = {
+    "requests": 0,
+    "completed": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "rate_limited": 0,
+    "overloaded": 0,
+    "concurrency_rejected": 0,
+    "output_tokens": 0,
+    "by_prompt_type": {},
+}
+
+CHARS_PER_TOKEN = 2  # usage の output_tokens と同じ換算（日本語混じりの概算）
+CHUNK_TOKENS = 4     # 1 回の delta で送るトークン数
+
+# batch_id -> {"created": float, "requests": [...], "object": {...}}
+_batches: dict[str, dict] = {}
+
+
+# ---- 定型レスポンス ----
+
+_DAILY_SAMPLE = {
+    "summary": {
+        "tasks_completed_count": 3,
+        "task_completion_rate": 0.75,
+        "overall_score": 68,
+    },
+    "analysis": {
+        "good_points": ["午前中に集中して作業できた"],
+        "bad_points": ["夕食後に YouTube を長時間視聴した"],
+        "root_causes": ["疲労時の代替行動が決まっていない"],
+        "thinking_weaknesses": ["「少しだけ」という楽観バイアス"],
+        "behavior_weaknesses": ["スマホを手元に置いたまま休憩している"],
+        "improvement_suggestions": [
+            {"suggestion": "夕食後はスマホを別室に置く", "priority": "high", "category": "環境設計"},
+        ],
+        "comparison_with_past": {
+            "recurring_patterns": ["夜の動画視聴"],
+            "improvements_from_last_week": ["午前の集中時間が増えた"],
+        },
+    },
+}
+
+_WEEKLY_SAMPLE = {
+    "weekly_summary": {
+        "avg_productive_hours": 5.0,
+        "avg_wasted_hours": 1.8,
+        "avg_task_completion_rate": 0.7,
+        "total_youtube_hours": 6.5,
+        "avg_overall_score": 64,
+        "score_trend": "stable",
+    },
+    "deep_analysis": {
+        "weekly_pattern": "週の前半に集中し、後半は疲労で失速する傾向",
+        "biggest_time_wasters": [
+            {"activity": "YouTube", "total_hours": 6.5, "trigger": "夕食後の休憩"},
+        ],
+        "cognitive_patterns": ["先延ばし"],
+        "improvement_plan": {
+            "next_week_goals": ["夜のスマホ時間を1時間以内にする"],
+            "concrete_actions": ["21時以降はスマホを充電器に置く"],
+            "habit_building": ["朝の15分計画"],
+        },
+        "progress_vs_last_week": {"improved": [], "declined": [], "unchanged": ["夜の動画視聴"]},
+    },
+}
+
+_JOURNAL_SAMPLE = {
+    "emotions": [{"tag": "充実感", "intensity": 0.6, "context": "作業が進んだ"}],
+    "blockers": [],
+    "mood_score": 65,
+    "energy_level": "medium",
+    "key_themes": ["仕事"],
+    "insights": ["午前の方が集中しやすい"],
+    "gratitude": [],
+    "summary": "作業が進んだ一日",
+    "advice": ["午前中に重いタスクを置いてみてください"],
+    "encouragement": "着実に前進できていますね。",
+}
+
+_SUMMARY_SAMPLE = {
+    "top_patterns": [{"pattern": "夕食後の動画視聴", "frequency": 3, "trend": "improving"}],
+    "goals_progress": [
+        {"goal": "夜のスマホ時間を減らす", "progress_percentage": 60, "blockers": ["疲労"], "achievements": ["21時以降の制限"]},
+    ],
+    "emotional_summary": {"average_score": 62.5, "best_day_pattern": "午前に重いタスク", "worst_day_pattern": "夜更かしの翌日"},
+    "key_insights": ["午前の集中が一日の評価を決める"],
+    "coaching_effectiveness": {
+        "advice_followed_rate": 0.5,
+        "most_effective_advice": "スマホを充電器に置く",
+        "least_effective_advice": "早起き",
+    },
+}
+
+_ACTIVITIES_SAMPLE = [
+    {"start_time": "07:00", "end_time": "08:00", "activity": "（モック）朝食", "category": "生活", "is_productive": True},
+    {"start_time": "09:00", "end_time": "12:00", "activity": "（モック）作業", "category": "仕事", "is_productive": True},
+]
+
+_SAMPLES_BY_SYSTEM = {
+    DAILY_ANALYSIS_SYSTEM_PROMPT: _DAILY_SAMPLE,
+    WEEKLY_ANALYSIS_SYSTEM_PROMPT: _WEEKLY_SAMPLE,
+    JOURNAL_ANALYSIS_SYSTEM_PROMPT: _JOURNAL_SAMPLE,
+    MONTHLY_SUMMARY_SYSTEM_PROMPT: _SUMMARY_SAMPLE,
+    YEARLY_SUMMARY_SYSTEM_PROMPT: _SUMMARY_SAMPLE,
+}
+
+# 統計用のプロンプト種別（claude_service の prompt_type と同じ名前）
+_PROMPT_TYPES_BY_SYSTEM = {
+    DAILY_ANALYSIS_SYSTEM_PROMPT: "daily_analysis",
+    WEEKLY_ANALYSIS_SYSTEM_PROMPT: "weekly_analysis",
+    JOURNAL_ANALYSIS_SYSTEM_PROMPT: "journal_analysis",
+    WEEKLY_JOURNAL_DIGEST_SYSTEM_PROMPT: "weekly_journal_digest",
+    MONTHLY_SUMMARY_SYSTEM_PROMPT: "monthly_summary",
+    YEARLY_SUMMARY_SYSTEM_PROMPT: "yearly_summary",
+    SOCRATIC_QUESTION_SYSTEM_PROMPT: "socratic_question",
+    SOCRATIC_FOLLOWUP_SYSTEM_PROMPT: "socratic_followup",
+    SOCRATIC_SYNTHESIS_SYSTEM_PROMPT: "socratic_synthesis",
+    MORNING_QUESTION_SYSTEM_PROMPT: "morning_question",
+    MORNING_FOLLOWUP_SYSTEM_PROMPT: "morning_followup",
+    MORNING_SYNTHESIS_SYSTEM_PROMPT: "morning_synthesis",
+    DIARY_QUESTION_SYSTEM_PROMPT: "diary_question",
+    DIARY_FOLLOWUP_SYSTEM_PROMPT: "diary_followup",
+    DIARY_SYNTHESIS_SYSTEM_PROMPT: "diary_synthesis",
+}
+
+# claude_service 内で組み立てている system プロンプトは先頭の文言で判定する
+# (判定に使う文言, プロンプト種別, 定型テキスト)
+_TEXT_BY_SYSTEM_PREFIX = [
+    ("ユーザーの行動記録テキストを解析し", "parse_activities", json.dumps(_ACTIVITIES_SAMPLE, ensure_ascii=False)),
+    ("あなたはメモのタイトルを生成する", "braindump_title", "モックのメモ"),
+    ("あなたはメモの整理・要約を行う", "braindump_markdown", "## モック要約\n- 入力内容の整理（モック）"),
+    ("あなたは日記の要約を作成する", "journal_markdown", "## モック要約\n- 日記の要点（モック）"),
+]
+
+_DEFAULT_TEXT = "（モック応答）ありがとうございます。もう少し詳しく教えていただけますか？"
+
+
+def _system_text(system) -> str:
+    """system はプレーン文字列またはテキストブロックの配列"""
+    if isinstance(system, list):
+        return "".join(b.get("text", "") for b in system if isinstance(b, dict))
+    return system or ""
+
+
+def _prompt_type(params: dict) -> str:
+    """統計用のプロンプト種別（判定できなければ tool 名、それも無ければ unknown）"""
+    system = _system_text(params.get("system"))
+    if system in _PROMPT_TYPES_BY_SYSTEM:
+        return _PROMPT_TYPES_BY_SYSTEM[system]
+    for prefix, prompt_type, _ in _TEXT_BY_SYSTEM_PREFIX:
+        if system.startswith(prefix):
+            return prompt_type
+    tool = _forced_tool(params)
+    return tool["name"] if tool is not None else "unknown"
+
+
+def _canned_text(params: dict) -> str:
+    """リクエストの system プロンプトに応じた定型テキストを返す"""
+    system = _system_text(params.get("system"))
+    sample = _SAMPLES_BY_SYSTEM.get(system)
+    if sample is not None:
+        return "```json\n" + json.dumps(sample, ensure_ascii=False) + "\n```"
+    for prefix, _, text in _TEXT_BY_SYSTEM_PREFIX:
+        if system.startswith(prefix):
+            return text
+    return _DEFAULT_TEXT
+
+
+def _value_for_schema(schema: dict):
+    """tool の input_schema から検証を通るダミー値を組み立てる（配列は 1 要素、enum は先頭の値）"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        options = [o for o in schema["anyOf"] if o.get("type") != "null"] or schema["anyOf"]
+        return _value_for_schema(options[0])
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _value_for_schema(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_value_for_schema(schema.get("items", {}))]
+    if kind in ("number", "integer"):
+        return schema.get("minimum", 0)
+    if kind == "boolean":
+        return False
+    if kind == "string":
+        return "（モック）"
+    return None
+
+
+def _forced_tool(params: dict) -> dict | None:
+    """tool_choice で強制されたツール定義を返す"""
+    choice = params.get("tool_choice") or {}
+    if choice.get("type") != "tool":
+        return None
+    return next((t for t in params.get("tools", []) if t.get("name") == choice.get("name")), None)
+
+
+def _build_content(params: dict) -> list[dict]:
+    """構造化出力（tool_use）が要求されていれば tool_use ブロック、それ以外はテキストを返す"""
+    tool = _forced_tool(params)
+    if tool is not None:
+        sample = _SAMPLES_BY_SYSTEM.get(_system_text(params.get("system")))
+        return [{
+            "type": "tool_use",
+            "id": f"toolu_mock_{uuid.uuid4().hex[:20]}",
+            "name": tool["name"],
+            "input": sample if sample is not None else _value_for_schema(tool.get("input_schema", {})),
+        }]
+    return [{"type": "text", "text": _canned_text(params)}]
+
+
+def _input_tokens(params: dict) -> int:
+    return len(json.dumps(params, ensure_ascii=False)) // CHARS_PER_TOKEN
+
+
+def _block_payload(block: dict) -> str:
+    """ストリーミングで逐次送る部分（テキスト、または tool_use の入力 JSON）"""
+    if block["type"] == "tool_use":
+        return json.dumps(block["input"], ensure_ascii=False)
+    return block["text"]
+
+
+def _output_tokens(content: list[dict]) -> int:
+    return max(1, sum(len(_block_payload(b)) for b in content) // CHARS_PER_TOKEN)
+
+
+def _build_message(params: dict, content: list[dict] | None = None) -> dict:
+    content = content if content is not None else _build_content(params)
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "mock"),
+        "content": content,
+        "stop_reason": "tool_use" if content[0]["type"] == "tool_use" else "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": _input_tokens(params),
+            "output_tokens": _output_tokens(content),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+# ---- Messages ----
+
+def _error_response(status_code: int, error_type: str, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"type": "error", "error": {"type": error_type, "message": message}},
+        status_code=status_code,
+        headers={"retry-after": str(_config["retry_after"])},
+    )
+
+
+def _injected_error() -> JSONResponse | None:
+    """同時実行の上限超過、または設定した確率で 429 / 529 を返す"""
+    if _config["max_concurrency"] and _stats["in_flight"] >= _config["max_concurrency"]:
+        _stats["concurrency_rejected"] += 1
+        return _error_response(429, "rate_limit_error", "Number of concurrent requests exceeded (mock)")
+    roll = random.random()
+    if roll < _config["rate_limit_rate"]:
+        _stats["rate_limited"] += 1
+        return _error_response(429, "rate_limit_error", "Number of request tokens has exceeded your rate limit (mock)")
+    if roll < _config["rate_limit_rate"] + _config["overload_rate"]:
+        _stats["overloaded"] += 1
+        return _error_response(529, "overloaded_error", "Overloaded (mock)")
+    return None
+
+
+def _token_delay(tokens: int) -> float:
+    rate = _config["tokens_per_second"]
+    return tokens / rate if rate > 0 else 0.0
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def _delta(block: dict, piece: str) -> dict:
+    if block["type"] == "tool_use":
+        return {"type": "input_json_delta", "partial_json": piece}
+    return {"type": "text_delta", "text": piece}
+
+
+async def _stream_message(message: dict):
+    """Messages API のストリーミングと同じ順序でイベントを送る（トークン速度に合わせて待つ）"""
+    try:
+        start = {**message, "content": [], "stop_reason": None,
+                 "usage": {**message["usage"], "output_tokens": 1}}
+        yield _sse({"type": "message_start", "message": start})
+        await asyncio.sleep(_config["latency_ms"] / 1000)
+        chunk_chars = CHUNK_TOKENS * CHARS_PER_TOKEN
+        for index, block in enumerate(message["content"]):
+            empty = {**block, "input": {}} if block["type"] == "tool_use" else {**block, "text": ""}
+            yield _sse({"type": "content_block_start", "index": index, "content_block": empty})
+            payload = _block_payload(block)
+            for i in range(0, len(payload), chunk_chars):
+                piece = payload[i:i + chunk_chars]
+                yield _sse({"type": "content_block_delta", "index": index, "delta": _delta(block, piece)})
+                await asyncio.sleep(_token_delay(max(1, len(piece) // CHARS_PER_TOKEN)))
+            yield _sse({"type": "content_block_stop", "index": index})
+        yield _sse({
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]},
+        })
+        yield _sse({"type": "message_stop"})
+        _stats["completed"] += 1
+        _stats["output_tokens"] += message["usage"]["output_tokens"]
+    finally:
+        _stats["in_flight"] -= 1
+
+
+@app.post("/v1/messages")
+async def create_message(request: Request):
+    params = await request.json()
+    prompt_type = _prompt_type(params)
+    _stats["requests"] += 1
+    _stats["by_prompt_type"][prompt_type] = _stats["by_prompt_type"].get(prompt_type, 0) + 1
+
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    _stats["in_flight"] += 1
+    _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    message = _build_message(params)
+    if params.get("stream"):
+        # in_flight は _stream_message の最後（クライアント切断時も）で減らす
+        return StreamingResponse(_stream_message(message), media_type="text/event-stream")
+
+    try:
+        await asyncio.sleep(_config["latency_ms"] / 1000 + _token_delay(message["usage"]["output_tokens"]))
+        _stats["completed"] += 1
+        _stats["output_tokens"] += message["usage"]["output_tokens"]
+        return message
+    finally:
+        _stats["in_flight"] -= 1
+
+
+# ---- モックの設定・統計 ----
+
+@app.get("/mock/config")
+async def get_config():
+    return _config
+
+
+@app.put("/mock/config")
+async def update_config(request: Request):
+    """指定したキーだけ変更する（例: {"overload_rate": 0.2, "max_concurrency": 4}）"""
+    body = await request.json()
+    unknown = set(body) - set(_config)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown keys: {sorted(unknown)}")
+    for key, value in body.items():
+        _config[key] = type(_config[key])(value)
+    return _config
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return _stats
+
+
+@app.delete("/mock/stats")
+async def reset_stats():
+    """統計をリセットする（in_flight は実行中のリクエストがあるため残す）"""
+    for key in ("requests", "completed", "rate_limited", "overloaded", "concurrency_rejected", "output_tokens"):
+        _stats[key] = 0
+    _stats["peak_in_flight"] = _stats["in_flight"]
+    _stats["by_prompt_type"] = {}
+    return _stats
+
+
+# ---- Message Batches ----
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _batch_object(batch_id: str, base_url: str) -> dict:
+    entry = _batches[batch_id]
+    ended = time.time() - entry["created"] >= BATCH_SECONDS
+    count = len(entry["requests"])
+    return {
+        "id": batch_id,
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": {
+            "processing": 0 if ended else count,
+            "succeeded": count if ended else 0,
+            "errored": 0,
+            "canceled": 0,
+            "expired": 0,
+        },
+        "created_at": _iso(entry["created"]),
+        "expires_at": _iso(entry["created"] + 24 * 3600),
+        "ended_at": _iso(entry["created"] + BATCH_SECONDS) if ended else None,
+        "archived_at": None,
+        "cancel_initiated_at": None,
+        "results_url": f"{base_url}v1/messages/batches/{batch_id}/results" if ended else None,
+    }
+
+
+@app.post("/v1/messages/batches")
+async def create_batch(request: Request):
+    body = await request.json()
+    requests = body.get("requests") or []
+    if not requests:
+        raise HTTPException(status_code=400, detail="requests is empty")
+    batch_id = f"msgbatch_mock_{uuid.uuid4().hex[:20]}"
+    _batches[batch_id] = {"created": time.time(), "requests": requests}
+    return _batch_object(batch_id, str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_batch(batch_id: str, request: Request):
+    if batch_id not in _batches:
+        raise HTTPException(status_code=404, detail="batch not found")
+    return _batch_object(batch_id, str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}/results")
+async def batch_results(batch_id: str):
+    entry = _batches.get(batch_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="batch not found")
+    if time.time() - entry["created"] < BATCH_SECONDS:
+        raise HTTPException(status_code=409, detail="batch is still in progress")
+    lines = [
+        json.dumps({
+            "custom_id": req["custom_id"],
+            "result": {"type": "succeeded", "message": _build_message(req.get("params", {}))},
+        }, ensure_ascii=False)
+        for req in entry["requests"]
+    ]
+    return Response("\n".join(lines) + "\n", media_type="application/binary")
@@ -0,0 +1,194 @@
+"""
+行動記録テキストのローカル構造化
+「07:00-08:00 朝食」のような時刻付きのタイムラインはそのまま読めるため、
+Claude を呼ばずに parse_activities と同じ形式（start_time / end_time / activity /
+category / is_productive）に変換する。カテゴリはキーワード表で判定し、
+parse_activities のプロンプトと同じ 生活/仕事/勉強/娯楽/無駄時間/運動 の規則に従う。
+
+対応する書式（全角数字・全角記号も可）:
+    07:00-08:00 朝食        07:00〜08:00 朝食      7時-8時半 朝食
+    07:00 起床              - 07:00 起床           ・7:00　起床
+
+時刻の無い行があるなどタイムラインとして読めない入力は None を返し、全体を Claude に任せる。
+数字で始まっていても時刻として読めない行（「2時間勉強」「30分読書」のような所要時間）も同じ。
+カテゴリが決まらない行（キーワードが無い・複数カテゴリに当たる）は ambiguous として返し、
+その行だけを Claude で構造化する。
+"""
+
+import re
+import unicodedata
+from typing import Optional
+
+CATEGORIES = ("生活", "仕事", "勉強", "娯楽", "無駄時間", "運動")
+
+# 小文字化したテキストに対する部分一致。複数カテゴリに当たる行は曖昧とみなす
+# カタカナ・英字で始まる（終わる）キーワードは、前（後）がカタカナ・英字の続きなら別の語の一部として数えない
+# （「プランニング」の ランニング、「ライブラリ」の ライブ、「ジムニー」の ジム など）
+CATEGORY_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "生活": (
+        "起床", "就寝", "睡眠", "寝る", "昼寝", "仮眠", "朝食", "昼食", "夕食", "食事", "ご飯", "ごはん",
+        "朝ご飯", "朝ごはん", "昼ご飯", "昼ごはん", "晩ご飯", "晩ごはん", "夜ご飯", "ランチ", "ディナー",
+        "入浴", "風呂", "シャワー", "歯磨き", "身支度", "支度", "家事", "洗濯", "掃除", "料理", "自炊",
+        "買い物", "買物", "通勤", "帰宅", "移動", "病院", "通院",
+    ),
+    "仕事": (
+        "仕事", "業務", "会議", "ミーティング", "mtg", "打ち合わせ", "打合せ", "メール", "資料作成",
+        "出社", "退社", "残業", "商談", "開発", "実装", "コードレビュー", "報告書", "出勤", "テレワーク",
+        "リモートワーク", "案件", "納品",
+    ),
+    "勉強": (
+        "勉強", "学習", "読書", "udemy", "講座", "資格", "復習", "予習", "英語", "英会話", "暗記",
+        "授業", "講義", "セミナー", "研修", "参考書", "問題集", "プログラミング学習",
+    ),
+    "娯楽": (
+        "映画", "ゲーム", "趣味", "漫画", "マンガ", "アニメ", "ドラマ", "音楽", "カラオケ", "netflix",
+        "ネットフリックス", "プライムビデオ", "旅行", "ライブ", "飲み会",
+    ),
+    "無駄時間": (
+        "youtube", "ユーチューブ", "sns", "twitter", "ツイッター", "instagram", "インスタ", "tiktok",
+        "ネットサーフィン", "ダラダラ", "だらだら", "ぼーっと", "ぼーっ", "スマホ", "2ch", "まとめサイト",
+    ),
+    "運動": (
+        "ジム", "筋トレ", "ウォーキング", "ランニング", "ジョギング", "散歩", "運動", "ストレッチ",
+        "ヨガ", "水泳", "スポーツ", "サッカー", "テニス", "サイクリング", "トレーニング",
+    ),
+}
+
+ENTERTAINMENT_PRODUCTIVE_MINUTES = 60  # 娯楽はこの時間以内なら is_productive
+
+# 「時間」は所要時間のため時刻として読まない。時刻の直後に数字が続く行（「7時30」など）も読まない
+_TIME = r"(\d{1,2})\s*(?::\s*(\d{2})|時(?!間)\s*(?:(\d{1,2})\s*分|(半))?)(?!\d)"
+_RANGE_SEP = r"\s*(?:-|~|〜|–|—|から)\s*"
+_LINE_RE = re.compile(
+    rf"^(?:[-*・●○◆▪]\s*)?{_TIME}(?:{_RANGE_SEP}{_TIME})?\s*(?:[:|、,]\s*)?(.*)$"
+)
+_HEADER_RE = re.compile(r"^(?:#+\s|【.*】$|\[.*\]$)")
+
+
+def _normalize(line: str) -> str:
+    # 全角数字・記号を半角に（〜 はそのまま残るため _RANGE_SEP で扱う）
+    return unicodedata.normalize("NFKC", line).strip()
+
+
+def _to_hhmm(hour: str, minute: Optional[str], minute_kanji: Optional[str], half: Optional[str]) -> Optional[str]:
+    h = int(hour)
+    m = int(minute or minute_kanji or 0)
+    if half:
+        m = 30
+    if h > 24 or m > 59:
+        return None
+    return f"{h % 24:02d}:{m:02d}"
+
+
+def _minutes(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _script(c: str) -> Optional[str]:
+    """語の続きを判定する文字種（カタカナ・英字以外は None）"""
+    if c and ("\u30a1" <= c <= "\u30fa" or c == "ー"):
+        return "katakana"
+    if c and c.isascii() and c.isalpha():
+        return "latin"
+    return None
+
+
+def _contains(text: str, keyword: str) -> bool:
+    """text が keyword を別の語の一部としてでなく含むか"""
+    start = text.find(keyword)
+    while start >= 0:
+        end = start + len(keyword)
+        before = _script(text[start - 1]) if start else None
+        after = _script(text[end]) if end < len(text) else None
+        if not (before and before == _script(keyword[0])) and not (after and after == _script(keyword[-1])):
+            return True
+        start = text.find(keyword, start + 1)
+    return False
+
+
+def categorize(activity: str) -> Optional[str]:
+    """キーワード表でカテゴリを判定する。決まらない（該当なし・複数該当）なら None"""
+    text = activity.lower()
+    matched = {
+        category for category, keywords in CATEGORY_KEYWORDS.items()
+        if any(_contains(text, keyword) for keyword in keywords)
+    }
+    if len(matched) == 1:
+        return matched.pop()
+    return None
+
+
+def _parse_line(line: str) -> Optional[dict]:
+    """1 行を {start_time, end_time, activity} に変換する（時刻で始まらない行は None）"""
+    m = _LINE_RE.match(line)
+    if not m:
+        return None
+    start = _to_hhmm(*m.group(1, 2, 3, 4))
+    end = _to_hhmm(m.group(5), m.group(6), m.group(7), m.group(8)) if m.group(5) else None
+    activity = m.group(9).strip()
+    if start is None or (m.group(5) and end is None) or not activity:
+        return None
+    return {"start_time": start, "end_time": end, "activity": activity}
+
+
+def _is_productive(category: str, duration: Optional[int]) -> bool:
+    if category == "無駄時間":
+        return False
+    if category == "娯楽":
+        return duration is None or duration <= ENTERTAINMENT_PRODUCTIVE_MINUTES
+    return True
+
+
+def _sort_key(day_start: int):
+    # 深夜 0 時を跨ぐ記録（23:00 → 01:00）も記録の並び通りになるよう、最初の行動からの経過分で並べる
+    return lambda a: (_minutes(a["start_time"]) - day_start) % (24 * 60)
+
+
+def parse_timeline(raw_input: str) -> Optional[tuple[list[dict], list[str]]]:
+    """
+    時刻付きタイムラインをローカルで構造化する
+
+    Returns:
+        (構造化できた行動リスト, カテゴリが決まらなかった行) のタプル。
+        時刻で始まらない行があり、タイムラインとして読めない場合は None。
+    """
+    entries: list[tuple[dict, str]] = []
+    for raw_line in raw_input.splitlines():
+        line = _normalize(raw_line)
+        if not line or _HEADER_RE.match(line):
+            continue
+        parsed = _parse_line(line)
+        if parsed is None:
+            return None
+        entries.append((parsed, raw_line.strip()))
+
+    activities: list[dict] = []
+    ambiguous: list[str] = []
+    for i, (parsed, raw_line) in enumerate(entries):
+        category = categorize(parsed["activity"])
+        if category is None:
+            ambiguous.append(raw_line)
+            continue
+        # 終了時刻が無ければ次の行の開始までを所要時間とみなす（is_productive の判定のみに使う）
+        end = parsed["end_time"] or (entries[i + 1][0]["start_time"] if i + 1 < len(entries) else None)
+        duration = (_minutes(end) - _minutes(parsed["start_time"])) % (24 * 60) if end else None
+        activities.append({
+            **parsed,
+            "category": category,
+            "is_productive": _is_productive(category, duration),
+        })
+    return activities, ambiguous
+
+
+def merge(local: list[dict], remote: list[dict]) -> list[dict]:
+    """ローカルで構造化した行動と Claude が構造化した行動を時刻順にまとめる"""
+    merged = local + remote
+    if not merged:
+        return merged
+    day_start = _minutes(merged[0]["start_time"]) if local else min(_minutes(a["start_time"]) for a in merged)
+    try:
+        return sorted(merged, key=_sort_key(day_start))
+    except (ValueError, KeyError, AttributeError):
+        # Claude の start_time が HH:MM でない場合は並べ替えずに返す
+        return merged
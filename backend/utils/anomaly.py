@@ -0,0 +1,192 @@
+"""
+日次スコアのオンライン異常検知
+日次分析の overall_score と wasted_hours を 1 日ずつ取り込み、過去の値を読み直さずに
+外れ値の日（異常）と水準の変化（変化点）を検出する。状態は値の数によらず一定の大きさの dict。
+
+- 平均・分散は EWMA（指数加重移動平均）で更新する。取り込み数が少ないうちは係数を 1/n にして
+  単純平均と同じにし、1/ALPHA 件を超えたら ALPHA に固定する。
+- 取り込む前の平均・標準偏差で z スコアを計算し、|z| が ANOMALY_Z 以上なら異常とする。
+  標準偏差は項目ごとの下限（MIN_STD）を下回らないようにする（値の揃った期間のわずかな差を異常にしない）。
+- 変化点は z スコアの両側 CUSUM で検出する（許容幅 CUSUM_K、閾値 CUSUM_H）。
+  検出したら CUSUM を 0 に戻し、累積が始まった日を水準が変わり始めた日（since）として記録する。
+- 取り込みが WARMUP 件に満たない間は検出しない。
+"""
+
+import copy
+import math
+from datetime import datetime, timedelta
+from typing import Optional
+
+# 項目 → 表示名・単位・標準偏差の下限・悪い方向（+1 = 高いと悪い、-1 = 低いと悪い）
+FIELDS = {
+    "overall_score": {"label": "スコア", "unit": "", "min_std": 3.0, "bad": -1},
+    "wasted_hours": {"label": "無駄時間", "unit": "h", "min_std": 0.25, "bad": 1},
+}
+ALPHA = 0.1
+WARMUP = 7
+ANOMALY_Z = 2.5
+CUSUM_K = 0.5
+CUSUM_H = 4.0
+Z_CLIP = 4.0         # 1 日の外れ値だけで変化点にならないよう CUSUM に足す z を抑える
+MAX_EVENTS = 20
+FACT_DAYS = 14       # プロンプトに引用するイベントの日数
+
+
+def _empty_field() -> dict:
+    return {"n": 0, "mean": 0.0, "var": 0.0, "cusum_pos": 0.0, "cusum_neg": 0.0, "pos_since": None, "neg_since": None}
+
+
+def empty_state() -> dict:
+    return {"last_date": None, "fields": {field: _empty_field() for field in FIELDS}, "events": [], "previous": None}
+
+
+def _std(stats: dict, field: str) -> float:
+    return max(math.sqrt(max(stats["var"], 0.0)), FIELDS[field]["min_std"])
+
+
+def _is_bad(field: str, direction: str) -> bool:
+    return (direction == "up") == (FIELDS[field]["bad"] > 0)
+
+
+def _observe(stats: dict, field: str, date: str, x: float) -> list[dict]:
+    """1 項目に 1 日分の値を取り込み（stats を書き換える）、検出したイベントを返す"""
+    events = []
+    if stats["n"] >= WARMUP:
+        expected, std = stats["mean"], _std(stats, field)
+        z = (x - expected) / std
+        if abs(z) >= ANOMALY_Z:
+            direction = "up" if z > 0 else "down"
+            events.append({
+                "date": date, "field": field, "kind": "anomaly", "direction": direction,
+                "bad": _is_bad(field, direction), "value": round(x, 2), "expected": round(expected, 2),
+                "z": round(z, 2), "since": None,
+            })
+
+        clipped = max(-Z_CLIP, min(Z_CLIP, z))
+        if stats["cusum_pos"] == 0:
+            stats["pos_since"] = date
+        if stats["cusum_neg"] == 0:
+            stats["neg_since"] = date
+        stats["cusum_pos"] = max(0.0, stats["cusum_pos"] + clipped - CUSUM_K)
+        stats["cusum_neg"] = max(0.0, stats["cusum_neg"] - clipped - CUSUM_K)
+        for direction, key in (("up", "pos"), ("down", "neg")):
+            if stats[f"cusum_{key}"] >= CUSUM_H:
+                events.append({
+                    "date": date, "field": field, "kind": "shift", "direction": direction,
+                    "bad": _is_bad(field, direction), "value": round(x, 2), "expected": round(expected, 2),
+                    "z": round(z, 2), "since": stats[f"{key}_since"],
+                })
+                stats["cusum_pos"] = stats["cusum_neg"] = 0.0
+                stats["pos_since"] = stats["neg_since"] = None
+                break
+        if stats["cusum_pos"] == 0:
+            stats["pos_since"] = None
+        if stats["cusum_neg"] == 0:
+            stats["neg_since"] = None
+
+    # EWMA の平均・分散（取り込み数が少ないうちは単純平均と同じ重み）
+    stats["n"] += 1
+    alpha = max(ALPHA, 1.0 / stats["n"])
+    diff = x - stats["mean"]
+    increment = alpha * diff
+    stats["mean"] += increment
+    stats["var"] = (1 - alpha) * (stats["var"] + diff * increment)
+    return events
+
+
+def ingest(state: dict, date: str, values: dict) -> dict:
+    """
+    state に date の値を取り込んだ新しい状態を返す（state は書き換えない）
+    date は state の last_date より後の日であること。値が None の項目は取り込まない。
+    取り込む前の状態を previous に残す（同じ日を取り込み直すときに rewind で戻す）。
+    """
+    previous = {k: copy.deepcopy(v) for k, v in state.items() if k != "previous"}
+    new = copy.deepcopy(previous)
+    for field in FIELDS:
+        value = values.get(field)
+        if value is None:
+            continue
+        stats = new["fields"].setdefault(field, _empty_field())
+        new["events"].extend(_observe(stats, field, date, float(value)))
+    new["events"] = new["events"][-MAX_EVENTS:]
+    new["last_date"] = date
+    new["previous"] = previous
+    return new
+
+
+def rewind(state: dict) -> Optional[dict]:
+    """last_date を取り込む前の状態（戻せなければ None）"""
+    previous = state.get("previous")
+    if not previous:
+        return None
+    return {**copy.deepcopy(previous), "previous": None}
+
+
+def _baseline_state(state: dict, date: Optional[str]) -> Optional[dict]:
+    """date より前の日だけを取り込んだ状態（date が None なら現在の状態。戻せなければ None）"""
+    last = state.get("last_date")
+    if date is None or not last or last < date:
+        return state
+    if last == date:
+        return state.get("previous")
+    return None
+
+
+def baselines(state: dict, date: Optional[str] = None) -> dict:
+    """date 時点（省略時は現在）の項目ごとの平均・標準偏差（取り込みが WARMUP 件に満たない項目は含めない）"""
+    base = _baseline_state(state, date)
+    if not base:
+        return {}
+    result = {}
+    for field, stats in (base.get("fields") or {}).items():
+        if field in FIELDS and stats.get("n", 0) >= WARMUP:
+            result[field] = {"n": stats["n"], "mean": round(stats["mean"], 2), "std": round(_std(stats, field), 2)}
+    return result
+
+
+def recent_events(state: dict, date: str, days: int = FACT_DAYS) -> list[dict]:
+    """date より前の直近 days 日のイベント（古い順）"""
+    start = (datetime.strptime(date, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+    return [e for e in state.get("events") or [] if start <= e["date"] < date]
+
+
+def _md(date: Optional[str]) -> str:
+    return f"{int(date[5:7])}/{int(date[8:10])}" if date else "-"
+
+
+def _value(field: str, value: float) -> str:
+    spec = FIELDS[field]
+    return f"{value:.1f}{spec['unit']}" if spec["unit"] else f"{value:.0f}"
+
+
+def format_facts(state: dict, date: str) -> str:
+    """
+    date のプロンプトに引用する異常検知の結果（箇条書き、何も無ければ空文字列）
+    date より前の日だけを使う（date 当日の分析はまだ取り込まれていない前提）。
+    """
+    lines = []
+    base = baselines(state, date)
+    if base:
+        parts = [
+            f"{FIELDS[field]['label']} 平均 {_value(field, b['mean'])}（±{_value(field, b['std'])}）"
+            for field, b in base.items()
+        ]
+        lines.append(f"- 最近の基準: {'、'.join(parts)}")
+
+    for event in recent_events(state, date):
+        spec = FIELDS.get(event["field"])
+        if not spec:
+            continue
+        tone = "悪い方向" if event["bad"] else "良い方向"
+        if event["kind"] == "anomaly":
+            lines.append(
+                f"- {_md(event['date'])} {spec['label']}が外れ値: {_value(event['field'], event['value'])}"
+                f"（通常 {_value(event['field'], event['expected'])} 前後、z={event['z']:+.1f}、{tone}）"
+            )
+        else:
+            level = "高い" if event["direction"] == "up" else "低い"
+            lines.append(
+                f"- {_md(event['since'])} ごろから{spec['label']}が{level}水準に変化"
+                f"（{_md(event['date'])} に検出、{tone}）"
+            )
+    return "\n".join(lines)
@@ -2,8 +2,14 @@
 ヘルパー関数
 """
 
+import json
+import logging
 from datetime import datetime, timezone, timedelta
 
+from utils import prompt_budget
+
+logger = logging.getLogger(__name__)
+
 
 JST = timezone(timedelta(hours=9))
 
@@ -18,6 +24,23 @@ def today_jst() -> str:
     return datetime.now(JST).strftime("%Y-%m-%d")
 
 
+def week_id_to_dates(week_id: str) -> tuple[str, str]:
+    """
+    'YYYY-Www' 形式の週 ID を (week_start, week_end) の日付ペアに変換する
+    例: '2026-W08' → ('2026-02-16', '2026-02-22')
+    """
+    # ISO 8601 week: %G-W%V
+    dt = datetime.strptime(f"{week_id}-1", "%G-W%V-%u")
+    week_start = dt.strftime("%Y-%m-%d")
+    week_end = (dt + timedelta(days=6)).strftime("%Y-%m-%d")
+    return week_start, week_end
+
+
+def sse_event(event: str, data) -> str:
+    """Server-Sent Events の 1 イベント分の文字列を返す"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 def format_screen_time(screen_time: dict) -> str:
     """スクリーンタイムデータを文字列にフォーマット"""
     if not screen_time:
@@ -34,27 +57,76 @@ def format_screen_time(screen_time: dict) -> str:
     return "\n".join(lines)
 
 
-def format_past_data(past_records: list, past_analyses: list) -> str:
-    """過去データを文字列にフォーマット"""
-    if not past_records:
+def format_past_data(past_days: list) -> str:
+    """過去データ（firestore_service.get_past_days の日ごとの要約）を文字列にフォーマット"""
+    if not past_days:
         return "過去データなし"
 
+    def value(v):
+        return "-" if v is None else v
+
     lines = []
-    for record in past_records[-7:]:  # 直近7件
-        date = record.get("date", "不明")
-        # 対応する分析を探す
-        analysis = next(
-            (a for a in past_analyses if a.get("date") == date), None
-        )
-        if analysis:
-            summary = analysis.get("summary", {})
-            score = summary.get("overall_score", "-")
-            productive = summary.get("productive_hours", "-")
-            wasted = summary.get("wasted_hours", "-")
-            lines.append(
-                f"{date}: スコア={score}, 生産的={productive}h, 無駄={wasted}h"
+    for day in past_days[-7:]:  # 直近7件
+        date = day.get("date", "不明")
+        if day.get("has_analysis"):
+            line = (
+                f"{date}: スコア={value(day.get('overall_score'))}, "
+                f"生産的={value(day.get('productive_hours'))}h, 無駄={value(day.get('wasted_hours'))}h"
             )
+            if day.get("top_issues"):
+                line += f"（課題: {' / '.join(day['top_issues'])}）"
+            lines.append(line)
         else:
             lines.append(f"{date}: 分析データなし")
 
     return "\n".join(lines)
+
+
+# 対話プロンプトの上限（見積もりトークン）
+DIALOGUE_CONTEXT_TOKEN_BUDGET = 3000  # 先頭のコンテキスト（記録の生テキストなど）
+DIALOGUE_MESSAGE_TOKEN_BUDGET = 800   # 1 発言あたり
+
+
+def build_dialogue_messages(
+    context: str,
+    messages: list[dict],
+    turn_note: str,
+    label: str = "dialogue_followup",
+) -> list[dict]:
+    """
+    対話履歴を Messages API の user/assistant 交互メッセージ配列に変換する
+
+    - 先頭の user メッセージに記録データなどのコンテキストを置き、cache_control を付ける
+    - 保存済みの "ai" は assistant、"user" は user として 1 発言 1 メッセージで並べる
+    - 長すぎる発言は DIALOGUE_MESSAGE_TOKEN_BUDGET で切り詰める（発言ごとに同じ結果になるためキャッシュは崩れない）
+    - 最後のユーザー発言にもキャッシュ境界を付け、次のターンでは新しい発言分だけが未キャッシュになる
+    - ターン数などの毎回変わる情報は、キャッシュ境界の後ろの別ブロックに置く
+    """
+    result: list[dict] = [{
+        "role": "user",
+        "content": [{"type": "text", "text": context, "cache_control": {"type": "ephemeral"}}],
+    }]
+    for msg in messages:
+        role = "assistant" if msg.get("role") == "ai" else "user"
+        text = msg.get("content", "")
+        if not text:
+            continue
+        text = prompt_budget.cap_text(label, text, DIALOGUE_MESSAGE_TOKEN_BUDGET)
+        if result[-1]["role"] == role:
+            # 同じ role が連続した場合は 1 メッセージにまとめる（API は交互を要求する）
+            result[-1]["content"].append({"type": "text", "text": text})
+        else:
+            result.append({"role": role, "content": [{"type": "text", "text": text}]})
+
+    if result[-1]["role"] == "assistant":
+        result.append({"role": "user", "content": []})
+    elif len(result) > 1:
+        result[-1]["content"][-1]["cache_control"] = {"type": "ephemeral"}
+    result[-1]["content"].append({"type": "text", "text": turn_note})
+    logger.info(
+        "prompt %s: 約 %d tokens（%d メッセージ）",
+        label,
+        sum(prompt_budget.estimate_tokens(block["text"]) for m in result for block in m["content"]),
+        len(result),
+    )
+    return result
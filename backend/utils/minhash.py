@@ -0,0 +1,60 @@
+"""
+文字 n-gram の MinHash
+改善提案のような短い日本語の文をトークナイザー無しで近似比較する。
+文を正規化（NFKC・小文字化・空白と記号の除去）して SHINGLE_SIZE 文字（2 文字）ずつのシングルに分け、
+NUM_PERM 個のハッシュ関数それぞれの最小値を署名とする。2 つの署名で一致する位置の割合が
+シングル集合の Jaccard 係数の推定値になる。
+
+ハッシュは zlib.crc32 と固定シードの係数で作るため、プロセスをまたいでも同じ署名になる
+（Firestore に保存した署名と後から計算した署名を比較できる）。
+"""
+
+import random
+import unicodedata
+import zlib
+
+NUM_PERM = 128
+SHINGLE_SIZE = 2
+_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+
+_rng = random.Random(20261019)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text: str) -> str:
+    """全角半角・大文字小文字の揺れをそろえ、空白と記号を除く"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(c for c in text if unicodedata.category(c)[0] in ("L", "N"))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """正規化した文の size 文字ずつの部分文字列（size 以下の短い文は文全体）"""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(text: str) -> list[int]:
+    """MinHash 署名（NUM_PERM 個の 32bit 値）"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in _PERMUTATIONS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """2 つの署名から推定した Jaccard 係数"""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def encode(sig: list[int]) -> str:
+    """Firestore に保存するための 16 進文字列（1 値 8 文字）"""
+    return "".join(f"{v:08x}" for v in sig)
+
+
+def decode(text: str) -> list[int]:
+    return [int(text[i:i + 8], 16) for i in range(0, len(text), 8)]
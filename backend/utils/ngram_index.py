@@ -0,0 +1,83 @@
+"""
+文字 n-gram の転置インデックス
+日本語は単語の区切りが無いため、形態素解析の代わりに文字の 1-gram・2-gram・3-gram を索引語にする。
+文を正規化（NFKC・小文字化）して文字・数字の連続ごとに区切り、連続の中だけで n-gram を作る。
+検索語は 1 文字だけの連続（「夢」など）をその文字で、2 文字以上の連続を 2/3-gram で引く
+（1-gram は 1 文字の検索語のためだけに索引に入れる）。
+
+ポスティングリスト（索引語 → 文書番号と出現回数）は 1 行 1 索引語のテキストにして zlib で圧縮する。
+文書番号は昇順に並べて前の番号との差を書き、出現回数が 1 のときは省く:
+    "索引語\\t差[:回数],差[:回数],..."
+"""
+
+import unicodedata
+import zlib
+from collections import Counter
+
+NGRAM_SIZES = (1, 2, 3)
+QUERY_NGRAM_SIZES = (2, 3)  # 2 文字以上の検索語に使う n-gram
+INDEX_FORMAT = 2  # 索引語の作り方を変えたら上げる（保存済みの索引を作り直させる）
+
+
+def _runs(text: str) -> list[str]:
+    """正規化した文を文字・数字の連続に区切る"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    runs, current = [], []
+    for c in text:
+        if unicodedata.category(c)[0] in ("L", "N"):
+            current.append(c)
+        elif current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+def _ngrams(run: str, sizes: tuple[int, ...]) -> list[str]:
+    return [run[i:i + n] for n in sizes for i in range(len(run) - n + 1)]
+
+
+def terms(text: str) -> Counter:
+    """文の索引語と出現回数"""
+    counts: Counter = Counter()
+    for run in _runs(text):
+        counts.update(_ngrams(run, NGRAM_SIZES))
+    return counts
+
+
+def query_terms(text: str) -> list[str]:
+    """検索語の索引語（重複なし、出現順）"""
+    result = []
+    for run in _runs(text):
+        result.extend([run] if len(run) == 1 else _ngrams(run, QUERY_NGRAM_SIZES))
+    return list(dict.fromkeys(result))
+
+
+def encode_postings(postings: dict[str, dict[int, int]]) -> bytes:
+    """索引語 → {文書番号: 出現回数} を圧縮したバイト列にする"""
+    lines = []
+    for term in sorted(postings):
+        prev, parts = 0, []
+        for number, count in sorted(postings[term].items()):
+            parts.append(f"{number - prev}:{count}" if count > 1 else str(number - prev))
+            prev = number
+        lines.append(f"{term}\t{','.join(parts)}")
+    return zlib.compress("\n".join(lines).encode("utf-8"), 9)
+
+
+def decode_postings(blob: bytes) -> dict[str, dict[int, int]]:
+    postings: dict[str, dict[int, int]] = {}
+    if not blob:
+        return postings
+    for line in zlib.decompress(blob).decode("utf-8").split("\n"):
+        if not line:
+            continue
+        term, encoded = line.split("\t", 1)
+        number, docs = 0, {}
+        for part in encoded.split(","):
+            delta, _, count = part.partition(":")
+            number += int(delta)
+            docs[number] = int(count) if count else 1
+        postings[term] = docs
+    return postings
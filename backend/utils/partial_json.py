@@ -0,0 +1,120 @@
+"""
+ストリーミング中の JSON を逐次解析するパーサー
+tool use の input_json_delta を受け取りながら、完成したセクション（指定深さまでのキーの値）を
+生成完了を待たずに取り出す。
+
+例: {"summary": {...}, "analysis": {"good_points": [...], ...}}
+    → ("summary",) / ("analysis", "good_points") / ... の順に値が確定した時点で返す
+
+各文字を 1 回だけ走査するため、全体で入力長に対して線形。
+"""
+
+import json
+from typing import Any
+
+
+class PartialJSONSections:
+    """
+    JSON テキストを断片ごとに feed し、確定したセクションを (path, value) のリストで受け取る
+
+    max_depth: 何階層目のオブジェクトのキーまでをセクションとして返すか（1 ならトップレベルのみ）
+    配列の要素はセクションとして返さない（配列全体が確定した時点で返す）
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._text = ""
+        self._pos = 0
+        # 開いているコンテナ: {"type": "{"|"[", "expect": "key"|"colon"|"value"|"after", "key", "start", "scalar"}
+        self._stack: list[dict] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> list[tuple[tuple[str, ...], Any]]:
+        """断片を追加し、新たに確定したセクションを返す"""
+        self._text += chunk
+        text = self._text
+        sections: list[tuple[tuple[str, ...], Any]] = []
+
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+            frame = self._stack[-1] if self._stack else None
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        frame["key"] = json.loads(text[self._string_start:i + 1])
+                        frame["expect"] = "colon"
+                    else:
+                        self._complete(i + 1, sections)
+                continue
+
+            if ch.isspace():
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = frame is not None and frame["type"] == "{" and frame["expect"] == "key"
+                if not self._string_is_key:
+                    self._begin_value(i, scalar=False)
+            elif ch in "{[":
+                self._begin_value(i, scalar=False)
+                self._stack.append({
+                    "type": ch,
+                    "expect": "key" if ch == "{" else "value",
+                    "key": None,
+                    "start": None,
+                    "scalar": False,
+                })
+            elif ch == ":":
+                if frame is not None:
+                    frame["expect"] = "value"
+            elif ch in ",}]":
+                # 数値・true/false/null は区切り文字で確定する
+                if frame is not None and frame["start"] is not None and frame["scalar"]:
+                    self._complete(i, sections)
+                if ch == ",":
+                    if frame is not None:
+                        frame["expect"] = "key" if frame["type"] == "{" else "value"
+                elif self._stack:
+                    self._stack.pop()
+                    if self._stack:
+                        self._complete(i + 1, sections)
+            elif frame is not None and frame["start"] is None:
+                self._begin_value(i, scalar=True)
+
+        return sections
+
+    def _begin_value(self, index: int, scalar: bool) -> None:
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        frame["start"] = index
+        frame["scalar"] = scalar
+        frame["expect"] = "after"
+
+    def _complete(self, end: int, sections: list) -> None:
+        """最上位フレームの現在の値が確定した。対象の深さなら (path, value) を追加する"""
+        frame = self._stack[-1]
+        start = frame["start"]
+        frame["start"] = None
+        frame["scalar"] = False
+        if start is None or len(self._stack) > self.max_depth:
+            return
+        if any(f["type"] != "{" for f in self._stack):
+            return
+        try:
+            value = json.loads(self._text[start:end])
+        except json.JSONDecodeError:
+            return
+        sections.append((tuple(f["key"] for f in self._stack), value))
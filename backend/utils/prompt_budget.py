@@ -0,0 +1,155 @@
+"""
+プロンプトのトークン予算
+週のジャーナル全文・対話の全履歴・行動記録の生テキストなど上限の無い入力を
+そのまま連結すると、大きな週ほど遅く高くなる。プロンプトをセクションに分けて
+トークン数をローカルで見積もり、予算を超えた分は優先度の低いセクションから
+切り詰めて、最終的なサイズをログに残す。
+
+- section(): 1 つのテキストブロック。超過時は行単位（収まらなければ文字単位）で末尾を切る
+- item_section(): 日ごとのエントリなどの並び。超過時は各要素を同じ文字数まで均等に短くする
+  （後ろの日だけが消えないようにする）
+- fixed=True のセクション（見出し・指示文など）は切り詰めない
+
+見積もりは API（count_tokens）を呼ばずに行う。生成の前に往復が 1 回増えると
+レイテンシを予測しやすくするという目的に反するため。
+"""
+
+import logging
+import math
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_ITEM_CHARS = 40  # 要素を均等に短くするときの下限（日付とスコアが残る程度）
+TRUNCATION_MARK = "…（省略）"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数をローカルで見積もる
+    日本語など非 ASCII は 1 文字 ≒ 1 トークン、ASCII は 4 文字 ≒ 1 トークンとして数える。
+    実際のトークナイザーより多めに出るため、予算の判定は安全側になる。
+    """
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+
+def section(name: str, text: str, priority: int = 0, min_tokens: int = 0, fixed: bool = False) -> dict:
+    """テキストのセクション（priority が小さいものから切り詰める）"""
+    return {"name": name, "text": text, "priority": priority, "min_tokens": min_tokens, "fixed": fixed}
+
+
+def item_section(
+    name: str,
+    items: list[str],
+    header: str = "",
+    priority: int = 0,
+    min_tokens: int = 0,
+) -> dict:
+    """要素の並びのセクション（超過時は各要素の末尾を均等に切る。要素内の大事な情報は先頭に置く）"""
+    return {
+        "name": name, "items": list(items), "header": header,
+        "priority": priority, "min_tokens": min_tokens, "fixed": False,
+    }
+
+
+def _render(sec: dict, item_cap: Optional[int] = None) -> str:
+    if "items" not in sec:
+        return sec["text"]
+    items = sec["items"]
+    if item_cap is not None:
+        # 要素末尾の改行（要素間の空行）は切り詰めても残す
+        items = [
+            i if len(i) <= item_cap else i[:item_cap].rstrip("\n") + TRUNCATION_MARK + ("\n" if i.endswith("\n") else "")
+            for i in items
+        ]
+    return "\n".join(([sec["header"]] if sec["header"] else []) + items)
+
+
+def _truncate_text(text: str, target: int) -> str:
+    """target トークン以内に収まる最長の先頭部分を返す（できるだけ行の区切りで切る）"""
+    if target <= 0:
+        return ""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) + estimate_tokens(TRUNCATION_MARK) <= target:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text.rfind("\n", 0, lo)
+    if cut < lo // 2:
+        cut = lo
+    return text[:cut].rstrip() + TRUNCATION_MARK if cut > 0 else ""
+
+
+def _shrink(sec: dict, target: int) -> str:
+    """セクションを target トークン以内に縮めたテキストを返す"""
+    if "items" not in sec:
+        return _truncate_text(sec["text"], target)
+    longest = max((len(i) for i in sec["items"]), default=0)
+    lo, hi = MIN_ITEM_CHARS, max(longest, MIN_ITEM_CHARS)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(_render(sec, mid)) <= target:
+            lo = mid
+        else:
+            hi = mid - 1
+    rendered = _render(sec, lo)
+    if estimate_tokens(rendered) > target:
+        # 下限まで短くしても入らない場合はテキストとして末尾を切る
+        rendered = _truncate_text(rendered, target)
+    return rendered
+
+
+def assemble(label: str, sections: list[dict], budget: int, separator: str = "\n") -> str:
+    """
+    セクションを予算内に収めて連結する
+
+    Args:
+        label: ログに出すプロンプト名（prompt_type と同じ名前にする）
+        sections: section() / item_section() のリスト（連結順）
+        budget: 全体の上限トークン数（見積もり）
+    """
+    texts = [_render(sec) for sec in sections]
+    sizes = [estimate_tokens(t) for t in texts]
+    original = sum(sizes)
+    over = original - budget
+    shrunk: list[str] = []
+
+    # 優先度の低い順（同じ優先度なら後ろのセクションから）に超過分を削る
+    order = sorted(range(len(sections)), key=lambda i: (sections[i]["priority"], -i))
+    for i in order:
+        if over <= 0:
+            break
+        sec = sections[i]
+        if sec["fixed"] or sizes[i] <= sec["min_tokens"]:
+            continue
+        target = max(sec["min_tokens"], sizes[i] - over)
+        texts[i] = _shrink(sec, target)
+        new_size = estimate_tokens(texts[i])
+        over -= sizes[i] - new_size
+        sizes[i] = new_size
+        shrunk.append(sec["name"])
+
+    prompt = separator.join(t for t in texts if t)
+    final = estimate_tokens(prompt)
+    if shrunk:
+        log = logger.warning if final > budget else logger.info
+        log(
+            "prompt %s: 約 %d → %d tokens（予算 %d、切り詰め: %s）",
+            label, original, final, budget, ", ".join(shrunk),
+        )
+    else:
+        logger.info("prompt %s: 約 %d tokens（予算 %d）", label, final, budget)
+    return prompt
+
+
+def cap_text(label: str, text: str, max_tokens: int) -> str:
+    """1 つのテキストを max_tokens 以内に切り詰める（対話の 1 発言など）"""
+    size = estimate_tokens(text)
+    if size <= max_tokens:
+        return text
+    capped = _truncate_text(text, max_tokens)
+    logger.info("prompt %s: 発言を約 %d → %d tokens に切り詰め", label, size, estimate_tokens(capped))
+    return capped
@@ -0,0 +1,208 @@
+"""
+行動記録の時間集計
+parsed_activities（start_time / end_time / category / is_productive）から
+カテゴリ別の分数・生産的な時間の割合・記録の空白をローカルで計算する。
+
+日次分析では productive_hours / wasted_hours / youtube_hours を Claude に
+自由記述から推定させていたため、同じ記録でも生成のたびに数値が揺れていた。
+ここで計算した値を事実としてプロンプトに渡し、summary の時間もこの値で確定させる。
+
+- 時刻は最初の行動からの経過分で並べる（23:00 → 01:00 のような深夜 0 時跨ぎも記録の並び通り）
+- 終了時刻の無い行動は次の行動の開始までとみなす。最後の行動は就寝（OPEN_END_BEDTIME）までとし、
+  最大 OPEN_END_MAX_MINUTES 分とする（件数を open_end_count、割り当てた分を open_end_minutes に返す）
+- 前の行動の終了から次の行動の開始まで GAP_MINUTES 以上空いていれば空白として返す
+- 時刻が不整合な記録（記録の並びと時刻の順が違う・終了が開始より前・合計が 1 日を超える）は
+  issues に理由を返す。issues があれば時間は確定させず、日次分析では AI に記録から推定させる
+  （読み違えた時刻がそのまま summary・daily_metrics・異常検知に入らないようにする）
+"""
+
+from typing import Optional
+
+from utils.activity_parser import CATEGORIES
+
+DAY_MINUTES = 24 * 60
+GAP_MINUTES = 15  # これ未満の空白は移動・準備などとして無視する
+OPEN_END_BEDTIME = "24:00"  # 終了時刻の無い最後の行動を閉じる就寝時刻
+OPEN_END_MAX_MINUTES = 120  # 就寝後に始めた行動・日中で記録が途切れた場合に長くしすぎないための上限
+MAX_ACTIVITY_MINUTES = 16 * 60  # 終了時刻付きの行動がこれより長ければ終了が開始より前とみなす
+PRODUCTIVE_CATEGORIES = ("仕事", "勉強", "運動")
+LIFE_CATEGORY = "生活"  # 睡眠・食事など。生産的な時間の割合の分母から除く
+YOUTUBE_KEYWORDS = ("youtube", "ユーチューブ")
+
+
+def _minutes(hhmm) -> Optional[int]:
+    """"HH:MM" を 0 時からの分に変換する（読めなければ None）"""
+    try:
+        h, m = str(hhmm).split(":")
+        h, m = int(h), int(m)
+    except (ValueError, AttributeError):
+        return None
+    if not (0 <= h <= 24 and 0 <= m <= 59):
+        return None
+    return (h * 60 + m) % DAY_MINUTES
+
+
+def _hhmm(minutes: int) -> str:
+    minutes %= DAY_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _is_youtube(activity: dict) -> bool:
+    text = str(activity.get("activity", "")).lower()
+    return any(keyword in text for keyword in YOUTUBE_KEYWORDS)
+
+
+def compute(parsed_activities: list[dict]) -> dict:
+    """
+    行動リストの時間を集計する
+
+    Returns:
+        {"category_minutes": {カテゴリ: 分}, "total_minutes", "productive_minutes",
+         "wasted_minutes", "youtube_minutes", "productive_ratio",
+         "gaps": [{"start", "end", "minutes"}], "gap_minutes", "open_end_count", "open_end_minutes",
+         "issues": [時刻が不整合な理由]}
+        productive_ratio は 生活 を除いた記録時間に占める 仕事・勉強・運動 の割合
+    """
+    # 開始時刻が読める行動だけを、最初の行動からの経過分で並べる
+    timed = []
+    for activity in parsed_activities or []:
+        if not isinstance(activity, dict):
+            continue
+        start = _minutes(activity.get("start_time"))
+        if start is not None:
+            timed.append((start, activity))
+    day_start = timed[0][0] if timed else 0
+    issues: list[str] = []
+    offsets = [(start - day_start) % DAY_MINUTES for start, _ in timed]
+    for (start, _), prev, offset in zip(timed[1:], offsets, offsets[1:]):
+        if offset < prev:
+            issues.append(f"{_hhmm(start)} の行動が記録の並びと時刻の順で前後している")
+            break
+    timed.sort(key=lambda t: (t[0] - day_start) % DAY_MINUTES)
+
+    category_minutes = {category: 0 for category in CATEGORIES}
+    productive = wasted = youtube = open_end = open_end_minutes = 0
+    gaps: list[dict] = []
+    covered_until: Optional[int] = None  # これまでの行動が埋めた経過分の終わり
+
+    for i, (start, activity) in enumerate(timed):
+        offset = (start - day_start) % DAY_MINUTES
+        end = _minutes(activity.get("end_time"))
+        if end is None and i + 1 < len(timed):
+            # 終了時刻が無ければ次の行動の開始まで
+            end = timed[i + 1][0]
+        if end is None:
+            # 最後の行動は就寝まで（長くても OPEN_END_MAX_MINUTES 分）
+            open_end += 1
+            duration = min((_minutes(OPEN_END_BEDTIME) - start) % DAY_MINUTES, OPEN_END_MAX_MINUTES)
+            open_end_minutes += duration
+        else:
+            duration = (end - start) % DAY_MINUTES
+            if activity.get("end_time") and duration > MAX_ACTIVITY_MINUTES:
+                issues.append(f"{_hhmm(start)}-{_hhmm(end)} の終了が開始より前")
+
+        if covered_until is not None and offset - covered_until >= GAP_MINUTES:
+            gaps.append({
+                "start": _hhmm(day_start + covered_until),
+                "end": _hhmm(start),
+                "minutes": offset - covered_until,
+            })
+        covered_until = max(covered_until or 0, offset + duration)
+
+        category = activity.get("category", "")
+        category_minutes[category] = category_minutes.get(category, 0) + duration
+        if category in PRODUCTIVE_CATEGORIES:
+            productive += duration
+        if not activity.get("is_productive", True):
+            wasted += duration
+        if _is_youtube(activity):
+            youtube += duration
+
+    total = sum(category_minutes.values())
+    if total > DAY_MINUTES or (covered_until or 0) > DAY_MINUTES:
+        issues.append(f"記録の合計（{_format_minutes(max(total, covered_until or 0))}）が 1 日を超える")
+    discretionary = total - category_minutes.get(LIFE_CATEGORY, 0)
+    return {
+        "category_minutes": {k: v for k, v in category_minutes.items() if v},
+        "total_minutes": total,
+        "productive_minutes": productive,
+        "wasted_minutes": wasted,
+        "youtube_minutes": youtube,
+        "productive_ratio": round(productive / discretionary, 3) if discretionary else 0.0,
+        "gaps": gaps,
+        "gap_minutes": sum(g["minutes"] for g in gaps),
+        "open_end_count": open_end,
+        "open_end_minutes": open_end_minutes,
+        "issues": issues,
+    }
+
+
+def for_record(record: dict) -> dict:
+    """記録に保存済みの集計を返す（保存前の古い記録と、issues の無い以前の形式の集計はその場で計算する）"""
+    stored = record.get("time_accounting")
+    if stored and "issues" in stored:
+        return stored
+    return compute(record.get("parsed_activities") or [])
+
+
+def _screen_youtube_minutes(screen_time: Optional[dict]) -> int:
+    apps = (screen_time or {}).get("apps") or []
+    return sum(
+        int(app.get("duration_minutes", 0)) for app in apps
+        if any(keyword in str(app.get("name", "")).lower() for keyword in YOUTUBE_KEYWORDS)
+    )
+
+
+def summary_hours(accounting: dict, screen_time: Optional[dict] = None) -> dict:
+    """
+    分析 summary に入れる時間（時間単位）
+    YouTube はスクリーンタイムの方が長ければそちらを使う（記録に書かれない視聴があるため）
+    時刻が不整合（issues あり）なら空の dict（時間は AI の推定を使う）
+    """
+    if accounting.get("issues"):
+        return {}
+    youtube = max(accounting.get("youtube_minutes", 0), _screen_youtube_minutes(screen_time))
+    return {
+        "productive_hours": round(accounting.get("productive_minutes", 0) / 60, 2),
+        "wasted_hours": round(accounting.get("wasted_minutes", 0) / 60, 2),
+        "youtube_hours": round(youtube / 60, 2),
+    }
+
+
+def _format_minutes(minutes: int) -> str:
+    hours, rest = divmod(minutes, 60)
+    if not hours:
+        return f"{rest}分"
+    return f"{hours}時間{rest}分" if rest else f"{hours}時間"
+
+
+def format_facts(accounting: dict, screen_time: Optional[dict] = None) -> str:
+    """プロンプト用のテキストにする（記録が無ければ空文字）"""
+    if not accounting.get("total_minutes"):
+        return ""
+    if accounting.get("issues"):
+        return (
+            f"- 記録の時刻が不整合なため計算できません（{'、'.join(accounting['issues'])}）。"
+            "productive_hours / wasted_hours / youtube_hours は記録から推定して summary に入れてください"
+        )
+    hours = summary_hours(accounting, screen_time)
+    categories = "、".join(
+        f"{category} {_format_minutes(minutes)}"
+        for category, minutes in sorted(accounting["category_minutes"].items(), key=lambda kv: -kv[1])
+    )
+    lines = [
+        f"- カテゴリ別: {categories}（合計 {_format_minutes(accounting['total_minutes'])}）",
+        f"- 生産的な時間: {hours['productive_hours']}h（生活を除いた記録時間の {round(accounting['productive_ratio'] * 100)}%）",
+        f"- 無駄時間: {hours['wasted_hours']}h",
+        f"- YouTube: {hours['youtube_hours']}h",
+    ]
+    if accounting.get("gaps"):
+        gaps = "、".join(f"{g['start']}-{g['end']}" for g in accounting["gaps"])
+        lines.append(f"- 記録の空白: {gaps}（計 {_format_minutes(accounting['gap_minutes'])}）")
+    if accounting.get("open_end_count"):
+        lines.append(
+            f"- 終了時刻の無い最後の行動: {accounting['open_end_count']}件"
+            f"（就寝 {OPEN_END_BEDTIME} まで・最大 {_format_minutes(OPEN_END_MAX_MINUTES)}として"
+            f" {_format_minutes(accounting.get('open_end_minutes', 0))}を集計）"
+        )
+    return "\n".join(lines)
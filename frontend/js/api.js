@@ -39,9 +39,82 @@ async function apiFetch(path, options = {}) {
   }
 
   if (res.status === 204) return null;
+  if (res.status === 202) {
+    // 時間のかかる AI 生成はジョブとして受け付けられる。完了を待って結果を返す
+    const accepted = await res.json();
+    return accepted.job_id ? waitForJob(accepted) : accepted;
+  }
   return res.json();
 }
 
+/**
+ * 202 Accepted で返ったジョブの完了を待つ
+ * GET /jobs/{job_id} をポーリングし、succeeded なら result を返す（failed なら Error を投げる）
+ */
+async function waitForJob(job) {
+  let interval = 1000;
+  while (true) {
+    if (job.status === "succeeded") return job.result;
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw new Error(job.error?.detail || "処理に失敗しました。しばらく待ってから再度お試しください。");
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    interval = Math.min(interval * 1.5, 5000);
+    job = await apiFetch(`/jobs/${job.job_id}`);
+  }
+}
+
+/**
+ * Server-Sent Events を返す POST エンドポイントを読み進める
+ * イベントを受け取るたびに onEvent(event, data) を呼び、done のデータを返す
+ * event: error を受け取った場合は Error を投げる
+ */
+async function apiStream(path, onEvent, options = {}) {
+  const res = await fetch(`${API_BASE}${path}`, {
+    method: "POST",
+    headers: { Accept: "text/event-stream" },
+    ...options,
+  });
+
+  if (!res.ok) {
+    let message = `HTTP ${res.status}`;
+    try {
+      const data = await res.json();
+      if (typeof data.detail === "string") message = data.detail;
+    } catch {}
+    throw new Error(message);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let result = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // イベントは空行で区切られる
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let dataText = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataText += line.slice(5).trim();
+      }
+      const data = dataText ? JSON.parse(dataText) : null;
+      if (event === "error") throw new Error(data?.detail || "ストリーミングに失敗しました");
+      if (event === "done") result = data;
+      onEvent(event, data);
+    }
+  }
+  return result;
+}
+
 // ---- 行動記録 ----
 
 export const recordsApi = {
@@ -85,6 +158,10 @@ export const analysisApi = {
   generate: (date) =>
     apiFetch(`/analysis/${date}/generate`, { method: "POST" }),
 
+  /** 日次分析をストリーミング生成（セクションが確定するたびに onEvent を呼ぶ） */
+  generateStream: (date, onEvent) =>
+    apiStream(`/analysis/${date}/generate/stream`, onEvent),
+
   /** 保存済み分析を取得 */
   get: (date) => apiFetch(`/analysis/${date}`),
 
@@ -97,6 +174,14 @@ export const analysisApi = {
   },
 };
 
+// ---- 週次分析 ----
+
+export const weeklyApi = {
+  /** 週次分析をストリーミング生成（セクションが確定するたびに onEvent を呼ぶ） */
+  generateStream: (weekId, onEvent) =>
+    apiStream(`/weekly/${weekId}/generate/stream`, onEvent),
+};
+
 // ---- ソクラテス式対話 ----
 
 export const dialogueApi = {
@@ -208,6 +293,15 @@ export const journalApi = {
   analyze: (entryId) =>
     apiFetch(`/journal/entry/${encodeURIComponent(entryId)}/analyze`, { method: "POST" }),
 
+  /** 気分・エネルギーの日次推移と感情タグの頻度（省略時は endDate までの 30 日間） */
+  metrics: ({ startDate, endDate, window } = {}) => {
+    const params = new URLSearchParams();
+    if (startDate) params.set("start_date", startDate);
+    if (endDate) params.set("end_date", endDate);
+    if (window) params.set("window", window);
+    return apiFetch(`/journal/metrics?${params}`);
+  },
+
   /** マークダウン要約を生成 */
   summarize: (entryId) =>
     apiFetch(`/journal/entry/${encodeURIComponent(entryId)}/summarize`, { method: "POST" }),
@@ -505,3 +599,51 @@ export const summariesApi = {
   /** サマリー一覧 */
   list: () => apiFetch("/summaries"),
 };
+
+// ---- タスク実績 ----
+
+export const statsApi = {
+  /** タスク実績（日別・月別のタスク数と完了率、連続日数）を取得 */
+  tasks: ({ today, months, days, streakTask } = {}) => {
+    const params = new URLSearchParams();
+    if (today) params.set("today", today);
+    if (months) params.set("months", months);
+    if (days) params.set("days", days);
+    if (streakTask) params.set("streak_task", streakTask);
+    return apiFetch(`/stats/tasks?${params}`);
+  },
+};
+
+// ---- 履歴 ----
+
+export const historyApi = {
+  /** 履歴一覧（記録と分析スコアを日付で結合したもの、新しい順）。cursor は前のページの next_cursor */
+  list: ({ limit, cursor } = {}) => {
+    const params = new URLSearchParams();
+    if (limit) params.set("limit", limit);
+    if (cursor) params.set("cursor", cursor);
+    return apiFetch(`/history?${params}`);
+  },
+};
+
+// ---- 改善提案 ----
+
+export const suggestionsApi = {
+  /** 全期間の改善提案を似た提案ごとにまとめた一覧（出現回数の多い順） */
+  list: () => apiFetch("/suggestions"),
+};
+
+// ---- 横断検索 ----
+
+export const searchApi = {
+  /** 日記・ブレインダンプ・Udemy Tips・ありがたいノートの全文検索（kinds / labels はカンマ区切り） */
+  search: ({ q, kinds, labels, startDate, endDate, limit } = {}) => {
+    const params = new URLSearchParams({ q });
+    if (kinds) params.set("kinds", kinds);
+    if (labels) params.set("labels", labels);
+    if (startDate) params.set("start_date", startDate);
+    if (endDate) params.set("end_date", endDate);
+    if (limit) params.set("limit", limit);
+    return apiFetch(`/search?${params}`);
+  },
+};
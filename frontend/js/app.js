@@ -35,19 +35,20 @@ import { initSidebarResize } from "./sidebar-resize.js?v=20260820c";
 // 各コンポーネントは初回訪問時に初めてネットワーク取得（以降は SW キャッシュから即応答）
 const loadInputForm       = () => import("./components/input-form.js?v=20260820c");
 const loadAnalysisView    = () => import("./components/analysis-view.js?v=20260820c");
-const loadHistoryList     = () => import("./components/history-list.js?v=20260820c");
+const loadHistoryList     = () => import("./components/history-list.js?v=20261019a");
 const loadWeeklyReport    = () => import("./components/weekly-report.js?v=20260820c");
-const loadSuggestions     = () => import("./components/suggestions.js?v=20260820c");
+const loadSuggestions     = () => import("./components/suggestions.js?v=20261019b");
 const loadMonthlyReport   = () => import("./components/monthly-report.js?v=20260820c");
-const loadJournal         = () => import("./components/journal.js?v=20260820c");
+const loadJournal         = () => import("./components/journal.js?v=20261019d");
 const loadBraindump       = () => import("./components/braindump.js?v=20260820c");
-const loadTaskStats       = () => import("./components/task-stats.js?v=20260820c");
+const loadTaskStats       = () => import("./components/task-stats.js?v=20261018a");
 const loadFlashcardList   = () => import("./components/flashcard-list.js?v=20260820c");
 const loadFlashcardStudy  = () => import("./components/flashcard-study.js?v=20260820c");
 const loadWishlist        = () => import("./components/wishlist.js?v=20260820c");
 const loadGratitude       = () => import("./components/gratitude.js?v=20260820c");
 const loadUdemyTips       = () => import("./components/udemy-tips.js?v=20260820c");
 const loadMichishirube    = () => import("./components/michishirube.js?v=20260820c");
+const loadSearch          = () => import("./components/search.js?v=20261019c");
 
 // ===== ユーティリティ =====
 
@@ -78,6 +79,7 @@ const ROUTE_TITLES = {
   "/wishlist": { title: "やりたいことリスト", breadcrumb: "Wishlist" },
   "/gratitude": { title: "ありがたいノート", breadcrumb: "Gratitude" },
   "/udemy-tips": { title: "Udemy 制作 Tips", breadcrumb: "コース制作の小技集" },
+  "/search": { title: "検索", breadcrumb: "横断検索" },
   "/michishirube": { title: "道しるべ", breadcrumb: "今日意識すること" },
 };
 
@@ -462,6 +464,7 @@ addRoute("/wishlist", async () => (await loadWishlist()).renderWishlist());
 addRoute("/gratitude", async () => (await loadGratitude()).renderGratitude());
 addRoute("/udemy-tips", async () => (await loadUdemyTips()).renderUdemyTips());
 addRoute("/michishirube", async () => (await loadMichishirube()).renderMichishirube());
+addRoute("/search", async () => (await loadSearch()).renderSearch());
 
 // ===== 初期化 =====
 
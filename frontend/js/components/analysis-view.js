@@ -150,18 +150,9 @@ function attachChoiceEvents(date) {
     }
   });
 
-  document.getElementById("btn-quick-analysis")?.addEventListener("click", async (e) => {
+  document.getElementById("btn-quick-analysis")?.addEventListener("click", (e) => {
     e.target.disabled = true;
-    e.target.textContent = "分析中...";
-    try {
-      await analysisApi.generate(date);
-      showToast("分析が完了しました！", "success");
-      await renderAnalysisView(date);
-    } catch (err) {
-      showToast(`分析に失敗しました: ${err.message}`, "error");
-      e.target.disabled = false;
-      e.target.textContent = "通常の分析を生成";
-    }
+    generateWithStreaming(date, "分析が完了しました！");
   });
 }
 
@@ -442,6 +433,103 @@ function buildComparisonSection(comparison) {
     </div>`;
 }
 
+// ===== 分析生成中（ストリーミング表示） =====
+
+/**
+ * 分析をストリーミングで生成し、確定したセクションから順に描画する
+ * 完了・失敗どちらの場合も最後に保存済みの状態で再描画する
+ */
+async function generateWithStreaming(date, successMessage) {
+  const main = document.querySelector("main");
+  const partial = { date, summary: null, analysis: {} };
+  main.innerHTML = buildStreamingHTML(partial);
+
+  try {
+    await analysisApi.generateStream(date, (event, data) => {
+      if (event !== "section") return;
+      const [top, key] = data.path;
+      if (top === "summary" && !key) {
+        partial.summary = data.value;
+      } else if (top === "analysis" && key) {
+        partial.analysis[key] = data.value;
+      } else {
+        return;
+      }
+      main.innerHTML = buildStreamingHTML(partial);
+    });
+    showToast(successMessage, "success");
+  } catch (err) {
+    showToast(`分析に失敗しました: ${err.message}`, "error");
+  }
+  await renderAnalysisView(date);
+}
+
+function buildStreamingHTML(partial) {
+  const { date, summary, analysis: detail } = partial;
+  const dateLabel = new Date(date + "T00:00:00").toLocaleDateString("ja-JP", {
+    year: "numeric", month: "long", day: "numeric", weekday: "long",
+  });
+
+  let summaryHTML = `
+    <div class="card">
+      <div class="card-title">総合スコア</div>
+      <div class="loading" style="padding: 16px 0;">
+        <div class="spinner"></div>
+        <p>スコアを計算中...</p>
+      </div>
+    </div>`;
+  if (summary) {
+    const score = summary.overall_score ?? 0;
+    const scoreClass = score >= 70 ? "good" : score >= 40 ? "mid" : "bad";
+    summaryHTML = `
+    <div class="card">
+      <div class="card-title">総合スコア</div>
+      <div class="score-circle ${scoreClass}">
+        <span class="score-value">${score}</span>
+        <span class="score-label">${score >= 70 ? "良い一日" : score >= 40 ? "まあまあ" : "要改善"}</span>
+      </div>
+      <div class="stats-grid">
+        <div class="stat-item">
+          <div class="stat-value">${(summary.productive_hours ?? 0).toFixed(1)}<small style="font-size:0.7rem">h</small></div>
+          <div class="stat-label">生産的</div>
+        </div>
+        <div class="stat-item">
+          <div class="stat-value">${(summary.wasted_hours ?? 0).toFixed(1)}<small style="font-size:0.7rem">h</small></div>
+          <div class="stat-label">無駄時間</div>
+        </div>
+        <div class="stat-item">
+          <div class="stat-value">${(summary.youtube_hours ?? 0).toFixed(1)}<small style="font-size:0.7rem">h</small></div>
+          <div class="stat-label">YouTube</div>
+        </div>
+        <div class="stat-item">
+          <div class="stat-value">${summary.tasks_completed_count ?? Math.round((summary.task_completion_rate ?? 0) * 100)}<small style="font-size:0.7rem">${summary.tasks_completed_count != null ? '個' : '%'}</small></div>
+          <div class="stat-label">完了タスク</div>
+        </div>
+      </div>
+    </div>`;
+  }
+
+  return `
+    <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 4px;">
+      <h2 style="font-size: 1.1rem;">分析結果</h2>
+    </div>
+    <p style="color: var(--text-muted); font-size: 0.85rem; margin-bottom: var(--gap);">${dateLabel}</p>
+
+    ${summaryHTML}
+    ${buildListSection("✅ 良かった点", detail.good_points, "good")}
+    ${buildListSection("❌ 改善が必要な点", detail.bad_points, "bad")}
+    ${buildListSection("🔍 根本原因の分析", detail.root_causes, "cause")}
+    ${buildListSection("🧠 思考パターンの弱み", detail.thinking_weaknesses, "cause")}
+    ${buildListSection("🔄 行動パターンの弱み", detail.behavior_weaknesses, "cause")}
+    ${buildSuggestionsSection(detail.improvement_suggestions)}
+    ${buildComparisonSection(detail.comparison_with_past)}
+
+    <div class="loading">
+      <div class="spinner"></div>
+      <p>分析を生成中...</p>
+    </div>`;
+}
+
 // ===== 対話履歴（分析結果ページ内） =====
 
 function buildDialogueHistorySection(dialogue) {
@@ -499,18 +587,9 @@ function buildNoAnalysisHTML(date, errorMsg) {
 function attachAnalysisEvents(date) {
   const btnRegenerate = document.getElementById("btn-regenerate");
   if (btnRegenerate) {
-    btnRegenerate.addEventListener("click", async (e) => {
+    btnRegenerate.addEventListener("click", (e) => {
       e.target.disabled = true;
-      e.target.textContent = "分析中...";
-      try {
-        await analysisApi.generate(date);
-        showToast("分析を再実行しました！", "success");
-        await renderAnalysisView(date);
-      } catch (err) {
-        showToast(`分析に失敗しました: ${err.message}`, "error");
-        e.target.disabled = false;
-        e.target.textContent = "🔄 分析を再実行する";
-      }
+      generateWithStreaming(date, "分析を再実行しました！");
     });
   }
 
@@ -536,18 +615,9 @@ function attachAnalysisEvents(date) {
   // 「今すぐ分析する」ボタン（記録なし画面）
   const btnGenerateNow = document.getElementById("btn-generate-now");
   if (btnGenerateNow) {
-    btnGenerateNow.addEventListener("click", async (e) => {
+    btnGenerateNow.addEventListener("click", (e) => {
       e.target.disabled = true;
-      e.target.textContent = "分析中...";
-      try {
-        await analysisApi.generate(date);
-        showToast("分析が完了しました！", "success");
-        await renderAnalysisView(date);
-      } catch (err) {
-        showToast(`分析に失敗しました: ${err.message}`, "error");
-        e.target.disabled = false;
-        e.target.textContent = "🤖 今すぐ分析する";
-      }
+      generateWithStreaming(date, "分析が完了しました！");
     });
   }
 }
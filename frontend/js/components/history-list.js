@@ -3,7 +3,9 @@
  * カレンダービュー（月ごとのスコア色）＋リストビュー
  */
 
-import { recordsApi, analysisApi } from "../api.js?v=20260725b";
+import { historyApi } from "../api.js?v=20261019a";
+
+const PAGE_SIZE = 31; // 1 ページ目で今月のカレンダーが埋まる
 
 /**
  * 履歴一覧画面をメインエリアに描画する
@@ -13,17 +15,11 @@ export async function renderHistoryList() {
   main.innerHTML = `<div class="loading"><div class="spinner"></div><p>履歴を読み込み中...</p></div>`;
 
   try {
-    // 直近3ヶ月のデータを取得
-    const endDate = todayStr();
-    const startDate = monthsAgo(3);
-
-    const [records, analyses] = await Promise.all([
-      recordsApi.list(startDate, endDate),
-      analysisApi.list(startDate, endDate),
-    ]);
+    // 記録と分析スコアはサーバー側で日付ごとに結合済み
+    const page = await historyApi.list({ limit: PAGE_SIZE });
 
-    main.innerHTML = buildHistoryHTML(records, analyses);
-    attachHistoryEvents(records, analyses);
+    main.innerHTML = buildHistoryHTML(page.items, page.next_cursor);
+    attachHistoryEvents(page.next_cursor);
   } catch (err) {
     main.innerHTML = `
       <div class="empty-state">
@@ -33,11 +29,8 @@ export async function renderHistoryList() {
   }
 }
 
-function buildHistoryHTML(records, analyses) {
-  const analysisMap = Object.fromEntries(analyses.map((a) => [a.date, a]));
-  const recordDates = new Set(records.map((r) => r.date));
-
-  if (records.length === 0) {
+function buildHistoryHTML(items, nextCursor) {
+  if (items.length === 0) {
     return `
       <h2 style="margin-bottom: var(--gap);">履歴</h2>
       <div class="empty-state">
@@ -47,40 +40,51 @@ function buildHistoryHTML(records, analyses) {
       </div>`;
   }
 
-  // 今月のカレンダーを生成
-  const calendarHTML = buildCalendarHTML(analysisMap, recordDates);
+  // 今月のカレンダーを生成（1 ページ目に今月の記録はすべて含まれる）
+  const calendarHTML = buildCalendarHTML(Object.fromEntries(items.map((i) => [i.date, i])));
 
-  // リストビュー（新しい順）
-  const listHTML = records.slice(0, 30).map((rec) => {
-    const analysis = analysisMap[rec.date];
-    const score = analysis?.summary?.overall_score;
-    const scoreClass = score == null ? "" : score >= 70 ? "good" : score >= 40 ? "mid" : "bad";
-    const tasks = rec.tasks || {};
-    const completionRate = Math.round((tasks.completion_rate || 0) * 100);
+  return `
+    <h2 style="margin-bottom: var(--gap);">履歴</h2>
+    ${calendarHTML}
+    <div class="card">
+      <div class="card-title">記録一覧</div>
+      <div class="history-list" id="history-list">${items.map(buildItemHTML).join("")}</div>
+      ${buildMoreButtonHTML(nextCursor)}
+    </div>`;
+}
 
-    return `
-      <div class="history-item" data-date="${rec.date}" onclick="window.location.hash='/analysis/${rec.date}'" role="button">
-        <div class="history-date">${formatDateShort(rec.date)}</div>
+function buildItemHTML(item) {
+  const score = item.score;
+  const scoreClass = score == null ? "" : score >= 70 ? "good" : score >= 40 ? "mid" : "bad";
+  const completionRate = Math.round((item.task_completion_rate || 0) * 100);
+  const meta = [
+    item.rest_day ? `おやすみ${item.rest_reason ? `（${escapeHtml(item.rest_reason)}）` : ""}` : "",
+    completionRate > 0 ? `タスク完了率: ${completionRate}%` : "",
+    item.productive_hours != null ? `生産的 ${item.productive_hours}h` : "",
+  ].filter(Boolean).join(" / ");
+
+  return `
+      <div class="history-item" data-date="${item.date}" onclick="window.location.hash='/analysis/${item.date}'" role="button">
+        <div class="history-date">${formatDateShort(item.date)}</div>
         <div class="history-body">
-          <div class="history-preview">${truncate(rec.raw_input, 60)}</div>
-          ${completionRate > 0 ? `<div class="history-meta">タスク完了率: ${completionRate}%</div>` : ""}
+          <div class="history-preview">${escapeHtml(item.snippet)}</div>
+          ${meta ? `<div class="history-meta">${meta}</div>` : ""}
         </div>
         ${score != null ? `
           <div class="history-score ${scoreClass}">${score}</div>
         ` : `<div class="history-score no-score">-</div>`}
       </div>`;
-  }).join("");
+}
 
+function buildMoreButtonHTML(nextCursor) {
+  if (!nextCursor) return "";
   return `
-    <h2 style="margin-bottom: var(--gap);">履歴</h2>
-    ${calendarHTML}
-    <div class="card">
-      <div class="card-title">記録一覧（直近 ${Math.min(records.length, 30)} 件）</div>
-      <div class="history-list">${listHTML}</div>
-    </div>`;
+      <div style="text-align: center; margin-top: var(--gap);">
+        <button class="btn btn-outline btn-sm" id="btn-history-more" data-cursor="${nextCursor}">さらに表示</button>
+      </div>`;
 }
 
-function buildCalendarHTML(analysisMap, recordDates) {
+function buildCalendarHTML(itemMap) {
   const now = new Date();
   const year = now.getFullYear();
   const month = now.getMonth(); // 0-based
@@ -98,9 +102,9 @@ function buildCalendarHTML(analysisMap, recordDates) {
 
   for (let d = 1; d <= lastDay.getDate(); d++) {
     const dateStr = `${year}-${String(month + 1).padStart(2, "0")}-${String(d).padStart(2, "0")}`;
-    const analysis = analysisMap[dateStr];
-    const hasRecord = recordDates.has(dateStr);
-    const score = analysis?.summary?.overall_score;
+    const item = itemMap[dateStr];
+    const hasRecord = item != null;
+    const score = item?.score;
     const isToday = dateStr === todayStr();
 
     let cls = "cal-cell";
@@ -134,8 +138,25 @@ function buildCalendarHTML(analysisMap, recordDates) {
     </div>`;
 }
 
-function attachHistoryEvents(records, analyses) {
-  // 現在は onclick で処理しているため追加イベントなし
+function attachHistoryEvents(nextCursor) {
+  // 一覧の行は onclick で処理。「さらに表示」は次のページを一覧の末尾に追加する
+  const button = document.getElementById("btn-history-more");
+  if (!button || !nextCursor) return;
+  button.addEventListener("click", async () => {
+    button.disabled = true;
+    button.textContent = "読み込み中...";
+    try {
+      const page = await historyApi.list({ limit: PAGE_SIZE, cursor: nextCursor });
+      document.getElementById("history-list").insertAdjacentHTML("beforeend", page.items.map(buildItemHTML).join(""));
+      const wrapper = button.parentElement;
+      wrapper.insertAdjacentHTML("afterend", buildMoreButtonHTML(page.next_cursor));
+      wrapper.remove();
+      attachHistoryEvents(page.next_cursor);
+    } catch (err) {
+      button.disabled = false;
+      button.textContent = "さらに表示";
+    }
+  });
 }
 
 // ---- ユーティリティ ----
@@ -144,11 +165,6 @@ function todayStr() {
   return new Date().toLocaleDateString("sv-SE");
 }
 
-function monthsAgo(n) {
-  const d = new Date();
-  d.setMonth(d.getMonth() - n);
-  return d.toLocaleDateString("sv-SE");
-}
 
 function formatDateShort(dateStr) {
   const d = new Date(dateStr + "T00:00:00");
@@ -156,8 +172,8 @@ function formatDateShort(dateStr) {
   return `${d.getMonth() + 1}/${d.getDate()}（${weekdays[d.getDay()]}）`;
 }
 
-function truncate(str, len) {
-  if (!str) return "";
-  const firstLine = str.split("\n")[0];
-  return firstLine.length > len ? firstLine.slice(0, len) + "…" : firstLine;
+function escapeHtml(str) {
+  const div = document.createElement("div");
+  div.textContent = str || "";
+  return div.innerHTML;
 }
@@ -3,7 +3,7 @@
  * 1日に複数エントリ作成可能。各エントリに独立した分析・MD要約。
  */
 
-import { journalApi, diaryDialogueApi } from "../api.js?v=20260725b";
+import { journalApi, diaryDialogueApi } from "../api.js?v=20261019d";
 import { showToast } from "../app.js?v=20260725b";
 import {
   attachFloatingToolbar,
@@ -152,10 +152,11 @@ export async function renderJournal(date) {
   // marked.js をデータ取得と並行してロード（API 応答待ち中に JS も降ってくる）
   const markedPromise = loadMarked().catch(() => null);
 
-  const [entriesResult, recentResult, diaryDialogueResult] = await Promise.allSettled([
+  const [entriesResult, recentResult, diaryDialogueResult, metricsResult] = await Promise.allSettled([
     journalApi.listByDate(date),
     journalApi.list(getMonthStart(date), date),
     diaryDialogueApi.get(date),
+    journalApi.metrics({ endDate: date }),
   ]);
 
   // API 応答時点で marked が未ロードなら、ここで待機（通常はすでにロード済み）
@@ -164,14 +165,14 @@ export async function renderJournal(date) {
   const entries = entriesResult.status === "fulfilled" ? (entriesResult.value || []) : [];
   const recentEntries = recentResult.status === "fulfilled" ? recentResult.value : [];
   const diaryDialogue = diaryDialogueResult.status === "fulfilled" ? diaryDialogueResult.value : null;
+  const metrics = metricsResult.status === "fulfilled" ? metricsResult.value : null;
 
   // エントリ番号順にソート
   entries.sort((a, b) => (a.entry_number || 1) - (b.entry_number || 1));
 
   const monthlyBlockers = aggregateBlockers(recentEntries);
-  const last7 = recentEntries.filter((e) => e.is_analyzed).slice(0, 7).reverse();
 
-  main.innerHTML = buildJournalHTML(date, entries, last7, monthlyBlockers, recentEntries, diaryDialogue);
+  main.innerHTML = buildJournalHTML(date, entries, metrics, monthlyBlockers, recentEntries, diaryDialogue);
   initJournalEditors();
   attachJournalEvents(date, entries);
   attachDiaryDialogueEvents(date);
@@ -226,7 +227,7 @@ function modeSeverity(arr) {
 
 // ===== HTML ビルダー =====
 
-function buildJournalHTML(date, entries, last7, monthlyBlockers, recentEntries, diaryDialogue) {
+function buildJournalHTML(date, entries, metrics, monthlyBlockers, recentEntries, diaryDialogue) {
   const dateJP = formatDateJP(date);
   const isToday = date === today();
   const isFuture = date > today();
@@ -286,7 +287,7 @@ function buildJournalHTML(date, entries, last7, monthlyBlockers, recentEntries,
         </div>
       </div>
 
-      ${last7.length >= 2 ? buildTrendSection(last7) : ""}
+      ${buildTrendSection(metrics)}
       ${monthlyBlockers.length > 0 ? buildBlockerSummary(monthlyBlockers) : ""}
       ${buildWeeklyDigestSection(date)}
       ${buildRecentList(recentEntries, date)}
@@ -668,28 +669,32 @@ function buildAnalysisSection(a) {
   `;
 }
 
-function buildTrendSection(entries) {
-  const allEmotions = new Set();
-  entries.forEach((e) => {
-    (e.ai_analysis?.emotions || []).forEach((em) => allEmotions.add(em.tag));
-  });
-  if (allEmotions.size === 0) return "";
+/** 気分の推移（GET /journal/metrics の日次系列）。分析済みの日が 2 日未満なら表示しない */
+function buildTrendSection(metrics) {
+  if (!metrics || metrics.summary.days_with_entries < 2) return "";
 
   const trendData = JSON.stringify(
-    entries.map((e) => ({
-      date: e.date.slice(5),
-      mood: e.ai_analysis?.mood_score || 0,
-      emotions: Object.fromEntries(
-        (e.ai_analysis?.emotions || []).map((em) => [em.tag, em.intensity]),
-      ),
+    metrics.days.map((d) => ({
+      date: d.date.slice(5),
+      mood: d.mood_score,
+      rolling: d.mood_rolling,
     })),
   );
+  const topEmotions = metrics.emotions.slice(0, 6);
 
   return `
     <div class="card">
-      <div class="card-title">感情トレンド（直近${entries.length}日間）</div>
+      <div class="card-title">感情トレンド（直近${metrics.days.length}日間）</div>
       <canvas class="journal-trend-canvas" id="journal-trend-canvas"></canvas>
       <script type="application/json" id="journal-trend-data">${trendData}</script>
+      ${topEmotions.length > 0 ? `
+        <div class="emotion-pills" style="margin-top:10px">
+          ${topEmotions.map((e) => `
+            <span class="emotion-pill ${emotionValence(e.tag)}">
+              ${escapeHTML(e.tag)} <span class="emotion-intensity">×${e.count}</span>
+            </span>`).join("")}
+        </div>
+      ` : ""}
     </div>
   `;
 }
@@ -1063,28 +1068,43 @@ function drawTrendChart() {
     ctx.fillText(String(100 - i * 25), pad.left - 6, y + 3);
   }
 
+  const xAt = (i) => pad.left + (chartW / (data.length - 1)) * i;
+  const yAt = (v) => pad.top + chartH * (1 - v / 100);
+
+  // 日付ラベルは 7 本程度に間引く
   ctx.textAlign = "center";
+  const labelStep = Math.max(1, Math.ceil(data.length / 7));
+  data.forEach((d, i) => {
+    if (i % labelStep === 0 || i === data.length - 1) ctx.fillText(d.date, xAt(i), H - 8);
+  });
+
+  // 移動平均（分析の無い日も途切れない線）
+  ctx.strokeStyle = isDark ? "rgba(0,212,255,0.35)" : "rgba(2,132,199,0.35)";
+  ctx.lineWidth = 3;
+  ctx.beginPath();
+  let started = false;
   data.forEach((d, i) => {
-    const x = pad.left + (chartW / (data.length - 1)) * i;
-    ctx.fillText(d.date, x, H - 8);
+    if (d.rolling == null) return;
+    if (!started) ctx.moveTo(xAt(i), yAt(d.rolling));
+    else ctx.lineTo(xAt(i), yAt(d.rolling));
+    started = true;
   });
+  ctx.stroke();
 
+  // 日ごとの気分スコア（分析のある日だけを結ぶ）
+  const points = data.map((d, i) => ({ ...d, i })).filter((d) => d.mood != null);
   ctx.strokeStyle = isDark ? "#00d4ff" : "#0284c7";
   ctx.lineWidth = 2;
   ctx.beginPath();
-  data.forEach((d, i) => {
-    const x = pad.left + (chartW / (data.length - 1)) * i;
-    const y = pad.top + chartH * (1 - d.mood / 100);
-    if (i === 0) ctx.moveTo(x, y);
-    else ctx.lineTo(x, y);
+  points.forEach((d, j) => {
+    if (j === 0) ctx.moveTo(xAt(d.i), yAt(d.mood));
+    else ctx.lineTo(xAt(d.i), yAt(d.mood));
   });
   ctx.stroke();
 
-  data.forEach((d, i) => {
-    const x = pad.left + (chartW / (data.length - 1)) * i;
-    const y = pad.top + chartH * (1 - d.mood / 100);
+  points.forEach((d) => {
     ctx.beginPath();
-    ctx.arc(x, y, 4, 0, Math.PI * 2);
+    ctx.arc(xAt(d.i), yAt(d.mood), 4, 0, Math.PI * 2);
     ctx.fillStyle = isDark ? "#00d4ff" : "#0284c7";
     ctx.fill();
   });
@@ -0,0 +1,169 @@
+/**
+ * 横断検索画面
+ * 日記・ブレインダンプ・Udemy Tips・ありがたいノートをサーバー側の全文検索（GET /search）で探す。
+ * 種類・ラベル・期間で絞り込める。結果をクリックするとそのエントリの画面へ移動する。
+ */
+
+import { searchApi } from "../api.js?v=20261019c";
+
+const KIND_LABELS = {
+  journal: "日記",
+  braindump: "ブレインダンプ",
+  udemy_tip: "Udemy Tips",
+  gratitude: "ありがたいノート",
+};
+
+// ブレインダンプ画面が復元するノートID（braindump.js と同じキー）
+const BRAINDUMP_LAST_ENTRY_KEY = "braindump:lastOpenEntryId";
+
+const state = {
+  query: "",
+  kind: "all",
+  label: "",
+  startDate: "",
+  endDate: "",
+  results: [],
+};
+
+/**
+ * 横断検索画面をメインエリアに描画する
+ */
+export function renderSearch() {
+  const main = document.querySelector("main");
+  main.innerHTML = buildPageHTML();
+  attachEvents();
+  if (state.query) runSearch();
+}
+
+function buildPageHTML() {
+  return `
+    <h2 style="margin-bottom:4px;">検索</h2>
+    <p style="color:var(--text-muted); font-size:0.85rem; margin-bottom:var(--gap);">
+      日記・ブレインダンプ・Udemy Tips・ありがたいノートを横断して探します
+    </p>
+
+    <div class="card" style="padding:14px 16px;">
+      <form id="search-form" autocomplete="off">
+        <div class="form-group">
+          <input type="text" id="search-query" placeholder="キーワード（例: 瞑想、動画編集）" value="${esc(state.query)}" />
+        </div>
+        <div style="display:flex; flex-direction:column; gap:10px;">
+          <div>
+            <label style="font-size:0.78rem; margin-bottom:4px; display:block;">種類</label>
+            <div id="search-kind" class="filter-btn-group">
+              <button type="button" class="filter-btn ${state.kind === "all" ? "active" : ""}" data-kind="all">すべて</button>
+              ${Object.entries(KIND_LABELS).map(([kind, label]) => `
+                <button type="button" class="filter-btn ${state.kind === kind ? "active" : ""}" data-kind="${kind}">${label}</button>`).join("")}
+            </div>
+          </div>
+          <div style="display:flex; gap:8px; flex-wrap:wrap;">
+            <input type="text" id="search-label" placeholder="ラベル" value="${esc(state.label)}" style="flex:1; min-width:120px;" />
+            <input type="date" id="search-start" value="${esc(state.startDate)}" style="flex:1; min-width:140px;" />
+            <input type="date" id="search-end" value="${esc(state.endDate)}" style="flex:1; min-width:140px;" />
+          </div>
+          <button type="submit" class="btn btn-primary">検索</button>
+        </div>
+      </form>
+    </div>
+
+    <div id="search-results"></div>`;
+}
+
+function buildResultsHTML(data) {
+  if (!data.results.length) {
+    return `
+      <div class="empty-state" style="padding:32px 16px;">
+        <div class="icon">🔍</div>
+        <p>一致するエントリがありません</p>
+      </div>`;
+  }
+  const more = data.total > data.results.length ? `（上位 ${data.results.length} 件を表示）` : "";
+  return `
+    <p style="color:var(--text-muted); font-size:0.8rem; margin:0 0 8px;">${data.total} 件${more}</p>
+    ${data.results.map((r, i) => `
+      <div class="card search-result" data-index="${i}" style="cursor:pointer;">
+        <div style="display:flex; align-items:center; justify-content:space-between; margin-bottom:6px; gap:8px;">
+          <div style="display:flex; gap:6px; flex-wrap:wrap;">
+            <span class="badge badge-cat">${KIND_LABELS[r.kind] || esc(r.kind)}</span>
+            ${r.labels.map((l) => `<span class="badge badge-low">${esc(l)}</span>`).join("")}
+          </div>
+          <span style="font-size:0.75rem; color:var(--text-muted); white-space:nowrap;">${esc(r.date)}</span>
+        </div>
+        <div style="font-weight:600; margin-bottom:4px;">${esc(r.title)}</div>
+        <p style="font-size:0.88rem; line-height:1.55; color:var(--text-secondary);">${esc(r.snippet)}</p>
+      </div>`).join("")}`;
+}
+
+async function runSearch() {
+  const container = document.getElementById("search-results");
+  if (!container) return;
+  if (!state.query.trim()) {
+    container.innerHTML = "";
+    return;
+  }
+  container.innerHTML = `<div class="loading"><div class="spinner"></div><p>検索中...</p></div>`;
+  try {
+    const data = await searchApi.search({
+      q: state.query,
+      kinds: state.kind === "all" ? "" : state.kind,
+      labels: state.label,
+      startDate: state.startDate,
+      endDate: state.endDate,
+    });
+    state.results = data.results;
+    container.innerHTML = buildResultsHTML(data);
+  } catch (err) {
+    container.innerHTML = `
+      <div class="empty-state">
+        <div class="icon">🔍</div>
+        <p>検索に失敗しました: ${esc(err.message)}</p>
+      </div>`;
+  }
+}
+
+function openResult(result) {
+  if (result.kind === "journal") {
+    window.location.hash = `/journal/${result.date}`;
+  } else if (result.kind === "braindump") {
+    try { localStorage.setItem(BRAINDUMP_LAST_ENTRY_KEY, result.id); } catch {}
+    window.location.hash = "/braindump";
+  } else if (result.kind === "udemy_tip") {
+    window.location.hash = "/udemy-tips";
+  } else {
+    window.location.hash = "/gratitude";
+  }
+}
+
+function attachEvents() {
+  document.getElementById("search-form").addEventListener("submit", (e) => {
+    e.preventDefault();
+    state.query = document.getElementById("search-query").value;
+    state.label = document.getElementById("search-label").value.trim();
+    state.startDate = document.getElementById("search-start").value;
+    state.endDate = document.getElementById("search-end").value;
+    runSearch();
+  });
+
+  const kindGroup = document.getElementById("search-kind");
+  kindGroup.addEventListener("click", (e) => {
+    const btn = e.target.closest("[data-kind]");
+    if (!btn) return;
+    kindGroup.querySelectorAll(".filter-btn").forEach((b) => b.classList.remove("active"));
+    btn.classList.add("active");
+    state.kind = btn.dataset.kind;
+    runSearch();
+  });
+
+  document.getElementById("search-results").addEventListener("click", (e) => {
+    const card = e.target.closest(".search-result");
+    if (!card) return;
+    const result = state.results[Number(card.dataset.index)];
+    if (result) openResult(result);
+  });
+}
+
+function esc(str) {
+  return String(str || "").replace(/[&<>"']/g, (c) => ({
+    "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;",
+  })[c]);
+}
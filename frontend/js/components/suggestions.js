@@ -1,9 +1,10 @@
 /**
  * 改善提案アーカイブコンポーネント
- * 過去の日次分析から改善提案を集約・フィルタリング表示する
+ * 全期間の日次分析の改善提案を、サーバー側で似た提案ごとにまとめた索引から表示する
+ * （何度も挙がっている提案ほど上に並ぶ）
  */
 
-import { analysisApi } from "../api.js?v=20260725b";
+import { suggestionsApi } from "../api.js?v=20261019b";
 
 /**
  * 改善提案アーカイブをメインエリアに描画する
@@ -13,20 +14,15 @@ export async function renderSuggestions() {
   main.innerHTML = `<div class="loading"><div class="spinner"></div><p>改善提案を読み込み中...</p></div>`;
 
   try {
-    // 直近3ヶ月の分析データを取得
-    const endDate = todayStr();
-    const startDate = monthsAgo(3);
-    const analyses = await analysisApi.list(startDate, endDate);
+    const { clusters, total_occurrences: total } = await suggestionsApi.list();
 
-    if (!analyses || analyses.length === 0) {
+    if (!clusters || clusters.length === 0) {
       main.innerHTML = buildEmptyHTML();
       return;
     }
 
-    // 全提案を集約
-    const allSuggestions = collectSuggestions(analyses);
-    main.innerHTML = buildSuggestionsHTML(allSuggestions, analyses.length);
-    attachFilterEvents(allSuggestions);
+    main.innerHTML = buildSuggestionsHTML(clusters, total);
+    attachFilterEvents(clusters);
   } catch (err) {
     main.innerHTML = `
       <div class="empty-state">
@@ -36,37 +32,7 @@ export async function renderSuggestions() {
   }
 }
 
-/**
- * 分析リストから改善提案を集約する
- */
-function collectSuggestions(analyses) {
-  const suggestions = [];
-
-  analyses.forEach((analysis) => {
-    const items = analysis.analysis?.improvement_suggestions || [];
-    items.forEach((s) => {
-      suggestions.push({
-        date: analysis.date,
-        priority: s.priority || "low",
-        category: s.category || "その他",
-        suggestion: s.suggestion || "",
-        score: analysis.summary?.overall_score ?? null,
-      });
-    });
-  });
-
-  // 日付降順・優先度順でソート
-  const priorityOrder = { high: 0, medium: 1, low: 2 };
-  suggestions.sort((a, b) => {
-    const dateDiff = b.date.localeCompare(a.date);
-    if (dateDiff !== 0) return dateDiff;
-    return (priorityOrder[a.priority] ?? 2) - (priorityOrder[b.priority] ?? 2);
-  });
-
-  return suggestions;
-}
-
-function buildSuggestionsHTML(suggestions, analysesDays) {
+function buildSuggestionsHTML(suggestions, total) {
   // カテゴリ・優先度の選択肢を収集
   const categories = [...new Set(suggestions.map((s) => s.category))].sort();
   const highCount = suggestions.filter((s) => s.priority === "high").length;
@@ -76,7 +42,7 @@ function buildSuggestionsHTML(suggestions, analysesDays) {
   return `
     <h2 style="margin-bottom:4px;">改善提案アーカイブ</h2>
     <p style="color:var(--text-muted); font-size:0.85rem; margin-bottom:var(--gap);">
-      過去 ${analysesDays} 日の分析から ${suggestions.length} 件の提案
+      これまでの ${total} 件の提案を ${suggestions.length} 件にまとめました
     </p>
 
     <!-- サマリーバー -->
@@ -142,16 +108,18 @@ function buildSuggestionItems(suggestions) {
   const priorityBadge = { high: "badge-high", medium: "badge-medium", low: "badge-low" };
 
   return suggestions.map((s) => `
-    <div class="card suggestion-card ${s.priority}" data-priority="${esc(s.priority)}" data-category="${esc(s.category)}" style="cursor:pointer;" onclick="window.location.hash='/analysis/${s.date}'">
+    <div class="card suggestion-card ${s.priority}" data-priority="${esc(s.priority)}" data-category="${esc(s.category)}" style="cursor:pointer;" onclick="window.location.hash='/analysis/${esc(s.last_seen)}'">
       <div style="display:flex; align-items:center; justify-content:space-between; margin-bottom:6px;">
         <div style="display:flex; gap:6px; flex-wrap:wrap;">
           <span class="badge ${priorityBadge[s.priority] || "badge-low"}">優先度：${priorityLabel[s.priority] || s.priority}</span>
           <span class="badge badge-cat">${esc(s.category)}</span>
         </div>
-        <span style="font-size:0.75rem; color:var(--text-muted);">${formatDateShort(s.date)}</span>
+        <span style="font-size:0.75rem; color:var(--text-muted);">${s.count}回</span>
       </div>
       <p style="font-size:0.92rem; line-height:1.55; color:var(--text-primary);">${esc(s.suggestion)}</p>
-      ${s.score !== null ? `<div style="margin-top:6px; font-size:0.75rem; color:var(--text-muted);">その日のスコア: ${s.score}</div>` : ""}
+      <div style="margin-top:6px; font-size:0.75rem; color:var(--text-muted);">
+        ${s.count > 1 ? `初出 ${formatDateShort(s.first_seen)} ・ 最近 ${formatDateShort(s.last_seen)}` : formatDateShort(s.last_seen)}
+      </div>
     </div>`).join("");
 }
 
@@ -209,16 +177,6 @@ function attachFilterEvents(allSuggestions) {
 
 // ---- ユーティリティ ----
 
-function todayStr() {
-  return new Date().toLocaleDateString("sv-SE");
-}
-
-function monthsAgo(n) {
-  const d = new Date();
-  d.setMonth(d.getMonth() - n);
-  return d.toLocaleDateString("sv-SE");
-}
-
 function formatDateShort(dateStr) {
   if (!dateStr) return "";
   const d = new Date(dateStr + "T00:00:00");
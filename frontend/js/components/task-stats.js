@@ -5,7 +5,7 @@
  * - タスク完了時 +1 フローティングアニメーション
  */
 
-import { recordsApi } from "../api.js?v=20260725b";
+import { statsApi } from "../api.js?v=20261018a";
 
 // ===== ユーティリティ =====
 
@@ -28,15 +28,6 @@ function getWeekRange(dateStr) {
   };
 }
 
-/** 指定日が含まれる月の初日～末日を返す */
-function getMonthRange(dateStr) {
-  const d = new Date(dateStr + "T00:00:00");
-  const start = `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}-01`;
-  const last = new Date(d.getFullYear(), d.getMonth() + 1, 0);
-  const end = last.toLocaleDateString("sv-SE");
-  return { start, end };
-}
-
 /** 前の期間の範囲を返す */
 function getPrevWeekRange(dateStr) {
   const d = new Date(dateStr + "T00:00:00");
@@ -44,27 +35,23 @@ function getPrevWeekRange(dateStr) {
   return getWeekRange(d.toLocaleDateString("sv-SE"));
 }
 
-function getPrevMonthRange(dateStr) {
-  const d = new Date(dateStr + "T00:00:00");
-  d.setMonth(d.getMonth() - 1);
-  return getMonthRange(d.toLocaleDateString("sv-SE"));
-}
-
-/** レコード配列からタスク完了数の合計を算出 */
-function sumCompleted(records) {
+/** 日別集計（/stats/tasks の days）から期間内の完了数の合計を算出 */
+function sumCompleted(days, range) {
   let total = 0;
-  for (const r of records) {
-    if (r.tasks && r.tasks.completed) {
-      total += r.tasks.completed.length;
-    }
+  for (const d of days) {
+    if (d.date >= range.start && d.date <= range.end) total += d.completed;
   }
   return total;
 }
 
-/** レコードから日別の完了数を取得（前日との差分算出用） */
-function getCompletedForDate(records, dateStr) {
-  const r = records.find((rec) => rec.date === dateStr);
-  return r?.tasks?.completed?.length || 0;
+/** 日別集計から指定日の完了数を取得（前日との差分算出用） */
+function getCompletedForDate(days, dateStr) {
+  return days.find((d) => d.date === dateStr)?.completed || 0;
+}
+
+/** 月別集計（/stats/tasks の months）から指定月の完了数を取得 */
+function getCompletedForMonth(months, dateStr) {
+  return months.find((m) => m.month === dateStr.slice(0, 7))?.completed || 0;
 }
 
 /** トレンドHTMLを生成 */
@@ -75,36 +62,9 @@ function buildTrend(current, previous) {
   return `<div class="task-stat-trend flat">±0</div>`;
 }
 
-// ===== 瞑想連続日数の算出 =====
-
+// 瞑想の連続日数はサーバー側（/stats/tasks の streaks.task）で集計する
 const MEDITATION_TASK_NAME = "トラタカ瞑想";
 
-/** 今日から遡って瞑想タスクが連続で完了されている日数を返す */
-function calcMeditationStreak(allRecords, todayStr) {
-  // 日付降順でソート
-  const sorted = [...allRecords].sort((a, b) => (b.date > a.date ? 1 : -1));
-  let streak = 0;
-  const d = new Date(todayStr + "T00:00:00");
-
-  for (let i = 0; i <= 365; i++) {
-    const dateStr = d.toLocaleDateString("sv-SE");
-    const rec = sorted.find((r) => r.date === dateStr);
-    const completed = rec?.tasks?.completed || [];
-    if (completed.includes(MEDITATION_TASK_NAME)) {
-      streak++;
-    } else {
-      // 今日まだ未完了の場合はスキップして昨日以前の連続を数える
-      if (i === 0) {
-        d.setDate(d.getDate() - 1);
-        continue;
-      }
-      break;
-    }
-    d.setDate(d.getDate() - 1);
-  }
-  return streak;
-}
-
 // ===== ホーム画面サマリーカード =====
 
 export async function buildTaskStatsCards() {
@@ -117,40 +77,30 @@ export async function buildTaskStatsCards() {
 
   const weekRange = getWeekRange(todayStr);
   const prevWeekRange = getPrevWeekRange(todayStr);
-  const monthRange = getMonthRange(todayStr);
-  const prevMonthRange = getPrevMonthRange(todayStr);
+  const prevMonth = new Date(todayStr + "T00:00:00");
+  prevMonth.setDate(1);
+  prevMonth.setMonth(prevMonth.getMonth() - 1);
 
   try {
-    // 必要なレコードを並行取得（瞑想ストリーク用に過去90日分も取得）
-    const earliest = prevMonthRange.start < prevWeekRange.start ? prevMonthRange.start : prevWeekRange.start;
-    const streakStart = new Date(todayStr + "T00:00:00");
-    streakStart.setDate(streakStart.getDate() - 90);
-    const streakStartStr = streakStart.toLocaleDateString("sv-SE");
-    const fetchStart = earliest < streakStartStr ? earliest : streakStartStr;
-    const allRecords = await recordsApi.list(fetchStart, monthRange.end);
+    // 今月・先月の月別集計と、先週の月曜以降の日別集計だけを取得
+    const days = Math.round((new Date(todayStr + "T00:00:00") - new Date(prevWeekRange.start + "T00:00:00")) / 86400000) + 1;
+    const stats = await statsApi.tasks({ today: todayStr, months: 2, days, streakTask: MEDITATION_TASK_NAME });
 
     // 瞑想連続日数
-    const meditationStreak = calcMeditationStreak(allRecords, todayStr);
+    const meditationStreak = stats.streaks.task.current;
+    const meditationDoneToday = stats.streaks.task.done_today;
 
     // 今日
-    const todayCount = getCompletedForDate(allRecords, todayStr);
-    const yesterdayCount = getCompletedForDate(allRecords, yesterdayStr);
+    const todayCount = getCompletedForDate(stats.days, todayStr);
+    const yesterdayCount = getCompletedForDate(stats.days, yesterdayStr);
 
     // 今週
-    const weekRecords = allRecords.filter((r) => r.date >= weekRange.start && r.date <= weekRange.end);
-    const weekCount = sumCompleted(weekRecords);
-    const prevWeekRecords = allRecords.filter((r) => r.date >= prevWeekRange.start && r.date <= prevWeekRange.end);
-    const prevWeekCount = sumCompleted(prevWeekRecords);
+    const weekCount = sumCompleted(stats.days, weekRange);
+    const prevWeekCount = sumCompleted(stats.days, prevWeekRange);
 
     // 今月
-    const monthRecords = allRecords.filter((r) => r.date >= monthRange.start && r.date <= monthRange.end);
-    const monthCount = sumCompleted(monthRecords);
-    const prevMonthRecords = allRecords.filter((r) => r.date >= prevMonthRange.start && r.date <= prevMonthRange.end);
-    const prevMonthCount = sumCompleted(prevMonthRecords);
-
-    // 今日瞑想完了済みかチェック
-    const todayRec = allRecords.find((r) => r.date === todayStr);
-    const meditationDoneToday = (todayRec?.tasks?.completed || []).includes(MEDITATION_TASK_NAME);
+    const monthCount = getCompletedForMonth(stats.months, todayStr);
+    const prevMonthCount = getCompletedForMonth(stats.months, prevMonth.toLocaleDateString("sv-SE"));
 
     return `
       <div class="task-stats-row" id="task-stats-row">
@@ -354,15 +304,11 @@ export async function renderTaskStats() {
       <p>タスク実績を読み込み中...</p>
     </div>`;
 
-  // 6ヶ月分のレコードを取得
+  // 6ヶ月分の月別集計と、4週分の日別集計を取得
   const todayStr = today();
-  const sixMonthsAgo = new Date(todayStr + "T00:00:00");
-  sixMonthsAgo.setMonth(sixMonthsAgo.getMonth() - 6);
-  const startDate = sixMonthsAgo.toLocaleDateString("sv-SE");
-
-  let allRecords;
+  let stats;
   try {
-    allRecords = await recordsApi.list(startDate, todayStr);
+    stats = await statsApi.tasks({ today: todayStr, months: 6, days: 28 });
   } catch {
     main.innerHTML = `<div class="empty-state"><div class="icon">📊</div><p>データの読み込みに失敗しました</p></div>`;
     return;
@@ -390,9 +336,9 @@ export async function renderTaskStats() {
       t.classList.toggle("active", t.dataset.tab === tab);
     });
 
-    if (tab === "daily") renderDailyChart(chartArea, allRecords, todayStr);
-    else if (tab === "weekly") renderWeeklyChart(chartArea, allRecords, todayStr);
-    else renderMonthlyChart(chartArea, allRecords, todayStr);
+    if (tab === "daily") renderDailyChart(chartArea, stats.days, todayStr);
+    else if (tab === "weekly") renderWeeklyChart(chartArea, stats.days, todayStr);
+    else renderMonthlyChart(chartArea, stats.months, todayStr);
   }
 
   document.querySelector(".task-stats-tabs").addEventListener("click", (e) => {
@@ -403,28 +349,27 @@ export async function renderTaskStats() {
   renderChart("daily");
 }
 
-function renderDailyChart(container, records, todayStr) {
+function renderDailyChart(container, statDays, todayStr) {
   const days = [];
   const weekdays = ["日", "月", "火", "水", "木", "金", "土"];
   for (let i = 6; i >= 0; i--) {
     const d = new Date(todayStr + "T00:00:00");
     d.setDate(d.getDate() - i);
     const dateStr = d.toLocaleDateString("sv-SE");
-    const count = getCompletedForDate(records, dateStr);
+    const count = getCompletedForDate(statDays, dateStr);
     const label = i === 0 ? "今日" : `${d.getMonth() + 1}/${d.getDate()}(${weekdays[d.getDay()]})`;
     days.push({ label, count, isToday: i === 0 });
   }
   renderBarChart(container, days);
 }
 
-function renderWeeklyChart(container, records, todayStr) {
+function renderWeeklyChart(container, statDays, todayStr) {
   const weeks = [];
   for (let i = 3; i >= 0; i--) {
     const d = new Date(todayStr + "T00:00:00");
     d.setDate(d.getDate() - i * 7);
     const range = getWeekRange(d.toLocaleDateString("sv-SE"));
-    const weekRecords = records.filter((r) => r.date >= range.start && r.date <= range.end);
-    const count = sumCompleted(weekRecords);
+    const count = sumCompleted(statDays, range);
     const startD = new Date(range.start + "T00:00:00");
     const label = i === 0 ? "今週" : `${startD.getMonth() + 1}/${startD.getDate()}~`;
     weeks.push({ label, count, isToday: i === 0 });
@@ -432,14 +377,13 @@ function renderWeeklyChart(container, records, todayStr) {
   renderBarChart(container, weeks);
 }
 
-function renderMonthlyChart(container, records, todayStr) {
+function renderMonthlyChart(container, statMonths, todayStr) {
   const months = [];
   for (let i = 5; i >= 0; i--) {
     const d = new Date(todayStr + "T00:00:00");
+    d.setDate(1);
     d.setMonth(d.getMonth() - i);
-    const range = getMonthRange(d.toLocaleDateString("sv-SE"));
-    const monthRecords = records.filter((r) => r.date >= range.start && r.date <= range.end);
-    const count = sumCompleted(monthRecords);
+    const count = getCompletedForMonth(statMonths, d.toLocaleDateString("sv-SE"));
     const label = i === 0 ? "今月" : `${d.getFullYear()}/${d.getMonth() + 1}`;
     months.push({ label, count, isToday: i === 0 });
   }
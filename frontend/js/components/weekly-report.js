@@ -3,6 +3,8 @@
  * 週次分析結果の表示・生成
  */
 
+import { weeklyApi } from "../api.js?v=20260820c";
+
 const API_BASE = window.API_BASE_URL || "http://localhost:8000/api/v1";
 
 /**
@@ -30,11 +32,7 @@ export async function renderWeeklyReport(weekId) {
 }
 
 function buildWeeklyHTML(data, weekId) {
-  const { week_start, week_end, weekly_summary: s, deep_analysis: d } = data;
-  const score = s?.avg_overall_score ?? 0;
-  const scoreClass = score >= 70 ? "good" : score >= 40 ? "mid" : "bad";
-  const trendIcon = { improving: "📈", declining: "📉", stable: "➡️" }[s?.score_trend] ?? "➡️";
-  const trendLabel = { improving: "改善中", declining: "悪化中", stable: "横ばい" }[s?.score_trend] ?? "-";
+  const { weekly_summary: s, deep_analysis: d } = data;
 
   return `
     <div style="display:flex; align-items:center; justify-content:space-between; margin-bottom:4px;">
@@ -54,6 +52,19 @@ function buildWeeklyHTML(data, weekId) {
     </div>
 
     <!-- サマリー -->
+    ${buildSummaryCard(s)}
+
+    ${buildDeepAnalysisSections(d)}
+  `;
+}
+
+function buildSummaryCard(s) {
+  const score = s?.avg_overall_score ?? 0;
+  const scoreClass = score >= 70 ? "good" : score >= 40 ? "mid" : "bad";
+  const trendIcon = { improving: "📈", declining: "📉", stable: "➡️" }[s?.score_trend] ?? "➡️";
+  const trendLabel = { improving: "改善中", declining: "悪化中", stable: "横ばい" }[s?.score_trend] ?? "-";
+
+  return `
     <div class="card">
       <div class="card-title">週間サマリー</div>
       <div class="score-circle ${scoreClass}" style="margin-bottom:12px;">
@@ -81,8 +92,11 @@ function buildWeeklyHTML(data, weekId) {
       <div style="text-align:center; font-size:0.9rem; color:var(--text-muted); margin-top:4px;">
         ${trendIcon} ${trendLabel}
       </div>
-    </div>
+    </div>`;
+}
 
+function buildDeepAnalysisSections(d) {
+  return `
     <!-- 週パターン -->
     ${d?.weekly_pattern ? `
     <div class="card">
@@ -101,10 +115,58 @@ function buildWeeklyHTML(data, weekId) {
 
     <!-- 前週比較 -->
     ${buildProgressSection(d?.progress_vs_last_week)}
+  `;
+}
 
+/** 生成中の表示（確定したセクションだけを描画し、末尾にスピナーを出す） */
+function buildWeeklyStreamingHTML(partial, weekId) {
+  return `
+    <h2 style="font-size:1.1rem; margin-bottom:4px;">週次レポート</h2>
+    <p style="color:var(--text-muted); font-size:0.85rem; margin-bottom:var(--gap);">
+      ${formatWeekLabel(weekId)}
+    </p>
+
+    ${partial.weekly_summary ? buildSummaryCard(partial.weekly_summary) : `
+    <div class="card">
+      <div class="card-title">週間サマリー</div>
+      <div class="loading" style="padding:16px 0;"><div class="spinner"></div><p>集計中...</p></div>
+    </div>`}
+
+    ${buildDeepAnalysisSections(partial.deep_analysis)}
+
+    <div class="loading"><div class="spinner"></div><p>週次分析を生成中...</p></div>
   `;
 }
 
+/**
+ * 週次分析をストリーミングで生成し、確定したセクションから順に描画する
+ * 完了・失敗どちらの場合も最後に保存済みの状態で再描画する
+ */
+async function generateWeeklyWithStreaming(weekId) {
+  const main = document.querySelector("main");
+  const partial = { weekly_summary: null, deep_analysis: {} };
+  main.innerHTML = buildWeeklyStreamingHTML(partial, weekId);
+
+  try {
+    await weeklyApi.generateStream(weekId, (event, data) => {
+      if (event !== "section") return;
+      const [top, key] = data.path;
+      if (top === "weekly_summary" && !key) {
+        partial.weekly_summary = data.value;
+      } else if (top === "deep_analysis" && key) {
+        partial.deep_analysis[key] = data.value;
+      } else {
+        return;
+      }
+      main.innerHTML = buildWeeklyStreamingHTML(partial, weekId);
+    });
+    import("../app.js").then(({ showToast }) => showToast("週次分析が完了しました！", "success"));
+  } catch (err) {
+    import("../app.js").then(({ showToast }) => showToast(`分析に失敗: ${err.message}`, "error"));
+  }
+  await renderWeeklyReport(weekId);
+}
+
 function buildTimewastersSection(timewasters) {
   if (!timewasters || timewasters.length === 0) return "";
   return `
@@ -203,20 +265,9 @@ function attachWeeklyEvents(weekId) {
   ["btn-generate-weekly", "btn-regenerate-weekly"].forEach((id) => {
     const btn = document.getElementById(id);
     if (!btn) return;
-    btn.addEventListener("click", async (e) => {
+    btn.addEventListener("click", (e) => {
       e.target.disabled = true;
-      const orig = e.target.textContent;
-      e.target.textContent = "分析中...";
-      try {
-        const res = await fetch(`${API_BASE}/weekly/${weekId}/generate`, { method: "POST" });
-        if (!res.ok) throw new Error((await res.json()).detail || `HTTP ${res.status}`);
-        import("../app.js").then(({ showToast }) => showToast("週次分析が完了しました！", "success"));
-        await renderWeeklyReport(weekId);
-      } catch (err) {
-        import("../app.js").then(({ showToast }) => showToast(`分析に失敗: ${err.message}`, "error"));
-        e.target.disabled = false;
-        e.target.textContent = orig;
-      }
+      generateWeeklyWithStreaming(weekId);
     });
   });
 
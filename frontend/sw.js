@@ -9,7 +9,7 @@
  * SWR でも古いコードが出続けることはない（新バージョンは新 URL として取得される）。
  */
 
-const CACHE_NAME = "daily-tracker-v331";
+const CACHE_NAME = "daily-tracker-v332";
 const STATIC_ASSETS = [
   "/",
   "/index.html",
@@ -57,6 +57,9 @@ self.addEventListener("fetch", (event) => {
   // （キャッシュすると 2 回目以降バックエンドを起こせず、コールドスタート対策が無効化する）
   if (url.pathname === "/health") return;
 
+  // ジョブの状態はポーリングのたびに変わるためキャッシュしない
+  if (url.pathname.includes("/api/v1/jobs/")) return;
+
   // API リクエストは Network First
   if (url.pathname.startsWith("/api/")) {
     event.respondWith(networkFirst(request));